@@ -0,0 +1,338 @@
+import json
+import math
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import unquote
+from config.settings import ADMISION_MAX_CLAVES, ADMISION_PROXIES, ADMISION_REGLAS
+from metricas import registro
+from services.idempotencia import respuestas_idempotentes
+
+# Cuerpo máximo que se lee para sacar correo/userId (los votos ocupan ~100 bytes);
+# uno mayor en una ruta limitada por cuenta se rechaza con 413
+MAX_CUERPO = 16 * 1024
+
+
+class Regla:
+    """Token bucket y límite de peticiones en curso para una ruta y una clave.
+
+    `clave` es `ip` (la IP del cliente) o `cuenta` (correo y userId del
+    cuerpo JSON, o el último segmento de la ruta en las verificaciones).
+    Cada valor de la clave tiene su cubeta: `rafaga` tokens que se reponen a
+    `tasa` por segundo. `tasa` 0 = sin límite de tasa; `concurrencia` 0 =
+    sin límite de peticiones simultáneas. Solo se guardan las cubetas que no
+    están llenas (una llena es igual a una que no existe): al pasar de
+    `max_claves` se descartan las que ya se llenaron, nunca una que sigue
+    limitando a alguien.
+    """
+
+    def __init__(self, metodo: str, ruta: str, clave: str, tasa: float, rafaga: float, concurrencia: int,
+                 max_claves: int = ADMISION_MAX_CLAVES):
+        self.metodo = metodo
+        self.prefijo = ruta[:-2] if ruta.endswith('/*') else None
+        self.ruta = ruta.rstrip('/') if self.prefijo is None else self.prefijo
+        self.etiqueta = f'{metodo} {ruta}'
+        self.clave = clave
+        self.tasa = tasa
+        self.rafaga = max(1.0, rafaga)
+        self.concurrencia = concurrencia
+        self.max_claves = max_claves
+        # valor -> [tokens, instante de la última actualización], de la menos a la más recientemente usada
+        self._cubetas: 'OrderedDict[str, list]' = OrderedDict()
+        # Tamaño a partir del cual se purga (crece si no hay cubetas llenas que quitar)
+        self._limite = max_claves
+        self._en_curso: Dict[str, int] = {}
+        # Peticiones por resultado (se exponen en /metrics sin un lock por petición)
+        self.resultados: Dict[str, int] = {'admitida': 0, 'tasa': 0, 'concurrencia': 0, 'cuerpo': 0}
+
+    def aplica(self, metodo: str, directorio: str) -> bool:
+        """Si una regla con /* abarca las rutas que cuelgan de `directorio`"""
+        return metodo == self.metodo and (directorio + '/').startswith(self.prefijo + '/')
+
+    def tokens(self, valor: str, ahora: float) -> float:
+        cubeta = self._cubetas.get(valor)
+        if cubeta is None:
+            return self.rafaga
+        return min(self.rafaga, cubeta[0] + (ahora - cubeta[1]) * self.tasa)
+
+    def rechazo(self, valor: str, ahora: float, en_curso: bool = True) -> Optional[Tuple[str, int]]:
+        """(motivo, segundos para reintentar) si la petición excede la regla
+        (`en_curso` False: sin el límite de concurrencia)"""
+        if en_curso and self.concurrencia and self._en_curso.get(valor, 0) >= self.concurrencia:
+            return 'concurrencia', 1
+        if self.tasa:
+            tokens = self.tokens(valor, ahora)
+            if tokens < 1:
+                return 'tasa', math.ceil((1 - tokens) / self.tasa)
+        return None
+
+    def tomar(self, valor: str, ahora: float, en_curso: bool = True):
+        if self.tasa:
+            tokens = self.tokens(valor, ahora) - 1
+            cubeta = self._cubetas.get(valor)
+            if cubeta is None:
+                if len(self._cubetas) >= self._limite:
+                    self._purgar(ahora)
+                self._cubetas[valor] = [tokens, ahora]
+            else:
+                cubeta[0], cubeta[1] = tokens, ahora
+                self._cubetas.move_to_end(valor)
+        if en_curso and self.concurrencia:
+            self._en_curso[valor] = self._en_curso.get(valor, 0) + 1
+
+    def soltar(self, valor: str):
+        if self.concurrencia:
+            restantes = self._en_curso.get(valor, 0) - 1
+            if restantes > 0:
+                self._en_curso[valor] = restantes
+            else:
+                self._en_curso.pop(valor, None)
+
+    def _purgar(self, ahora: float):
+        """Quitar las cubetas que ya se llenaron.
+
+        Las que no están llenas se conservan aunque sean viejas: quitarlas
+        devolvería la ráfaga completa a quien está siendo limitado. Si no
+        alcanza, el límite se duplica hasta la próxima purga (las cubetas se
+        llenan en ráfaga / tasa segundos, así que el exceso es pasajero).
+        """
+        llenas = [valor for valor, (tokens, t) in self._cubetas.items()
+                  if tokens + (ahora - t) * self.tasa >= self.rafaga]
+        for valor in llenas:
+            del self._cubetas[valor]
+        self._limite = max(self.max_claves, 2 * len(self._cubetas))
+
+    def claves(self) -> int:
+        return len(self._cubetas)
+
+    def en_curso(self) -> int:
+        return sum(self._en_curso.values())
+
+
+def leer_reglas(texto: str, max_claves: int = ADMISION_MAX_CLAVES) -> List[Regla]:
+    """Reglas de ADMISION_REGLAS: `MÉTODO /ruta|clave:tasa:ráfaga:concurrencia;...`"""
+    reglas = []
+    for parte in texto.split(';'):
+        parte = parte.strip()
+        if not parte:
+            continue
+        try:
+            ruta, limites = parte.split('|')
+            metodo, ruta = ruta.split()
+            clave, tasa, rafaga, concurrencia = limites.split(':')
+            regla = Regla(metodo.upper(), ruta, clave, float(tasa), float(rafaga), int(concurrencia), max_claves)
+        except ValueError:
+            raise ValueError(f"Regla de admisión inválida: {parte!r}")
+        if clave not in ('ip', 'cuenta'):
+            raise ValueError(f"Clave de admisión desconocida (ip | cuenta): {parte!r}")
+        reglas.append(regla)
+    return reglas
+
+
+class ControlAdmision:
+    """Middleware ASGI que rechaza con 429 lo que excede las reglas, antes de
+    llegar a las rutas (y por lo tanto a Firestore).
+
+    Todas las reglas que aplican se revisan primero y solo si ninguna rechaza
+    se descuentan los tokens y se cuenta la petición en curso, hasta que la
+    respuesta termina. El estado vive en memoria de cada worker y se usa
+    desde el event loop, sin locks.
+
+    El reintento de un POST con una `Idempotency-Key` que ya tiene respuesta
+    guardada o una petición en curso (de la misma cuenta) no cuenta para los
+    límites de concurrencia (sí para los de tasa): el almacén de respuestas
+    idempotentes lo resuelve sin ejecutarlo otra vez. Una clave nueva cuenta
+    como cualquier petición.
+    """
+
+    def __init__(self, app, reglas: Optional[List[Regla]] = None, proxies: int = ADMISION_PROXIES):
+        self.app = app
+        self.proxies = proxies
+        self.reglas = leer_reglas(ADMISION_REGLAS) if reglas is None else reglas
+        controles.append(self)
+
+    @property
+    def reglas(self) -> List[Regla]:
+        return self._reglas
+
+    @reglas.setter
+    def reglas(self, reglas: List[Regla]):
+        self._reglas = reglas
+        self._exactas: Dict[Tuple[str, str], List[Regla]] = {}
+        for regla in reglas:
+            if regla.prefijo is None:
+                self._exactas.setdefault((regla.metodo, regla.ruta), []).append(regla)
+        self._con_prefijo = [regla for regla in reglas if regla.prefijo is not None]
+        self._por_directorio: Dict[Tuple[str, str], List[Regla]] = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not self._reglas:
+            await self.app(scope, receive, send)
+            return
+        reglas = self._reglas_de(scope['method'], scope['path'])
+        if not reglas:
+            await self.app(scope, receive, send)
+            return
+
+        cuentas: List[str] = []
+        if any(regla.clave == 'cuenta' for regla in reglas):
+            if scope['method'] in ('POST', 'PUT', 'PATCH'):
+                cuentas, receive = await self._cuentas_del_cuerpo(receive)
+                if cuentas is None:
+                    # Sin leer el cuerpo no se sabe la cuenta: no se deja pasar sin límite
+                    for regla in reglas:
+                        if regla.clave == 'cuenta':
+                            regla.resultados['cuerpo'] += 1
+                    await self._responder(send, 413, 'Cuerpo de la petición demasiado grande')
+                    return
+            else:
+                segmento = unquote(scope['path'].rstrip('/').rsplit('/', 1)[-1])
+                # Los correos no distinguen mayúsculas; los userId (UID de Firebase) sí
+                if '@' in segmento:
+                    segmento = segmento.lower()
+                cuentas = [segmento] if segmento else []
+
+        ip = self._ip(scope)
+        en_curso = not self._reintento_idempotente(scope, cuentas)
+        ahora = time.monotonic()
+        aplicadas = []
+        for regla in reglas:
+            for valor in ((ip,) if regla.clave == 'ip' else cuentas):
+                rechazo = regla.rechazo(valor, ahora, en_curso)
+                if rechazo is not None:
+                    regla.resultados[rechazo[0]] += 1
+                    await self._rechazar(send, rechazo)
+                    return
+                aplicadas.append((regla, valor))
+
+        for regla, valor in aplicadas:
+            regla.tomar(valor, ahora, en_curso)
+        for regla in reglas:
+            regla.resultados['admitida'] += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            if en_curso:
+                for regla, valor in aplicadas:
+                    regla.soltar(valor)
+
+    def _reglas_de(self, metodo: str, ruta: str) -> List[Regla]:
+        ruta = ruta.rstrip('/')
+        exactas = self._exactas.get((metodo, ruta))
+        if not self._con_prefijo:
+            return exactas or []
+        # Las reglas con /* dependen solo del directorio: /verificar-correo/{correo}
+        # comparte la entrada de todos los correos
+        clave = (metodo, ruta[:ruta.rfind('/')])
+        prefijos = self._por_directorio.get(clave)
+        if prefijos is None:
+            prefijos = [regla for regla in self._con_prefijo if regla.aplica(*clave)]
+            if len(self._por_directorio) < 1024:
+                self._por_directorio[clave] = prefijos
+        if exactas and prefijos:
+            return exactas + prefijos
+        return exactas or prefijos
+
+    @staticmethod
+    def _reintento_idempotente(scope, cuentas: List[str]) -> bool:
+        """Si es el reintento de una petición con Idempotency-Key ya guardada o en curso"""
+        if scope['method'] not in ('POST', 'PUT', 'PATCH'):
+            return False
+        user_id = next((cuenta[len('userId:'):] for cuenta in cuentas if cuenta.startswith('userId:')), None)
+        if user_id is None:
+            return False
+        for nombre, valor in scope['headers']:
+            if nombre == b'idempotency-key':
+                return respuestas_idempotentes.conocida(user_id, valor.decode('latin-1'))
+        return False
+
+    def _ip(self, scope) -> str:
+        if self.proxies:
+            for nombre, valor in scope['headers']:
+                if nombre == b'x-forwarded-for':
+                    # Cada proxy de confianza agrega la IP que vio al final
+                    saltos = [ip.strip() for ip in valor.decode('latin-1').split(',')]
+                    if len(saltos) >= self.proxies:
+                        return saltos[-self.proxies]
+                    break
+        cliente = scope.get('client')
+        return cliente[0] if cliente else ''
+
+    @staticmethod
+    async def _cuentas_del_cuerpo(receive):
+        """correo y userId del cuerpo JSON, y un receive que lo vuelve a entregar
+        (None en lugar de las cuentas si el cuerpo pasa de MAX_CUERPO)"""
+        mensajes = []
+        tamano = 0
+        while True:
+            mensaje = await receive()
+            mensajes.append(mensaje)
+            if mensaje['type'] != 'http.request':
+                break
+            tamano += len(mensaje.get('body', b''))
+            if not mensaje.get('more_body') or tamano > MAX_CUERPO:
+                break
+
+        async def repetir():
+            if mensajes:
+                return mensajes.pop(0)
+            return await receive()
+
+        if tamano > MAX_CUERPO:
+            return None, repetir
+        cuentas = []
+        if mensajes[-1]['type'] == 'http.request' and not mensajes[-1].get('more_body'):
+            try:
+                cuerpo = json.loads(b''.join(m.get('body', b'') for m in mensajes))
+            except ValueError:
+                cuerpo = None
+            if isinstance(cuerpo, dict):
+                correo, user_id = cuerpo.get('correo'), cuerpo.get('userId')
+                if isinstance(correo, str) and correo:
+                    cuentas.append(correo.strip().lower())
+                if isinstance(user_id, str) and user_id:
+                    cuentas.append(f'userId:{user_id}')
+        return cuentas, repetir
+
+    @staticmethod
+    async def _rechazar(send, rechazo: Tuple[str, int]):
+        motivo, reintentar = rechazo
+        detalle = ('Demasiadas peticiones simultáneas' if motivo == 'concurrencia'
+                   else 'Demasiadas peticiones, intenta de nuevo en unos segundos')
+        await ControlAdmision._responder(send, 429, detalle, [(b'retry-after', str(reintentar).encode('ascii'))])
+
+    @staticmethod
+    async def _responder(send, estado: int, detalle: str, headers: list = ()):
+        cuerpo = json.dumps({"detail": detalle}, ensure_ascii=False).encode('utf-8')
+        await send({
+            'type': 'http.response.start',
+            'status': estado,
+            'headers': [
+                (b'content-type', b'application/json'),
+                (b'content-length', str(len(cuerpo)).encode('ascii')),
+                *headers,
+            ],
+        })
+        await send({'type': 'http.response.body', 'body': cuerpo})
+
+
+# Instancias creadas por la app (una por worker), para las métricas
+controles: List[ControlAdmision] = []
+
+registro.medidor(
+    'contivotos_admision_total',
+    'Peticiones por regla de admisión y resultado (admitida, tasa, concurrencia, cuerpo)',
+    lambda: {
+        (regla.etiqueta, regla.clave, resultado): n
+        for control in controles for regla in control.reglas for resultado, n in regla.resultados.items()
+    },
+    ('ruta', 'clave', 'resultado'), tipo='counter'
+)
+registro.medidor(
+    'contivotos_admision_claves', 'IPs y cuentas con una cubeta de tokens sin llenar',
+    lambda: sum(regla.claves() for control in controles for regla in control.reglas)
+)
+registro.medidor(
+    'contivotos_admision_en_curso', 'Peticiones en curso contadas por los límites de concurrencia',
+    lambda: sum(regla.en_curso() for control in controles for regla in control.reglas)
+)
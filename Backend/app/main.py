@@ -1,6 +1,42 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from routers import candidatos, votos
+from app.admision import ControlAdmision
+from routers import candidatos, votos, metricas, salud
+from services.almacenamiento import usa_firestore
+from services.arranque import arranque
+from services.idempotencia import respuestas_idempotentes
+from realtime import backplane, coalescer, flujo_resultados, cache_respuestas, emisor_participacion, manager
+
+
+# =========================
+# Ciclo de vida
+# =========================
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Eventos entre workers y frames de resultados para /api/votos/ws y /stream
+    await backplane.iniciar()
+    coalescer.iniciar()
+    flujo_resultados.iniciar()
+    # Curva de participación (y sus frames para los clientes que la piden)
+    emisor_participacion.iniciar()
+    # Respuestas GET cacheadas hasta el próximo cambio de datos
+    cache_respuestas.iniciar()
+    # Respuestas de votos con Idempotency-Key, compartidas con los demás workers
+    respuestas_idempotentes.iniciar(al_guardar=backplane.publicar)
+    backplane.suscribir(respuestas_idempotentes.on_evento)
+    # Cliente de Firestore (o pool de PostgreSQL), listeners e ingesta diferida
+    # se preparan en segundo plano: el servidor atiende desde ya
+    arranque.iniciar(al_confirmar=backplane.publicar)
+    yield
+    await arranque.detener()
+    await emisor_participacion.detener()
+    await coalescer.detener()
+    await flujo_resultados.detener()
+    # Tareas de envío de los WebSocket que sigan abiertos
+    await manager.detener()
+    await backplane.detener()
+
 
 # =========================
 # Crear aplicación FastAPI
@@ -9,8 +45,16 @@ app = FastAPI(
     title="API Votación - Firestore",
     description="API para gestión de candidatos y votación en tiempo real con Firebase Firestore",
     version="2.0.0",
+    lifespan=lifespan,
 )
 
+# =========================
+# Control de admisión
+# =========================
+# Límites por IP y por cuenta antes de las rutas (429); se agrega antes que
+# CORS para que los rechazos también lleven sus cabeceras
+app.add_middleware(ControlAdmision)
+
 # =========================
 # Configuración CORS
 # =========================
@@ -28,6 +72,8 @@ app.add_middleware(
 # =========================
 app.include_router(candidatos.router, prefix="/api")
 app.include_router(votos.router, prefix="/api")
+app.include_router(salud.router, prefix="/api")
+app.include_router(metricas.router)
 
 
 # =========================
@@ -54,7 +100,13 @@ def home():
                 "tiempo_real": "GET /api/votos/tiempo-real",
                 "verificar_correo": "GET /api/votos/verificar-correo/{correo}",
                 "verificar_ubicacion": "GET /api/votos/verificar-ubicacion?lat={lat}&lng={lng}",
+                "participacion": "GET /api/votos/participacion",
                 "websocket": "WS /api/votos/ws",
+                "stream": "GET /api/votos/stream",
+            },
+            "salud": {
+                "vivo": "GET /api/salud/vivo",
+                "listo": "GET /api/salud/listo",
             },
         },
     }
@@ -69,5 +121,5 @@ def status():
         "success": True,
         "message": "API de Votación con Firestore - Operativa",
         "version": "2.0.0",
-        "database": "Firebase Firestore",
+        "database": "Firebase Firestore" if usa_firestore() else "PostgreSQL",
     }
@@ -0,0 +1,123 @@
+"""Comprobación multi-worker del backplane por socket Unix.
+
+Uso (desde Backend/):
+    python -m benchmarks.backplane_multiworker [--workers 4] [--eventos 200] [--clientes 50]
+
+Lanza N procesos, cada uno con su BackplaneUnixSocket y sus propios
+clientes WebSocket simulados conectados a un ConnectionManager. Cada worker
+publica sus eventos y reenvía todo lo que recibe del backplane a sus
+clientes. Termina con código 1 si algún cliente no recibió todos los
+eventos de todos los workers.
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+
+class WebSocketSimulado:
+    def __init__(self):
+        self.recibidos = set()
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, texto: str):
+        import json
+
+        evento = json.loads(texto)
+        self.recibidos.add((evento['worker'], evento['n']))
+
+    async def close(self, code: int = 1000):
+        pass
+
+
+async def _worker(indice, args, ruta, barrera, resultados):
+    from realtime.backplane import BackplaneUnixSocket
+    from realtime.connection_manager import ConnectionManager
+
+    backplane = BackplaneUnixSocket(ruta)
+    manager = ConnectionManager(max_cola=args.workers * args.eventos + 1)
+    clientes = [WebSocketSimulado() for _ in range(args.clientes)]
+    for cliente in clientes:
+        await manager.connect(cliente)
+    backplane.suscribir(lambda evento, local: manager.broadcast(evento))
+
+    await backplane.iniciar()
+    await backplane.esperar_conexion(timeout=10)
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, barrera.wait)
+    # Dar tiempo al hub para registrar todas las conexiones
+    await asyncio.sleep(0.5)
+
+    inicio = time.perf_counter()
+    for n in range(args.eventos):
+        backplane.publicar({'tipo': 'voto', 'worker': indice, 'n': n})
+        if n % 50 == 0:
+            await asyncio.sleep(0)
+
+    esperados = args.workers * args.eventos
+    limite = time.monotonic() + args.timeout
+    while time.monotonic() < limite:
+        if all(len(c.recibidos) == esperados for c in clientes):
+            break
+        await asyncio.sleep(0.05)
+    duracion = time.perf_counter() - inicio
+
+    # Esperar a que todos terminen antes de cortar el hub
+    await loop.run_in_executor(None, barrera.wait)
+    resultados.put((
+        indice,
+        backplane.es_hub,
+        min(len(c.recibidos) for c in clientes),
+        esperados,
+        duracion,
+    ))
+    await backplane.detener()
+
+
+def worker(indice, args, ruta, barrera, resultados):
+    # Los módulos de realtime importan los servicios: usar Firestore en memoria
+    from benchmarks.firestore_simulado import ClienteSimulado, instalar
+
+    instalar(ClienteSimulado())
+    asyncio.run(_worker(indice, args, ruta, barrera, resultados))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--eventos', type=int, default=200, help='eventos publicados por worker')
+    parser.add_argument('--clientes', type=int, default=50, help='clientes WebSocket por worker')
+    parser.add_argument('--timeout', type=float, default=20.0)
+    args = parser.parse_args()
+
+    ruta = os.path.join(tempfile.mkdtemp(), 'backplane.sock')
+    contexto = multiprocessing.get_context('spawn')
+    barrera = contexto.Barrier(args.workers)
+    resultados = contexto.Queue()
+    procesos = [
+        contexto.Process(target=worker, args=(i, args, ruta, barrera, resultados))
+        for i in range(args.workers)
+    ]
+    for proceso in procesos:
+        proceso.start()
+
+    filas = sorted(resultados.get(timeout=args.timeout * 3) for _ in procesos)
+    for proceso in procesos:
+        proceso.join()
+
+    ok = True
+    print(f"{'worker':>6} {'hub':>4} {'min recibidos':>14} {'esperados':>10} {'seg':>6}")
+    for indice, es_hub, minimo, esperados, duracion in filas:
+        ok = ok and minimo == esperados
+        print(f"{indice:>6} {'sí' if es_hub else '':>4} {minimo:>14} {esperados:>10} {duracion:>6.2f}")
+    print('OK: todos los clientes recibieron todos los eventos' if ok else 'FALLO: faltan eventos')
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+"""Costo del control de admisión y cuánto ahorra ante un cliente desbocado.
+
+Uso (desde Backend/):
+    python -m benchmarks.bench_admision [--peticiones 50000] [--segundos 2]
+
+1. Sobrecosto por petición del middleware ControlAdmision frente a una app
+   ASGI vacía, llamándolo directamente (sin HTTP): ruta sin reglas, GET con
+   la cuenta en la ruta, POST con la cuenta en el cuerpo JSON (admitidas,
+   con una cuenta distinta en cada una) y el rechazo 429.
+2. Un cliente que durante `--segundos` manda sin pausa votos con correos
+   nuevos desde una misma IP y otro que reintenta el mismo voto en bucle,
+   contra la API con el Firestore simulado, con las reglas por defecto y sin
+   ellas: peticiones que llegan a los servicios y round trips a Firestore.
+"""
+import argparse
+import asyncio
+import json
+import time
+from collections import Counter
+
+from benchmarks.firestore_simulado import ClienteSimulado, instalar
+
+cliente = ClienteSimulado()
+instalar(cliente)
+
+import httpx  # noqa: E402
+
+from app.admision import ControlAdmision, controles, leer_reglas  # noqa: E402
+from app.main import app  # noqa: E402
+from services.candidato_service_async import AsyncCandidatoService  # noqa: E402
+
+# Límites que nunca se alcanzan: mide el camino de una petición admitida
+HOLGADAS = ';'.join((
+    'POST /api/votos|ip:1e9:1e9:0', 'POST /api/votos|cuenta:1e9:1e9:1000',
+    'GET /api/votos/verificar-correo/*|ip:1e9:1e9:0', 'GET /api/votos/verificar-correo/*|cuenta:1e9:1e9:1000',
+))
+
+
+async def app_vacia(scope, receive, send):
+    await receive()
+    await send({'type': 'http.response.start', 'status': 200, 'headers': []})
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+def alcance(metodo: str, ruta: str) -> dict:
+    return {'type': 'http', 'method': metodo, 'path': ruta, 'headers': [], 'client': ('10.0.0.1', 5000)}
+
+
+async def por_peticion(destino, peticiones) -> float:
+    """µs por petición llamando a `destino` con cada (scope, cuerpo)"""
+    async def enviar(mensaje):
+        pass
+
+    inicio = time.perf_counter()
+    for scope, cuerpo in peticiones:
+        async def recibir(cuerpo=cuerpo):
+            return {'type': 'http.request', 'body': cuerpo, 'more_body': False}
+        await destino(scope, recibir, enviar)
+    return (time.perf_counter() - inicio) * 1e6 / len(peticiones)
+
+
+async def sobrecosto(n: int):
+    print(f"Sobrecosto por petición ({n} peticiones, µs):")
+    casos = {
+        'ruta sin reglas': [(alcance('GET', '/api/candidatos/'), b'')] * n,
+        'GET cuenta en la ruta': [
+            (alcance('GET', f'/api/votos/verificar-correo/u{k}@continental.edu.pe'), b'') for k in range(n)
+        ],
+        'POST cuenta en el cuerpo': [
+            (alcance('POST', '/api/votos/'), json.dumps({
+                'userId': f'u{k}', 'candidatoId': 'c1', 'correo': f'u{k}@continental.edu.pe'
+            }).encode()) for k in range(n)
+        ],
+    }
+    base = await por_peticion(app_vacia, casos['ruta sin reglas'])
+    print(f"  {'app vacía (referencia)':<28} {base:>7.2f}")
+    for nombre, peticiones in casos.items():
+        control = ControlAdmision(app_vacia, reglas=leer_reglas(HOLGADAS))
+        total = await por_peticion(control, peticiones)
+        print(f"  {nombre:<28} {total - base:>7.2f}  (claves: {sum(r.claves() for r in control.reglas)})")
+
+    control = ControlAdmision(app_vacia, reglas=leer_reglas('POST /api/votos|ip:1:1:0'))
+    rechazos = [(alcance('POST', '/api/votos/'), b'{}')] * n
+    print(f"  {'rechazo 429':<28} {await por_peticion(control, rechazos) - base:>7.2f}")
+
+
+async def desbocado(http, candidato_id: str, segundos: float, mismo_voto: bool, desde: int) -> tuple:
+    """Un cliente que no espera entre peticiones; (códigos, round trips)"""
+    codigos = Counter()
+    cliente.reiniciar_contadores()
+    fin = time.perf_counter() + segundos
+    k = desde
+    while time.perf_counter() < fin:
+        n = desde if mismo_voto else k
+        respuesta = await http.post('/api/votos/', json={
+            'userId': f'b{n}', 'candidatoId': candidato_id, 'correo': f'b{n}@continental.edu.pe'
+        })
+        codigos[respuesta.status_code] += 1
+        k += 1
+    return codigos, cliente.round_trips(), k
+
+
+async def inundacion(segundos: float):
+    print(f"\nCliente desbocado durante {segundos:.0f} s por escenario:")
+    print(f"  {'escenario':<34} {'peticiones':>10} {'a servicios':>11} {'round trips':>11}  códigos")
+    async with app.router.lifespan_context(app):
+        transporte = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transporte, base_url='http://prueba') as http:
+            while (await http.get('/api/salud/listo')).status_code != 200:
+                await asyncio.sleep(0.01)
+            _, _, candidato_id = await AsyncCandidatoService.create(nombre='A', numero=1)
+            control = controles[-1]
+            reglas = control.reglas
+            k = 0
+            for nombre_reglas, activas in (('reglas por defecto', reglas), ('sin reglas', [])):
+                control.reglas = activas
+                for escenario, mismo in (('votos con correos nuevos', False), ('mismo voto en bucle', True)):
+                    codigos, round_trips, k = await desbocado(http, candidato_id, segundos, mismo, k)
+                    peticiones = sum(codigos.values())
+                    print(f"  {escenario + ', ' + nombre_reglas:<34} {peticiones:>10} "
+                          f"{peticiones - codigos[429]:>11} {round_trips:>11}  {dict(codigos)}")
+            control.reglas = reglas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--peticiones', type=int, default=50000)
+    parser.add_argument('--segundos', type=float, default=2)
+    args = parser.parse_args()
+    asyncio.run(sobrecosto(args.peticiones))
+    asyncio.run(inundacion(args.segundos))
+
+
+if __name__ == '__main__':
+    main()
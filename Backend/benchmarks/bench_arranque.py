@@ -0,0 +1,105 @@
+"""Tiempo de arranque en frío: importar la app, lifespan y primeras peticiones.
+
+Uso (desde Backend/):
+    python -m benchmarks.bench_arranque [--repeticiones 5] [--latencia-ms 5]
+
+Cada repetición es un proceso nuevo (sin módulos ya importados) que mide:
+
+- importar app.main (lo que paga cada worker de uvicorn antes de escuchar);
+- importar el SDK de Firebase, que ahora se carga en segundo plano al
+  preparar el almacenamiento y no al importar la app;
+- el lifespan hasta que el servidor acepta peticiones;
+- la primera respuesta de /api/salud/vivo y de /api/candidatos/;
+- cuánto tarda /api/salud/listo en responder 200 (con el Firestore simulado).
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+MEDICIONES = (
+    ('importar', 'importar app.main'),
+    ('sdk', 'importar SDK de Firebase'),
+    ('lifespan', 'lifespan hasta aceptar peticiones'),
+    ('vivo', 'primera /api/salud/vivo'),
+    ('listo', 'hasta /api/salud/listo = 200'),
+    ('candidatos', 'primera /api/candidatos/'),
+)
+
+
+def medir_en_proceso(latencia: float) -> dict:
+    """Una medición; debe correr en un proceso recién creado"""
+    import asyncio
+
+    tiempos = {}
+    inicio = time.perf_counter()
+    from app.main import app
+    tiempos['importar'] = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    import firebase_admin.firestore  # noqa: F401
+    import firebase_admin.firestore_async  # noqa: F401
+    tiempos['sdk'] = time.perf_counter() - inicio
+
+    from benchmarks.firestore_simulado import ClienteSimulado, instalar
+    import httpx
+
+    instalar(ClienteSimulado(latencia))
+
+    async def peticiones():
+        transporte = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transporte, base_url='http://prueba') as http:
+            inicio = time.perf_counter()
+            async with app.router.lifespan_context(app):
+                tiempos['lifespan'] = time.perf_counter() - inicio
+
+                inicio = time.perf_counter()
+                await http.get('/api/salud/vivo')
+                tiempos['vivo'] = time.perf_counter() - inicio
+
+                inicio = time.perf_counter()
+                while (await http.get('/api/salud/listo')).status_code != 200:
+                    await asyncio.sleep(0.001)
+                tiempos['listo'] = time.perf_counter() - inicio
+
+                inicio = time.perf_counter()
+                await http.get('/api/candidatos/')
+                tiempos['candidatos'] = time.perf_counter() - inicio
+
+    asyncio.run(peticiones())
+    return tiempos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeticiones', type=int, default=5)
+    parser.add_argument('--latencia-ms', type=float, default=5.0, help='latencia por round trip a Firestore')
+    parser.add_argument('--hijo', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.hijo:
+        # La salida de la app (prints de Firebase) va a stderr para no mezclarse
+        salida, sys.stdout = sys.stdout, sys.stderr
+        tiempos = medir_en_proceso(args.latencia_ms / 1000)
+        print(json.dumps(tiempos), file=salida)
+        return
+
+    corridas = []
+    for _ in range(args.repeticiones):
+        proceso = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.bench_arranque', '--hijo', '--latencia-ms', str(args.latencia_ms)],
+            capture_output=True, text=True, check=True,
+        )
+        corridas.append(json.loads(proceso.stdout.strip().splitlines()[-1]))
+
+    print(f"{args.repeticiones} arranques en frío, latencia Firestore {args.latencia_ms} ms por round trip")
+    print(f"{'medición':<36} {'mediana ms':>10} {'mín ms':>8} {'máx ms':>8}")
+    for clave, nombre in MEDICIONES:
+        valores = [corrida[clave] * 1000 for corrida in corridas]
+        print(f"{nombre:<36} {statistics.median(valores):>10.1f} {min(valores):>8.1f} {max(valores):>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+"""Broadcast WebSocket con miles de clientes simulados.
+
+Uso (desde Backend/):
+    python -m benchmarks.bench_broadcast [--clientes 5000] [--lentos 50]
+
+Compara el broadcast secuencial anterior (send_json cliente por cliente)
+con ConnectionManager: tiempo hasta que broadcast() retorna (lo que espera
+POST /api/votos), tiempo hasta que todos los clientes sanos recibieron el
+mensaje y clientes lentos expulsados.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from benchmarks.firestore_simulado import ClienteSimulado, instalar
+
+# El paquete realtime importa los servicios: usar Firestore en memoria
+instalar(ClienteSimulado())
+
+from realtime.connection_manager import ConnectionManager  # noqa: E402
+
+
+class WebSocketSimulado:
+    """Cliente con latencia de envío; los lentos no vacían su socket a tiempo"""
+
+    def __init__(self, latencia: float, lento: bool):
+        self.latencia = latencia
+        self.lento = lento
+        self.recibidos = 0
+        self.recibido = asyncio.Event()
+        self.cerrado = False
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, texto: str):
+        await asyncio.sleep(self.latencia)
+        self.recibidos += 1
+        self.recibido.set()
+
+    async def send_json(self, data: dict):
+        texto = json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+        await self.send_text(texto)
+
+    async def close(self, code: int = 1000):
+        self.cerrado = True
+
+
+def mensaje(candidatos: int) -> dict:
+    return {
+        "tipo": "voto_registrado",
+        "candidatoId": "c0",
+        "total_votos": 1234,
+        "candidatos": [
+            {
+                "candidato_id": f"c{i}",
+                "nombre": f"Candidato {i}",
+                "numero": i,
+                "cargo": "Delegado",
+                "imagen": f"https://example.com/{i}.png",
+                "votos": 100 + i,
+                "porcentaje": 12.5,
+            }
+            for i in range(candidatos)
+        ],
+    }
+
+
+def crear_clientes(args) -> list:
+    return [
+        WebSocketSimulado(
+            args.lento_s if i < args.lentos else random.uniform(0, args.latencia),
+            lento=i < args.lentos
+        )
+        for i in range(args.clientes)
+    ]
+
+
+async def secuencial(args) -> dict:
+    """Implementación anterior: await send_json por cliente, en serie"""
+    clientes = crear_clientes(args)
+    inicio = time.perf_counter()
+    for cliente in clientes:
+        try:
+            await cliente.send_json(mensaje(args.candidatos))
+        except Exception:
+            pass
+    retorno = time.perf_counter() - inicio
+    return {'retorno': retorno, 'entrega': retorno, 'expulsados': 0}
+
+
+async def concurrente(args) -> dict:
+    manager = ConnectionManager(max_cola=args.max_cola, timeout_envio=args.timeout)
+    clientes = crear_clientes(args)
+    for cliente in clientes:
+        await manager.connect(cliente)
+
+    inicio = time.perf_counter()
+    manager.broadcast(mensaje(args.candidatos))
+    retorno = time.perf_counter() - inicio
+
+    sanos = [c for c in clientes if not c.lento]
+    await asyncio.gather(*(c.recibido.wait() for c in sanos))
+    entrega = time.perf_counter() - inicio
+
+    # Siguen llegando votos: los clientes lentos llenan su cola y se expulsan
+    for _ in range(args.max_cola * 2):
+        manager.broadcast(mensaje(args.candidatos))
+        await asyncio.sleep(args.latencia * 2)
+    resultado = {'retorno': retorno, 'entrega': entrega, 'expulsados': manager.expulsados}
+    await manager.detener()
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clientes', type=int, default=5000)
+    parser.add_argument('--lentos', type=int, default=50)
+    parser.add_argument('--candidatos', type=int, default=8)
+    parser.add_argument('--latencia', type=float, default=0.002, help='latencia máxima por envío (s)')
+    parser.add_argument('--lento-s', type=float, default=0.5, help='latencia de los clientes lentos (s)')
+    parser.add_argument('--max-cola', type=int, default=64)
+    parser.add_argument('--timeout', type=float, default=5.0)
+    args = parser.parse_args()
+
+    print(f'{args.clientes} clientes ({args.lentos} lentos), {args.candidatos} candidatos')
+    print(f"{'modo':<12} {'retorno (ms)':>14} {'entrega (ms)':>14} {'expulsados':>11}")
+    for nombre, escenario in (('secuencial', secuencial), ('concurrente', concurrente)):
+        r = asyncio.run(escenario(args))
+        print(f"{nombre:<12} {r['retorno'] * 1000:>14.1f} {r['entrega'] * 1000:>14.1f} {r['expulsados']:>11}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""Throughput de votos por candidato según el número de shards.
+
+Uso (desde Backend/):
+    python -m benchmarks.bench_contador_distribuido [--segundos 2] [--hilos 64]
+
+Cada documento del Firestore simulado acepta una escritura a la vez
+(`--escritura-ms` por escritura), así que con un solo contador el
+throughput queda limitado por ese documento y con N shards escala ~N veces.
+"""
+import argparse
+import threading
+import time
+
+from benchmarks.firestore_simulado import ClienteSimulado, instalar
+
+cliente = ClienteSimulado()
+instalar(cliente)
+
+from services import contador_distribuido  # noqa: E402
+from services.candidato_service import CandidatoService  # noqa: E402
+
+
+def medir(num_shards: int, segundos: float, hilos: int) -> tuple:
+    contador_distribuido.VOTOS_NUM_SHARDS = num_shards
+    _, _, candidato_id = CandidatoService.create(nombre=f'Shards {num_shards}', numero=num_shards)
+
+    fin = time.perf_counter() + segundos
+    registrados = [0] * hilos
+
+    def votar(indice):
+        while time.perf_counter() < fin:
+            if CandidatoService.increment_vote(candidato_id):
+                registrados[indice] += 1
+
+    trabajadores = [threading.Thread(target=votar, args=(i,)) for i in range(hilos)]
+    inicio = time.perf_counter()
+    for t in trabajadores:
+        t.start()
+    for t in trabajadores:
+        t.join()
+    duracion = time.perf_counter() - inicio
+
+    total = CandidatoService.get_by_id(candidato_id).votos
+    assert total == sum(registrados), (total, sum(registrados))
+    return total, total / duracion
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--segundos', type=float, default=2.0)
+    parser.add_argument('--hilos', type=int, default=64)
+    parser.add_argument('--escritura-ms', type=float, default=5.0)
+    parser.add_argument('--shards', type=int, nargs='+', default=[1, 2, 4, 8, 16])
+    args = parser.parse_args()
+
+    cliente.escritura_por_doc = args.escritura_ms / 1000
+    base = None
+    print(f"{'shards':>6} {'votos':>8} {'votos/s':>10} {'x':>6}")
+    for num_shards in args.shards:
+        total, por_segundo = medir(num_shards, args.segundos, args.hilos)
+        base = base or por_segundo
+        print(f'{num_shards:>6} {total:>8} {por_segundo:>10.1f} {por_segundo / base:>6.2f}')
+
+
+if __name__ == '__main__':
+    main()
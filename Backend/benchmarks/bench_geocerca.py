@@ -0,0 +1,130 @@
+"""Verificación de ubicación: Haversine en línea contra el motor de geocercas.
+
+Uso (desde Backend/):
+    python -m benchmarks.bench_geocerca [--puntos 100000] [--campus 1,2,50]
+
+1. ns por coordenada con el cálculo que hacía verificar-ubicacion (un solo
+   campus, trigonometría completa en cada llamada) frente a Geocerca, de a
+   una (`verificar`) y en lote (`verificar_lote`), con y sin distancia. Con
+   varios campus la referencia los recorre todos; los puntos se reparten
+   alrededor de ellos (la mitad a menos de 2 km).
+2. La API: `--puntos` / 100 coordenadas como GETs a verificar-ubicacion
+   contra un solo POST a verificar-ubicacion/lote.
+"""
+import argparse
+import asyncio
+import math
+import random
+import time
+
+import httpx
+
+from services.geocerca import Circulo, Geocerca, Poligono
+
+CAMPUS_BASE = (-12.047505186140151, -75.19906082214352)
+
+
+def campus_sinteticos(n: int) -> list:
+    """n campus a ~5 km entre sí; uno de cada cinco es un polígono"""
+    cercas = []
+    for k in range(n):
+        lat = CAMPUS_BASE[0] + (k // 10) * 0.045
+        lng = CAMPUS_BASE[1] + (k % 10) * 0.045
+        if k % 5 == 4:
+            d = 0.006
+            cercas.append(Poligono(f'c{k}', [
+                (lat - d, lng - d), (lat - d, lng + d), (lat, lng + d / 2), (lat + d, lng + d), (lat + d, lng - d),
+            ]))
+        else:
+            cercas.append(Circulo(f'c{k}', lat, lng, 1000))
+    return cercas
+
+
+def haversine_en_linea(cercas, lat: float, lng: float) -> bool:
+    """Lo que hacía verificar-ubicacion, repetido por cada campus (los polígonos, por su círculo)"""
+    for cerca in cercas:
+        campus_lat, campus_lng = (cerca.lat, cerca.lng) if isinstance(cerca, Circulo) else (cerca.lat0, cerca.lng0)
+        lat1 = math.radians(campus_lat)
+        lat2 = math.radians(lat)
+        delta_lat = math.radians(lat - campus_lat)
+        delta_lng = math.radians(lng - campus_lng)
+        a = math.sin(delta_lat / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin(delta_lng / 2) ** 2
+        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+        if 6371000 * c <= 1000:
+            return True
+    return False
+
+
+def puntos(cercas, n: int, semilla: int = 7):
+    azar = random.Random(semilla)
+    lats, lngs = [], []
+    for k in range(n):
+        cerca = cercas[k % len(cercas)]
+        lat, lng = cerca.caja[0] / 2 + cerca.caja[2] / 2, cerca.caja[1] / 2 + cerca.caja[3] / 2
+        alcance = 0.018 if k % 2 else 0.5
+        lats.append(lat + azar.uniform(-alcance, alcance))
+        lngs.append(lng + azar.uniform(-alcance, alcance))
+    return lats, lngs
+
+
+def medir(fn) -> float:
+    inicio = time.perf_counter()
+    fn()
+    return time.perf_counter() - inicio
+
+
+def motor(n_puntos: int, n_campus: int):
+    cercas = campus_sinteticos(n_campus)
+    geocerca = Geocerca(cercas)
+    lats, lngs = puntos(cercas, n_puntos)
+    pares = list(zip(lats, lngs))
+
+    casos = {
+        'Haversine en línea': lambda: [haversine_en_linea(cercas, lat, lng) for lat, lng in pares],
+        'verificar (con distancia)': lambda: [geocerca.verificar(lat, lng) for lat, lng in pares],
+        'verificar (sin distancia)': lambda: [geocerca.verificar(lat, lng, False) for lat, lng in pares],
+        'verificar_lote (sin distancia)': lambda: geocerca.verificar_lote(lats, lngs),
+        'verificar_lote (con distancia)': lambda: geocerca.verificar_lote(lats, lngs, True),
+    }
+    print(f"\n{n_campus} campus ({geocerca.celdas()} celdas), {n_puntos} coordenadas:")
+    base = None
+    for nombre, fn in casos.items():
+        ns = medir(fn) * 1e9 / n_puntos
+        base = base or ns
+        print(f"  {nombre:<32} {ns:>8.0f} ns/coordenada  x{base / ns:.1f}")
+    dentro = sum(geocerca.verificar_lote(lats, lngs)[0])
+    print(f"  dentro de algún campus: {dentro}/{n_puntos}")
+
+
+async def api(n: int):
+    from app.main import app
+    from services.geocerca import geocerca
+
+    lats, lngs = puntos(geocerca.cercas, n)
+    transporte = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transporte, base_url='http://prueba') as http:
+        inicio = time.perf_counter()
+        for lat, lng in zip(lats, lngs):
+            await http.get('/api/votos/verificar-ubicacion', params={'lat': lat, 'lng': lng})
+        uno_a_uno = time.perf_counter() - inicio
+        inicio = time.perf_counter()
+        respuesta = await http.post('/api/votos/verificar-ubicacion/lote', json={'lat': lats, 'lng': lngs})
+        lote = time.perf_counter() - inicio
+    print(f"\nAPI con la configuración por defecto, {n} coordenadas:")
+    print(f"  {'GET verificar-ubicacion':<32} {uno_a_uno * 1e6 / n:>8.1f} µs/coordenada")
+    print(f"  {'POST verificar-ubicacion/lote':<32} {lote * 1e6 / n:>8.1f} µs/coordenada  "
+          f"({respuesta.status_code}, dentro: {sum(respuesta.json()['data']['dentroCampus'])})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--puntos', type=int, default=100000)
+    parser.add_argument('--campus', default='1,2,50')
+    args = parser.parse_args()
+    for n_campus in (int(c) for c in args.campus.split(',')):
+        motor(args.puntos, n_campus)
+    asyncio.run(api(max(1, args.puntos // 100)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+"""Reintentos de POST /api/votos con y sin Idempotency-Key.
+
+Uso (desde Backend/):
+    python -m benchmarks.bench_idempotencia [--votantes 300] [--reintentos 3] [--latencia-ms 5]
+
+Cada votante envía su voto y lo reintenta `--reintentos` veces, como la app
+cuando se pierde la respuesta en una red móvil inestable: primero todos
+los reintentos después de la respuesta y luego un reintento concurrente con
+el original (la respuesta aún no llegó). Informa los códigos de los
+reintentos, sus round trips a Firestore y su latencia, y la memoria y el
+costo de consulta del almacén de respuestas. Con el índice de votantes
+(INDICE_VOTANTES=conjunto) los reintentos sin clave se rechazan en memoria;
+con INDICE_VOTANTES=desactivado cada uno vuelve a Firestore.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+
+# Los reintentos de una misma cuenta excederían la regla de admisión por cuenta
+os.environ.setdefault('ADMISION_REGLAS', '')
+
+from benchmarks.firestore_simulado import ClienteSimulado, instalar  # noqa: E402
+
+cliente = ClienteSimulado()
+instalar(cliente)
+
+import httpx  # noqa: E402
+
+from app.main import app  # noqa: E402
+from services.candidato_service_async import AsyncCandidatoService  # noqa: E402
+from services.idempotencia import RespuestasIdempotentes  # noqa: E402
+
+
+def voto(n: int, candidato_id: str) -> dict:
+    return {'userId': f'r{n}', 'candidatoId': candidato_id, 'correo': f'r{n}@continental.edu.pe'}
+
+
+async def reintentos_tras_respuesta(http, args, candidato_id: str, con_clave: bool, desde: int):
+    codigos, latencias = Counter(), []
+    round_trips = 0
+    for n in range(desde, desde + args.votantes):
+        headers = {'Idempotency-Key': str(uuid.uuid4())} if con_clave else {}
+        await http.post('/api/votos/', json=voto(n, candidato_id), headers=headers)
+        antes = cliente.round_trips()
+        for _ in range(args.reintentos):
+            inicio = time.perf_counter()
+            respuesta = await http.post('/api/votos/', json=voto(n, candidato_id), headers=headers)
+            latencias.append((time.perf_counter() - inicio) * 1000)
+            codigos[respuesta.status_code] += 1
+        round_trips += cliente.round_trips() - antes
+    return codigos, round_trips / (args.votantes * args.reintentos), latencias
+
+
+async def reintento_concurrente(http, args, candidato_id: str, con_clave: bool, desde: int):
+    codigos = Counter()
+    antes = cliente.round_trips()
+    for n in range(desde, desde + args.votantes):
+        headers = {'Idempotency-Key': str(uuid.uuid4())} if con_clave else {}
+        original, reintento = await asyncio.gather(
+            http.post('/api/votos/', json=voto(n, candidato_id), headers=headers),
+            http.post('/api/votos/', json=voto(n, candidato_id), headers=headers),
+        )
+        codigos[(original.status_code, reintento.status_code)] += 1
+    return codigos, (cliente.round_trips() - antes) / args.votantes
+
+
+def almacen(n: int):
+    tracemalloc.start()
+    antes = tracemalloc.get_traced_memory()[0]
+    respuestas = RespuestasIdempotentes(max_respuestas=n)
+    claves = [(f'u{k}', str(uuid.uuid4())) for k in range(n)]
+    for k, clave in enumerate(claves):
+        respuestas.guardar(clave, (f'u{k}', 'c1', f'u{k}@continental.edu.pe'), 200, {
+            'success': True, 'mensaje': 'Voto registrado exitosamente', 'candidatoId': 'c1',
+        })
+    memoria = (tracemalloc.get_traced_memory()[0] - antes) / n
+    tracemalloc.stop()
+    inicio = time.perf_counter()
+    for clave in claves:
+        respuestas._leer(clave)
+    ns = (time.perf_counter() - inicio) * 1e9 / n
+    print(f"\nAlmacén con {n} respuestas: ~{memoria:.0f} bytes por respuesta "
+          f"(con su huella y las claves), {ns:.0f} ns por consulta")
+
+
+async def ejecutar(args):
+    cliente.latencia = args.latencia_ms / 1000
+    async with app.router.lifespan_context(app):
+        transporte = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transporte, base_url='http://prueba') as http:
+            while (await http.get('/api/salud/listo')).status_code != 200:
+                await asyncio.sleep(0.01)
+            _, _, candidato_id = await AsyncCandidatoService.create(nombre='A', numero=1)
+
+            print(f"{args.votantes} votantes, {args.reintentos} reintentos tras la respuesta, "
+                  f"{args.latencia_ms} ms por round trip\n")
+            print(f"{'reintentos':<22} {'round trips':>11} {'p50 ms':>7} {'p95 ms':>7}  códigos")
+            desde = 0
+            for nombre, con_clave in (('sin Idempotency-Key', False), ('con Idempotency-Key', True)):
+                codigos, round_trips, latencias = await reintentos_tras_respuesta(
+                    http, args, candidato_id, con_clave, desde
+                )
+                desde += args.votantes
+                cuantiles = statistics.quantiles(latencias, n=20)
+                print(f"{nombre:<22} {round_trips:>11.2f} {cuantiles[9]:>7.2f} {cuantiles[18]:>7.2f}  {dict(codigos)}")
+
+            print(f"\n{'reintento concurrente':<22} {'round trips/voto':>16}  (original, reintento)")
+            for nombre, con_clave in (('sin Idempotency-Key', False), ('con Idempotency-Key', True)):
+                codigos, round_trips = await reintento_concurrente(http, args, candidato_id, con_clave, desde)
+                desde += args.votantes
+                print(f"{nombre:<22} {round_trips:>16.2f}  {dict(codigos)}")
+    almacen(50000)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--votantes', type=int, default=300)
+    parser.add_argument('--reintentos', type=int, default=3)
+    parser.add_argument('--latencia-ms', type=float, default=5)
+    args = parser.parse_args()
+    asyncio.run(ejecutar(args))
+
+
+if __name__ == '__main__':
+    main()
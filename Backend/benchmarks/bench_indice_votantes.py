@@ -0,0 +1,131 @@
+"""Memoria y latencia del índice de votantes con 100k+ votantes.
+
+Uso (desde Backend/):
+    python -m benchmarks.bench_indice_votantes [--votantes 100000 250000]
+        [--consultas 100000] [--latencia-ms 5]
+
+Carga `--votantes` reservas en el Firestore simulado, arranca el índice en
+cada modo (conjunto y bloom) y mide la carga inicial, la memoria retenida
+(tracemalloc y la estimación que expone /metrics) y el costo de verificar
+correos nuevos y repetidos frente a un get a Firestore con `--latencia-ms`.
+"""
+import argparse
+import asyncio
+import gc
+import time
+import tracemalloc
+from datetime import datetime
+
+from benchmarks.firestore_simulado import ClienteSimulado, instalar
+
+cliente = ClienteSimulado()
+instalar(cliente)
+
+from services.indice_votantes import IndiceVotantes, indice_votantes  # noqa: E402
+from services.voto_service import correo_id, voto_id  # noqa: E402
+from services.voto_service_async import AsyncVotoService  # noqa: E402
+
+
+def poblar(desde: int, hasta: int):
+    """Reservas de correo (con su voto_id) como las escribe registrar_voto"""
+    fecha = datetime.utcnow()
+    for inicio in range(desde, hasta, 500):
+        batch = cliente.batch()
+        for i in range(inicio, min(inicio + 500, hasta)):
+            batch.create(cliente.collection('votos_correos').document(correo_id(f'votante{i}@continental.edu.pe')), {
+                'voto_id': voto_id(f'usuario-{i}'),
+                'fecha': fecha,
+            })
+        batch.commit()
+
+
+def cargar(modo: str, votantes: int) -> IndiceVotantes:
+    indice = IndiceVotantes(modo=modo, capacidad=votantes)
+    indice.iniciar()
+    indice.esperar()
+    return indice
+
+
+def memoria_retenida(modo: str, votantes: int) -> int:
+    """Bytes que quedan asignados tras cargar el índice (tracemalloc)"""
+    gc.collect()
+    tracemalloc.start()
+    antes = tracemalloc.get_traced_memory()[0]
+    indice = cargar(modo, votantes)
+    gc.collect()
+    retenida = tracemalloc.get_traced_memory()[0] - antes
+    tracemalloc.stop()
+    indice.detener()
+    return retenida
+
+
+def medir_modo(modo: str, votantes: int, consultas: int) -> dict:
+    t0 = time.perf_counter()
+    indice = cargar(modo, votantes)
+    carga = time.perf_counter() - t0
+
+    nuevos = [correo_id(f'nuevo{i}@continental.edu.pe') for i in range(consultas)]
+    repetidos = [correo_id(f'votante{i % votantes}@continental.edu.pe') for i in range(consultas)]
+    t0 = time.perf_counter()
+    falsos_positivos = sum(1 for doc_id in nuevos if indice.consultar('votos_correos', doc_id) is not False)
+    negativos = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    for doc_id in repetidos:
+        indice.consultar('votos_correos', doc_id)
+    positivos = time.perf_counter() - t0
+    estimada = indice.memoria()
+    indice.detener()
+    return {
+        'carga': carga,
+        'retenida': memoria_retenida(modo, votantes),
+        'estimada': estimada,
+        'negativo_us': negativos / consultas * 1e6,
+        'positivo_us': positivos / consultas * 1e6,
+        'falsos_positivos': falsos_positivos / consultas,
+    }
+
+
+async def round_trips_verificacion(n: int) -> list:
+    """Round trips de AsyncVotoService.verificar_correo sin índice y con él"""
+    resultados = []
+    for modo in ('desactivado', 'conjunto'):
+        indice_votantes.modo = modo
+        indice_votantes.iniciar()
+        if modo != 'desactivado':
+            indice_votantes.esperar()
+        cliente.reiniciar_contadores()
+        t0 = time.perf_counter()
+        for i in range(n):
+            await AsyncVotoService.verificar_correo(f'nuevo{i}@continental.edu.pe')
+        resultados.append((modo, cliente.round_trips() / n, (time.perf_counter() - t0) / n * 1000))
+        indice_votantes.detener()
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--votantes', type=int, nargs='+', default=[100000, 250000])
+    parser.add_argument('--consultas', type=int, default=100000)
+    parser.add_argument('--latencia-ms', type=float, default=5.0)
+    args = parser.parse_args()
+
+    cargados = 0
+    print(f"{'votantes':>9} {'modo':>9} {'carga s':>8} {'MiB':>7} {'B/votante':>10} "
+          f"{'estimado MiB':>13} {'no (µs)':>8} {'sí (µs)':>8} {'falsos +':>9}")
+    for votantes in args.votantes:
+        poblar(cargados, votantes)
+        cargados = votantes
+        for modo in ('conjunto', 'bloom'):
+            r = medir_modo(modo, votantes, args.consultas)
+            print(f"{votantes:>9} {modo:>9} {r['carga']:>8.2f} {r['retenida'] / 2**20:>7.2f} "
+                  f"{r['retenida'] / votantes:>10.1f} {r['estimada'] / 2**20:>13.2f} "
+                  f"{r['negativo_us']:>8.2f} {r['positivo_us']:>8.2f} {r['falsos_positivos']:>9.2%}")
+
+    cliente.latencia = args.latencia_ms / 1000
+    print(f"\nverificar_correo de un correo nuevo (latencia {args.latencia_ms} ms por round trip):")
+    for modo, round_trips, ms in asyncio.run(round_trips_verificacion(200)):
+        print(f"  índice {modo:<12} {round_trips:.2f} round trips  {ms:.3f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""Lecturas a Firestore con y sin single-flight al crecer la concurrencia.
+
+Uso (desde Backend/):
+    python -m benchmarks.bench_lecturas_compartidas [--concurrencias 1 10 100 1000]
+        [--latencia-ms 20] [--segundos 2] [--vigencias-ms 0 250]
+
+Sin el listener del conteo (como al arrancar, o con PostgreSQL) cada
+consulta de conteo y estadísticas recorre la colección de candidatos.
+Primero lanza ráfagas de N consultas simultáneas (como los teléfonos que
+refrescan a la vez al proyectar los resultados) y cuenta los round trips
+a Firestore; luego mantiene N clientes consultando sin pausa durante
+`--segundos` con cada `--vigencias-ms`.
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks.firestore_simulado import ClienteSimulado, instalar
+
+cliente = ClienteSimulado()
+instalar(cliente)
+
+from services.candidato_service_async import AsyncCandidatoService  # noqa: E402
+from services.lecturas_compartidas import lecturas_compartidas  # noqa: E402
+
+LECTURAS = (AsyncCandidatoService.get_conteo_votos, AsyncCandidatoService.get_estadisticas)
+
+
+async def rafaga(concurrencia: int) -> tuple:
+    """(round trips, segundos) de `concurrencia` consultas simultáneas"""
+    cliente.reiniciar_contadores()
+    inicio = time.perf_counter()
+    await asyncio.gather(*(LECTURAS[i % 2]() for i in range(concurrencia)))
+    return cliente.round_trips(), time.perf_counter() - inicio
+
+
+async def sostenida(concurrencia: int, segundos: float) -> tuple:
+    """(consultas/s, round trips/s) con `concurrencia` clientes sin pausa"""
+    consultas = 0
+    limite = time.perf_counter() + segundos
+
+    async def consultar(i: int):
+        nonlocal consultas
+        while time.perf_counter() < limite:
+            await LECTURAS[i % 2]()
+            consultas += 1
+
+    cliente.reiniciar_contadores()
+    await asyncio.gather(*(consultar(i) for i in range(concurrencia)))
+    return consultas / segundos, cliente.round_trips() / segundos
+
+
+async def ejecutar(args):
+    for numero in range(1, 9):
+        await AsyncCandidatoService.create(nombre=f'Candidato {numero}', numero=numero)
+    cliente.latencia = args.latencia_ms / 1000
+
+    print(f"Ráfagas simultáneas (latencia {args.latencia_ms} ms por round trip):")
+    print(f"{'concurrencia':>12} {'sin: round trips':>17} {'ms':>7} {'con: round trips':>17} {'ms':>7}")
+    for concurrencia in args.concurrencias:
+        fila = []
+        for activa in (False, True):
+            lecturas_compartidas.activa = activa
+            round_trips, segundos = await rafaga(concurrencia)
+            fila += [round_trips, segundos * 1000]
+        print(f"{concurrencia:>12} {fila[0]:>17} {fila[1]:>7.1f} {fila[2]:>17} {fila[3]:>7.1f}")
+
+    print(f"\nCarga sostenida ({args.segundos} s por medición):")
+    print(f"{'concurrencia':>12} {'modo':>22} {'consultas/s':>12} {'round trips/s':>14}")
+    for concurrencia in args.concurrencias:
+        modos = [('sin single-flight', False, 0)] + [
+            (f'single-flight {vigencia:g} ms', True, vigencia) for vigencia in args.vigencias_ms
+        ]
+        for nombre, activa, vigencia in modos:
+            lecturas_compartidas.activa = activa
+            lecturas_compartidas.vigencia = vigencia / 1000
+            por_segundo, round_trips = await sostenida(concurrencia, args.segundos)
+            print(f"{concurrencia:>12} {nombre:>22} {por_segundo:>12.0f} {round_trips:>14.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--concurrencias', type=int, nargs='+', default=[1, 10, 100, 1000])
+    parser.add_argument('--latencia-ms', type=float, default=20.0)
+    parser.add_argument('--segundos', type=float, default=2.0)
+    parser.add_argument('--vigencias-ms', type=float, nargs='+', default=[0, 250])
+    args = parser.parse_args()
+    asyncio.run(ejecutar(args))
+
+
+if __name__ == '__main__':
+    main()
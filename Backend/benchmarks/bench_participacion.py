@@ -0,0 +1,94 @@
+"""Curva de participación: recorrer `votos` contra la serie incremental.
+
+Uso (desde Backend/):
+    python -m benchmarks.bench_participacion [--votos 50000] [--horas 10] [--lecturas 20]
+
+Siembra `votos` en el Firestore simulado repartidos en `--horas` horas y
+compara armar la curva por minuto recorriendo la colección en cada
+lectura (lo que haría un endpoint sin estado) con leer la serie que
+mantiene `services.participacion` (sumas por minuto, por hora y
+acumuladas actualizadas con cada voto). También mide el costo de sumar
+un voto a la serie y la memoria de sus arrays.
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+from benchmarks.firestore_simulado import ClienteSimulado, instalar
+
+cliente = ClienteSimulado()
+instalar(cliente)
+
+from services.participacion import SerieParticipacion, minuto_de  # noqa: E402
+
+
+def curva_recorriendo(coleccion) -> dict:
+    """Curva por minuto leyendo todos los votos (sin estado)"""
+    por_minuto = {}
+    for doc in coleccion.select(['fecha']).stream():
+        minuto = minuto_de(doc.to_dict()['fecha'])
+        por_minuto[minuto] = por_minuto.get(minuto, 0) + 1
+    acumulado, total = [], 0
+    for minuto in range(min(por_minuto), max(por_minuto) + 1):
+        total += por_minuto.get(minuto, 0)
+        acumulado.append(total)
+    return {'por_minuto': por_minuto, 'acumulado': acumulado, 'total': total}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--votos', type=int, default=50000)
+    parser.add_argument('--horas', type=int, default=10)
+    parser.add_argument('--lecturas', type=int, default=20)
+    args = parser.parse_args()
+
+    inicio = datetime(2026, 10, 1, 8, tzinfo=timezone.utc)
+    fechas = sorted(
+        inicio + timedelta(seconds=random.uniform(0, args.horas * 3600)) for _ in range(args.votos)
+    )
+    coleccion = cliente.collection('votos')
+    for numero, fecha in enumerate(fechas):
+        coleccion.document(f'v{numero}').set({'userId': f'u{numero}', 'candidatoId': 'c1', 'fecha': fecha})
+
+    print(f"{args.votos} votos en {args.horas} h, {args.lecturas} lecturas de la curva\n")
+    print(f"{'estrategia':<24} {'ms/lectura':>10} {'docs leídos':>12} {'KB Firestore':>13}")
+
+    cliente.reiniciar_contadores()
+    t0 = time.perf_counter()
+    for _ in range(args.lecturas):
+        esperado = curva_recorriendo(coleccion)
+    ms = (time.perf_counter() - t0) * 1000 / args.lecturas
+    print(f"{'recorrer votos':<24} {ms:>10.2f} {cliente.llamadas['documentos_leidos']:>12} "
+          f"{cliente.llamadas['bytes_leidos'] / 1024:>13.1f}")
+
+    serie = SerieParticipacion()
+    minutos = [minuto_de(fecha) for fecha in fechas]
+    t0 = time.perf_counter()
+    for minuto in minutos:
+        serie.sumar(minuto)
+    ns_voto = (time.perf_counter() - t0) * 1e9 / args.votos
+
+    cliente.reiniciar_contadores()
+    t0 = time.perf_counter()
+    for _ in range(args.lecturas):
+        actual = serie.como_dict()
+    ms = (time.perf_counter() - t0) * 1000 / args.lecturas
+    print(f"{'serie incremental':<24} {ms:>10.2f} {cliente.llamadas['documentos_leidos']:>12} "
+          f"{cliente.llamadas['bytes_leidos'] / 1024:>13.1f}")
+
+    assert actual['total'] == esperado['total'] and actual['acumulado'] == esperado['acumulado']
+
+    # Votos que llegan fuera de orden: recorren el acumulado hasta el último minuto
+    atrasados = random.sample(minutos, min(1000, len(minutos)))
+    t0 = time.perf_counter()
+    for minuto in atrasados:
+        serie.sumar(minuto)
+    ns_atrasado = (time.perf_counter() - t0) * 1e9 / len(atrasados)
+
+    print(f"\nsumar un voto: {ns_voto:.0f} ns en orden, {ns_atrasado:.0f} ns fuera de orden")
+    print(f"memoria de la serie: {serie.memoria() / 1024:.1f} KB ({serie.capacidad} minutos)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""Bytes leídos de Firestore y tamaño de respuesta del listado de candidatos.
+
+Uso (desde Backend/):
+    python -m benchmarks.bench_proyeccion [--candidatos 40] [--largo-textos 3000] [--limite 10]
+
+Compara GET /api/candidatos/ completo con `fields=` (solo la cédula:
+id, nombre, número, cargo, imagen) y con `fields=` + `limit=` recorriendo
+todas las páginas, primero sin el listener del conteo (la proyección va a
+Firestore con select()) y luego con el listener (la cédula sale de memoria).
+"""
+import argparse
+import asyncio
+
+from benchmarks.firestore_simulado import ClienteSimulado, instalar
+
+cliente = ClienteSimulado()
+instalar(cliente)
+
+import httpx  # noqa: E402
+
+from app.main import app  # noqa: E402
+from services.candidato_service_async import AsyncCandidatoService  # noqa: E402
+from services.conteo_cache import conteo_cache  # noqa: E402
+
+CEDULA = 'id,nombre,numero,cargo,imagen'
+
+
+async def recorrer(http, params: dict) -> tuple:
+    """(peticiones, bytes de respuesta) de recorrer todas las páginas"""
+    peticiones = bytes_respuesta = 0
+    cursor = None
+    while True:
+        respuesta = await http.get('/api/candidatos/', params=dict(params, **({'cursor': cursor} if cursor else {})))
+        peticiones += 1
+        bytes_respuesta += len(respuesta.content)
+        cuerpo = respuesta.json()
+        cursor = cuerpo['data']['siguiente'] if isinstance(cuerpo, dict) else None
+        if not cursor:
+            return peticiones, bytes_respuesta
+
+
+async def medir(http, titulo: str, args):
+    print(f"\n{titulo}")
+    print(f"{'consulta':<28} {'peticiones':>10} {'round trips':>11} {'docs leídos':>11} "
+          f"{'KB Firestore':>12} {'KB respuesta':>12}")
+    for nombre, params in (
+        ('completo', {}),
+        ('fields=cédula', {'fields': CEDULA}),
+        (f'fields=cédula, limit={args.limite}', {'fields': CEDULA, 'limit': args.limite}),
+    ):
+        cliente.reiniciar_contadores()
+        peticiones, bytes_respuesta = await recorrer(http, params)
+        print(f"{nombre:<28} {peticiones:>10} {cliente.round_trips():>11} "
+              f"{cliente.llamadas['documentos_leidos']:>11} {cliente.llamadas['bytes_leidos'] / 1024:>12.1f} "
+              f"{bytes_respuesta / 1024:>12.1f}")
+
+
+async def ejecutar(args):
+    textos = {campo: campo[0] * args.largo_textos for campo in ('propuesta', 'vision', 'experiencia')}
+    for numero in range(1, args.candidatos + 1):
+        await AsyncCandidatoService.create(
+            nombre=f'Candidato {numero}', numero=numero, cargo='Delegado', imagen=f'https://img/{numero}.png',
+            **textos
+        )
+
+    transporte = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transporte, base_url='http://prueba') as http:
+        await medir(http, 'Sin listener del conteo (select() en Firestore):', args)
+        async with app.router.lifespan_context(app):
+            while not conteo_cache.listo:
+                await asyncio.sleep(0.01)
+            await medir(http, 'Con listener del conteo (cédula desde memoria):', args)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--candidatos', type=int, default=40)
+    parser.add_argument('--largo-textos', type=int, default=3000, help='caracteres de propuesta, visión y experiencia')
+    parser.add_argument('--limite', type=int, default=10)
+    args = parser.parse_args()
+    asyncio.run(ejecutar(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,217 @@
+"""Resultados por segmento (cargo, semestre): rankings en memoria contra filtrar el conteo.
+
+Uso (desde Backend/):
+    python -m benchmarks.bench_segmentos [--cargos 4] [--semestres 10] [--por-segmento 4]
+                                         [--votos 2000] [--clientes 400]
+
+1. Lo que cuesta obtener los resultados de un cargo y semestre: el conteo
+   completo filtrado y recalculado en el cliente, el segmento recalculado
+   del conteo (PostgreSQL o Firestore sin listener) y el segmento leído de
+   los rankings que el cache mantiene con cada voto. Verifica que los
+   rankings coinciden con el recálculo en todos los segmentos.
+2. µs por voto que el cache tarda en mantener el ranking general y el del
+   segmento.
+3. `--clientes` clientes de /api/votos/ws que miran un solo segmento cada
+   uno, primero con los deltas de todos los resultados y luego suscritos a
+   su segmento: KB recibidos por cliente (snapshot y frames) y CPU por voto.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from benchmarks.firestore_simulado import ClienteSimulado, instalar
+
+cliente = ClienteSimulado()
+instalar(cliente)
+
+from fastapi import WebSocketDisconnect  # noqa: E402
+
+from app.main import app  # noqa: E402
+from realtime import backplane  # noqa: E402
+from realtime.connection_manager import serializar  # noqa: E402
+from routers.votos import websocket_votos  # noqa: E402
+from services.candidato_service_async import AsyncCandidatoService  # noqa: E402
+from services.conteo_cache import conteo_cache  # noqa: E402
+from services.ranking import segmentos_desde_conteo  # noqa: E402
+from services.voto_service_async import AsyncVotoService  # noqa: E402
+
+
+class ClienteWS:
+    """Cliente de /api/votos/ws que mira un segmento y parsea cada frame"""
+
+    def __init__(self, segmento: tuple, suscrito: bool):
+        self.segmento = segmento
+        self.suscrito = suscrito
+        self.bytes = 0
+        self.frames = 0
+        self.votos_segmento = None
+        self.total = None
+        self._entrada = asyncio.Queue()
+
+    async def accept(self):
+        pass
+
+    async def receive_text(self) -> str:
+        texto = await self._entrada.get()
+        if texto is None:
+            raise WebSocketDisconnect()
+        return texto
+
+    async def send_text(self, texto: str):
+        self.bytes += len(texto)
+        self.frames += 1
+        frame = json.loads(texto)
+        if frame['tipo'] == 'segmento':
+            self.votos_segmento = frame['total_votos']
+        else:
+            self.total = frame.get('total_votos')
+
+    async def close(self, code: int = 1000):
+        self._entrada.put_nowait(None)
+
+    def abrir(self) -> asyncio.Task:
+        if self.suscrito:
+            return asyncio.create_task(websocket_votos(self, cargo=self.segmento[0], semestre=self.segmento[1]))
+        return asyncio.create_task(websocket_votos(self))
+
+    def cerrar(self):
+        self._entrada.put_nowait(None)
+
+
+async def esperar(condicion, limite: float = 60.0):
+    fin = time.perf_counter() + limite
+    while not condicion():
+        if time.perf_counter() > fin:
+            raise TimeoutError('los clientes no recibieron todos los frames')
+        await asyncio.sleep(0.01)
+
+
+async def votar(candidatos: list, desde: int, cantidad: int, azar: random.Random):
+    for k in range(desde, desde + cantidad):
+        _, _, evento = await AsyncVotoService.registrar_voto(
+            f'u{k}', azar.choice(candidatos), f'u{k}@continental.edu.pe'
+        )
+        backplane.publicar(evento)
+        if k % 10 == 0:
+            await asyncio.sleep(0.02)
+
+
+def por_llamada(fn, repeticiones: int = 2000) -> tuple:
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        resultado = fn()
+    return (time.perf_counter() - inicio) * 1e6 / repeticiones, resultado
+
+
+def lecturas(segmentos: list):
+    cargo, semestre = segmentos[len(segmentos) // 2]
+    conteo = conteo_cache.get_conteo_votos()
+    recalculo = segmentos_desde_conteo(conteo)
+    assert conteo_cache.get_segmentos() == recalculo, 'los rankings por segmento no coinciden con el conteo'
+
+    def en_el_cliente():
+        # La app recibe el conteo completo y filtra, ordena y saca porcentajes
+        filas = json.loads(serializar({"success": True, "data": {"candidatos": conteo_cache.get_conteo_votos()}}))
+        return segmentos_desde_conteo(filas['data']['candidatos'], cargo, semestre)
+
+    casos = (
+        ('conteo completo + filtro en cliente', en_el_cliente,
+         {"success": True, "data": {"candidatos": conteo}}),
+        ('segmento recalculado del conteo',
+         lambda: segmentos_desde_conteo(conteo_cache.get_conteo_votos(), cargo, semestre), None),
+        ('segmento de los rankings', lambda: conteo_cache.get_segmentos(cargo, semestre), None),
+    )
+    print(f"Resultados de {cargo} / semestre {semestre} ({len(conteo)} candidatos, {len(segmentos)} segmentos):")
+    print(f"  {'camino':<36} {'µs':>8} {'bytes':>8}")
+    for nombre, fn, cuerpo in casos:
+        us, resultado = por_llamada(fn)
+        if cuerpo is None:
+            cuerpo = {"success": True, "data": {"segmentos": resultado}}
+        print(f"  {nombre:<36} {us:>8.1f} {len(serializar(cuerpo).encode('utf-8')):>8}")
+
+
+def mantenimiento(candidatos: list, n: int = 100000):
+    azar = random.Random(3)
+    elegidos = [azar.choice(candidatos) for _ in range(n)]
+    inicio = time.perf_counter()
+    with conteo_cache._lock:
+        for candidato_id in elegidos:
+            conteo_cache._sumar(candidato_id, 1)
+        for candidato_id in elegidos:
+            conteo_cache._sumar(candidato_id, -1)
+    us = (time.perf_counter() - inicio) * 1e6 / (2 * n)
+    print(f"\nMantener el ranking general y el del segmento: {us:.2f} µs por voto")
+
+
+async def clientes_ws(args, candidatos: list, segmentos: list, votados: int, azar: random.Random) -> int:
+    print(f"\n{args.clientes} clientes WebSocket mirando un segmento cada uno, {args.votos} votos:")
+    print(f"  {'modo':<22} {'KB snapshot':>11} {'KB frames':>10} {'frames/cl':>10} {'µs CPU/voto':>12}")
+    for nombre, suscrito in (('deltas de todo', False), ('suscritos al segmento', True)):
+        clientes = [ClienteWS(segmentos[k % len(segmentos)], suscrito) for k in range(args.clientes)]
+        tareas = [c.abrir() for c in clientes]
+        if suscrito:
+            await esperar(lambda: all(c.votos_segmento is not None for c in clientes))
+        else:
+            await esperar(lambda: all(c.total == votados for c in clientes))
+        snapshot = sum(c.bytes for c in clientes) / args.clientes
+        frames_antes = sum(c.frames for c in clientes)
+
+        cpu = time.process_time()
+        await votar(candidatos, votados, args.votos, azar)
+        votados += args.votos
+        if suscrito:
+            esperados = {(s['cargo'], s['semestre']): s['total_votos'] for s in conteo_cache.get_segmentos()}
+            await esperar(lambda: all(c.votos_segmento == esperados[c.segmento] for c in clientes))
+        else:
+            await esperar(lambda: all(c.total == votados for c in clientes))
+        cpu = time.process_time() - cpu
+
+        frames = (sum(c.bytes for c in clientes) / args.clientes - snapshot) / 1024
+        print(f"  {nombre:<22} {snapshot / 1024:>11.1f} {frames:>10.1f} "
+              f"{(sum(c.frames for c in clientes) - frames_antes) / args.clientes:>10.1f} {cpu * 1e6 / args.votos:>12.0f}")
+        for c in clientes:
+            c.cerrar()
+        await asyncio.gather(*tareas)
+    return votados
+
+
+async def ejecutar(args):
+    async with app.router.lifespan_context(app):
+        while not conteo_cache.listo:
+            await asyncio.sleep(0.01)
+        candidatos, segmentos = [], []
+        numero = 0
+        for c in range(args.cargos):
+            for s in range(1, args.semestres + 1):
+                segmentos.append((f'Cargo {c + 1}', str(s)))
+                for _ in range(args.por_segmento):
+                    numero += 1
+                    _, _, candidato_id = await AsyncCandidatoService.create(
+                        nombre=f'Candidato {numero}', numero=numero, cargo=f'Cargo {c + 1}',
+                        imagen=f'https://img/{numero}.png', semestre=str(s)
+                    )
+                    candidatos.append(candidato_id)
+        await esperar(lambda: len(conteo_cache.get_candidatos()) == len(candidatos))
+
+        azar = random.Random(7)
+        await votar(candidatos, 0, args.votos, azar)
+        lecturas(segmentos)
+        mantenimiento(candidatos)
+        await clientes_ws(args, candidatos, segmentos, args.votos, azar)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cargos', type=int, default=4)
+    parser.add_argument('--semestres', type=int, default=10)
+    parser.add_argument('--por-segmento', type=int, default=4)
+    parser.add_argument('--votos', type=int, default=2000)
+    parser.add_argument('--clientes', type=int, default=400)
+    args = parser.parse_args()
+    asyncio.run(ejecutar(args))
+
+
+if __name__ == '__main__':
+    main()
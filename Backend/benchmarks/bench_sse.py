@@ -0,0 +1,258 @@
+"""Memoria y CPU por conexión: WebSocket (/api/votos/ws) contra SSE (/api/votos/stream).
+
+Uso (desde Backend/):
+    python -m benchmarks.bench_sse [--clientes 1000] [--votos 400] [--candidatos 30] [--perdidos 20]
+
+Abre `--clientes` conexiones de cada tipo contra los handlers reales (el
+WebSocket con su tarea de lectura y la de envío del ConnectionManager; el
+SSE como StreamingResponse ASGI con su tarea de desconexión), mide con
+tracemalloc la memoria que agrega cada conexión y luego el CPU del proceso
+para entregar los frames de `--votos` votos a todos, descontando el costo de
+los mismos votos sin clientes. Los clientes simulados de ambos parsean cada
+frame. Al final desconecta un cliente SSE, deja pasar `--perdidos` frames y
+compara los bytes de reanudar con Last-Event-ID contra un snapshot nuevo.
+
+No incluye los buffers de socket del servidor ASGI (uvicorn), iguales para
+los dos caminos.
+"""
+import argparse
+import asyncio
+import gc
+import json
+import time
+import tracemalloc
+
+from benchmarks.firestore_simulado import ClienteSimulado, instalar
+
+cliente = ClienteSimulado()
+instalar(cliente)
+
+from fastapi import WebSocketDisconnect  # noqa: E402
+
+from app.main import app  # noqa: E402
+from realtime import backplane, coalescer, flujo_resultados, manager  # noqa: E402
+from routers.votos import stream_resultados, websocket_votos  # noqa: E402
+from services.candidato_service_async import AsyncCandidatoService  # noqa: E402
+from services.conteo_cache import conteo_cache  # noqa: E402
+from services.voto_service_async import AsyncVotoService  # noqa: E402
+
+
+class ClienteWS:
+    """Cliente de /api/votos/ws que parsea cada frame"""
+
+    def __init__(self):
+        self.total = None
+        self.bytes = 0
+        self._entrada = asyncio.Queue()
+
+    async def accept(self):
+        pass
+
+    async def receive_text(self) -> str:
+        texto = await self._entrada.get()
+        if texto is None:
+            raise WebSocketDisconnect()
+        return texto
+
+    async def send_text(self, texto: str):
+        self.bytes += len(texto)
+        self.total = json.loads(texto).get('total_votos')
+
+    async def close(self, code: int = 1000):
+        self._entrada.put_nowait(None)
+
+    def abrir(self) -> asyncio.Task:
+        return asyncio.create_task(websocket_votos(self))
+
+    def cerrar(self):
+        self._entrada.put_nowait(None)
+
+
+class ClienteSSE:
+    """Cliente de /api/votos/stream: recibe el cuerpo por ASGI y parsea cada evento"""
+
+    def __init__(self, ultimo_id: str = None, guardar: bool = False):
+        self.ultimo_id = ultimo_id
+        self.total = None
+        self.bytes = 0
+        # Frames recibidos (solo para la prueba de reanudación)
+        self.guardar = guardar
+        self.eventos = []
+        self._fin = asyncio.Event()
+
+    async def receive(self) -> dict:
+        await self._fin.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(self, mensaje: dict):
+        if mensaje['type'] != 'http.response.body':
+            return
+        cuerpo = mensaje.get('body', b'')
+        self.bytes += len(cuerpo)
+        for bloque in cuerpo.split(b'\n\n'):
+            campos = dict(
+                linea.split(': ', 1) for linea in bloque.decode('utf-8').split('\n') if ': ' in linea
+            )
+            if 'data' in campos:
+                frame = json.loads(campos['data'])
+                self.total = frame.get('total_votos')
+                self.ultimo_id = campos.get('id', self.ultimo_id)
+                if self.guardar:
+                    self.eventos.append(frame)
+
+    async def _conectar(self):
+        respuesta = await stream_resultados(last_event_id=self.ultimo_id)
+        # spec_version 2.3 como uvicorn: Starlette escucha la desconexión en otra tarea
+        alcance = {'type': 'http', 'asgi': {'version': '3.0', 'spec_version': '2.3'}, 'method': 'GET'}
+        await respuesta(alcance, self.receive, self.send)
+
+    def abrir(self) -> asyncio.Task:
+        self._fin.clear()
+        return asyncio.create_task(self._conectar())
+
+    def cerrar(self):
+        self._fin.set()
+
+
+async def esperar(clientes, condicion, limite: float = 60.0):
+    fin = time.perf_counter() + limite
+    while not all(condicion(c) for c in clientes):
+        if time.perf_counter() > fin:
+            raise TimeoutError('los clientes no recibieron todos los frames')
+        await asyncio.sleep(0.01)
+
+
+async def cerrar(clientes, tareas, limite: float = 10.0):
+    """Cerrar los clientes y esperar sus tareas; las que no terminan a tiempo se cancelan"""
+    for c in clientes:
+        c.cerrar()
+    _, pendientes = await asyncio.wait(tareas, timeout=limite)
+    for tarea in pendientes:
+        tarea.cancel()
+    # Propaga el error de un handler que haya fallado
+    await asyncio.gather(*tareas)
+
+
+async def votar(candidatos: list, desde: int, cantidad: int):
+    """Votos espaciados para que el coalescer emita varios frames"""
+    for k in range(desde, desde + cantidad):
+        _, _, evento = await AsyncVotoService.registrar_voto(
+            f'u{k}', candidatos[k % len(candidatos)], f'u{k}@continental.edu.pe'
+        )
+        backplane.publicar(evento)
+        if k % 10 == 0:
+            await asyncio.sleep(0.02)
+
+
+async def medir(tipo, args, candidatos: list, votados: int, cpu_base: float):
+    clase = ClienteWS if tipo == 'WebSocket' else ClienteSSE
+    gc.collect()
+    tracemalloc.start()
+    antes = tracemalloc.get_traced_memory()[0]
+    clientes = [clase() for _ in range(args.clientes)]
+    tareas = [c.abrir() for c in clientes]
+    try:
+        await esperar(clientes, lambda c: c.total == votados)
+        gc.collect()
+        memoria = (tracemalloc.get_traced_memory()[0] - antes) / args.clientes
+        tracemalloc.stop()
+
+        bytes_antes = sum(c.bytes for c in clientes)
+        frames_antes = coalescer.seq
+        cpu = time.process_time()
+        await votar(candidatos, votados, args.votos)
+        await esperar(clientes, lambda c: c.total == votados + args.votos)
+        cpu = time.process_time() - cpu - cpu_base
+        frames = coalescer.seq - frames_antes
+    finally:
+        await cerrar(clientes, tareas)
+    print(f"{tipo:<10} {memoria / 1024:>11.2f} {frames:>7} "
+          f"{cpu * 1e6 / (args.clientes * frames):>15.1f} "
+          f"{(sum(c.bytes for c in clientes) - bytes_antes) / args.clientes / 1024:>12.1f}")
+    return votados + args.votos
+
+
+async def reanudar(args, candidatos: list, votados: int) -> int:
+    sse = ClienteSSE(guardar=True)
+    testigo = ClienteSSE()
+    nuevo = ClienteSSE(guardar=True)
+    tareas = [sse.abrir()]
+    try:
+        return await _reanudar(args, candidatos, votados, sse, testigo, nuevo, tareas)
+    finally:
+        await cerrar((sse, testigo, nuevo), tareas)
+
+
+async def _reanudar(args, candidatos: list, votados: int, sse, testigo, nuevo, tareas: list) -> int:
+    await esperar([sse], lambda c: c.total == votados)
+    # Otro cliente mantiene al coalescer emitiendo mientras este está caído
+    tareas.append(testigo.abrir())
+    sse.cerrar()
+    await tareas.pop(0)
+    perdido_desde = coalescer.seq
+    while coalescer.seq - perdido_desde < args.perdidos:
+        await votar(candidatos, votados, 10)
+        votados += 10
+        await asyncio.sleep(coalescer.intervalo)
+    await esperar([testigo], lambda c: c.total == votados)
+
+    estado = {c['candidato_id']: c['votos'] for c in sse.eventos[0]['candidatos']}
+    for frame in sse.eventos[1:]:
+        estado.update({c['candidato_id']: c['votos'] for c in frame['candidatos']})
+
+    bytes_antes, eventos_antes = sse.bytes, len(sse.eventos)
+    tareas.append(sse.abrir())
+    await esperar([sse], lambda c: c.total == votados)
+    bytes_reanudar = sse.bytes - bytes_antes
+    for frame in sse.eventos[eventos_antes:]:
+        assert frame['tipo'] == 'delta', 'la reanudación no debe pedir un snapshot'
+        estado.update({c['candidato_id']: c['votos'] for c in frame['candidatos']})
+
+    tareas.append(nuevo.abrir())
+    await esperar([nuevo], lambda c: c.total == votados)
+    assert estado == {c['candidato_id']: c['votos'] for c in nuevo.eventos[0]['candidatos']}
+
+    print(f"\nReanudar tras {coalescer.seq - perdido_desde} frames perdidos: "
+          f"{bytes_reanudar / 1024:.1f} KB con Last-Event-ID "
+          f"contra {nuevo.bytes / 1024:.1f} KB de un snapshot nuevo (estado final idéntico)")
+    return votados
+
+
+async def ejecutar(args):
+    async with app.router.lifespan_context(app):
+        while not conteo_cache.listo:
+            await asyncio.sleep(0.01)
+        candidatos = []
+        for numero in range(1, args.candidatos + 1):
+            _, _, candidato_id = await AsyncCandidatoService.create(
+                nombre=f'Candidato {numero}', numero=numero, cargo='Delegado',
+                imagen=f'https://img/{numero}.png', propuesta='p' * 200
+            )
+            candidatos.append(candidato_id)
+
+        # CPU de los mismos votos sin clientes (se descuenta)
+        cpu = time.process_time()
+        await votar(candidatos, 0, args.votos)
+        cpu_base = time.process_time() - cpu
+        votados = args.votos
+
+        print(f"{args.clientes} clientes, {args.votos} votos, {args.candidatos} candidatos\n")
+        print(f"{'camino':<10} {'KB/conexión':>11} {'frames':>7} {'µs CPU/frame/cl':>15} {'KB/cliente':>12}")
+        for tipo in ('WebSocket', 'SSE'):
+            votados = await medir(tipo, args, candidatos, votados, cpu_base)
+        assert not manager.active_connections and not flujo_resultados.clientes
+        await reanudar(args, candidatos, votados)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clientes', type=int, default=1000)
+    parser.add_argument('--votos', type=int, default=400)
+    parser.add_argument('--candidatos', type=int, default=30)
+    parser.add_argument('--perdidos', type=int, default=20, help='frames que se pierde el cliente SSE caído')
+    args = parser.parse_args()
+    asyncio.run(ejecutar(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,288 @@
+"""Simulacro de jornada electoral contra la API con Firestore simulado.
+
+Uso (desde Backend/):
+    python -m benchmarks.carga_eleccion [--votos 2000] [--concurrencia 100]
+        [--latencia-ms 5] [--clientes-ws 500] [--escenarios votos,resultados,sondeo,ws]
+        [--ingesta directa|diferida]
+
+Levanta la app con su lifespan en el mismo proceso y la ejercita con httpx
+sobre ASGI (sin red), con un Firestore en memoria que añade `--latencia-ms`
+por round trip y los cuenta. Escenarios:
+
+- votos: ráfaga de POST /api/votos (con `--duplicados` de votos repetidos).
+  Con `--ingesta diferida` la API responde 202 con un recibo y escribe los
+  votos en batches agrupados.
+- resultados: GET de /api/candidatos/resultados/{conteo,estadisticas}.
+- sondeo: la app consultando candidatos y resultados con If-None-Match (el
+  ETag de su consulta anterior); sin cambios de datos se responde 304.
+- ws: `--clientes-ws` clientes en /api/votos/ws durante una ráfaga de votos;
+  mide cuánto tarda cada voto en aparecer en los frames de cada cliente.
+
+Para cada escenario informa throughput, percentiles de latencia y llamadas
+a Firestore por petición.
+"""
+import argparse
+import asyncio
+import bisect
+import json
+import os
+import random
+import time
+from collections import Counter
+
+# Todo el simulacro sale de una sola IP: sin control de admisión salvo que
+# se configure ADMISION_REGLAS (bench_admision mide el limitador)
+os.environ.setdefault('ADMISION_REGLAS', '')
+
+from benchmarks.firestore_simulado import NO_ROUND_TRIPS, ClienteSimulado, instalar  # noqa: E402
+
+cliente = ClienteSimulado()
+instalar(cliente)
+
+import httpx  # noqa: E402
+from fastapi import WebSocketDisconnect  # noqa: E402
+
+from app.main import app  # noqa: E402
+from routers.votos import websocket_votos  # noqa: E402
+from services.ingesta_votos import ingesta_votos  # noqa: E402
+
+
+def percentil(valores: list, p: float) -> float:
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))]
+
+
+def resumen_latencias(valores: list) -> str:
+    return '  '.join(
+        f'{nombre} {percentil(valores, p) * 1000:7.1f}'
+        for nombre, p in (('p50', 50), ('p95', 95), ('p99', 99), ('max', 100))
+    )
+
+
+def imprimir(nombre: str, resultado: dict):
+    n = resultado['peticiones']
+    print(f"\n== {nombre}: {n} peticiones en {resultado['duracion']:.2f} s "
+          f"({n / resultado['duracion']:.0f} req/s)")
+    print(f"   latencia (ms)  {resumen_latencias(resultado['latencias'])}")
+    print(f"   códigos HTTP   {dict(sorted(resultado['codigos'].items()))}")
+    llamadas = resultado['llamadas']
+    detalle = ', '.join(
+        f'{tipo} {cantidad / n:.2f}' for tipo, cantidad in sorted(llamadas.items())
+        if tipo not in NO_ROUND_TRIPS
+    )
+    print(f"   Firestore/pet. {resultado['round_trips'] / n:.2f} round trips ({detalle or '-'}); "
+          f"{llamadas.get('documentos_leidos', 0) / n:.2f} documentos leídos")
+
+
+async def rafaga(n: int, concurrencia: int, peticion) -> dict:
+    """Lanzar n peticiones con a lo sumo `concurrencia` en vuelo"""
+    semaforo = asyncio.Semaphore(concurrencia)
+    latencias = []
+    completadas = []
+    codigos = Counter()
+
+    async def una(i: int):
+        async with semaforo:
+            # Sin red de por medio, una petición que no espera a Firestore
+            # (202) no cede el event loop; ceder como lo haría el socket
+            await asyncio.sleep(0)
+            t0 = time.perf_counter()
+            respuesta = await peticion(i)
+            fin = time.perf_counter()
+            latencias.append(fin - t0)
+            codigos[respuesta.status_code] += 1
+            if respuesta.status_code in (200, 202):
+                completadas.append(fin)
+
+    cliente.reiniciar_contadores()
+    inicio = time.perf_counter()
+    await asyncio.gather(*(una(i) for i in range(n)))
+    return {
+        'peticiones': n,
+        'duracion': time.perf_counter() - inicio,
+        'latencias': latencias,
+        'codigos': codigos,
+        'completadas': sorted(completadas),
+        'llamadas': dict(cliente.llamadas),
+        'round_trips': cliente.round_trips(),
+    }
+
+
+class Votante:
+    """Genera votos; una fracción repite un userId ya usado"""
+
+    def __init__(self, candidatos: list, duplicados: float):
+        self.candidatos = candidatos
+        self.duplicados = duplicados
+        self.siguiente = 0
+
+    def cuerpo(self) -> dict:
+        if self.siguiente and random.random() < self.duplicados:
+            indice = random.randrange(self.siguiente)
+        else:
+            indice = self.siguiente
+            self.siguiente += 1
+        return {
+            'userId': f'usuario-{indice}',
+            'candidatoId': random.choice(self.candidatos),
+            'correo': f'usuario{indice}@continental.edu.pe',
+        }
+
+
+class WebSocketSimulado:
+    """Cliente de /api/votos/ws que registra cada frame con su hora de llegada"""
+
+    def __init__(self):
+        self.frames = []
+        self.inicial = asyncio.Event()
+        self._entrada = asyncio.Queue()
+
+    async def accept(self):
+        pass
+
+    async def receive_text(self) -> str:
+        texto = await self._entrada.get()
+        if texto is None:
+            raise WebSocketDisconnect()
+        return texto
+
+    async def send_text(self, texto: str):
+        frame = json.loads(texto)
+        self.frames.append((time.perf_counter(), frame.get('total_votos')))
+        if frame.get('tipo') == 'inicial':
+            self.inicial.set()
+
+    async def close(self, code: int = 1000):
+        self._entrada.put_nowait(None)
+
+    def desconectar(self):
+        self._entrada.put_nowait(None)
+
+
+def retrasos_de_visibilidad(ws: WebSocketSimulado, completadas: list, base: int) -> list:
+    """Para cada voto aceptado: tiempo hasta el primer frame que lo incluye"""
+    frames = [(t, total) for t, total in ws.frames if total is not None]
+    totales = [total for _, total in frames]
+    retrasos = []
+    for k, completada in enumerate(completadas, start=1):
+        i = bisect.bisect_left(totales, base + k)
+        if i < len(frames):
+            retrasos.append(max(0.0, frames[i][0] - completada))
+    return retrasos
+
+
+async def escenario_votos(http, args, votante: Votante) -> dict:
+    return await rafaga(
+        args.votos, args.concurrencia,
+        lambda i: http.post('/api/votos/', json=votante.cuerpo())
+    )
+
+
+async def escenario_resultados(http, args) -> dict:
+    rutas = ['/api/candidatos/resultados/conteo', '/api/candidatos/resultados/estadisticas']
+    return await rafaga(args.lecturas, args.concurrencia, lambda i: http.get(rutas[i % 2]))
+
+
+async def escenario_sondeo(http, args) -> dict:
+    rutas = ['/api/candidatos/', '/api/candidatos/resultados/conteo', '/api/candidatos/resultados/estadisticas']
+    etags = {}
+
+    async def consultar(i: int):
+        ruta = rutas[i % len(rutas)]
+        respuesta = await http.get(ruta, headers={'If-None-Match': etags[ruta]} if ruta in etags else {})
+        etags[ruta] = respuesta.headers.get('etag', '')
+        return respuesta
+
+    return await rafaga(args.lecturas, args.concurrencia, consultar)
+
+
+async def escenario_ws(http, args, votante: Votante) -> dict:
+    clientes = [WebSocketSimulado() for _ in range(args.clientes_ws)]
+    tareas = [asyncio.create_task(websocket_votos(ws)) for ws in clientes]
+    await asyncio.gather(*(ws.inicial.wait() for ws in clientes))
+    # Con ingesta diferida, que el total de partida incluya los votos en cola
+    while ingesta_votos.pendientes():
+        await asyncio.sleep(0.01)
+    base = (await http.get('/api/candidatos/resultados/estadisticas')).json()['data']['total_votos']
+
+    resultado = await escenario_votos(http, args, votante)
+    esperado = base + len(resultado['completadas'])
+    limite = time.perf_counter() + 10
+    while time.perf_counter() < limite:
+        if all(ws.frames and ws.frames[-1][1] == esperado for ws in clientes):
+            break
+        await asyncio.sleep(0.05)
+
+    retrasos = []
+    for ws in clientes:
+        retrasos.extend(retrasos_de_visibilidad(ws, resultado['completadas'], base))
+        ws.desconectar()
+    await asyncio.gather(*tareas, return_exceptions=True)
+
+    resultado['visibilidad'] = retrasos
+    resultado['frames_por_cliente'] = sum(len(ws.frames) for ws in clientes) / len(clientes)
+    resultado['al_dia'] = sum(1 for ws in clientes if ws.frames and ws.frames[-1][1] == esperado)
+    return resultado
+
+
+async def esperar_listo(http, limite: float = 30.0) -> float:
+    """Segundos hasta que /api/salud/listo responde 200 (el lifespan prepara en segundo plano)"""
+    inicio = time.perf_counter()
+    while (await http.get('/api/salud/listo')).status_code != 200:
+        if time.perf_counter() - inicio > limite:
+            raise RuntimeError('La app no quedó lista')
+        await asyncio.sleep(0.01)
+    return time.perf_counter() - inicio
+
+
+async def ejecutar(args):
+    cliente.latencia = args.latencia_ms / 1000
+    ingesta_votos.modo = args.ingesta
+    escenarios = args.escenarios.split(',')
+    transporte = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transporte, base_url='http://prueba') as http:
+            await esperar_listo(http)
+            candidatos = []
+            for numero in range(1, args.candidatos + 1):
+                respuesta = await http.post('/api/candidatos/', json={'nombre': f'Candidato {numero}', 'numero': numero})
+                candidatos.append(respuesta.json()['candidato_id'])
+            votante = Votante(candidatos, args.duplicados)
+
+            print(f'{args.candidatos} candidatos, latencia Firestore {args.latencia_ms} ms por round trip, '
+                  f'concurrencia {args.concurrencia}, ingesta {args.ingesta}')
+            if 'votos' in escenarios:
+                imprimir('POST /api/votos', await escenario_votos(http, args, votante))
+            if 'resultados' in escenarios:
+                imprimir('GET resultados', await escenario_resultados(http, args))
+            if 'sondeo' in escenarios:
+                imprimir('GET con If-None-Match', await escenario_sondeo(http, args))
+            if 'ws' in escenarios:
+                resultado = await escenario_ws(http, args, votante)
+                imprimir(f'POST /api/votos con {args.clientes_ws} clientes WS', resultado)
+                print(f"   WS             {resultado['frames_por_cliente']:.1f} frames/cliente, "
+                      f"{resultado['al_dia']}/{args.clientes_ws} clientes al día")
+                print(f"   voto visible en WS (ms)  {resumen_latencias(resultado['visibilidad'])}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--votos', type=int, default=2000)
+    parser.add_argument('--lecturas', type=int, default=2000)
+    parser.add_argument('--concurrencia', type=int, default=100)
+    parser.add_argument('--candidatos', type=int, default=8)
+    parser.add_argument('--duplicados', type=float, default=0.05, help='fracción de votos repetidos')
+    parser.add_argument('--latencia-ms', type=float, default=5.0, help='latencia por round trip a Firestore')
+    parser.add_argument('--clientes-ws', type=int, default=500)
+    parser.add_argument('--escenarios', default='votos,resultados,sondeo,ws')
+    parser.add_argument('--ingesta', choices=('directa', 'diferida'), default='directa')
+    parser.add_argument('--semilla', type=int, default=1)
+    args = parser.parse_args()
+    random.seed(args.semilla)
+    asyncio.run(ejecutar(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,658 @@
+"""Firestore en memoria para los benchmarks.
+
+Implementa el subconjunto del cliente que usan config/firebase.py y los
+servicios: collection/document, where/order_by/limit/start_after/stream,
+count(), batch,
+Increment, precondiciones `last_update_time` en update(), transacciones (compatibles con firestore.transactional) y
+listeners. Cada documento admite una escritura a la vez y cada escritura
+ocupa el documento `escritura_por_doc` segundos, lo que modela el límite de
+escrituras sostenidas por documento de Firestore.
+
+Cada llamada que en Firestore es un round trip (get, escritura, commit,
+consulta, agregación, transacción, listen) se cuenta en `cliente.llamadas`
+y espera `latencia` segundos; en la fachada asíncrona la espera es un asyncio.sleep,
+así que no bloquea el event loop.
+"""
+import asyncio
+import contextvars
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+
+from google.api_core.exceptions import Aborted, AlreadyExists, FailedPrecondition, NotFound
+from google.cloud.firestore_v1.transforms import Increment
+
+# Contadores de `llamadas` que no son round trips
+NO_ROUND_TRIPS = ('documentos_leidos', 'bytes_leidos')
+
+# Segundos que una transacción espera el bloqueo de un documento
+ESPERA_BLOQUEO = 5.0
+
+# Dentro de la fachada asíncrona la latencia se espera con asyncio.sleep
+_en_async = contextvars.ContextVar('_en_async', default=False)
+
+# Operadores de where()
+_OPERADORES = {
+    '==': lambda a, b: a == b,
+    '!=': lambda a, b: a != b,
+    '<': lambda a, b: a is not None and a < b,
+    '<=': lambda a, b: a is not None and a <= b,
+    '>': lambda a, b: a is not None and a > b,
+    '>=': lambda a, b: a is not None and a >= b,
+    'in': lambda a, b: a in b,
+    'not-in': lambda a, b: a not in b,
+    'array_contains': lambda a, b: isinstance(a, list) and b in a,
+    'array_contains_any': lambda a, b: isinstance(a, list) and any(x in a for x in b),
+}
+
+
+def _ahora():
+    return datetime.now(timezone.utc)
+
+
+class WriteResult:
+    def __init__(self, update_time):
+        self.update_time = update_time
+
+
+class DocumentSnapshot:
+    def __init__(self, reference, data, update_time=None):
+        self.reference = reference
+        self.id = reference.id
+        self._data = data
+        self.exists = data is not None
+        self.update_time = update_time
+
+    def to_dict(self):
+        return dict(self._data) if self._data is not None else None
+
+    def get(self, campo):
+        return (self._data or {}).get(campo)
+
+
+class _Documento:
+    """Estado interno de un documento"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.data = None
+        self.update_time = None
+        # Datos previos al último borrado (los listeners los entregan en REMOVED)
+        self.borrado = None
+        # Si la última escritura lo creó (ADDED para los listeners)
+        self.creado = False
+
+
+def _aplicar(actual, cambios):
+    """Aplicar un diccionario de cambios (con Increment) sobre los datos actuales"""
+    resultado = dict(actual or {})
+    for campo, valor in cambios.items():
+        if isinstance(valor, Increment):
+            resultado[campo] = resultado.get(campo, 0) + valor.value
+        else:
+            resultado[campo] = valor
+    return resultado
+
+
+def _escribir_bloqueado(doc, funcion):
+    """Aplicar una escritura sobre un documento cuyo lock ya se tiene"""
+    anterior = doc.data
+    doc.data = funcion(doc.data)
+    doc.creado = anterior is None and doc.data is not None
+    if doc.data is None:
+        doc.borrado = anterior
+    doc.update_time = _ahora() if doc.data is not None else None
+    return WriteResult(doc.update_time or _ahora())
+
+
+class DocumentReference:
+    def __init__(self, cliente, path):
+        self._cliente = cliente
+        self.path = path
+        self.id = path.rsplit('/', 1)[-1]
+
+    @property
+    def parent(self):
+        return CollectionReference(self._cliente, self.path.rsplit('/', 1)[0])
+
+    def collection(self, nombre):
+        return CollectionReference(self._cliente, f'{self.path}/{nombre}')
+
+    def get(self, field_paths=None, transaction=None):
+        if transaction is not None:
+            return transaction.get(self)
+        self._cliente._rpc('get', documentos=1)
+        return self._leer()
+
+    def _leer(self):
+        doc = self._cliente._documentos.get(self.path)
+        if doc is None or doc.data is None:
+            return DocumentSnapshot(self, None)
+        return DocumentSnapshot(self, doc.data, doc.update_time)
+
+    def _escribir(self, funcion):
+        self._cliente._rpc('escritura')
+        doc = self._cliente._documento(self.path)
+        with doc.lock:
+            if self._cliente.escritura_por_doc:
+                time.sleep(self._cliente.escritura_por_doc)
+            resultado = _escribir_bloqueado(doc, funcion)
+        self._cliente._notificar([self.path])
+        return resultado
+
+    def _create(self, data):
+        def funcion(actual):
+            if actual is not None:
+                raise AlreadyExists(f'Document already exists: {self.path}')
+            return _aplicar(None, data)
+        return funcion
+
+    def _set(self, data, merge=False):
+        return lambda actual: _aplicar(actual if merge else None, data)
+
+    def _update(self, data):
+        def funcion(actual):
+            if actual is None:
+                raise NotFound(f'No document to update: {self.path}')
+            return _aplicar(actual, data)
+        return funcion
+
+    def create(self, data):
+        return self._escribir(self._create(data))
+
+    def set(self, data, merge=False):
+        return self._escribir(self._set(data, merge))
+
+    def update(self, data, option=None):
+        funcion = self._update(data)
+        if option is not None:
+            funcion = self._con_precondicion(funcion, option)
+        return self._escribir(funcion)
+
+    def _con_precondicion(self, funcion, option):
+        """La escritura falla si el documento cambió desde `last_update_time`"""
+        def verificada(actual):
+            # Se ejecuta con el lock del documento tomado
+            if self._cliente._documentos[self.path].update_time != option.last_update_time:
+                raise FailedPrecondition(f'Document was modified: {self.path}')
+            return funcion(actual)
+        return verificada
+
+    def delete(self):
+        return self._escribir(lambda actual: None)
+
+
+class Query:
+    ASCENDING = 'ASCENDING'
+    DESCENDING = 'DESCENDING'
+
+    def __init__(self, cliente, coleccion, grupo=False, filtros=(), orden=(), limite=None, despues=None,
+                 seleccion=None):
+        self._cliente = cliente
+        self._coleccion = coleccion
+        self._grupo = grupo
+        self._filtros = list(filtros)
+        self._orden = list(orden)
+        self._limite = limite
+        self._despues = despues
+        self._seleccion = seleccion
+
+    def _copiar(self, **cambios):
+        estado = {
+            'grupo': self._grupo, 'filtros': self._filtros, 'orden': self._orden, 'limite': self._limite,
+            'despues': self._despues, 'seleccion': self._seleccion,
+        }
+        estado.update(cambios)
+        return Query(self._cliente, self._coleccion, **estado)
+
+    def where(self, campo=None, op=None, valor=None, *, filter=None):
+        if filter is not None:
+            # FieldFilter(campo, op, valor)
+            campo, op, valor = filter.field_path, filter.op_string, filter.value
+        if op not in _OPERADORES:
+            raise NotImplementedError(op)
+        return self._copiar(filtros=self._filtros + [(campo, op, valor)])
+
+    def order_by(self, campo, direction=ASCENDING):
+        return self._copiar(orden=self._orden + [(campo, direction == self.DESCENDING)])
+
+    def limit(self, cantidad):
+        return self._copiar(limite=cantidad)
+
+    def select(self, field_paths):
+        # Proyección: cuenta las mismas lecturas pero transfiere menos bytes
+        return self._copiar(seleccion=[campo for campo in field_paths if campo != '__name__'])
+
+    def start_after(self, valores):
+        """Cursor sobre los campos de order_by (dict, o un DocumentSnapshot)"""
+        if isinstance(valores, DocumentSnapshot):
+            valores = dict(valores._data or {}, __name__=valores.id)
+        return self._copiar(despues=tuple(valores[campo] for campo, _ in self._orden))
+
+    def count(self, alias=None):
+        return AggregationQuery(self, alias or 'count')
+
+    def _coincide(self, path):
+        partes = path.split('/')
+        if self._grupo:
+            return len(partes) >= 2 and partes[-2] == self._coleccion
+        return path.rsplit('/', 1)[0] == self._coleccion
+
+    def on_snapshot(self, callback):
+        """Listener: snapshot inicial y luego un cambio por escritura (en el hilo que escribe)"""
+        return self._cliente._escuchar(self, callback)
+
+    def _resultados(self):
+        docs = []
+        for path, doc in list(self._cliente._documentos.items()):
+            if doc.data is None or not self._coincide(path):
+                continue
+            if all(_OPERADORES[op](doc.data.get(campo), valor) for campo, op, valor in self._filtros):
+                docs.append(DocumentSnapshot(
+                    DocumentReference(self._cliente, path), dict(doc.data), doc.update_time
+                ))
+        # Orden estable: se aplica del último criterio al primero
+        for campo, descendente in reversed(self._orden):
+            docs = [d for d in docs if campo == '__name__' or campo in d._data]
+            docs.sort(key=lambda d, c=campo: _valor_orden(d, c), reverse=descendente)
+        if self._despues is not None:
+            docs = [d for d in docs if self._posterior(d)]
+        if self._limite is not None:
+            docs = docs[:self._limite]
+        if self._seleccion is not None:
+            for doc in docs:
+                doc._data = {campo: doc._data[campo] for campo in self._seleccion if campo in doc._data}
+        return docs
+
+    def _posterior(self, doc):
+        """True si el documento va después del cursor de start_after"""
+        for (campo, descendente), cursor in zip(self._orden, self._despues):
+            if isinstance(cursor, DocumentReference):
+                cursor = cursor.id
+            valor = _valor_orden(doc, campo)
+            if valor != cursor:
+                return valor < cursor if descendente else valor > cursor
+        return False
+
+    def stream(self, transaction=None):
+        if transaction is not None:
+            return transaction.get(self)
+        docs = self._resultados()
+        self._cliente._rpc(
+            'consulta', documentos=max(len(docs), 1), bytes_leidos=sum(_tamano(d._data) for d in docs)
+        )
+        return iter(docs)
+
+
+def _tamano(data) -> int:
+    """Tamaño aproximado de un documento transferido (bytes)"""
+    return len(repr(data).encode('utf-8'))
+
+
+def _valor_orden(doc, campo):
+    return doc.id if campo == '__name__' else doc._data[campo]
+
+
+class AggregationResult:
+    def __init__(self, alias, value, read_time):
+        self.alias = alias
+        self.value = value
+        self.read_time = read_time
+
+
+class AggregationQuery:
+    """count() de una consulta: un round trip que no transfiere los documentos"""
+
+    def __init__(self, query, alias):
+        self._query = query
+        self._cliente = query._cliente
+        self._alias = alias
+
+    def get(self, transaction=None):
+        total = len(self._query._resultados())
+        # Firestore cobra una lectura por cada 1000 entradas de índice
+        self._cliente._rpc('agregacion', documentos=max(1, -(-total // 1000)))
+        return [[AggregationResult(self._alias, total, _ahora())]]
+
+
+class CollectionReference(Query):
+    def __init__(self, cliente, path):
+        super().__init__(cliente, path)
+        self.path = path
+        self.id = path.rsplit('/', 1)[-1]
+
+    @property
+    def parent(self):
+        if '/' not in self.path:
+            return None
+        return DocumentReference(self._cliente, self.path.rsplit('/', 1)[0])
+
+    def document(self, doc_id=None):
+        return DocumentReference(self._cliente, f'{self.path}/{doc_id or uuid.uuid4().hex[:20]}')
+
+
+class WriteBatch:
+    """Batch atómico: bloquea todos sus documentos y valida antes de escribir"""
+
+    def __init__(self, cliente):
+        self._cliente = cliente
+        self._operaciones = []
+
+    def create(self, ref, data):
+        self._operaciones.append((ref, ref._create(data)))
+
+    def set(self, ref, data, merge=False):
+        self._operaciones.append((ref, ref._set(data, merge)))
+
+    def update(self, ref, data):
+        self._operaciones.append((ref, ref._update(data)))
+
+    def delete(self, ref):
+        self._operaciones.append((ref, lambda actual: None))
+
+    def commit(self):
+        self._cliente._rpc('commit')
+        return self._aplicar_operaciones()
+
+    def _aplicar_operaciones(self, bloqueados_previos=()):
+        """Aplicar las operaciones de forma atómica.
+
+        Bloquea los documentos escritos (salvo los de `bloqueados_previos`, ya
+        tomados por una transacción) y valida todo antes de escribir.
+        """
+        docs = {ref.path: self._cliente._documento(ref.path) for ref, _ in self._operaciones}
+        bloqueados = [docs[path] for path in sorted(docs) if path not in bloqueados_previos]
+        tomados = []
+        try:
+            for doc in bloqueados:
+                if not doc.lock.acquire(timeout=ESPERA_BLOQUEO):
+                    raise Aborted('Transaction lock timeout')
+                tomados.append(doc)
+            if not self._operaciones:
+                return []
+            if self._cliente.escritura_por_doc:
+                time.sleep(self._cliente.escritura_por_doc)
+            # Validar todas las precondiciones sobre copias antes de aplicar
+            estado = {path: doc.data for path, doc in docs.items()}
+            for ref, funcion in self._operaciones:
+                estado[ref.path] = funcion(estado[ref.path])
+            resultados = [
+                _escribir_bloqueado(docs[ref.path], lambda actual, p=ref.path: estado[p])
+                for ref, _ in self._operaciones
+            ]
+        finally:
+            for doc in tomados:
+                doc.lock.release()
+        self._cliente._notificar(list(docs))
+        return resultados
+
+
+class Transaction(WriteBatch):
+    """Transacción con la interfaz que usa firestore.transactional.
+
+    Como en Firestore, leer un documento lo bloquea hasta el commit o el
+    rollback; si un bloqueo no se obtiene en ESPERA_BLOQUEO segundos se lanza
+    Aborted y el decorador reintenta la función.
+    """
+
+    def __init__(self, cliente, max_attempts=5, read_only=False):
+        super().__init__(cliente)
+        self._max_attempts = max_attempts
+        self._read_only = read_only
+        self._id = None
+        self._bloqueos = {}
+
+    @property
+    def in_progress(self):
+        return self._id is not None
+
+    @property
+    def id(self):
+        return self._id
+
+    def _clean_up(self):
+        for doc in self._bloqueos.values():
+            doc.lock.release()
+        self._bloqueos = {}
+        self._operaciones = []
+        self._id = None
+
+    def _begin(self, retry_id=None):
+        self._cliente._rpc('transaccion')
+        self._id = uuid.uuid4().bytes
+
+    def _rollback(self):
+        if self._id is not None:
+            self._cliente._rpc('rollback')
+        self._clean_up()
+
+    def _commit(self):
+        self._cliente._rpc('commit')
+        try:
+            return self._aplicar_operaciones(self._bloqueos)
+        finally:
+            self._clean_up()
+
+    def _bloquear(self, path):
+        if path in self._bloqueos:
+            return
+        doc = self._cliente._documento(path)
+        if not doc.lock.acquire(timeout=ESPERA_BLOQUEO):
+            raise Aborted(f'Transaction lock timeout on {path}')
+        self._bloqueos[path] = doc
+
+    def get(self, ref_o_query):
+        if isinstance(ref_o_query, DocumentReference):
+            self._bloquear(ref_o_query.path)
+            return ref_o_query.get()
+        docs = list(ref_o_query.stream())
+        for doc in docs:
+            self._bloquear(doc.reference.path)
+        # Releer bajo bloqueo: los documentos pudieron cambiar entre tanto
+        return iter([doc.reference._leer() for doc in docs])
+
+
+class _TipoCambio:
+    def __init__(self, name):
+        self.name = name
+
+
+class _Cambio:
+    def __init__(self, tipo, document):
+        self.type = _TipoCambio(tipo)
+        self.document = document
+
+
+class _Listener:
+    def __init__(self, cliente, query, callback):
+        self._cliente = cliente
+        self.query = query
+        self.callback = callback
+
+    def unsubscribe(self):
+        with self._cliente._lock:
+            if self in self._cliente._listeners:
+                self._cliente._listeners.remove(self)
+
+
+class ClienteSimulado:
+    """Cliente de Firestore en memoria"""
+
+    def __init__(self, escritura_por_doc: float = 0.0, latencia: float = 0.0):
+        self.escritura_por_doc = escritura_por_doc
+        self.latencia = latencia
+        # Round trips por tipo, más 'documentos_leidos' y 'bytes_leidos'
+        self.llamadas = Counter()
+        self._documentos = {}
+        self._lock = threading.Lock()
+        self._listeners = []
+
+    def _rpc(self, tipo, documentos=0, bytes_leidos=0):
+        """Contar un round trip y esperar la latencia (salvo en la fachada async)"""
+        with self._lock:
+            self.llamadas[tipo] += 1
+            if documentos:
+                self.llamadas['documentos_leidos'] += documentos
+            if bytes_leidos:
+                self.llamadas['bytes_leidos'] += bytes_leidos
+        if self.latencia and not _en_async.get():
+            time.sleep(self.latencia)
+
+    def round_trips(self) -> int:
+        """Total de round trips contados"""
+        with self._lock:
+            return sum(n for tipo, n in self.llamadas.items() if tipo not in NO_ROUND_TRIPS)
+
+    def reiniciar_contadores(self):
+        with self._lock:
+            self.llamadas.clear()
+
+    def _documento(self, path):
+        with self._lock:
+            return self._documentos.setdefault(path, _Documento())
+
+    def collection(self, nombre):
+        return CollectionReference(self, nombre)
+
+    def _escuchar(self, query, callback):
+        self._rpc('listen')
+        listener = _Listener(self, query, callback)
+        with self._lock:
+            self._listeners.append(listener)
+        cambios = [_Cambio('ADDED', doc) for doc in query._resultados()]
+        callback(None, cambios, _ahora())
+        return listener
+
+    def _notificar(self, paths):
+        with self._lock:
+            listeners = list(self._listeners)
+        for listener in listeners:
+            cambios = []
+            for path in paths:
+                if not listener.query._coincide(path):
+                    continue
+                ref = DocumentReference(self, path)
+                doc = self._documentos.get(path)
+                if doc is None or doc.data is None:
+                    borrado = dict(doc.borrado or {}) if doc is not None else {}
+                    cambios.append(_Cambio('REMOVED', DocumentSnapshot(ref, borrado, None)))
+                else:
+                    tipo = 'ADDED' if doc.creado else 'MODIFIED'
+                    cambios.append(_Cambio(tipo, DocumentSnapshot(ref, dict(doc.data), doc.update_time)))
+            if cambios:
+                listener.callback(None, cambios, _ahora())
+
+    def collection_group(self, nombre):
+        return Query(self, nombre, grupo=True)
+
+    def batch(self):
+        return WriteBatch(self)
+
+    def transaction(self, max_attempts=5, read_only=False):
+        return Transaction(self, max_attempts=max_attempts, read_only=read_only)
+
+    @staticmethod
+    def write_option(last_update_time=None):
+        return _Precondicion(last_update_time)
+
+
+class _Precondicion:
+    def __init__(self, last_update_time):
+        self.last_update_time = last_update_time
+
+
+# =========================
+# Fachada asíncrona (AsyncClient)
+# =========================
+
+
+class _Async:
+    """Envuelve un objeto del cliente síncrono exponiendo la API de AsyncClient"""
+
+    _ASYNC = {'get', 'set', 'update', 'create', 'delete'}
+    _ENVOLVER = {
+        'document', 'collection', 'collection_group', 'where', 'order_by', 'limit', 'parent',
+        'select', 'start_after', 'count',
+    }
+
+    def __init__(self, objeto):
+        self._objeto = objeto
+
+    def __getattr__(self, nombre):
+        atributo = getattr(self._objeto, nombre)
+        if nombre in self._ASYNC:
+            async def llamada(*args, **kwargs):
+                return await _rpc_async(self._objeto._cliente, atributo, *_desenvolver(args), **kwargs)
+            return llamada
+        if nombre in self._ENVOLVER:
+            if callable(atributo):
+                return lambda *args, **kwargs: _envolver(atributo(*_desenvolver(args), **kwargs))
+            return _envolver(atributo)
+        return atributo
+
+    async def stream(self):
+        docs = await _rpc_async(self._objeto._cliente, self._objeto.stream)
+        for doc in docs:
+            doc.reference = _Async(doc.reference)
+            yield doc
+
+    def batch(self):
+        return _AsyncBatch(self._objeto.batch())
+
+
+class _AsyncBatch:
+    """En AsyncWriteBatch solo commit() es una corrutina"""
+
+    def __init__(self, batch):
+        self._batch = batch
+
+    def create(self, ref, data):
+        self._batch.create(*_desenvolver([ref]), data)
+
+    def set(self, ref, data, merge=False):
+        self._batch.set(*_desenvolver([ref]), data, merge=merge)
+
+    def update(self, ref, data):
+        self._batch.update(*_desenvolver([ref]), data)
+
+    def delete(self, ref):
+        self._batch.delete(*_desenvolver([ref]))
+
+    async def commit(self):
+        return await _rpc_async(self._batch._cliente, self._batch.commit)
+
+
+async def _rpc_async(cliente, funcion, *args, **kwargs):
+    """Ejecutar una llamada del cliente síncrono y esperar su latencia sin bloquear"""
+    token = _en_async.set(True)
+    try:
+        resultado = funcion(*args, **kwargs)
+    finally:
+        _en_async.reset(token)
+    if cliente.latencia:
+        await asyncio.sleep(cliente.latencia)
+    return resultado
+
+
+def _envolver(objeto):
+    return None if objeto is None else _Async(objeto)
+
+
+def _desenvolver(args):
+    return [a._objeto if isinstance(a, _Async) else a for a in args]
+
+
+def instalar(cliente: ClienteSimulado):
+    """Hacer que config.firebase use el cliente simulado (síncrono y asíncrono).
+
+    Debe llamarse antes del primer uso de Firestore (config.firebase crea
+    los clientes la primera vez que se usan).
+    """
+    import firebase_admin
+    from firebase_admin import firestore, firestore_async
+
+    firebase_admin.get_app = lambda *args, **kwargs: None
+    firestore.client = lambda *args, **kwargs: cliente
+    firestore_async.client = lambda *args, **kwargs: _Async(cliente)
@@ -1,14 +1,23 @@
-import firebase_admin
-from firebase_admin import credentials, firestore
 import os
+import threading
 from dotenv import load_dotenv
+from metricas import instrumentar_firestore
 
 load_dotenv()
 
+# Los clientes se crean la primera vez que se usan (o en el lifespan de la
+# app, en un hilo): importar este módulo no carga el SDK de Firebase
+_lock = threading.Lock()
+_db = None
+_async_db = None
+
 
 # Inicializar Firebase Admin SDK
 def initialize_firebase():
     """Inicializa la conexión con Firebase"""
+    import firebase_admin
+    from firebase_admin import credentials, firestore
+
     try:
         # Intentar obtener la app existente
         firebase_admin.get_app()
@@ -49,16 +58,80 @@ def initialize_firebase():
     return firestore.client()
 
 
-# Instancia global de Firestore
-print("Configurando Firestore...")
-db = initialize_firebase()
-print("Firestore configurado exitosamente")
+def _crear_clientes() -> tuple:
+    """Clientes síncrono y asíncrono (misma app de Firebase)"""
+    from firebase_admin import firestore_async
 
-# Referencias a colecciones
-candidatos_ref = db.collection("candidatos")
-votos_ref = db.collection("votos")
+    db = initialize_firebase()
+    return db, firestore_async.client()
+
+
+def inicializar() -> None:
+    """Crear los clientes si aún no existen (bloquea: llamar desde un hilo)"""
+    global _db, _async_db
+    if _async_db is not None:
+        return
+    with _lock:
+        if _async_db is None:
+            print("Configurando Firestore...")
+            db, async_db = _crear_clientes()
+            # Cada llamada queda medida en /metrics
+            _db = instrumentar_firestore(db)
+            _async_db = instrumentar_firestore(async_db)
+            print("Firestore configurado exitosamente")
+
+
+def inicializado() -> bool:
+    return _async_db is not None
 
 
 def get_db():
     """Retorna la instancia de Firestore"""
-    return db
+    inicializar()
+    return _db
+
+
+def get_async_db():
+    """Retorna la instancia asíncrona de Firestore"""
+    inicializar()
+    return _async_db
+
+
+class ColeccionDiferida:
+    """Referencia a una colección que crea el cliente al primer uso.
+
+    Se comporta como la CollectionReference real (document, where, stream,
+    on_snapshot, ...), así que los servicios la usan como antes.
+    """
+
+    def __init__(self, obtener_db, nombre: str):
+        self._obtener_db = obtener_db
+        self._nombre = nombre
+        self._ref = None
+
+    def __getattr__(self, atributo):
+        ref = self._ref
+        if ref is None:
+            ref = self._ref = self._obtener_db().collection(self._nombre)
+        return getattr(ref, atributo)
+
+    def __repr__(self):
+        return f'ColeccionDiferida({self._nombre!r})'
+
+
+# Referencias a colecciones
+candidatos_ref = ColeccionDiferida(get_db, "candidatos")
+votos_ref = ColeccionDiferida(get_db, "votos")
+votos_correos_ref = ColeccionDiferida(get_db, "votos_correos")
+# Votos por minuto de cada worker (ver services/participacion.py)
+participacion_ref = ColeccionDiferida(get_db, "participacion")
+# Estado de trabajos de mantenimiento (p. ej. la migración de IDs de votos)
+sistema_ref = ColeccionDiferida(get_db, "sistema")
+
+# Cliente asíncrono para los servicios async
+candidatos_async_ref = ColeccionDiferida(get_async_db, "candidatos")
+votos_async_ref = ColeccionDiferida(get_async_db, "votos")
+votos_correos_async_ref = ColeccionDiferida(get_async_db, "votos_correos")
+participacion_async_ref = ColeccionDiferida(get_async_db, "participacion")
+# Estado de trabajos en segundo plano (p. ej. el reinicio de la elección)
+sistema_async_ref = ColeccionDiferida(get_async_db, "sistema")
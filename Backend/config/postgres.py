@@ -0,0 +1,48 @@
+import threading
+from contextlib import contextmanager
+from typing import Optional
+from psycopg2.extras import RealDictCursor
+from psycopg2.pool import ThreadedConnectionPool
+from config.settings import DATABASE_URL, PG_POOL_MIN, PG_POOL_MAX
+
+_pool: Optional[ThreadedConnectionPool] = None
+_pool_lock = threading.Lock()
+# ThreadedConnectionPool lanza PoolError si se agota: así los hilos esperan turno
+_disponibles = threading.BoundedSemaphore(PG_POOL_MAX)
+
+
+def get_pool() -> ThreadedConnectionPool:
+    """Retorna el pool de conexiones (se crea en el primer uso)"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadedConnectionPool(PG_POOL_MIN, PG_POOL_MAX, DATABASE_URL)
+    return _pool
+
+
+@contextmanager
+def cursor():
+    """Cursor (filas como dict) en una transacción de una conexión del pool.
+
+    Al salir hace commit, o rollback si hubo una excepción.
+    """
+    with _disponibles:
+        pool = get_pool()
+        conn = pool.getconn()
+        try:
+            with conn:
+                with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                    yield cur
+        finally:
+            # Una conexión rota no vuelve al pool
+            pool.putconn(conn, close=bool(conn.closed))
+
+
+def cerrar_pool():
+    """Cerrar todas las conexiones del pool"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
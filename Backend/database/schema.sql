@@ -24,18 +24,43 @@ CREATE TABLE IF NOT EXISTS candidatos (
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Campos del candidato que usa la API (imagen = foto_url, propuesta = descripcion)
+ALTER TABLE candidatos ADD COLUMN IF NOT EXISTS cargo VARCHAR(100);
+ALTER TABLE candidatos ADD COLUMN IF NOT EXISTS vision TEXT;
+ALTER TABLE candidatos ADD COLUMN IF NOT EXISTS experiencia TEXT;
+ALTER TABLE candidatos ADD COLUMN IF NOT EXISTS semestre VARCHAR(50);
+
 -- Tabla de votos
+-- Las restricciones UNIQUE llevan nombre: sp_registrar_voto las distingue
+-- para decir qué se repitió
 CREATE TABLE IF NOT EXISTS votos (
     id SERIAL PRIMARY KEY,
-    user_id VARCHAR(100) NOT NULL UNIQUE,
+    user_id VARCHAR(100) NOT NULL,
     candidato_id INTEGER NOT NULL REFERENCES candidatos(id),
-    correo VARCHAR(255) NOT NULL UNIQUE,
+    correo VARCHAR(255) NOT NULL,
     fecha TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     ip_address VARCHAR(45),
     ubicacion_lat DOUBLE PRECISION,
-    ubicacion_lng DOUBLE PRECISION
+    ubicacion_lng DOUBLE PRECISION,
+    CONSTRAINT votos_user_id_unico UNIQUE (user_id),
+    CONSTRAINT votos_correo_unico UNIQUE (correo)
 );
 
+-- Tablas creadas por versiones anteriores: renombrar las restricciones con
+-- el nombre que les puso PostgreSQL
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'votos_user_id_key'
+               AND conrelid = 'votos'::regclass) THEN
+        ALTER TABLE votos RENAME CONSTRAINT votos_user_id_key TO votos_user_id_unico;
+    END IF;
+    IF EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'votos_correo_key'
+               AND conrelid = 'votos'::regclass) THEN
+        ALTER TABLE votos RENAME CONSTRAINT votos_correo_key TO votos_correo_unico;
+    END IF;
+END;
+$$;
+
 -- Tabla de usuarios verificados (para controlar quién puede votar)
 CREATE TABLE IF NOT EXISTS usuarios_verificados (
     id SERIAL PRIMARY KEY,
@@ -50,6 +75,7 @@ CREATE TABLE IF NOT EXISTS usuarios_verificados (
 -- =====================================================
 
 -- 1. Obtener todos los candidatos
+DROP FUNCTION IF EXISTS sp_obtener_candidatos();
 CREATE OR REPLACE FUNCTION sp_obtener_candidatos()
 RETURNS TABLE (
     id INTEGER,
@@ -58,6 +84,10 @@ RETURNS TABLE (
     foto_url TEXT,
     votos INTEGER,
     descripcion TEXT,
+    cargo VARCHAR(100),
+    vision TEXT,
+    experiencia TEXT,
+    semestre VARCHAR(50),
     created_at TIMESTAMP,
     updated_at TIMESTAMP
 ) AS $$
@@ -70,6 +100,10 @@ BEGIN
         c.foto_url,
         c.votos,
         c.descripcion,
+        c.cargo,
+        c.vision,
+        c.experiencia,
+        c.semestre,
         c.created_at,
         c.updated_at
     FROM candidatos c
@@ -78,6 +112,7 @@ END;
 $$ LANGUAGE plpgsql;
 
 -- 2. Obtener candidato por ID
+DROP FUNCTION IF EXISTS sp_obtener_candidato_por_id(INTEGER);
 CREATE OR REPLACE FUNCTION sp_obtener_candidato_por_id(p_id INTEGER)
 RETURNS TABLE (
     id INTEGER,
@@ -86,6 +121,10 @@ RETURNS TABLE (
     foto_url TEXT,
     votos INTEGER,
     descripcion TEXT,
+    cargo VARCHAR(100),
+    vision TEXT,
+    experiencia TEXT,
+    semestre VARCHAR(50),
     created_at TIMESTAMP,
     updated_at TIMESTAMP
 ) AS $$
@@ -98,6 +137,10 @@ BEGIN
         c.foto_url,
         c.votos,
         c.descripcion,
+        c.cargo,
+        c.vision,
+        c.experiencia,
+        c.semestre,
         c.created_at,
         c.updated_at
     FROM candidatos c
@@ -128,6 +171,8 @@ END;
 $$ LANGUAGE plpgsql;
 
 -- 5. Registrar voto (con transacción atómica)
+-- Los duplicados los detectan las restricciones UNIQUE de votos (sin
+-- consultas previas), así dos votos simultáneos no pueden pasar ambos.
 CREATE OR REPLACE FUNCTION sp_registrar_voto(
     p_user_id VARCHAR(100),
     p_candidato_id INTEGER,
@@ -141,36 +186,25 @@ RETURNS TABLE (
     message VARCHAR(255)
 ) AS $$
 DECLARE
-    candidato_existe BOOLEAN;
-    voto_existe BOOLEAN;
+    restriccion TEXT;
 BEGIN
-    -- Verificar si el candidato existe
-    SELECT EXISTS(SELECT 1 FROM candidatos WHERE id = p_candidato_id) INTO candidato_existe;
-    
-    IF NOT candidato_existe THEN
-        RETURN QUERY SELECT FALSE, 'Candidato no encontrado';
-        RETURN;
-    END IF;
-
-    -- Verificar si el usuario ya votó
-    SELECT EXISTS(SELECT 1 FROM votos WHERE user_id = p_user_id) INTO voto_existe;
-    
-    IF voto_existe THEN
-        RETURN QUERY SELECT FALSE, 'El usuario ya ha votado';
-        RETURN;
-    END IF;
-
-    -- Verificar si el correo ya votó
-    SELECT EXISTS(SELECT 1 FROM votos WHERE correo = p_correo) INTO voto_existe;
-    
-    IF voto_existe THEN
-        RETURN QUERY SELECT FALSE, 'El correo ya ha sido usado para votar';
-        RETURN;
-    END IF;
-
-    -- Insertar voto
-    INSERT INTO votos (user_id, candidato_id, correo, ip_address, ubicacion_lat, ubicacion_lng)
-    VALUES (p_user_id, p_candidato_id, p_correo, p_ip_address, p_ubicacion_lat, p_ubicacion_lng);
+    BEGIN
+        -- Insertar voto
+        INSERT INTO votos (user_id, candidato_id, correo, ip_address, ubicacion_lat, ubicacion_lng)
+        VALUES (p_user_id, p_candidato_id, p_correo, p_ip_address, p_ubicacion_lat, p_ubicacion_lng);
+    EXCEPTION
+        WHEN foreign_key_violation THEN
+            RETURN QUERY SELECT FALSE, 'Candidato no encontrado'::VARCHAR(255);
+            RETURN;
+        WHEN unique_violation THEN
+            GET STACKED DIAGNOSTICS restriccion = CONSTRAINT_NAME;
+            IF restriccion = 'votos_user_id_unico' THEN
+                RETURN QUERY SELECT FALSE, 'El usuario ya ha votado'::VARCHAR(255);
+            ELSE
+                RETURN QUERY SELECT FALSE, 'Este correo ya ha sido usado para votar'::VARCHAR(255);
+            END IF;
+            RETURN;
+    END;
 
     -- Incrementar contador de votos del candidato
     UPDATE candidatos 
@@ -178,16 +212,20 @@ BEGIN
         updated_at = CURRENT_TIMESTAMP 
     WHERE id = p_candidato_id;
 
-    RETURN QUERY SELECT TRUE, 'Voto registrado exitosamente';
+    RETURN QUERY SELECT TRUE, 'Voto registrado exitosamente'::VARCHAR(255);
 END;
 $$ LANGUAGE plpgsql;
 
 -- 6. Obtener conteo de votos por candidato
+DROP FUNCTION IF EXISTS sp_obtener_conteo_votos();
 CREATE OR REPLACE FUNCTION sp_obtener_conteo_votos()
 RETURNS TABLE (
     candidato_id INTEGER,
     nombre VARCHAR(100),
     numero INTEGER,
+    cargo VARCHAR(100),
+    semestre VARCHAR(50),
+    foto_url TEXT,
     votos INTEGER,
     porcentaje DECIMAL(5,2)
 ) AS $$
@@ -195,20 +233,23 @@ DECLARE
     total_votos INTEGER;
 BEGIN
     -- Obtener total de votos
-    SELECT COALESCE(SUM(votos), 0) INTO total_votos FROM candidatos;
+    SELECT COALESCE(SUM(c.votos), 0) INTO total_votos FROM candidatos c;
 
     RETURN QUERY
     SELECT 
         c.id AS candidato_id,
         c.nombre,
         c.numero,
+        c.cargo,
+        c.semestre,
+        c.foto_url,
         c.votos,
         CASE 
             WHEN total_votos > 0 THEN ROUND((c.votos::DECIMAL / total_votos::DECIMAL) * 100, 2)
             ELSE 0
         END AS porcentaje
     FROM candidatos c
-    ORDER BY c.votos DESC;
+    ORDER BY c.votos DESC, c.numero ASC;
 END;
 $$ LANGUAGE plpgsql;
 
@@ -267,7 +308,7 @@ BEGIN
     SELECT EXISTS(SELECT 1 FROM candidatos WHERE numero = p_numero) INTO numero_existe;
     
     IF numero_existe THEN
-        RETURN QUERY SELECT FALSE, 'El número de candidato ya está en uso', NULL;
+        RETURN QUERY SELECT FALSE, 'El número de candidato ya está en uso'::VARCHAR(255), NULL::INTEGER;
         RETURN;
     END IF;
 
@@ -275,7 +316,7 @@ BEGIN
     INSERT INTO candidatos (nombre, numero, foto_url, descripcion)
     VALUES (p_nombre, p_numero, p_foto_url, p_descripcion);
 
-    RETURN QUERY SELECT TRUE, 'Candidato creado exitosamente', LASTVAL();
+    RETURN QUERY SELECT TRUE, 'Candidato creado exitosamente'::VARCHAR(255), LASTVAL()::INTEGER;
 END;
 $$ LANGUAGE plpgsql;
 
@@ -293,7 +334,7 @@ BEGIN
     SELECT EXISTS(SELECT 1 FROM candidatos WHERE id = p_id) INTO candidato_existe;
     
     IF NOT candidato_existe THEN
-        RETURN QUERY SELECT FALSE, 'Candidato no encontrado';
+        RETURN QUERY SELECT FALSE, 'Candidato no encontrado'::VARCHAR(255);
         RETURN;
     END IF;
 
@@ -301,14 +342,14 @@ BEGIN
     SELECT EXISTS(SELECT 1 FROM votos WHERE candidato_id = p_id) INTO tiene_votos;
     
     IF tiene_votos THEN
-        RETURN QUERY SELECT FALSE, 'No se puede eliminar un candidato con votos registrados';
+        RETURN QUERY SELECT FALSE, 'No se puede eliminar un candidato con votos registrados'::VARCHAR(255);
         RETURN;
     END IF;
 
     -- Eliminar candidato
     DELETE FROM candidatos WHERE id = p_id;
 
-    RETURN QUERY SELECT TRUE, 'Candidato eliminado exitosamente';
+    RETURN QUERY SELECT TRUE, 'Candidato eliminado exitosamente'::VARCHAR(255);
 END;
 $$ LANGUAGE plpgsql;
 
@@ -331,7 +372,7 @@ BEGIN
     -- Reiniciar contadores de candidatos
     UPDATE candidatos SET votos = 0, updated_at = CURRENT_TIMESTAMP;
 
-    RETURN QUERY SELECT TRUE, 'Elección reiniciada exitosamente', votos_eliminados;
+    RETURN QUERY SELECT TRUE, 'Elección reiniciada exitosamente'::VARCHAR(255), votos_eliminados;
 END;
 $$ LANGUAGE plpgsql;
 
@@ -360,7 +401,7 @@ BEGIN
     WHERE correo = p_correo;
 
     IF usuario_verificado IS NULL OR usuario_verificado = FALSE THEN
-        RETURN QUERY SELECT FALSE, 'Usuario no verificado';
+        RETURN QUERY SELECT FALSE, 'Usuario no verificado'::VARCHAR(255);
         RETURN;
     END IF;
 
@@ -368,7 +409,7 @@ BEGIN
     SELECT EXISTS(SELECT 1 FROM votos WHERE correo = p_correo) INTO ya_voto;
     
     IF ya_voto THEN
-        RETURN QUERY SELECT FALSE, 'Ya has votado';
+        RETURN QUERY SELECT FALSE, 'Ya has votado'::VARCHAR(255);
         RETURN;
     END IF;
 
@@ -387,11 +428,11 @@ BEGIN
     END IF;
 
     IF NOT dentro_campus THEN
-        RETURN QUERY SELECT FALSE, 'Debes estar dentro del campus universitario';
+        RETURN QUERY SELECT FALSE, 'Debes estar dentro del campus universitario'::VARCHAR(255);
         RETURN;
     END IF;
 
-    RETURN QUERY SELECT TRUE, 'Usuario puede votar';
+    RETURN QUERY SELECT TRUE, 'Usuario puede votar'::VARCHAR(255);
 END;
 $$ LANGUAGE plpgsql;
 
@@ -404,14 +445,16 @@ INSERT INTO candidatos (nombre, numero, foto_url, descripcion, votos) VALUES
 ('Juan Pérez', 1, 'https://example.com/juan.jpg', 'Estudiante de Ingeniería', 0),
 ('María García', 2, 'https://example.com/maria.jpg', 'Estudiante de Medicina', 0),
 ('Carlos López', 3, 'https://example.com/carlos.jpg', 'Estudiante de Derecho', 0),
-('Ana Martínez', 4, 'https://example.com/ana.jpg', 'Estudiante de Economía', 0);
+('Ana Martínez', 4, 'https://example.com/ana.jpg', 'Estudiante de Economía', 0)
+ON CONFLICT (numero) DO NOTHING;
 
 -- Insertar usuarios verificados de prueba
 INSERT INTO usuarios_verificados (correo, nombre, verificado) VALUES
 ('juan@uc.edu.pe', 'Juan Pérez', TRUE),
 ('maria@uc.edu.pe', 'María García', TRUE),
 ('carlos@uc.edu.pe', 'Carlos López', TRUE),
-('ana@uc.edu.pe', 'Ana Martínez', TRUE);
+('ana@uc.edu.pe', 'Ana Martínez', TRUE)
+ON CONFLICT (correo) DO NOTHING;
 
 -- =====================================================
 -- FIN DEL SCRIPT
@@ -0,0 +1,14 @@
+# Metricas package
+from .registro import Contador, Histograma, Medidor, Registro, registro
+from .instrumentacion import FirestoreInstrumentado, instrumentado, instrumentar_firestore
+
+__all__ = [
+    "Contador",
+    "Histograma",
+    "Medidor",
+    "Registro",
+    "registro",
+    "FirestoreInstrumentado",
+    "instrumentado",
+    "instrumentar_firestore",
+]
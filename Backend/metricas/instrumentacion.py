@@ -0,0 +1,189 @@
+import functools
+import inspect
+import time
+from metricas.registro import registro
+
+servicio_llamadas = registro.contador(
+    'contivotos_servicio_llamadas_total',
+    'Llamadas a métodos de servicio',
+    ('servicio', 'metodo', 'resultado')
+)
+servicio_duracion = registro.histograma(
+    'contivotos_servicio_duracion_segundos',
+    'Duración de los métodos de servicio',
+    ('servicio', 'metodo')
+)
+firestore_llamadas = registro.contador(
+    'contivotos_firestore_llamadas_total',
+    'Llamadas a Firestore (round trips)',
+    ('operacion', 'coleccion', 'resultado')
+)
+firestore_duracion = registro.histograma(
+    'contivotos_firestore_duracion_segundos',
+    'Duración de las llamadas a Firestore',
+    ('operacion', 'coleccion')
+)
+
+
+# =========================
+# Servicios
+# =========================
+
+
+def _medir(funcion, servicio: str, metodo: str):
+    if inspect.iscoroutinefunction(funcion):
+        @functools.wraps(funcion)
+        async def envoltura(*args, **kwargs):
+            inicio = time.perf_counter()
+            resultado = 'error'
+            try:
+                valor = await funcion(*args, **kwargs)
+                resultado = 'ok'
+                return valor
+            finally:
+                servicio_duracion.observar(time.perf_counter() - inicio, servicio, metodo)
+                servicio_llamadas.inc(servicio, metodo, resultado)
+    else:
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            inicio = time.perf_counter()
+            resultado = 'error'
+            try:
+                valor = funcion(*args, **kwargs)
+                resultado = 'ok'
+                return valor
+            finally:
+                servicio_duracion.observar(time.perf_counter() - inicio, servicio, metodo)
+                servicio_llamadas.inc(servicio, metodo, resultado)
+    return envoltura
+
+
+def instrumentado(cls):
+    """Decorador de clase: mide cada método estático público del servicio"""
+    for nombre, atributo in list(vars(cls).items()):
+        if isinstance(atributo, staticmethod) and not nombre.startswith('_'):
+            setattr(cls, nombre, staticmethod(_medir(atributo.__func__, cls.__name__, nombre)))
+    return cls
+
+
+# =========================
+# Firestore
+# =========================
+
+# Llamadas que son un round trip (en un batch solo lo es commit)
+_RPC_DOCUMENTO = {'get', 'set', 'update', 'create', 'delete'}
+_RPC_BATCH = {'commit'}
+# Llamadas que retornan otra referencia o consulta
+_DERIVADAS = {
+    'document', 'where', 'order_by', 'limit', 'limit_to_last', 'select',
+    'start_at', 'start_after', 'end_at', 'end_before', 'offset', 'count',
+}
+
+
+def _desenvolver(args):
+    return [a._objeto if isinstance(a, FirestoreInstrumentado) else a for a in args]
+
+
+class FirestoreInstrumentado:
+    """Envuelve un cliente, referencia o consulta de Firestore (sync o async)
+    registrando cada round trip por operación y colección.
+
+    Las referencias y consultas derivadas quedan envueltas también; el resto
+    de atributos se delega sin cambios.
+    """
+
+    def __init__(self, objeto, coleccion: str = '', batch: bool = False):
+        self._objeto = objeto
+        self._coleccion = coleccion
+        self._batch = batch
+
+    def __getattr__(self, nombre):
+        atributo = getattr(self._objeto, nombre)
+        rpc = _RPC_BATCH if self._batch else _RPC_DOCUMENTO
+        if nombre in rpc:
+            return self._rpc(atributo, nombre)
+        if nombre == 'stream':
+            return self._stream(atributo)
+        if nombre in ('collection', 'collection_group'):
+            return lambda coleccion, *args, **kwargs: FirestoreInstrumentado(
+                atributo(coleccion, *_desenvolver(args), **kwargs), coleccion
+            )
+        if nombre in ('batch', 'transaction'):
+            return lambda *args, **kwargs: FirestoreInstrumentado(
+                atributo(*args, **kwargs), nombre, batch=True
+            )
+        if nombre in _DERIVADAS and callable(atributo):
+            return lambda *args, **kwargs: FirestoreInstrumentado(
+                atributo(*_desenvolver(args), **kwargs), self._coleccion
+            )
+        if callable(atributo) and not self._batch:
+            return atributo
+        if callable(atributo):
+            # set/update/create/delete del batch: solo desenvolver la referencia
+            return lambda *args, **kwargs: atributo(*_desenvolver(args), **kwargs)
+        return atributo
+
+    def _registrar(self, operacion: str, inicio: float, resultado: str):
+        firestore_duracion.observar(time.perf_counter() - inicio, operacion, self._coleccion)
+        firestore_llamadas.inc(operacion, self._coleccion, resultado)
+
+    def _rpc(self, funcion, operacion: str):
+        if inspect.iscoroutinefunction(funcion):
+            async def llamada(*args, **kwargs):
+                inicio = time.perf_counter()
+                resultado = 'error'
+                try:
+                    valor = await funcion(*_desenvolver(args), **kwargs)
+                    resultado = 'ok'
+                    return valor
+                finally:
+                    self._registrar(operacion, inicio, resultado)
+            return llamada
+
+        def llamada(*args, **kwargs):
+            inicio = time.perf_counter()
+            resultado = 'error'
+            try:
+                valor = funcion(*_desenvolver(args), **kwargs)
+                resultado = 'ok'
+                return valor
+            finally:
+                self._registrar(operacion, inicio, resultado)
+        return llamada
+
+    def _stream(self, funcion):
+        """stream() es perezoso: se mide hasta agotar los resultados"""
+        def llamada(*args, **kwargs):
+            inicio = time.perf_counter()
+            resultados = funcion(*_desenvolver(args), **kwargs)
+            if hasattr(resultados, '__aiter__'):
+                return self._consumir_async(resultados, inicio)
+            return self._consumir(resultados, inicio)
+        return llamada
+
+    def _consumir(self, resultados, inicio: float):
+        # Cortar la iteración antes de tiempo (GeneratorExit) no es un error
+        resultado = 'ok'
+        try:
+            yield from resultados
+        except Exception:
+            resultado = 'error'
+            raise
+        finally:
+            self._registrar('stream', inicio, resultado)
+
+    async def _consumir_async(self, resultados, inicio: float):
+        resultado = 'ok'
+        try:
+            async for doc in resultados:
+                yield doc
+        except Exception:
+            resultado = 'error'
+            raise
+        finally:
+            self._registrar('stream', inicio, resultado)
+
+
+def instrumentar_firestore(cliente) -> FirestoreInstrumentado:
+    """Cliente de Firestore cuyas llamadas quedan medidas en /metrics"""
+    return FirestoreInstrumentado(cliente)
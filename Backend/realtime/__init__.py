@@ -0,0 +1,24 @@
+# Realtime package
+from .backplane import Backplane, BackplaneLocal, BackplaneUnixSocket, backplane
+from .connection_manager import ConnectionManager, manager
+from .flujo_resultados import FlujoResultados, flujo_resultados
+from .coalescer import ResultadosCoalescer, coalescer
+from .cache_respuestas import CacheRespuestas, cache_respuestas
+from .emisor_participacion import EmisorParticipacion, emisor_participacion
+
+__all__ = [
+    "Backplane",
+    "BackplaneLocal",
+    "BackplaneUnixSocket",
+    "backplane",
+    "ConnectionManager",
+    "manager",
+    "FlujoResultados",
+    "flujo_resultados",
+    "ResultadosCoalescer",
+    "coalescer",
+    "CacheRespuestas",
+    "cache_respuestas",
+    "EmisorParticipacion",
+    "emisor_participacion",
+]
@@ -0,0 +1,258 @@
+import asyncio
+import json
+import os
+import stat
+import tempfile
+import uuid
+from typing import Callable, List, Optional
+from config.settings import BACKPLANE, BACKPLANE_MAX_BUFFER, BACKPLANE_SOCKET
+
+# Reintento de conexión/elección del hub (segundos)
+REINTENTO_HUB = 0.2
+
+# Eventos que no cambian los datos de la elección: no invalidan caches ni
+# generan frames de resultados
+TIPOS_SIN_CAMBIOS = frozenset(('idempotencia',))
+
+
+class Backplane:
+    """Pub/sub de eventos entre los workers que sirven la API.
+
+    publicar() entrega el evento a los suscriptores de este proceso y de
+    todos los demás. Los suscriptores reciben (evento, local), donde `local`
+    indica si el evento se originó en este mismo proceso.
+    """
+
+    # Si los eventos llegan a otros procesos (workers)
+    entre_procesos = False
+
+    def __init__(self):
+        self.id = uuid.uuid4().hex
+        self._suscriptores: List[Callable[[dict, bool], None]] = []
+
+    def suscribir(self, callback: Callable[[dict, bool], None]):
+        if callback not in self._suscriptores:
+            self._suscriptores.append(callback)
+
+    async def iniciar(self):
+        pass
+
+    async def detener(self):
+        pass
+
+    def publicar(self, evento: dict):
+        evento = dict(evento, origen=self.id)
+        self._entregar(evento)
+        self._enviar_remoto(evento)
+
+    def _entregar(self, evento: dict):
+        local = evento.get('origen') == self.id
+        for callback in self._suscriptores:
+            callback(evento, local)
+
+    def _enviar_remoto(self, evento: dict):
+        pass
+
+
+def ruta_socket_por_defecto() -> str:
+    """Socket en $XDG_RUNTIME_DIR o en un directorio del usuario bajo el temporal del sistema"""
+    directorio = os.getenv('XDG_RUNTIME_DIR') or os.path.join(tempfile.gettempdir(), f'contivotos-{os.getuid()}')
+    return os.path.join(directorio, 'contivotos-backplane.sock')
+
+
+class BackplaneLocal(Backplane):
+    """Un solo proceso: los eventos solo llegan a los suscriptores locales"""
+
+
+class BackplaneUnixSocket(Backplane):
+    """Hub de pub/sub sobre un socket Unix, para uvicorn --workers N en una máquina.
+
+    El primer worker que toma el lock `<socket>.lock` hace de hub: escucha en
+    el socket y reenvía cada evento al resto. Los demás se conectan como
+    clientes. Si el hub muere, el sistema libera su lock, las conexiones se
+    cortan y otro worker toma su lugar. Los eventos son JSON, uno por línea.
+
+    publicar() no espera a que el socket drene: si una conexión acumula más
+    de `max_buffer` bytes sin enviar se corta, y el worker al reconectarse
+    entrega a sus suscriptores un evento `reconexion` (pudo perder eventos).
+    """
+
+    entre_procesos = True
+
+    def __init__(self, ruta: str = BACKPLANE_SOCKET, max_buffer: int = BACKPLANE_MAX_BUFFER):
+        super().__init__()
+        self.ruta = ruta or ruta_socket_por_defecto()
+        self.max_buffer = max_buffer
+        # Conexiones cortadas por no leer a tiempo
+        self.cortes = 0
+        self.es_hub = False
+        self._lock_fd: Optional[int] = None
+        self._servidor: Optional[asyncio.AbstractServer] = None
+        self._clientes: List[asyncio.StreamWriter] = []
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._tarea: Optional[asyncio.Task] = None
+        self._conectado = asyncio.Event()
+
+    async def iniciar(self):
+        if self._tarea is None:
+            self._preparar_directorio()
+            self._tarea = asyncio.create_task(self._mantener())
+
+    async def esperar_conexion(self, timeout: float = None):
+        """Esperar a ser hub o a estar conectado a uno"""
+        await asyncio.wait_for(self._conectado.wait(), timeout)
+
+    async def detener(self):
+        if self._tarea is not None:
+            self._tarea.cancel()
+            try:
+                await self._tarea
+            except asyncio.CancelledError:
+                pass
+            self._tarea = None
+        await self._cerrar()
+
+    # =========================
+    # Elección y conexión
+    # =========================
+
+    def _preparar_directorio(self):
+        """Crear el directorio del socket (0700) y rechazarlo si otro usuario puede escribir en él"""
+        directorio = os.path.dirname(os.path.abspath(self.ruta))
+        os.makedirs(directorio, mode=0o700, exist_ok=True)
+        info = os.stat(directorio)
+        if info.st_mode & stat.S_ISVTX:
+            # Directorio compartido con sticky bit (/tmp): nadie puede
+            # reemplazar el socket ajeno, y el socket mismo queda en 0600
+            return
+        if info.st_uid != os.getuid() or info.st_mode & 0o022:
+            raise PermissionError(
+                f"El directorio del backplane {directorio} no es privado del usuario; "
+                f"usar otro BACKPLANE_SOCKET"
+            )
+
+    def _tomar_lock(self) -> bool:
+        import fcntl
+
+        fd = os.open(self.ruta + '.lock', os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self._lock_fd = fd
+        return True
+
+    async def _mantener(self):
+        conectado_antes = False
+        while True:
+            if self._tomar_lock():
+                await self._servir_hub()
+                return
+            try:
+                reader, writer = await asyncio.open_unix_connection(self.ruta)
+            except OSError:
+                # El hub aún no escucha o acaba de morir
+                await asyncio.sleep(REINTENTO_HUB)
+                continue
+            self._writer = writer
+            self._conectado.set()
+            if conectado_antes:
+                # Los eventos de mientras no estuvo conectado no van a llegar
+                self._entregar({'tipo': 'reconexion', 'origen': self.id})
+            conectado_antes = True
+            await self._leer(reader, None)
+            self._conectado.clear()
+            self._writer = None
+            writer.close()
+
+    async def _servir_hub(self):
+        if os.path.exists(self.ruta):
+            os.unlink(self.ruta)
+        self._servidor = await asyncio.start_unix_server(self._atender, self.ruta)
+        os.chmod(self.ruta, 0o600)
+        self.es_hub = True
+        self._conectado.set()
+        await self._servidor.serve_forever()
+
+    async def _atender(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Conexión de un worker al hub"""
+        self._clientes.append(writer)
+        try:
+            await self._leer(reader, writer)
+        except (asyncio.CancelledError, ConnectionError):
+            # Hub deteniéndose o worker caído: solo limpiar la conexión
+            pass
+        finally:
+            if writer in self._clientes:
+                self._clientes.remove(writer)
+            writer.close()
+
+    async def _leer(self, reader: asyncio.StreamReader, emisor: Optional[asyncio.StreamWriter]):
+        while True:
+            linea = await reader.readline()
+            if not linea:
+                return
+            if self.es_hub:
+                # Reenviar a los demás workers (no al que lo envió)
+                self._difundir(linea, excepto=emisor)
+            try:
+                self._entregar(json.loads(linea))
+            except Exception:
+                pass
+
+    async def _cerrar(self):
+        if self._servidor is not None:
+            self._servidor.close()
+            self._servidor = None
+        for writer in self._clientes + ([self._writer] if self._writer else []):
+            writer.close()
+        self._clientes = []
+        self._writer = None
+        if self._lock_fd is not None:
+            if os.path.exists(self.ruta):
+                os.unlink(self.ruta)
+            os.close(self._lock_fd)
+            self._lock_fd = None
+        self.es_hub = False
+        self._conectado.clear()
+
+    # =========================
+    # Envío
+    # =========================
+
+    def _enviar_remoto(self, evento: dict):
+        linea = (json.dumps(evento, separators=(",", ":"), ensure_ascii=False) + "\n").encode('utf-8')
+        if self.es_hub:
+            self._difundir(linea)
+        elif self._writer is not None:
+            # Sin hub momentáneo el evento se pierde; el listener de Firestore
+            # de cada worker termina reflejando el cambio.
+            self._escribir(self._writer, linea)
+
+    def _difundir(self, linea: bytes, excepto: asyncio.StreamWriter = None):
+        for writer in list(self._clientes):
+            if writer is not excepto:
+                self._escribir(writer, linea)
+
+    def _escribir(self, writer: asyncio.StreamWriter, linea: bytes):
+        """write() sin esperar el drain; corta la conexión si el otro lado no lee"""
+        if writer.is_closing():
+            return
+        if writer.transport.get_write_buffer_size() + len(linea) > self.max_buffer:
+            self.cortes += 1
+            writer.transport.abort()
+            return
+        writer.write(linea)
+
+
+def crear_backplane(tipo: str = BACKPLANE) -> Backplane:
+    """Backplane según la configuración"""
+    if tipo == 'unix':
+        return BackplaneUnixSocket()
+    if tipo == 'local':
+        return BackplaneLocal()
+    raise ValueError(f'Backplane desconocido: {tipo}')
+
+
+backplane = crear_backplane()
@@ -0,0 +1,164 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from config.settings import RESPUESTAS_MAX_AGE, RESPUESTAS_MAX_ENTRADAS, RESPUESTAS_VIGENCIA_SIN_AVISOS_S
+from metricas import registro
+from realtime.backplane import TIPOS_SIN_CAMBIOS, backplane
+from services.almacenamiento import usa_firestore
+from services.conteo_cache import conteo_cache
+from services.lecturas_compartidas import lecturas_compartidas
+
+respuestas_cache_total = registro.contador(
+    'contivotos_cache_respuestas_total', 'Respuestas GET por ruta y resultado del cache (304, hit, miss)',
+    ('ruta', 'resultado')
+)
+
+
+class _Entrada:
+    __slots__ = ('version', 'cuerpo', 'etag', 'creada')
+
+    def __init__(self, version: int, cuerpo: bytes, etag: str):
+        self.version = version
+        self.cuerpo = cuerpo
+        self.etag = etag
+        self.creada = time.monotonic()
+
+    def vigente(self, version: int, vigencia_maxima: float = 0) -> bool:
+        if self.version != version:
+            return False
+        # Con LECTURAS_VIGENCIA_MS el cuerpo pudo armarse con datos de hasta
+        # esa antigüedad: pasado ese plazo se vuelve a armar
+        vigencia = lecturas_compartidas.vigencia
+        if vigencia_maxima > 0:
+            vigencia = min(vigencia, vigencia_maxima) if vigencia > 0 else vigencia_maxima
+        return vigencia <= 0 or time.monotonic() - self.creada <= vigencia
+
+
+class CacheRespuestas:
+    """Cuerpos JSON ya serializados de los GET que la app consulta en polling.
+
+    Cada entrada guarda la versión de los datos con que se armó; la versión
+    sube con cualquier evento del backplane (votos, cambios de candidatos,
+    reinicio; de este worker o de otros) y con cada cambio que ve el listener
+    del conteo. Mientras no suba, la respuesta sale del cache sin leer
+    Firestore ni serializar.
+
+    El ETag es un hash del cuerpo, así que es el mismo en todos los workers
+    para los mismos datos y un If-None-Match que coincide se responde 304.
+
+    Las claves incluyen parámetros de la consulta (cursor, filtros), así que
+    se guardan a lo sumo `max_entradas` con desalojo LRU.
+
+    Con PostgreSQL y el backplane `local` nada avisa de los votos de otros
+    workers (no hay listener): cada entrada vale a lo sumo
+    `vigencia_sin_avisos` segundos.
+    """
+
+    def __init__(
+        self, max_age: int = RESPUESTAS_MAX_AGE, max_entradas: int = RESPUESTAS_MAX_ENTRADAS,
+        vigencia_sin_avisos: float = RESPUESTAS_VIGENCIA_SIN_AVISOS_S
+    ):
+        self.max_age = max_age
+        self.max_entradas = max_entradas
+        self.vigencia_sin_avisos = vigencia_sin_avisos
+        # Segundos que vale una entrada (0 = hasta que suba la versión)
+        self.vigencia = 0.0
+        self._lock = threading.Lock()
+        self._version = 0
+        # clave -> entrada, de la menos a la más recientemente usada
+        self._entradas: 'OrderedDict[str, _Entrada]' = OrderedDict()
+        self._activo = False
+
+    def iniciar(self):
+        """Suscribirse a los eventos que invalidan (sin esto no se cachea)"""
+        if self._activo:
+            return
+        backplane.suscribir(self._on_evento)
+        conteo_cache.agregar_observador(self.invalidar)
+        if not usa_firestore() and not backplane.entre_procesos:
+            self.vigencia = self.vigencia_sin_avisos
+        self._activo = True
+
+    def invalidar(self):
+        """Los datos cambiaron (seguro desde cualquier hilo)"""
+        with self._lock:
+            self._version += 1
+
+    def _on_evento(self, evento: dict, local: bool):
+        if evento.get('tipo') not in TIPOS_SIN_CAMBIOS:
+            self.invalidar()
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    @property
+    def cache_control(self) -> str:
+        if self.max_age > 0:
+            return f'public, max-age={self.max_age}'
+        # Se puede guardar, pero hay que revalidar con If-None-Match
+        return 'no-cache'
+
+    async def responder(
+        self, request: Request, clave: str, producir: Callable[[], Awaitable], ruta: str = None
+    ) -> Response:
+        """Respuesta de `clave`, armada con `producir()` solo si los datos cambiaron.
+
+        `ruta` es la etiqueta de la métrica (por defecto `clave`); se indica
+        cuando la clave incluye parámetros de la consulta.
+        """
+        ruta = ruta or clave
+        entrada = self._entradas.get(clave)
+        version = self._version
+        if entrada is not None and entrada.vigente(version, self.vigencia) and self._activo:
+            self._entradas.move_to_end(clave)
+            resultado = 'hit'
+        else:
+            # Si la versión sube mientras se arma, la entrada queda vieja y
+            # la próxima petición la vuelve a armar
+            cuerpo = JSONResponse(jsonable_encoder(await producir())).body
+            etag = '"' + hashlib.blake2b(cuerpo, digest_size=12).hexdigest() + '"'
+            entrada = self._guardar(clave, _Entrada(version, cuerpo, etag))
+            resultado = 'miss'
+
+        headers = {'ETag': entrada.etag, 'Cache-Control': self.cache_control}
+        if _coincide(request.headers.get('if-none-match'), entrada.etag):
+            respuestas_cache_total.inc(ruta, '304')
+            return Response(status_code=304, headers=headers)
+        respuestas_cache_total.inc(ruta, resultado)
+        return Response(entrada.cuerpo, media_type='application/json', headers=headers)
+
+    def _guardar(self, clave: str, entrada: _Entrada) -> _Entrada:
+        self._entradas[clave] = entrada
+        self._entradas.move_to_end(clave)
+        while len(self._entradas) > self.max_entradas:
+            self._entradas.popitem(last=False)
+        return entrada
+
+    def __len__(self) -> int:
+        return len(self._entradas)
+
+
+def _coincide(if_none_match: str, etag: str) -> bool:
+    """Comparación débil de If-None-Match (RFC 9110): lista de ETags o *"""
+    if not if_none_match:
+        return False
+    for candidato in if_none_match.split(','):
+        candidato = candidato.strip()
+        if candidato == '*' or candidato.removeprefix('W/') == etag:
+            return True
+    return False
+
+
+# Instancia global del cache de respuestas
+cache_respuestas = CacheRespuestas()
+
+registro.medidor(
+    'contivotos_cache_respuestas_entradas', 'Respuestas serializadas en el cache de respuestas',
+    lambda: len(cache_respuestas)
+)
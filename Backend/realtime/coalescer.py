@@ -0,0 +1,222 @@
+import asyncio
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+from config.settings import WS_MAX_ACTUALIZACIONES_POR_SEGUNDO
+from realtime.backplane import TIPOS_SIN_CAMBIOS, backplane
+from realtime.connection_manager import ConnectionManager, manager
+from realtime.flujo_resultados import FlujoResultados, flujo_resultados
+from services.almacenamiento import ServicioCandidatos
+from services.conteo_cache import conteo_cache
+from services.ranking import clave_segmento, segmento_con_porcentajes, segmento_desde_filas
+
+# Campos del conteo que cambian con cada voto
+CAMPOS_DINAMICOS = ('votos', 'porcentaje')
+
+
+def tema_segmento(clave: Tuple[str, str]) -> str:
+    """Tema de /api/votos/ws con los frames de un segmento (cargo, semestre)"""
+    return f'segmento:{clave[0]}|{clave[1]}'
+
+
+class ResultadosCoalescer:
+    """Agrupa los cambios de resultados en frames delta con número de secuencia.
+
+    notificar() solo marca que hay cambios; una tarea emite como máximo
+    `max_por_segundo` frames, cada uno con los candidatos cuyo conteo o
+    porcentaje cambió desde el frame anterior (un voto mueve el porcentaje de
+    todos: los demás van solo con `porcentaje`). Los clientes reciben un
+    snapshot completo al conectarse o al pedir "resync", con el `seq` desde
+    el que aplicar deltas.
+    Los mismos frames alimentan el buffer de reanudación de GET /api/votos/stream.
+
+    Los clientes suscritos a un segmento (cargo, semestre) reciben en cada
+    frame en que cambió algún candidato del segmento un frame `segmento` con
+    sus resultados completos (porcentajes dentro del segmento y líder), que
+    sale del mismo conteo que el delta.
+    """
+
+    def __init__(
+        self, manager: ConnectionManager, flujo: FlujoResultados,
+        max_por_segundo: float = WS_MAX_ACTUALIZACIONES_POR_SEGUNDO
+    ):
+        self.manager = manager
+        self.flujo = flujo
+        self.intervalo = 1 / max_por_segundo if max_por_segundo > 0 else 0
+        self.seq = 0
+        self._ultimo: Dict[str, dict] = {}
+        self._pendiente: Optional[asyncio.Event] = None
+        self._tarea: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def iniciar(self):
+        """Arrancar la tarea de emisión (dentro del event loop)"""
+        if self._tarea is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._pendiente = asyncio.Event()
+        self._tarea = asyncio.create_task(self._bucle())
+        # Eventos de este y de los demás workers
+        backplane.suscribir(self.on_evento)
+        # Cambios vistos por el listener (ediciones fuera de la API)
+        conteo_cache.agregar_observador(self.notificar_desde_hilo)
+        # Un cliente SSE que se reanuda recibe también lo que cambió sin clientes
+        self.flujo.al_conectar = self.notificar
+
+    async def detener(self):
+        if self._tarea is not None:
+            self._tarea.cancel()
+            try:
+                await self._tarea
+            except asyncio.CancelledError:
+                pass
+            self._tarea = None
+
+    def notificar(self):
+        """Marcar que los resultados cambiaron"""
+        if self._pendiente is not None:
+            self._pendiente.set()
+
+    def on_evento(self, evento: dict, local: bool):
+        """Evento del backplane: los votos de otros workers se reflejan en el cache local"""
+        if evento.get('tipo') in TIPOS_SIN_CAMBIOS:
+            return
+        if evento.get('tipo') == 'voto' and not local and evento.get('update_time'):
+            conteo_cache.registrar_incremento(
+                evento['candidato_id'],
+                evento['ruta'],
+                datetime.fromisoformat(evento['update_time']),
+                evento.get('cantidad', 1)
+            )
+        self.notificar()
+
+    def notificar_desde_hilo(self):
+        """notificar() seguro desde hilos ajenos al event loop"""
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self.notificar)
+
+    async def _bucle(self):
+        while True:
+            await self._pendiente.wait()
+            self._pendiente.clear()
+            try:
+                await self._emitir()
+            except Exception:
+                # Un fallo de lectura no debe detener las actualizaciones
+                self._pendiente.set()
+            await asyncio.sleep(self.intervalo)
+
+    async def _leer(self) -> tuple:
+        return await asyncio.gather(
+            ServicioCandidatos.get_estadisticas(),
+            ServicioCandidatos.get_conteo_votos()
+        )
+
+    async def _emitir(self):
+        if not self.manager.active_connections and not self.flujo.clientes:
+            # Sin clientes no hay a quién enviar; el próximo snapshot estará al día.
+            # Si hay eventos SSE guardados, el próximo delta parte del último
+            # emitido para que la reanudación con Last-Event-ID no tenga huecos.
+            if not self.flujo.ultimo_seq:
+                self._ultimo = {}
+            return
+        estadisticas, conteo = await self._leer()
+        actuales = {c['candidato_id']: c for c in conteo}
+
+        cambios, porcentajes = [], []
+        for candidato_id, candidato in actuales.items():
+            anterior = self._ultimo.get(candidato_id)
+            if anterior is None or self._estaticos(anterior) != self._estaticos(candidato):
+                cambios.append(candidato)
+            elif anterior['votos'] != candidato['votos']:
+                # Solo cambió el conteo: no se reenvían nombre, imagen, etc.
+                cambios.append({
+                    'candidato_id': candidato_id,
+                    'votos': candidato['votos'],
+                    'porcentaje': candidato['porcentaje'],
+                })
+            elif anterior['porcentaje'] != candidato['porcentaje']:
+                # Cambió el total: el porcentaje de los demás también se mueve
+                porcentajes.append({'candidato_id': candidato_id, 'porcentaje': candidato['porcentaje']})
+        eliminados = [candidato_id for candidato_id in self._ultimo if candidato_id not in actuales]
+        # Los porcentajes dentro de un segmento no dependen del total general
+        segmentos = self._segmentos_cambiados(cambios, eliminados)
+        cambios += porcentajes
+
+        self._ultimo = actuales
+        if not cambios and not eliminados:
+            return
+
+        self.seq += 1
+        frame = {
+            "tipo": "delta",
+            "seq": self.seq,
+            "total_votos": estadisticas.get("total_votos", 0),
+            "candidatos": cambios,
+            "eliminados": eliminados,
+        }
+        self.manager.broadcast(frame)
+        self.flujo.publicar(frame)
+        if segmentos:
+            self._emitir_segmentos(segmentos, conteo)
+
+    def _segmentos_cambiados(self, cambios: List[dict], eliminados: List[str]) -> Set[Tuple[str, str]]:
+        """Segmentos con suscriptores donde entró, salió o cambió algún candidato
+        (se llama antes de reemplazar `_ultimo`)"""
+        segmentos = set()
+        for candidato in cambios:
+            anterior = self._ultimo.get(candidato['candidato_id'])
+            for fila in (anterior, candidato):
+                # Los cambios solo de conteo no traen cargo: el segmento es el del anterior
+                if fila is not None and 'cargo' in fila:
+                    segmentos.add(clave_segmento(fila['cargo'], fila.get('semestre')))
+        for candidato_id in eliminados:
+            anterior = self._ultimo[candidato_id]
+            segmentos.add(clave_segmento(anterior['cargo'], anterior.get('semestre')))
+        return {clave for clave in segmentos if self.manager.suscritos(tema_segmento(clave))}
+
+    def _emitir_segmentos(self, segmentos: Set[Tuple[str, str]], conteo: List[dict]):
+        """Un frame `segmento` por segmento cambiado, con las filas de este conteo"""
+        filas: Dict[Tuple[str, str], List[dict]] = {clave: [] for clave in segmentos}
+        for candidato in conteo:
+            del_segmento = filas.get(clave_segmento(candidato['cargo'], candidato.get('semestre')))
+            if del_segmento is not None:
+                del_segmento.append(candidato)
+        for clave, del_segmento in filas.items():
+            frame = {"tipo": "segmento", "seq": self.seq, **segmento_desde_filas(clave, del_segmento)}
+            self.manager.broadcast(frame, tema=tema_segmento(clave))
+
+    @staticmethod
+    def _estaticos(candidato: dict) -> tuple:
+        return tuple(v for k, v in candidato.items() if k not in CAMPOS_DINAMICOS)
+
+    async def snapshot(self) -> dict:
+        """Estado completo para un cliente nuevo o que pide resync"""
+        # El seq de antes de leer: un delta emitido durante la lectura se aplica encima
+        seq = self.seq
+        estadisticas, conteo = await self._leer()
+        if not self._ultimo:
+            # Primer cliente: los deltas siguientes parten de este estado
+            self._ultimo = {c['candidato_id']: c for c in conteo}
+        return {
+            "tipo": "inicial",
+            "seq": seq,
+            "total_votos": estadisticas.get("total_votos", 0),
+            "candidatos": conteo,
+        }
+
+    async def snapshot_segmento(self, clave: Tuple[str, str]) -> dict:
+        """Resultados de un segmento para un cliente que se suscribe a él"""
+        seq = self.seq
+        if not self._ultimo:
+            # Primer cliente: los frames siguientes parten de este estado
+            conteo = await ServicioCandidatos.get_conteo_votos()
+            self._ultimo = {c['candidato_id']: c for c in conteo}
+        segmentos = await ServicioCandidatos.get_segmentos(*clave)
+        return {
+            "tipo": "segmento",
+            "seq": seq,
+            **(segmentos[0] if segmentos else segmento_con_porcentajes(clave, [], 0)),
+        }
+
+
+coalescer = ResultadosCoalescer(manager, flujo_resultados)
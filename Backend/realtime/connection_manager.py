@@ -0,0 +1,254 @@
+import asyncio
+import json
+import time
+from typing import Dict, Optional, Set
+from fastapi import WebSocket
+from config.settings import WS_MAX_COLA, WS_TIMEOUT_ENVIO
+from metricas import registro
+
+# Código de cierre para clientes expulsados por lentos (1013 = Try Again Later)
+CODIGO_CLIENTE_LENTO = 1013
+
+
+ws_difusion = registro.histograma(
+    'contivotos_ws_difusion_segundos',
+    'Desde broadcast() hasta que el último cliente recibió (o descartó) el mensaje'
+)
+ws_encolado = registro.histograma(
+    'contivotos_ws_broadcast_encolado_segundos',
+    'Duración de broadcast() (serializar y encolar en todas las conexiones)'
+)
+ws_envio = registro.histograma(
+    'contivotos_ws_envio_segundos',
+    'Duración de cada envío a un cliente'
+)
+ws_mensajes = registro.contador(
+    'contivotos_ws_mensajes_enviados_total',
+    'Mensajes enviados a clientes WebSocket'
+)
+
+
+def serializar(message: dict) -> str:
+    """Serializar un mensaje igual que WebSocket.send_json"""
+    return json.dumps(message, separators=(",", ":"), ensure_ascii=False)
+
+
+class _Difusion:
+    """Un broadcast en curso: mide el fan-out completo al entregarse a todos"""
+
+    __slots__ = ('inicio', 'pendientes')
+
+    def __init__(self, inicio: float):
+        self.inicio = inicio
+        self.pendientes = 0
+
+    def completar(self):
+        self.pendientes -= 1
+        if self.pendientes == 0:
+            ws_difusion.observar(time.perf_counter() - self.inicio)
+
+
+class _Conexion:
+    """Un cliente con su cola de envío acotada y la tarea que la vacía"""
+
+    def __init__(self, websocket: WebSocket, max_cola: int, resultados: bool = True):
+        self.websocket = websocket
+        self.cola: asyncio.Queue = asyncio.Queue(maxsize=max_cola)
+        self.tarea: asyncio.Task = None
+        # Frames opcionales que pidió el cliente (p. ej. "participacion")
+        self.temas: Set[str] = set()
+        # Si recibe los broadcast sin tema (los deltas de todos los resultados)
+        self.resultados = resultados
+
+
+class ConnectionManager:
+    """Conexiones WebSocket con envío concurrente.
+
+    Cada mensaje se serializa una sola vez y se encola en cada conexión; una
+    tarea por conexión lo envía. broadcast() no espera a ningún cliente, y los
+    clientes cuya cola se llena o cuyo envío falla o excede el timeout se
+    expulsan.
+    """
+
+    def __init__(self, max_cola: int = WS_MAX_COLA, timeout_envio: float = WS_TIMEOUT_ENVIO):
+        self.max_cola = max_cola
+        self.timeout_envio = timeout_envio
+        self.active_connections: Dict[WebSocket, _Conexion] = {}
+        self.expulsados = 0
+        # Conexiones suscritas a cada tema (un broadcast de tema solo recorre las suyas)
+        self._por_tema: Dict[str, Set[_Conexion]] = {}
+        # Tareas de envío canceladas y cierres de expulsados que aún no
+        # terminan (referencia fuerte hasta que lo hagan)
+        self._terminando: Set[asyncio.Task] = set()
+
+    async def connect(self, websocket: WebSocket, resultados: bool = True):
+        await websocket.accept()
+        conexion = _Conexion(websocket, self.max_cola, resultados)
+        conexion.tarea = asyncio.create_task(self._enviar(conexion))
+        self.active_connections[websocket] = conexion
+
+    def disconnect(self, websocket: WebSocket) -> Optional[asyncio.Task]:
+        """Sacar la conexión y cancelar su tarea de envío; retorna esa tarea
+        si todavía hay que esperarla"""
+        conexion = self.active_connections.pop(websocket, None)
+        if conexion is None:
+            return None
+        for tema in conexion.temas:
+            self._quitar_de_tema(conexion, tema)
+        tarea = None
+        if conexion.tarea is not asyncio.current_task() and not conexion.tarea.done():
+            tarea = conexion.tarea
+            tarea.cancel()
+            self._seguir(tarea)
+        # Lo que quedó en cola ya no se enviará
+        while not conexion.cola.empty():
+            _, difusion = conexion.cola.get_nowait()
+            if difusion is not None:
+                difusion.completar()
+        if tarea is not None:
+            # wait_for() se traga la cancelación si el envío termina en ese
+            # mismo instante; la marca de fin corta el bucle igual
+            conexion.cola.put_nowait((None, None))
+        return tarea
+
+    async def desconectar(self, websocket: WebSocket):
+        """disconnect() esperando a que la tarea de envío termine"""
+        tarea = self.disconnect(websocket)
+        if tarea is not None:
+            await asyncio.gather(tarea, return_exceptions=True)
+
+    async def detener(self):
+        """Cancelar las tareas de envío de todas las conexiones y esperarlas
+        (junto con los cierres de expulsados pendientes)"""
+        for websocket in list(self.active_connections):
+            self.disconnect(websocket)
+        if self._terminando:
+            await asyncio.gather(*self._terminando, return_exceptions=True)
+
+    def enviar(self, websocket: WebSocket, message: dict) -> bool:
+        """Encolar un mensaje para un solo cliente"""
+        conexion = self.active_connections.get(websocket)
+        if conexion is None:
+            return False
+        return self._encolar(conexion, serializar(message))
+
+    def suscribir(self, websocket: WebSocket, tema: str) -> bool:
+        """Recibir también los broadcast de `tema`"""
+        conexion = self.active_connections.get(websocket)
+        if conexion is None:
+            return False
+        conexion.temas.add(tema)
+        self._por_tema.setdefault(tema, set()).add(conexion)
+        return True
+
+    def desuscribir(self, websocket: WebSocket, tema: str):
+        conexion = self.active_connections.get(websocket)
+        if conexion is not None and tema in conexion.temas:
+            conexion.temas.discard(tema)
+            self._quitar_de_tema(conexion, tema)
+
+    def _quitar_de_tema(self, conexion: _Conexion, tema: str):
+        conexiones = self._por_tema.get(tema)
+        if conexiones is not None:
+            conexiones.discard(conexion)
+            if not conexiones:
+                del self._por_tema[tema]
+
+    def suscritos(self, tema: str) -> int:
+        return len(self._por_tema.get(tema, ()))
+
+    def recibir_resultados(self, websocket: WebSocket, activo: bool):
+        """Si la conexión recibe los broadcast sin tema (los deltas de resultados)"""
+        conexion = self.active_connections.get(websocket)
+        if conexion is not None:
+            conexion.resultados = activo
+
+    def broadcast(self, message: dict, tema: str = None) -> int:
+        """Encolar un mensaje para todos los clientes que reciben resultados (o
+        solo los suscritos a `tema`); retorna a cuántos se encoló"""
+        inicio = time.perf_counter()
+        texto = serializar(message)
+        difusion = _Difusion(inicio)
+        encolados = 0
+        if tema is None:
+            conexiones = [conexion for conexion in self.active_connections.values() if conexion.resultados]
+        else:
+            conexiones = list(self._por_tema.get(tema, ()))
+        for conexion in conexiones:
+            if self._encolar(conexion, texto, difusion):
+                encolados += 1
+        ws_encolado.observar(time.perf_counter() - inicio)
+        return encolados
+
+    def mensajes_en_cola(self) -> list:
+        """Mensajes pendientes de cada conexión"""
+        return [conexion.cola.qsize() for conexion in self.active_connections.values()]
+
+    def _encolar(self, conexion: _Conexion, texto: str, difusion: Optional[_Difusion] = None) -> bool:
+        try:
+            conexion.cola.put_nowait((texto, difusion))
+        except asyncio.QueueFull:
+            self._expulsar(conexion)
+            return False
+        if difusion is not None:
+            difusion.pendientes += 1
+        return True
+
+    async def _enviar(self, conexion: _Conexion):
+        """Vaciar la cola de una conexión"""
+        try:
+            while True:
+                texto, difusion = await conexion.cola.get()
+                if texto is None:
+                    return
+                inicio = time.perf_counter()
+                try:
+                    await asyncio.wait_for(conexion.websocket.send_text(texto), self.timeout_envio)
+                finally:
+                    if difusion is not None:
+                        difusion.completar()
+                ws_envio.observar(time.perf_counter() - inicio)
+                ws_mensajes.inc()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self._expulsar(conexion)
+
+    def _expulsar(self, conexion: _Conexion):
+        """Sacar a un cliente lento o muerto y cerrar su socket"""
+        if self.active_connections.get(conexion.websocket) is not conexion:
+            return
+        self.disconnect(conexion.websocket)
+        self.expulsados += 1
+        self._seguir(asyncio.get_running_loop().create_task(self._cerrar(conexion.websocket)))
+
+    def _seguir(self, tarea: asyncio.Task):
+        self._terminando.add(tarea)
+        tarea.add_done_callback(self._terminando.discard)
+
+    @staticmethod
+    async def _cerrar(websocket: WebSocket):
+        try:
+            await websocket.close(code=CODIGO_CLIENTE_LENTO)
+        except Exception:
+            pass
+
+
+manager = ConnectionManager()
+
+registro.medidor(
+    'contivotos_ws_conexiones', 'Conexiones WebSocket activas',
+    lambda: len(manager.active_connections)
+)
+registro.medidor(
+    'contivotos_ws_cola_mensajes', 'Mensajes en cola sumando todas las conexiones',
+    lambda: sum(manager.mensajes_en_cola())
+)
+registro.medidor(
+    'contivotos_ws_cola_mensajes_max', 'Mensajes en cola de la conexión más atrasada',
+    lambda: max(manager.mensajes_en_cola(), default=0)
+)
+registro.medidor(
+    'contivotos_ws_expulsados_total', 'Clientes expulsados por lentos o caídos',
+    lambda: manager.expulsados, tipo='counter'
+)
@@ -0,0 +1,102 @@
+import asyncio
+from typing import Optional
+from realtime.backplane import backplane
+from realtime.connection_manager import ConnectionManager, manager
+from services.participacion import participacion
+
+# Frames de participación: tema al que se suscriben los clientes de /api/votos/ws
+TEMA = 'participacion'
+
+# Segundos mínimos entre frames (la serie es por minuto)
+INTERVALO_FRAMES = 1.0
+
+
+class EmisorParticipacion:
+    """Frames de la curva de participación para los clientes WebSocket que la piden.
+
+    Un cliente envía el texto "participacion" y recibe la serie completa
+    (`completo: true`); desde ahí, a lo sumo cada `intervalo` segundos, un
+    frame con la serie desde el primer minuto que cambió (`desde`): el
+    cliente reemplaza sus arrays a partir de ese índice. Si la ventana se
+    movió (otro `inicio`) el frame vuelve a ser completo.
+    """
+
+    def __init__(self, manager: ConnectionManager, intervalo: float = INTERVALO_FRAMES):
+        self.manager = manager
+        self.intervalo = intervalo
+        self._ultimo: Optional[dict] = None
+        self._pendiente: Optional[asyncio.Event] = None
+        self._tarea: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def iniciar(self):
+        """Arrancar la tarea de emisión (dentro del event loop)"""
+        if self._tarea is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._pendiente = asyncio.Event()
+        self._tarea = asyncio.create_task(self._bucle())
+        # Votos de este y de los demás workers
+        backplane.suscribir(participacion.on_evento)
+        participacion.agregar_observador(self.notificar_desde_hilo)
+
+    async def detener(self):
+        if self._tarea is not None:
+            self._tarea.cancel()
+            try:
+                await self._tarea
+            except asyncio.CancelledError:
+                pass
+            self._tarea = None
+
+    def notificar(self):
+        if self._pendiente is not None:
+            self._pendiente.set()
+
+    def notificar_desde_hilo(self):
+        """notificar() seguro desde hilos ajenos al event loop (el listener)"""
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self.notificar)
+
+    async def _bucle(self):
+        while True:
+            await self._pendiente.wait()
+            self._pendiente.clear()
+            self._emitir()
+            await asyncio.sleep(self.intervalo)
+
+    def _emitir(self):
+        if not self.manager.suscritos(TEMA):
+            self._ultimo = None
+            return
+        actual = participacion.serie()
+        desde = self._primer_cambio(actual)
+        self._ultimo = actual
+        if desde is None:
+            return
+        frame = participacion.serie(desde) if desde else actual
+        self.manager.broadcast({"tipo": "participacion", "completo": desde == 0, **frame}, tema=TEMA)
+
+    def _primer_cambio(self, actual: dict) -> Optional[int]:
+        """Primer índice distinto del último frame (0 = completo, None = sin cambios)"""
+        anterior = self._ultimo
+        if anterior is None or anterior['inicio'] != actual['inicio'] or anterior['anteriores'] != actual['anteriores']:
+            return 0
+        viejo, nuevo = anterior['por_minuto'], actual['por_minuto']
+        for indice in range(min(len(viejo), len(nuevo))):
+            if viejo[indice] != nuevo[indice]:
+                return indice
+        if len(viejo) != len(nuevo):
+            return min(len(viejo), len(nuevo))
+        return None
+
+    def snapshot(self) -> dict:
+        """Serie completa para un cliente que se suscribe"""
+        actual = participacion.serie()
+        if self._ultimo is None:
+            # Primer suscriptor: los frames siguientes parten de este estado
+            self._ultimo = actual
+        return {"tipo": "participacion", "completo": True, **actual}
+
+
+emisor_participacion = EmisorParticipacion(manager)
@@ -0,0 +1,208 @@
+import asyncio
+import uuid
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+from config.settings import SSE_BUFFER_EVENTOS, SSE_KEEPALIVE_S
+from metricas import registro
+from realtime.connection_manager import serializar
+
+# Milisegundos que EventSource espera antes de reconectarse
+RETRY_MS = 3000
+
+sse_inicios = registro.contador(
+    'contivotos_sse_inicios_total',
+    'Conexiones a /api/votos/stream por modo de inicio (reanudada desde el buffer o snapshot)',
+    ('modo',)
+)
+sse_eventos = registro.contador(
+    'contivotos_sse_eventos_enviados_total',
+    'Eventos de resultados enviados a clientes SSE'
+)
+
+
+class FlujoResultados:
+    """Frames de resultados para GET /api/votos/stream (Server-Sent Events).
+
+    Los frames `delta` del coalescer se guardan ya serializados en un buffer
+    circular de `capacidad` eventos indexado por `seq` (posición `seq %
+    capacidad`). Cada conexión es solo un cursor sobre ese buffer: no tiene
+    cola ni temporizador propios, se despierta cuando llega un evento y envía
+    lo que le falta; si le faltan varios, un solo `delta` que los fusiona.
+    Un cliente que se reconecta con `Last-Event-ID` recibe así solo lo que
+    cambió mientras no estuvo, sin releer el conteo; si el id ya no está en
+    el buffer (otro worker, un reinicio del proceso o demasiado viejo),
+    recibe un snapshot `inicial`. Los ids son `{epoca}-{seq}`, con una época
+    distinta por proceso. Una sola tarea despierta a todas las conexiones
+    para el keepalive cuando no hubo eventos.
+    """
+
+    def __init__(self, capacidad: int = SSE_BUFFER_EVENTOS, keepalive: float = SSE_KEEPALIVE_S):
+        self.capacidad = max(1, capacidad)
+        self.keepalive = keepalive
+        self.epoca = uuid.uuid4().hex[:8]
+        self._eventos: List[Optional[Tuple[int, dict, bytes]]] = [None] * self.capacidad
+        self.ultimo_seq = 0
+        self.primero_seq = 1
+        self.clientes = 0
+        self._nuevo = asyncio.Event()
+        self._publicado = 0.0
+        self._latido: Optional[asyncio.Task] = None
+        # Se llama al conectarse un cliente (el coalescer emite lo pendiente)
+        self.al_conectar: Optional[Callable[[], None]] = None
+
+    def iniciar(self):
+        """Arrancar el keepalive (dentro del event loop)"""
+        if self._latido is None and self.keepalive > 0:
+            self._latido = asyncio.create_task(self._bucle_latido())
+
+    async def detener(self):
+        if self._latido is not None:
+            self._latido.cancel()
+            try:
+                await self._latido
+            except asyncio.CancelledError:
+                pass
+            self._latido = None
+
+    async def _bucle_latido(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.keepalive)
+            if self.clientes and loop.time() - self._publicado >= self.keepalive:
+                # Las conexiones que despiertan sin eventos nuevos envían un comentario
+                self._despertar()
+
+    def _despertar(self):
+        nuevo, self._nuevo = self._nuevo, asyncio.Event()
+        nuevo.set()
+
+    # =========================
+    # Buffer
+    # =========================
+
+    def publicar(self, frame: dict):
+        """Guardar un frame con `seq` (consecutivo) y despertar a las conexiones"""
+        seq = frame['seq']
+        if seq != self.ultimo_seq + 1:
+            # Secuencia nueva: lo guardado ya no sirve para reanudar
+            self.vaciar()
+            self.primero_seq = seq
+        self._eventos[seq % self.capacidad] = (seq, frame, self._bloque(frame, 'delta'))
+        self.ultimo_seq = seq
+        self.primero_seq = max(self.primero_seq, seq - self.capacidad + 1)
+        self._publicado = asyncio.get_running_loop().time()
+        self._despertar()
+
+    def vaciar(self):
+        self._eventos = [None] * self.capacidad
+        self.ultimo_seq = 0
+        self.primero_seq = 1
+
+    def desde(self, seq: int) -> Optional[bytes]:
+        """Lo que cambió después de `seq`: el evento guardado si es uno solo, o
+        un delta que fusiona todos (None si ya no están en el buffer)"""
+        if seq < self.primero_seq - 1 or seq > self.ultimo_seq:
+            return None
+        if seq == self.ultimo_seq:
+            return b''
+        if seq == self.ultimo_seq - 1:
+            return self._eventos[self.ultimo_seq % self.capacidad][2]
+        frames = [self._eventos[s % self.capacidad][1] for s in range(seq + 1, self.ultimo_seq + 1)]
+        return self._bloque(fusionar(frames), 'delta')
+
+    def id_evento(self, seq: int) -> str:
+        return f'{self.epoca}-{seq}'
+
+    def leer_id(self, ultimo_id: Optional[str]) -> Optional[int]:
+        """`seq` de un Last-Event-ID de este proceso (None si no se puede reanudar)"""
+        if not ultimo_id:
+            return None
+        epoca, _, seq = ultimo_id.strip().partition('-')
+        if epoca != self.epoca or not seq.isdigit():
+            return None
+        return int(seq)
+
+    def _bloque(self, frame: dict, evento: str) -> bytes:
+        return (
+            f"id: {self.id_evento(frame['seq'])}\nevent: {evento}\ndata: {serializar(frame)}\n\n"
+        ).encode('utf-8')
+
+    # =========================
+    # Conexiones
+    # =========================
+
+    async def eventos(
+        self, ultimo_id: Optional[str], snapshot: Callable[[], Awaitable[dict]]
+    ) -> AsyncIterator[bytes]:
+        """Cuerpo de la respuesta SSE de una conexión"""
+        self.clientes += 1
+        try:
+            if self.al_conectar is not None:
+                self.al_conectar()
+            seq = self.leer_id(ultimo_id)
+            perdidos = self.desde(seq) if seq is not None else None
+            if perdidos is None:
+                sse_inicios.inc('snapshot')
+                seq, bloque = await self._snapshot(snapshot)
+                yield f'retry: {RETRY_MS}\n'.encode('ascii') + bloque
+            else:
+                sse_inicios.inc('reanudada')
+                yield f'retry: {RETRY_MS}\n\n'.encode('ascii') + perdidos
+                if perdidos:
+                    sse_eventos.inc()
+                seq = self.ultimo_seq
+
+            while True:
+                nuevo = self._nuevo
+                if seq < self.ultimo_seq:
+                    pendientes = self.desde(seq)
+                    if pendientes is None:
+                        # Quedó atrás del buffer (o cambió la secuencia): estado completo
+                        seq, pendientes = await self._snapshot(snapshot)
+                    else:
+                        seq = self.ultimo_seq
+                        sse_eventos.inc()
+                    yield pendientes
+                    continue
+                await nuevo.wait()
+                if seq == self.ultimo_seq:
+                    # Despertada por el keepalive: un comentario SSE mantiene viva
+                    # la conexión a través de proxies
+                    yield b': ping\n\n'
+        finally:
+            self.clientes -= 1
+
+    async def _snapshot(self, snapshot: Callable[[], Awaitable[dict]]) -> Tuple[int, bytes]:
+        frame = await snapshot()
+        sse_eventos.inc()
+        return frame['seq'], self._bloque(frame, frame.get('tipo', 'inicial'))
+
+
+def fusionar(frames: List[dict]) -> dict:
+    """Un delta equivalente a aplicar `frames` en orden (con el seq del último)"""
+    candidatos: Dict[str, dict] = {}
+    eliminados: Dict[str, None] = {}
+    for frame in frames:
+        for candidato in frame['candidatos']:
+            candidato_id = candidato['candidato_id']
+            candidatos[candidato_id] = {**candidatos.get(candidato_id, {}), **candidato}
+            eliminados.pop(candidato_id, None)
+        for candidato_id in frame['eliminados']:
+            candidatos.pop(candidato_id, None)
+            eliminados[candidato_id] = None
+    return {
+        **frames[-1],
+        "candidatos": list(candidatos.values()),
+        "eliminados": list(eliminados),
+    }
+
+
+flujo_resultados = FlujoResultados()
+
+registro.medidor(
+    'contivotos_sse_conexiones', 'Conexiones abiertas a /api/votos/stream',
+    lambda: flujo_resultados.clientes
+)
+registro.medidor(
+    'contivotos_sse_buffer_eventos', 'Eventos de resultados en el buffer de reanudación SSE',
+    lambda: flujo_resultados.ultimo_seq - flujo_resultados.primero_seq + 1 if flujo_resultados.ultimo_seq else 0
+)
@@ -1,7 +1,9 @@
-from fastapi import APIRouter, HTTPException
-from typing import List
-from services.candidato_service import CandidatoService
+from fastapi import APIRouter, HTTPException, Path, Query, Request
+from typing import List, Optional
+from services.almacenamiento import ServicioCandidatos
+from services.proyeccion import leer_campos, leer_cursor
 from schemas.candidato import CandidatoCreate, CandidatoUpdate
+from realtime import backplane, cache_respuestas
 
 router = APIRouter(prefix="/candidatos", tags=["candidatos"])
 
@@ -12,11 +14,41 @@ router = APIRouter(prefix="/candidatos", tags=["candidatos"])
 
 
 @router.get("/")
-async def obtener_candidatos():
-    """Obtener todos los candidatos desde Firestore"""
+async def obtener_candidatos(
+    request: Request,
+    fields: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=100),
+    cursor: Optional[str] = None,
+):
+    """Obtener todos los candidatos (cacheado; admite If-None-Match).
+
+    Con `fields` (p. ej. `id,nombre,numero,cargo,imagen`) solo se leen y
+    devuelven esos campos; con `limit` se pagina y `siguiente` es el
+    `cursor` de la próxima página.
+    """
+    if fields is None and limit is None and cursor is None:
+        try:
+            return await cache_respuestas.responder(request, 'candidatos', ServicioCandidatos.get_all)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
     try:
-        candidatos = CandidatoService.get_all()
-        return candidatos
+        campos = leer_campos(fields)
+        despues = leer_cursor(cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def pagina():
+        return {
+            "success": True,
+            "data": await ServicioCandidatos.get_pagina(campos, limit, despues)
+        }
+
+    clave = f"candidatos?fields={','.join(campos)}&limit={limit}&cursor={cursor}"
+    try:
+        return await cache_respuestas.responder(request, clave, pagina, ruta='candidatos_pagina')
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -25,7 +57,7 @@ async def obtener_candidatos():
 async def obtener_candidato(candidato_id: str):
     """Obtener un candidato por ID"""
     try:
-        candidato = CandidatoService.get_by_id(candidato_id)
+        candidato = await ServicioCandidatos.get_by_id(candidato_id)
         if not candidato:
             raise HTTPException(status_code=404, detail="Candidato no encontrado")
         return candidato
@@ -37,7 +69,7 @@ async def obtener_candidato(candidato_id: str):
 async def crear_candidato(candidato: CandidatoCreate):
     """Crear un nuevo candidato"""
     try:
-        success, message, candidato_id = CandidatoService.create(
+        success, message, candidato_id = await ServicioCandidatos.create(
             nombre=candidato.nombre,
             numero=candidato.numero,
             cargo=candidato.cargo,
@@ -50,6 +82,8 @@ async def crear_candidato(candidato: CandidatoCreate):
         
         if not success:
             raise HTTPException(status_code=400, detail=message)
+
+        backplane.publicar({"tipo": "resultados"})
             
         return {
             "success": True,
@@ -66,7 +100,7 @@ async def crear_candidato(candidato: CandidatoCreate):
 async def actualizar_candidato(candidato_id: str, candidato: CandidatoUpdate):
     """Actualizar un candidato"""
     try:
-        success, message = CandidatoService.update(
+        success, message = await ServicioCandidatos.update(
             candidato_id=candidato_id,
             nombre=candidato.nombre,
             numero=candidato.numero,
@@ -80,6 +114,8 @@ async def actualizar_candidato(candidato_id: str, candidato: CandidatoUpdate):
         
         if not success:
             raise HTTPException(status_code=400, detail=message)
+
+        backplane.publicar({"tipo": "resultados"})
             
         return {
             "success": True,
@@ -95,11 +131,13 @@ async def actualizar_candidato(candidato_id: str, candidato: CandidatoUpdate):
 async def eliminar_candidato(candidato_id: str):
     """Eliminar un candidato"""
     try:
-        success, message = CandidatoService.delete(candidato_id)
+        success, message = await ServicioCandidatos.delete(candidato_id)
 
         if not success:
             raise HTTPException(status_code=400, detail=message)
 
+        backplane.publicar({"tipo": "resultados"})
+
         return {"success": True, "mensaje": message}
     except HTTPException:
         raise
@@ -113,28 +151,68 @@ async def eliminar_candidato(candidato_id: str):
 
 
 @router.get("/resultados/conteo")
-async def obtener_conteo_votos():
-    """Obtener conteo de votos de todos los candidatos"""
-    try:
-        resultados = CandidatoService.get_conteo_votos()
+async def obtener_conteo_votos(request: Request):
+    """Obtener conteo de votos de todos los candidatos (cacheado; admite If-None-Match)"""
+    async def conteo():
+        resultados = await ServicioCandidatos.get_conteo_votos()
         return {
             "success": True,
             "data": {
                 "candidatos": resultados
             }
         }
+
+    try:
+        return await cache_respuestas.responder(request, 'conteo', conteo)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get("/resultados/estadisticas")
-async def obtener_estadisticas():
-    """Obtener estadísticas generales"""
+async def obtener_estadisticas(request: Request):
+    """Obtener estadísticas generales (cacheado; admite If-None-Match)"""
+    async def estadisticas():
+        return {
+            "success": True,
+            "data": await ServicioCandidatos.get_estadisticas()
+        }
+
     try:
-        estadisticas = CandidatoService.get_estadisticas()
+        return await cache_respuestas.responder(request, 'estadisticas', estadisticas)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/resultados/segmentos")
+async def obtener_segmentos(request: Request, cargo: Optional[str] = None, semestre: Optional[str] = None):
+    """Resultados por segmento (cargo, semestre): totales, porcentajes dentro del
+    segmento y líder; `cargo` y `semestre` filtran (cacheado; admite If-None-Match)"""
+    async def segmentos():
         return {
             "success": True,
-            "data": estadisticas
+            "data": {
+                "segmentos": await ServicioCandidatos.get_segmentos(cargo, semestre)
+            }
         }
+
+    clave = f"segmentos?cargo={cargo!r}&semestre={semestre!r}"
+    try:
+        return await cache_respuestas.responder(request, clave, segmentos, ruta='segmentos')
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/ganadores/top/{n}")
+async def obtener_ganadores(request: Request, n: int = Path(..., ge=1, le=100)):
+    """Los n primeros puestos, con empates resueltos por número y márgenes entre puestos
+    (cacheado; admite If-None-Match)"""
+    async def ganadores():
+        return {
+            "success": True,
+            "data": await ServicioCandidatos.get_top(n)
+        }
+
+    try:
+        return await cache_respuestas.responder(request, f'ganadores/top/{n}', ganadores)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
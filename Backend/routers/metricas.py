@@ -0,0 +1,14 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from metricas import registro
+
+router = APIRouter(tags=["metricas"])
+
+# Formato de texto de exposición de Prometheus
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def metricas():
+    """Métricas de servicios, Firestore y WebSocket para Prometheus"""
+    return PlainTextResponse(registro.exponer(), media_type=CONTENT_TYPE)
@@ -0,0 +1,21 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from services.arranque import arranque
+
+router = APIRouter(prefix="/salud", tags=["salud"])
+
+
+@router.get("/vivo")
+def vivo():
+    """Liveness: el proceso atiende peticiones (no toca el almacenamiento)"""
+    return {"success": True, "vivo": True}
+
+
+@router.get("/listo")
+def listo():
+    """Readiness: almacenamiento, listeners e ingesta listos (503 mientras no)"""
+    estado = arranque.estado()
+    return JSONResponse(
+        status_code=200 if estado["listo"] else 503,
+        content={"success": estado["listo"], **estado},
+    )
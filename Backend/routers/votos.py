@@ -1,56 +1,85 @@
-from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
-from typing import List
-import math
+from fastapi import APIRouter, Header, HTTPException, Response, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, StreamingResponse
 from datetime import datetime
-
-from services.candidato_service import CandidatoService
-from services.voto_service import VotoService
-from schemas.voto import VotoCreate
+from typing import Optional
+
+from services.almacenamiento import ServicioVotos
+from services.reinicio_eleccion import reinicio_eleccion
+from services.ingesta_votos import ingesta_votos
+from services.idempotencia import MAX_LARGO_CLAVE, ClaveReutilizada, respuestas_idempotentes
+from schemas.voto import UbicacionesLote, VotoCreate
+from config.settings import GEOCERCAS_MAX_LOTE
+from services.geocerca import geocerca
+from services.participacion import participacion
+from realtime import manager, coalescer, backplane, emisor_participacion, flujo_resultados
+from realtime.coalescer import tema_segmento
+from services.ranking import clave_segmento
 
 router = APIRouter(prefix="/votos", tags=["votos"])
 
 
 # =========================
-# WebSocket Connections Manager
+# Endpoints de Votación
 # =========================
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
-
-    async def connect(self, websocket: WebSocket):
-        await websocket.accept()
-        self.active_connections.append(websocket)
-
-    def disconnect(self, websocket: WebSocket):
-        if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
 
-    async def broadcast(self, message: dict):
-        for connection in self.active_connections:
-            try:
-                await connection.send_json(message)
-            except:
-                pass
 
-
-manager = ConnectionManager()
+@router.post("/")
+async def votar(voto: VotoCreate, response: Response, idempotency_key: Optional[str] = Header(None)):
+    """Registrar un voto y notificar en tiempo real.
+
+    Con `Idempotency-Key`, los reintentos con la misma clave reciben la
+    respuesta del primer intento (con `Idempotency-Replayed: true`) sin
+    volver a validar ni registrar el voto.
+    """
+    if not idempotency_key:
+        response.status_code, cuerpo = await _registrar_voto(voto)
+        return cuerpo
+
+    if len(idempotency_key) > MAX_LARGO_CLAVE:
+        raise HTTPException(status_code=400, detail="Idempotency-Key demasiado larga")
+    try:
+        codigo, cuerpo, repetida = await respuestas_idempotentes.resolver(
+            voto.userId, idempotency_key,
+            (voto.userId, voto.candidatoId, voto.correo.strip().lower()),
+            lambda: _respuesta_voto(voto)
+        )
+    except ClaveReutilizada:
+        raise HTTPException(status_code=422, detail="Idempotency-Key ya usada con otro voto")
+    return JSONResponse(
+        cuerpo, status_code=codigo,
+        headers={"Idempotency-Replayed": "true"} if repetida else None
+    )
 
 
-# =========================
-# Endpoints de Votación
-# =========================
+async def _respuesta_voto(voto: VotoCreate) -> tuple:
+    """(código, cuerpo) de registrar el voto, también para los rechazos"""
+    try:
+        return await _registrar_voto(voto)
+    except HTTPException as e:
+        return e.status_code, {"detail": e.detail}
 
 
-@router.post("/")
-async def votar(voto: VotoCreate):
-    """Registrar un voto y notificar en tiempo real"""
+async def _registrar_voto(voto: VotoCreate) -> tuple:
+    """(código, cuerpo) de un voto registrado o aceptado; los rechazos lanzan HTTPException"""
     try:
-        # Verificar si el correo ya votó
-        if VotoService.verificar_correo(voto.correo):
-            raise HTTPException(status_code=400, detail="Este correo ya votó")
+        if ingesta_votos.activa():
+            # Ingesta diferida: se acepta ya y se escribe en el próximo batch
+            success, message, recibo = await ingesta_votos.encolar(
+                user_id=voto.userId,
+                candidato_id=voto.candidatoId,
+                correo=voto.correo
+            )
+            if not success:
+                raise HTTPException(status_code=400, detail=message)
+            return 202, {
+                "success": True,
+                "mensaje": message,
+                "candidatoId": voto.candidatoId,
+                "recibo": recibo,
+            }
 
-        # Registrar el voto usando stored procedure
-        success, message = VotoService.registrar_voto(
+        # Registrar el voto (los duplicados se rechazan en la misma escritura)
+        success, message, evento = await ServicioVotos.registrar_voto(
             user_id=voto.userId,
             candidato_id=voto.candidatoId,
             correo=voto.correo
@@ -59,20 +88,10 @@ async def votar(voto: VotoCreate):
         if not success:
             raise HTTPException(status_code=400, detail=message)
 
-        # Obtener estadísticas actualizadas
-        estadisticas = CandidatoService.get_estadisticas()
-        conteo = CandidatoService.get_conteo_votos()
+        # Todos los workers lo reflejan en su próximo frame de resultados
+        backplane.publicar(evento)
 
-        await manager.broadcast(
-            {
-                "tipo": "voto_registrado",
-                "candidatoId": voto.candidatoId,
-                "total_votos": estadisticas.get("total_votos", 0),
-                "candidatos": conteo,
-            }
-        )
-
-        return {
+        return 200, {
             "success": True,
             "mensaje": message,
             "candidatoId": voto.candidatoId,
@@ -80,6 +99,31 @@ async def votar(voto: VotoCreate):
 
     except HTTPException:
         raise
+    except Exception as e:
+        # Firestore o PostgreSQL no respondieron: el voto no quedó decidido y
+        # el cliente puede reintentar (con Idempotency-Key no se guarda)
+        raise HTTPException(status_code=503, detail=str(e))
+
+
+@router.get("/recibos/{recibo}")
+async def estado_recibo(recibo: str):
+    """Estado de un voto aceptado por la ingesta diferida"""
+    try:
+        estado = await ingesta_votos.estado_recibo(recibo)
+        if estado is None:
+            raise HTTPException(status_code=404, detail="Recibo no encontrado")
+        return {"success": True, "data": estado}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/participacion")
+async def obtener_participacion():
+    """Votos por minuto, acumulados y por hora (en memoria, sin recorrer los votos)"""
+    try:
+        return {"success": True, "data": participacion.serie()}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -88,7 +132,7 @@ async def votar(voto: VotoCreate):
 async def verificar_ya_voto(user_id: str):
     """Verificar si un usuario ya ha votado"""
     try:
-        ya_voto = VotoService.verificar_user_id(user_id)
+        ya_voto = await ServicioVotos.verificar_user_id(user_id)
         return {"success": True, "yaVoto": ya_voto, "userId": user_id}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -98,7 +142,7 @@ async def verificar_ya_voto(user_id: str):
 async def verificar_correo_existe(correo: str):
     """Verificar si un correo ya ha votado"""
     try:
-        ya_voto = VotoService.verificar_correo(correo)
+        ya_voto = await ServicioVotos.verificar_correo(correo)
         return {"success": True, "yaVoto": ya_voto, "correo": correo}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -106,41 +150,40 @@ async def verificar_correo_existe(correo: str):
 
 @router.get("/verificar-ubicacion")
 async def verificar_ubicacion(lat: float, lng: float):
-    """Verificar si las coordenadas están dentro del campus"""
+    """Verificar si las coordenadas están dentro de algún campus"""
     try:
-        # Coordenadas del campus (Universidad Continental - Campus Huancayo)
-        campus_lat = -12.047505186140151
-        campus_lng = -75.19906082214352
-        radio_permitido = 1000  # metros
-
-        # Calcular distancia usando fórmula de Haversine
-        R = 6371000  # Radio de la Tierra en metros
-
-        lat1 = math.radians(campus_lat)
-        lat2 = math.radians(lat)
-        delta_lat = math.radians(lat - campus_lat)
-        delta_lng = math.radians(lng - campus_lng)
-
-        a = (
-            math.sin(delta_lat / 2) ** 2
-            + math.cos(lat1) * math.cos(lat2) * math.sin(delta_lng / 2) ** 2
-        )
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-        distancia = R * c
-
-        dentro_campus = distancia <= radio_permitido
-
+        dentro_campus, campus, distancia = geocerca.verificar(lat, lng)
         return {
             "success": True,
             "data": {
                 "dentroCampus": dentro_campus,
-                "distancia": round(distancia, 2),
+                "campus": campus,
+                "distancia": round(distancia, 2) if distancia is not None else None,
             },
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/verificar-ubicacion/lote")
+async def verificar_ubicaciones(ubicaciones: UbicacionesLote, distancia: bool = False):
+    """Verificar muchas coordenadas de una vez, en columnas.
+
+    Con `?distancia=true` incluye los metros al campus de cada una.
+    """
+    if len(ubicaciones.lat) != len(ubicaciones.lng):
+        raise HTTPException(status_code=400, detail="lat y lng deben tener el mismo largo")
+    if len(ubicaciones.lat) > GEOCERCAS_MAX_LOTE:
+        raise HTTPException(
+            status_code=413, detail=f"Máximo {GEOCERCAS_MAX_LOTE} coordenadas por petición"
+        )
+    dentro_campus, campus, distancias = geocerca.verificar_lote(ubicaciones.lat, ubicaciones.lng, distancia)
+    data = {"dentroCampus": dentro_campus, "campus": campus}
+    if distancias is not None:
+        data["distancia"] = [round(d, 2) if d is not None else None for d in distancias]
+    return {"success": True, "total": len(dentro_campus), "data": data}
+
+
 @router.get("/validar-correo/{correo}")
 async def validar_correo_institucional(correo: str):
     """Verificar si el correo es institucional"""
@@ -161,58 +204,115 @@ async def validar_correo_institucional(correo: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# =========================
+# Resultados por Server-Sent Events
+# =========================
+
+
+@router.get("/stream")
+async def stream_resultados(last_event_id: Optional[str] = Header(None)):
+    """Resultados en tiempo real por SSE (solo lectura, sin ping del cliente).
+
+    Envía un evento `inicial` con el estado completo y luego eventos `delta`
+    (los mismos frames que /api/votos/ws). Al reconectarse, EventSource manda
+    `Last-Event-ID` y recibe solo los eventos que se perdió.
+    """
+    return StreamingResponse(
+        flujo_resultados.eventos(last_event_id, coalescer.snapshot),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 # =========================
 # WebSocket para votos en tiempo real
 # =========================
 
 
 @router.websocket("/ws")
-async def websocket_votos(websocket: WebSocket):
-    """WebSocket para recibir actualizaciones de votos en tiempo real"""
-    await manager.connect(websocket)
+async def websocket_votos(websocket: WebSocket, cargo: Optional[str] = None, semestre: Optional[str] = None):
+    """WebSocket para recibir actualizaciones de votos en tiempo real.
+
+    Con `?cargo=&semestre=` (o enviando `segmento:{cargo}|{semestre}`) el
+    cliente recibe solo los frames `segmento` de ese cargo y semestre en
+    lugar de los deltas de todos los resultados; `resultados` vuelve a los
+    deltas.
+    """
+    segmento = clave_segmento(cargo, semestre) if cargo is not None or semestre is not None else None
+    await manager.connect(websocket, resultados=segmento is None)
 
     try:
         # Enviar estado inicial
-        estadisticas = CandidatoService.get_estadisticas()
-        conteo = CandidatoService.get_conteo_votos()
-
-        await websocket.send_json(
-            {
-                "tipo": "inicial",
-                "total_votos": estadisticas.get("total_votos", 0),
-                "candidatos": conteo,
-            }
-        )
+        if segmento is None:
+            manager.enviar(websocket, await coalescer.snapshot())
+        else:
+            manager.suscribir(websocket, tema_segmento(segmento))
+            manager.enviar(websocket, await coalescer.snapshot_segmento(segmento))
 
         while True:
             # Mantener la conexión abierta
             data = await websocket.receive_text()
             if data == "ping":
-                await websocket.send_json({"tipo": "pong"})
-
-    except WebSocketDisconnect:
-        manager.disconnect(websocket)
+                manager.enviar(websocket, {"tipo": "pong"})
+            elif data == "resync":
+                # El cliente perdió un delta (salto en seq): estado completo
+                if segmento is None:
+                    manager.enviar(websocket, await coalescer.snapshot())
+                else:
+                    manager.enviar(websocket, await coalescer.snapshot_segmento(segmento))
+            elif data.startswith("segmento:"):
+                # Solo los resultados de un cargo y semestre (reemplaza al anterior)
+                if segmento is not None:
+                    manager.desuscribir(websocket, tema_segmento(segmento))
+                segmento = clave_segmento(*data[len("segmento:"):].partition("|")[::2])
+                manager.recibir_resultados(websocket, False)
+                manager.suscribir(websocket, tema_segmento(segmento))
+                manager.enviar(websocket, await coalescer.snapshot_segmento(segmento))
+            elif data == "resultados" and segmento is not None:
+                # De vuelta a los deltas de todos los resultados
+                manager.desuscribir(websocket, tema_segmento(segmento))
+                segmento = None
+                manager.recibir_resultados(websocket, True)
+                manager.enviar(websocket, await coalescer.snapshot())
+            elif data == "participacion":
+                # Opcional: la curva de participación completa y luego sus cambios
+                manager.suscribir(websocket, "participacion")
+                manager.enviar(websocket, emisor_participacion.snapshot())
+
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        await manager.desconectar(websocket)
 
 
 # =========================
 # Endpoint para reiniciar elección
 # =========================
 
-@router.post("/reiniciar")
+@router.post("/reiniciar", status_code=202)
 async def reiniciar_eleccion():
-    """Reiniciar la elección (borrar todos los votos)"""
+    """Lanzar el reinicio de la elección (borrar todos los votos) en segundo plano.
+
+    Responde de inmediato con el estado del trabajo; el avance se consulta en
+    GET /api/votos/reiniciar/estado.
+    """
     try:
-        success, message, votos_eliminados = VotoService.reiniciar_eleccion()
-        
-        if not success:
-            raise HTTPException(status_code=400, detail=message)
-            
+        estado = await reinicio_eleccion.iniciar(
+            al_terminar=lambda: backplane.publicar({"tipo": "reinicio"})
+        )
         return {
             "success": True,
-            "mensaje": message,
-            "votos_eliminados": votos_eliminados
+            "mensaje": "Reinicio de la eleccion en curso",
+            "data": estado,
         }
-    except HTTPException:
-        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/reiniciar/estado")
+async def estado_reinicio():
+    """Avance del último reinicio de la elección"""
+    try:
+        return {"success": True, "data": await reinicio_eleccion.estado()}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 
 
 # =========================
@@ -24,3 +24,9 @@ class Voto(VotoBase):
 
     class Config:
         from_attributes = True
+
+
+class UbicacionesLote(BaseModel):
+    """Columnas de coordenadas para verificar en lote (lat[i], lng[i])"""
+    lat: List[float]
+    lng: List[float]
@@ -1,5 +1,15 @@
 # Services package
 from .candidato_service import CandidatoService
 from .voto_service import VotoService
+from .candidato_service_async import AsyncCandidatoService
+from .voto_service_async import AsyncVotoService
+from .almacenamiento import ServicioCandidatos, ServicioVotos
 
-__all__ = ["CandidatoService", "VotoService"]
+__all__ = [
+    "CandidatoService",
+    "VotoService",
+    "AsyncCandidatoService",
+    "AsyncVotoService",
+    "ServicioCandidatos",
+    "ServicioVotos",
+]
@@ -0,0 +1,19 @@
+from config.settings import ALMACENAMIENTO
+
+# Servicios async que usan los routers según ALMACENAMIENTO; ambos exponen
+# la misma interfaz (la de AsyncCandidatoService / AsyncVotoService).
+if ALMACENAMIENTO == 'postgres':
+    from services.postgres_service import (
+        PostgresCandidatoService as ServicioCandidatos,
+        PostgresVotoService as ServicioVotos,
+    )
+elif ALMACENAMIENTO == 'firestore':
+    from services.candidato_service_async import AsyncCandidatoService as ServicioCandidatos
+    from services.voto_service_async import AsyncVotoService as ServicioVotos
+else:
+    raise ValueError(f'Almacenamiento desconocido: {ALMACENAMIENTO}')
+
+
+def usa_firestore() -> bool:
+    """True si los datos viven en Firestore (listeners, shards y cache de conteo)"""
+    return ALMACENAMIENTO == 'firestore'
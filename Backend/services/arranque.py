@@ -0,0 +1,117 @@
+import asyncio
+import time
+from typing import Callable, Optional
+from config import firebase
+from services.almacenamiento import usa_firestore
+from services.conteo_cache import conteo_cache
+from services.contador_distribuido import ContadorDistribuido
+from services.indice_votantes import indice_votantes
+from services.ingesta_votos import ingesta_votos
+from services.migracion_votos import MigracionVotos
+from services.participacion import participacion
+
+# Segundos entre intentos si la preparación falla (credenciales, red)
+ESPERA_REINTENTO = 5.0
+
+
+class Arranque:
+    """Prepara el almacenamiento sin bloquear el arranque del servidor.
+
+    El lifespan solo lanza la preparación: el cliente de Firestore (o el pool
+    de PostgreSQL) se crea en un hilo, luego se suscriben los listeners y se
+    arranca el escritor de la ingesta diferida. Mientras tanto el servidor ya
+    responde /api/salud/vivo; /api/salud/listo responde 200 cuando todo está
+    listo. Una petición que llegue antes usa el cliente igual: se crea en ese
+    momento o espera a que termine de crearse.
+    """
+
+    def __init__(self):
+        self._tarea: Optional[asyncio.Task] = None
+        self._error: Optional[str] = None
+        self._inicio = 0.0
+        self._duracion: Optional[float] = None
+
+    def iniciar(self, al_confirmar: Callable[[dict], None] = None):
+        if self._tarea is not None:
+            return
+        self._inicio = time.perf_counter()
+        self._tarea = asyncio.create_task(self._preparar(al_confirmar))
+
+    async def _preparar(self, al_confirmar):
+        while True:
+            try:
+                await self._preparar_una_vez(al_confirmar)
+                self._error = None
+                self._duracion = time.perf_counter() - self._inicio
+                return
+            except Exception as e:
+                self._error = str(e)
+                print(f"Error preparando el almacenamiento, se reintentará: {e}")
+                await asyncio.sleep(ESPERA_REINTENTO)
+
+    async def _preparar_una_vez(self, al_confirmar):
+        if usa_firestore():
+            await asyncio.to_thread(firebase.inicializar)
+            # Votos anteriores a los IDs deterministas (solo la primera vez)
+            if await asyncio.to_thread(MigracionVotos.pendiente):
+                await asyncio.to_thread(MigracionVotos.migrar)
+            # Los votos con contadores distribuidos requieren que existan los shards
+            if ContadorDistribuido.activo():
+                await asyncio.to_thread(ContadorDistribuido.asegurar_shards)
+
+            # Listeners de Firestore que mantienen el conteo y los votantes en memoria
+            conteo_cache.iniciar()
+            indice_votantes.iniciar()
+        else:
+            from config.postgres import get_pool
+            await asyncio.to_thread(get_pool)
+
+        # Curva de participación (listener en Firestore, GROUP BY en PostgreSQL)
+        await participacion.iniciar()
+
+        if ingesta_votos.activa():
+            # Escritor de la ingesta diferida; cada batch escrito avisa a los workers
+            ingesta_votos.iniciar(al_confirmar=al_confirmar)
+
+    async def detener(self):
+        if self._tarea is None:
+            return
+        if not self._tarea.done():
+            self._tarea.cancel()
+            try:
+                await self._tarea
+            except asyncio.CancelledError:
+                pass
+        self._tarea = None
+        await ingesta_votos.detener()
+        await participacion.detener()
+        if usa_firestore():
+            conteo_cache.detener()
+            indice_votantes.detener()
+        else:
+            from config.postgres import cerrar_pool
+            cerrar_pool()
+
+    def estado(self) -> dict:
+        """Componentes listos; `listo` si el servidor puede atender con datos en memoria"""
+        if usa_firestore():
+            componentes = {
+                'firestore': firebase.inicializado(),
+                'conteo': conteo_cache.listo,
+                'indice_votantes': indice_votantes.listo or indice_votantes.modo == 'desactivado',
+                'participacion': participacion.listo,
+            }
+        else:
+            componentes = {'postgres': self._duracion is not None}
+        if ingesta_votos.activa():
+            componentes['ingesta'] = ingesta_votos.iniciada()
+        return {
+            'listo': self._error is None and self._duracion is not None and all(componentes.values()),
+            'componentes': componentes,
+            'error': self._error,
+            'segundos_preparacion': round(self._duracion, 3) if self._duracion is not None else None,
+        }
+
+
+# Instancia global de la preparación del almacenamiento
+arranque = Arranque()
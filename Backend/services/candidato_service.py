@@ -2,35 +2,34 @@ from typing import List, Optional
 from config.firebase import get_db, candidatos_ref
 from models.candidato import Candidato
 from datetime import datetime
-from google.cloud.firestore import Increment
+from services.conteo_cache import conteo_cache
+from services.contador_distribuido import ContadorDistribuido
+from services.proyeccion import CAMPOS_CANDIDATO, CAMPOS_EN_CACHE, campos_documento, pagina
+from services.ranking import segmentos_desde_conteo, top_desde_conteo
+from metricas import instrumentado
 
 
+@instrumentado
 class CandidatoService:
     """Servicio para operaciones CRUD de candidatos usando Firestore"""
 
     @staticmethod
     def get_all() -> List[Candidato]:
         """Obtener todos los candidatos"""
-        candidatos = []
         docs = candidatos_ref.order_by('numero').stream()
-        
-        for doc in docs:
-            data = doc.to_dict()
-            candidatos.append(Candidato(
-                id=doc.id,
-                nombre=data.get('nombre'),
-                numero=data.get('numero'),
-                cargo=data.get('cargo'),
-                imagen=data.get('imagen'),
-                propuesta=data.get('propuesta'),
-                vision=data.get('vision'),
-                experiencia=data.get('experiencia'),
-                semestre=data.get('semestre'),
-                votos=data.get('votos', 0),
-                created_at=data.get('created_at'),
-                updated_at=data.get('updated_at')
-            ))
-        return candidatos
+        shards = CandidatoService._totales_shards()
+        return [CandidatoService.desde_documento(doc.id, doc.to_dict(), shards) for doc in docs]
+
+    @staticmethod
+    def get_pagina(campos: tuple = CAMPOS_CANDIDATO, limite: int = None, despues: tuple = None) -> dict:
+        """Candidatos con solo `campos`, de a `limite`, después del cursor `despues`"""
+        if conteo_cache.listo and CAMPOS_EN_CACHE.issuperset(campos):
+            return pagina(conteo_cache.get_candidatos(), campos, limite, despues)
+
+        consulta = CandidatoService.consulta_pagina(candidatos_ref, campos, limite, despues)
+        shards = CandidatoService._totales_shards() if 'votos' in campos else None
+        filas = [CandidatoService.fila_documento(doc.id, doc.to_dict(), shards) for doc in consulta.stream()]
+        return pagina(filas, campos, limite)
 
     @staticmethod
     def get_by_id(candidato_id: str) -> Optional[Candidato]:
@@ -38,23 +37,150 @@ class CandidatoService:
         doc = candidatos_ref.document(candidato_id).get()
         
         if doc.exists:
-            data = doc.to_dict()
-            return Candidato(
-                id=doc.id,
-                nombre=data.get('nombre'),
-                numero=data.get('numero'),
-                cargo=data.get('cargo'),
-                imagen=data.get('imagen'),
-                propuesta=data.get('propuesta'),
-                vision=data.get('vision'),
-                experiencia=data.get('experiencia'),
-                semestre=data.get('semestre'),
-                votos=data.get('votos', 0),
-                created_at=data.get('created_at'),
-                updated_at=data.get('updated_at')
-            )
+            shards = None
+            if ContadorDistribuido.activo() and not conteo_cache.listo:
+                shards = {candidato_id: ContadorDistribuido.total(candidato_id)}
+            return CandidatoService.desde_documento(doc.id, doc.to_dict(), shards)
         return None
 
+    @staticmethod
+    def _totales_shards() -> Optional[dict]:
+        """Totales de shards para lecturas sin cache (None si no aplica)"""
+        if ContadorDistribuido.activo() and not conteo_cache.listo:
+            return ContadorDistribuido.totales()
+        return None
+
+    # =========================
+    # Helpers compartidos con AsyncCandidatoService
+    # =========================
+
+    @staticmethod
+    def votos_de(candidato_id: str, data: dict, shards: Optional[dict]) -> int:
+        """Votos de un candidato: cache, o campo del documento más sus shards"""
+        if conteo_cache.listo:
+            return conteo_cache.votos(candidato_id)
+        return data.get('votos', 0) + (shards or {}).get(candidato_id, 0)
+
+    @staticmethod
+    def desde_documento(doc_id: str, data: dict, shards: Optional[dict] = None) -> Candidato:
+        """Construir el modelo Candidato a partir de un documento"""
+        return Candidato(
+            id=doc_id,
+            nombre=data.get('nombre'),
+            numero=data.get('numero'),
+            cargo=data.get('cargo'),
+            imagen=data.get('imagen'),
+            propuesta=data.get('propuesta'),
+            vision=data.get('vision'),
+            experiencia=data.get('experiencia'),
+            semestre=data.get('semestre'),
+            votos=CandidatoService.votos_de(doc_id, data, shards),
+            created_at=data.get('created_at'),
+            updated_at=data.get('updated_at')
+        )
+
+    @staticmethod
+    def consulta_pagina(candidatos, campos: tuple, limite: Optional[int], despues: Optional[tuple]):
+        """Consulta por número e ID que solo trae `campos` (select) a partir del cursor"""
+        from google.cloud.firestore_v1.field_path import FieldPath
+
+        id_documento = FieldPath.document_id()
+        consulta = candidatos.order_by('numero').order_by(id_documento).select(campos_documento(campos))
+        if despues is not None:
+            consulta = consulta.start_after({'numero': despues[0], id_documento: despues[1]})
+        if limite is not None:
+            # Uno más para saber si hay página siguiente
+            consulta = consulta.limit(limite + 1)
+        return consulta
+
+    @staticmethod
+    def fila_documento(doc_id: str, data: dict, shards: Optional[dict]) -> dict:
+        """Campos leídos de un documento (posiblemente proyectado), con id y votos"""
+        return {**data, 'id': doc_id, 'votos': CandidatoService.votos_de(doc_id, data, shards)}
+
+    @staticmethod
+    def datos_nuevo(
+        nombre: str,
+        numero: int,
+        cargo: str = None,
+        imagen: str = None,
+        propuesta: str = None,
+        vision: str = None,
+        experiencia: str = None,
+        semestre: str = None
+    ) -> dict:
+        """Documento de un candidato nuevo"""
+        now = datetime.utcnow()
+        return {
+            'nombre': nombre,
+            'numero': numero,
+            'cargo': cargo or '',
+            'imagen': imagen or '',
+            'propuesta': propuesta or '',
+            'vision': vision or '',
+            'experiencia': experiencia or '',
+            'semestre': semestre or '',
+            'votos': 0,
+            'created_at': now,
+            'updated_at': now
+        }
+
+    @staticmethod
+    def datos_actualizacion(**campos) -> dict:
+        """Campos a actualizar (se ignoran los None)"""
+        update_data = {'updated_at': datetime.utcnow()}
+        for campo, valor in campos.items():
+            if valor is not None:
+                update_data[campo] = valor
+        return update_data
+
+    @staticmethod
+    def conteo_desde_documentos(docs: List[tuple], shards: Optional[dict]) -> List[dict]:
+        """Conteo con porcentajes a partir de (id, data) ordenados por número"""
+        votos = {doc_id: CandidatoService.votos_de(doc_id, data, shards) for doc_id, data in docs}
+        total_votos = sum(votos.values())
+
+        # Calcular porcentajes
+        resultados = []
+        for doc_id, data in docs:
+            porcentaje = (votos[doc_id] / total_votos * 100) if total_votos > 0 else 0
+            
+            resultados.append({
+                'candidato_id': doc_id,
+                'nombre': data.get('nombre'),
+                'numero': data.get('numero'),
+                'cargo': data.get('cargo'),
+                'semestre': data.get('semestre'),
+                'imagen': data.get('imagen'),
+                'votos': votos[doc_id],
+                'porcentaje': round(porcentaje, 2)
+            })
+        return resultados
+
+    @staticmethod
+    def estadisticas_desde_documentos(docs: List[tuple], shards: Optional[dict]) -> dict:
+        """Totales y ganador a partir de (id, data)"""
+        total_votos = 0
+        total_candidatos = 0
+        candidato_ganador = None
+        votos_ganador = 0
+        
+        for doc_id, data in docs:
+            total_candidatos += 1
+            votos = CandidatoService.votos_de(doc_id, data, shards)
+            total_votos += votos
+            
+            if votos > votos_ganador:
+                candidato_ganador = data.get('nombre')
+                votos_ganador = votos
+        
+        return {
+            'total_votos': total_votos,
+            'total_candidatos': total_candidatos,
+            'candidato_ganador': candidato_ganador,
+            'votos_ganador': votos_ganador
+        }
+
     @staticmethod
     def create(
         nombre: str, 
@@ -73,21 +199,14 @@ class CandidatoService:
             for _ in existing:
                 return (False, 'Ya existe un candidato con ese numero', None)
             
-            now = datetime.utcnow()
             doc_ref = candidatos_ref.document()
-            doc_ref.set({
-                'nombre': nombre,
-                'numero': numero,
-                'cargo': cargo or '',
-                'imagen': imagen or '',
-                'propuesta': propuesta or '',
-                'vision': vision or '',
-                'experiencia': experiencia or '',
-                'semestre': semestre or '',
-                'votos': 0,
-                'created_at': now,
-                'updated_at': now
-            })
+            batch = get_db().batch()
+            batch.set(doc_ref, CandidatoService.datos_nuevo(
+                nombre, numero, cargo, imagen, propuesta, vision, experiencia, semestre
+            ))
+            if ContadorDistribuido.activo():
+                ContadorDistribuido.inicializar(doc_ref.id, batch)
+            batch.commit()
             return (True, 'Candidato creado exitosamente', doc_ref.id)
         except Exception as e:
             return (False, str(e), None)
@@ -110,24 +229,16 @@ class CandidatoService:
             if not doc_ref.get().exists:
                 return (False, 'Candidato no encontrado')
             
-            update_data = {'updated_at': datetime.utcnow()}
-            if nombre is not None:
-                update_data['nombre'] = nombre
-            if numero is not None:
-                update_data['numero'] = numero
-            if cargo is not None:
-                update_data['cargo'] = cargo
-            if imagen is not None:
-                update_data['imagen'] = imagen
-            if propuesta is not None:
-                update_data['propuesta'] = propuesta
-            if vision is not None:
-                update_data['vision'] = vision
-            if experiencia is not None:
-                update_data['experiencia'] = experiencia
-            if semestre is not None:
-                update_data['semestre'] = semestre
-            
+            update_data = CandidatoService.datos_actualizacion(
+                nombre=nombre,
+                numero=numero,
+                cargo=cargo,
+                imagen=imagen,
+                propuesta=propuesta,
+                vision=vision,
+                experiencia=experiencia,
+                semestre=semestre
+            )
             doc_ref.update(update_data)
             return (True, 'Candidato actualizado exitosamente')
         except Exception as e:
@@ -141,6 +252,10 @@ class CandidatoService:
             if not doc.get().exists:
                 return (False, 'Candidato no encontrado')
             
+            if ContadorDistribuido.activo():
+                batch = get_db().batch()
+                if ContadorDistribuido.eliminar(candidato_id, batch):
+                    batch.commit()
             doc.delete()
             return (True, 'Candidato eliminado exitosamente')
         except Exception as e:
@@ -149,65 +264,61 @@ class CandidatoService:
     @staticmethod
     def get_conteo_votos() -> List[dict]:
         """Obtener conteo de votos de todos los candidatos"""
-        resultados = []
-        total_votos = 0
-        
-        # Contar total de votos
-        docs = candidatos_ref.stream()
-        for doc in docs:
-            data = doc.to_dict()
-            total_votos += data.get('votos', 0)
-        
-        # Calcular porcentajes
-        docs = candidatos_ref.order_by('numero').stream()
-        for doc in docs:
-            data = doc.to_dict()
-            votos = data.get('votos', 0)
-            porcentaje = (votos / total_votos * 100) if total_votos > 0 else 0
-            
-            resultados.append({
-                'candidato_id': doc.id,
-                'nombre': data.get('nombre'),
-                'numero': data.get('numero'),
-                'cargo': data.get('cargo'),
-                'imagen': data.get('imagen'),
-                'votos': votos,
-                'porcentaje': round(porcentaje, 2)
-            })
-        return resultados
+        if conteo_cache.listo:
+            return conteo_cache.get_conteo_votos()
+
+        # Sin cache: una sola lectura de la colección
+        docs = [(doc.id, doc.to_dict()) for doc in candidatos_ref.order_by('numero').stream()]
+        return CandidatoService.conteo_desde_documentos(docs, CandidatoService._totales_shards())
 
     @staticmethod
     def get_estadisticas() -> dict:
         """Obtener estadísticas generales"""
-        total_votos = 0
-        total_candidatos = 0
-        candidato_ganador = None
-        votos_ganador = 0
-        
-        docs = candidatos_ref.stream()
-        for doc in docs:
-            data = doc.to_dict()
-            total_candidatos += 1
-            votos = data.get('votos', 0)
-            total_votos += votos
-            
-            if votos > votos_ganador:
-                candidato_ganador = data.get('nombre')
-                votos_ganador = votos
-        
-        return {
-            'total_votos': total_votos,
-            'total_candidatos': total_candidatos,
-            'candidato_ganador': candidato_ganador,
-            'votos_ganador': votos_ganador
-        }
+        if conteo_cache.listo:
+            return conteo_cache.get_estadisticas()
+
+        docs = [(doc.id, doc.to_dict()) for doc in candidatos_ref.stream()]
+        return CandidatoService.estadisticas_desde_documentos(docs, CandidatoService._totales_shards())
+
+    @staticmethod
+    def get_top(n: int) -> dict:
+        """Los n primeros puestos con sus márgenes"""
+        if conteo_cache.listo:
+            return conteo_cache.get_top(n)
+        return top_desde_conteo(CandidatoService.get_conteo_votos(), n)
+
+    @staticmethod
+    def get_segmentos(cargo: str = None, semestre: str = None) -> List[dict]:
+        """Resultados por segmento (cargo, semestre) con porcentajes y líder de cada uno"""
+        if conteo_cache.listo:
+            return conteo_cache.get_segmentos(cargo, semestre)
+        return segmentos_desde_conteo(CandidatoService.get_conteo_votos(), cargo, semestre)
     
+    @staticmethod
+    def contador_ref(candidato_id: str, candidatos=None):
+        """Documento que recibe el incremento de un voto (el candidato o uno de sus shards)"""
+        if ContadorDistribuido.activo():
+            return ContadorDistribuido.shard_ref(candidato_id, candidatos=candidatos)
+        return (candidatos or candidatos_ref).document(candidato_id)
+
+    @staticmethod
+    def datos_incremento(cantidad: int = 1) -> dict:
+        """Campos a escribir en el documento contador"""
+        # Importación diferida: el SDK ya está cargado cuando hay un cliente
+        from google.cloud.firestore import Increment
+
+        data = {'votos': Increment(cantidad)}
+        if not ContadorDistribuido.activo():
+            data['updated_at'] = datetime.utcnow()
+        return data
+
     @staticmethod
     def increment_vote(candidato_id: str) -> bool:
         """Incrementar el contador de votos de un candidato"""
         try:
-            doc_ref = candidatos_ref.document(candidato_id)
-            doc_ref.update({'votos': Increment(1), 'updated_at': datetime.utcnow()})
+            doc_ref = CandidatoService.contador_ref(candidato_id)
+            result = doc_ref.update(CandidatoService.datos_incremento())
+            conteo_cache.registrar_incremento(candidato_id, doc_ref.path, result.update_time)
             return True
         except Exception:
             return False
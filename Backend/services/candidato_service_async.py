@@ -0,0 +1,203 @@
+import asyncio
+from typing import List, Optional
+from config.firebase import get_async_db, candidatos_async_ref
+from models.candidato import Candidato
+from services.candidato_service import CandidatoService
+from services.conteo_cache import conteo_cache
+from services.contador_distribuido import ContadorDistribuido
+from services.lecturas_compartidas import compartida
+from services.proyeccion import CAMPOS_CANDIDATO, CAMPOS_EN_CACHE, pagina
+from services.ranking import segmentos_desde_conteo, top_desde_conteo
+from metricas import instrumentado
+
+
+@instrumentado
+class AsyncCandidatoService:
+    """Versión asíncrona de CandidatoService sobre firestore.AsyncClient"""
+
+    @staticmethod
+    async def _totales_shards() -> Optional[dict]:
+        """Totales de shards para lecturas sin cache (None si no aplica)"""
+        if ContadorDistribuido.activo() and not conteo_cache.listo:
+            return await ContadorDistribuido.totales_async()
+        return None
+
+    @staticmethod
+    async def _documentos(query) -> List[tuple]:
+        return [(doc.id, doc.to_dict()) async for doc in query.stream()]
+
+    @staticmethod
+    @compartida
+    async def get_all() -> List[Candidato]:
+        """Obtener todos los candidatos"""
+        docs, shards = await asyncio.gather(
+            AsyncCandidatoService._documentos(candidatos_async_ref.order_by('numero')),
+            AsyncCandidatoService._totales_shards()
+        )
+        return [CandidatoService.desde_documento(doc_id, data, shards) for doc_id, data in docs]
+
+    @staticmethod
+    @compartida
+    async def get_pagina(campos: tuple = CAMPOS_CANDIDATO, limite: int = None, despues: tuple = None) -> dict:
+        """Candidatos con solo `campos`, de a `limite`, después del cursor `despues`"""
+        if conteo_cache.listo and CAMPOS_EN_CACHE.issuperset(campos):
+            # La cédula (nombre, número, cargo, imagen, votos) sale de memoria
+            return pagina(conteo_cache.get_candidatos(), campos, limite, despues)
+
+        consulta = CandidatoService.consulta_pagina(candidatos_async_ref, campos, limite, despues)
+        if 'votos' in campos:
+            docs, shards = await asyncio.gather(
+                AsyncCandidatoService._documentos(consulta),
+                AsyncCandidatoService._totales_shards()
+            )
+        else:
+            docs, shards = await AsyncCandidatoService._documentos(consulta), None
+        filas = [CandidatoService.fila_documento(doc_id, data, shards) for doc_id, data in docs]
+        return pagina(filas, campos, limite)
+
+    @staticmethod
+    async def get_by_id(candidato_id: str) -> Optional[Candidato]:
+        """Obtener un candidato por ID"""
+        if ContadorDistribuido.activo() and not conteo_cache.listo:
+            doc, total = await asyncio.gather(
+                candidatos_async_ref.document(candidato_id).get(),
+                ContadorDistribuido.total_async(candidato_id)
+            )
+            shards = {candidato_id: total}
+        else:
+            doc = await candidatos_async_ref.document(candidato_id).get()
+            shards = None
+
+        if doc.exists:
+            return CandidatoService.desde_documento(doc.id, doc.to_dict(), shards)
+        return None
+
+    @staticmethod
+    async def create(
+        nombre: str, 
+        numero: int, 
+        cargo: str = None, 
+        imagen: str = None, 
+        propuesta: str = None, 
+        vision: str = None, 
+        experiencia: str = None, 
+        semestre: str = None
+    ) -> tuple:
+        """Crear un nuevo candidato"""
+        try:
+            # Verificar si ya existe un candidato con ese número
+            existing = candidatos_async_ref.where('numero', '==', numero).limit(1).stream()
+            async for _ in existing:
+                return (False, 'Ya existe un candidato con ese numero', None)
+            
+            doc_ref = candidatos_async_ref.document()
+            batch = get_async_db().batch()
+            batch.set(doc_ref, CandidatoService.datos_nuevo(
+                nombre, numero, cargo, imagen, propuesta, vision, experiencia, semestre
+            ))
+            if ContadorDistribuido.activo():
+                ContadorDistribuido.inicializar(doc_ref.id, batch, candidatos_async_ref)
+            await batch.commit()
+            return (True, 'Candidato creado exitosamente', doc_ref.id)
+        except Exception as e:
+            return (False, str(e), None)
+
+    @staticmethod
+    async def update(
+        candidato_id: str,
+        nombre: str = None,
+        numero: int = None,
+        cargo: str = None,
+        imagen: str = None,
+        propuesta: str = None,
+        vision: str = None,
+        experiencia: str = None,
+        semestre: str = None
+    ) -> tuple:
+        """Actualizar un candidato"""
+        try:
+            doc_ref = candidatos_async_ref.document(candidato_id)
+            if not (await doc_ref.get()).exists:
+                return (False, 'Candidato no encontrado')
+            
+            await doc_ref.update(CandidatoService.datos_actualizacion(
+                nombre=nombre,
+                numero=numero,
+                cargo=cargo,
+                imagen=imagen,
+                propuesta=propuesta,
+                vision=vision,
+                experiencia=experiencia,
+                semestre=semestre
+            ))
+            return (True, 'Candidato actualizado exitosamente')
+        except Exception as e:
+            return (False, str(e))
+
+    @staticmethod
+    async def delete(candidato_id: str) -> tuple:
+        """Eliminar un candidato"""
+        try:
+            doc = candidatos_async_ref.document(candidato_id)
+            if not (await doc.get()).exists:
+                return (False, 'Candidato no encontrado')
+            
+            batch = get_async_db().batch()
+            if ContadorDistribuido.activo():
+                await ContadorDistribuido.eliminar_async(candidato_id, batch)
+            batch.delete(doc)
+            await batch.commit()
+            return (True, 'Candidato eliminado exitosamente')
+        except Exception as e:
+            return (False, str(e))
+
+    @staticmethod
+    @compartida
+    async def get_conteo_votos() -> List[dict]:
+        """Obtener conteo de votos de todos los candidatos"""
+        if conteo_cache.listo:
+            return conteo_cache.get_conteo_votos()
+
+        docs, shards = await asyncio.gather(
+            AsyncCandidatoService._documentos(candidatos_async_ref.order_by('numero')),
+            AsyncCandidatoService._totales_shards()
+        )
+        return CandidatoService.conteo_desde_documentos(docs, shards)
+
+    @staticmethod
+    @compartida
+    async def get_estadisticas() -> dict:
+        """Obtener estadísticas generales"""
+        if conteo_cache.listo:
+            return conteo_cache.get_estadisticas()
+
+        docs, shards = await asyncio.gather(
+            AsyncCandidatoService._documentos(candidatos_async_ref),
+            AsyncCandidatoService._totales_shards()
+        )
+        return CandidatoService.estadisticas_desde_documentos(docs, shards)
+
+    @staticmethod
+    async def get_top(n: int) -> dict:
+        """Los n primeros puestos con sus márgenes (del ranking en memoria si está listo)"""
+        if conteo_cache.listo:
+            return conteo_cache.get_top(n)
+        return top_desde_conteo(await AsyncCandidatoService.get_conteo_votos(), n)
+
+    @staticmethod
+    async def get_segmentos(cargo: str = None, semestre: str = None) -> List[dict]:
+        """Resultados por segmento (cargo, semestre), de los rankings en memoria si están listos"""
+        if conteo_cache.listo:
+            return conteo_cache.get_segmentos(cargo, semestre)
+        return segmentos_desde_conteo(await AsyncCandidatoService.get_conteo_votos(), cargo, semestre)
+
+    @staticmethod
+    async def increment_vote(candidato_id: str) -> bool:
+        """Incrementar el contador de votos de un candidato"""
+        try:
+            doc_ref = CandidatoService.contador_ref(candidato_id, candidatos_async_ref)
+            result = await doc_ref.update(CandidatoService.datos_incremento())
+            conteo_cache.registrar_incremento(candidato_id, doc_ref.path, result.update_time)
+            return True
+        except Exception:
+            return False
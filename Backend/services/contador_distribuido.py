@@ -0,0 +1,119 @@
+import random
+from typing import Dict
+from config.firebase import get_db, get_async_db, candidatos_ref, candidatos_async_ref
+from config.settings import VOTOS_NUM_SHARDS
+from metricas import instrumentado
+
+# Subcolección de shards dentro de cada candidato: candidatos/{id}/votos_shards/{n}
+SHARDS_COLLECTION = 'votos_shards'
+
+
+@instrumentado
+class ContadorDistribuido:
+    """Contador de votos repartido en N subdocumentos por candidato.
+
+    Firestore admite alrededor de una escritura sostenida por segundo en un
+    mismo documento; repartir los incrementos entre N shards eleva ese techo
+    a N escrituras por segundo por candidato. El total de un candidato es el
+    campo 'votos' de su documento más la suma de sus shards. Los shards se
+    crean junto con el candidato para que un incremento sobre un shard
+    inexistente falle igual que sobre un candidato inexistente.
+    """
+
+    @staticmethod
+    def activo() -> bool:
+        """True si los votos se cuentan en shards"""
+        return VOTOS_NUM_SHARDS > 1
+
+    @staticmethod
+    def shard_ref(candidato_id: str, indice: int = None, candidatos=None):
+        """Referencia a un shard (aleatorio si no se indica)"""
+        if indice is None:
+            indice = random.randrange(VOTOS_NUM_SHARDS)
+        candidatos = candidatos or candidatos_ref
+        return candidatos.document(candidato_id).collection(SHARDS_COLLECTION).document(str(indice))
+
+    @staticmethod
+    def inicializar(candidato_id: str, batch, candidatos=None) -> None:
+        """Agregar al batch la creación de los shards de un candidato nuevo"""
+        for indice in range(VOTOS_NUM_SHARDS):
+            batch.set(ContadorDistribuido.shard_ref(candidato_id, indice, candidatos), {'votos': 0})
+
+    @staticmethod
+    def asegurar_shards() -> int:
+        """Crear los shards que falten (candidatos previos o VOTOS_NUM_SHARDS aumentado),
+        en batches de a lo sumo MAX_OPERACIONES_BATCH creaciones"""
+        # voto_service importa este módulo
+        from services.voto_service import MAX_OPERACIONES_BATCH
+
+        existentes = set()
+        for doc in get_db().collection_group(SHARDS_COLLECTION).stream():
+            existentes.add((doc.reference.parent.parent.id, doc.id))
+
+        creados = 0
+        batch, en_batch = get_db().batch(), 0
+        for doc in candidatos_ref.stream():
+            for indice in range(VOTOS_NUM_SHARDS):
+                if (doc.id, str(indice)) not in existentes:
+                    batch.create(ContadorDistribuido.shard_ref(doc.id, indice), {'votos': 0})
+                    creados += 1
+                    en_batch += 1
+                    if en_batch == MAX_OPERACIONES_BATCH:
+                        batch.commit()
+                        batch, en_batch = get_db().batch(), 0
+        if en_batch:
+            batch.commit()
+        return creados
+
+    @staticmethod
+    def total(candidato_id: str) -> int:
+        """Suma de los shards de un candidato"""
+        docs = candidatos_ref.document(candidato_id).collection(SHARDS_COLLECTION).stream()
+        return sum(doc.to_dict().get('votos', 0) for doc in docs)
+
+    @staticmethod
+    def totales() -> Dict[str, int]:
+        """Suma de shards de todos los candidatos en una sola consulta"""
+        totales: Dict[str, int] = {}
+        for doc in get_db().collection_group(SHARDS_COLLECTION).stream():
+            candidato_id = doc.reference.parent.parent.id
+            totales[candidato_id] = totales.get(candidato_id, 0) + doc.to_dict().get('votos', 0)
+        return totales
+
+    @staticmethod
+    def eliminar(candidato_id: str, batch) -> int:
+        """Agregar al batch el borrado de los shards de un candidato"""
+        eliminados = 0
+        for doc in candidatos_ref.document(candidato_id).collection(SHARDS_COLLECTION).stream():
+            batch.delete(doc.reference)
+            eliminados += 1
+        return eliminados
+
+    # =========================
+    # Versiones async (cliente AsyncClient)
+    # =========================
+
+    @staticmethod
+    async def total_async(candidato_id: str) -> int:
+        """Suma de los shards de un candidato"""
+        shards = candidatos_async_ref.document(candidato_id).collection(SHARDS_COLLECTION)
+        return sum([doc.to_dict().get('votos', 0) async for doc in shards.stream()])
+
+    @staticmethod
+    async def totales_async() -> Dict[str, int]:
+        """Suma de shards de todos los candidatos en una sola consulta"""
+        totales: Dict[str, int] = {}
+        async for doc in get_async_db().collection_group(SHARDS_COLLECTION).stream():
+            candidato_id = doc.reference.parent.parent.id
+            totales[candidato_id] = totales.get(candidato_id, 0) + doc.to_dict().get('votos', 0)
+        return totales
+
+    @staticmethod
+    async def eliminar_async(candidato_id: str, batch) -> int:
+        """Agregar al batch el borrado de los shards de un candidato"""
+        eliminados = 0
+        shards = candidatos_async_ref.document(candidato_id).collection(SHARDS_COLLECTION)
+        async for doc in shards.stream():
+            batch.delete(doc.reference)
+            eliminados += 1
+        return eliminados
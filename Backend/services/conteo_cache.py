@@ -0,0 +1,336 @@
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+from config.firebase import get_db, candidatos_ref
+from services.contador_distribuido import ContadorDistribuido, SHARDS_COLLECTION
+from services.ranking import Ranking, clave_segmento, segmento_con_porcentajes, top_con_margenes
+
+
+class ConteoCache:
+    """Conteo de votos en memoria, alimentado por un listener on_snapshot de Firestore"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._listo = threading.Event()
+        self._candidatos: Dict[str, dict] = {}
+        # Documentos contador (el candidato y sus shards), por ruta
+        self._contadores: Dict[str, dict] = {}
+        self._totales: Dict[str, int] = {}
+        # Incrementos escritos por este proceso que el listener aún no reflejó
+        self._pendientes: Dict[str, dict] = {}
+        # Votos actuales por candidato (confirmados + pendientes) y su ranking
+        self._votos: Dict[str, int] = {}
+        self._ranking = Ranking()
+        # Ranking de cada segmento (cargo, semestre) y el segmento de cada candidato
+        self._segmentos: Dict[Tuple[str, str], Ranking] = {}
+        self._segmento_de: Dict[str, Tuple[str, str]] = {}
+        self._observadores: List[Callable[[], None]] = []
+        self._watches = []
+
+    # =========================
+    # Ciclo de vida del listener
+    # =========================
+
+    def iniciar(self):
+        """Suscribirse a la colección de candidatos (y a sus shards si están activos)"""
+        if self._watches:
+            return
+        self._watches.append(candidatos_ref.on_snapshot(self._on_snapshot))
+        if ContadorDistribuido.activo():
+            self._watches.append(
+                get_db().collection_group(SHARDS_COLLECTION).on_snapshot(self._on_snapshot_shards)
+            )
+
+    def detener(self):
+        """Cancelar las suscripciones y marcar el cache como no disponible"""
+        for watch in self._watches:
+            watch.unsubscribe()
+        self._watches = []
+        self._listo.clear()
+        with self._lock:
+            self._candidatos.clear()
+            self._contadores.clear()
+            self._totales.clear()
+            self._pendientes.clear()
+            self._votos.clear()
+            self._ranking.limpiar()
+            self._segmentos.clear()
+            self._segmento_de.clear()
+
+    @property
+    def listo(self) -> bool:
+        """True cuando el primer snapshot ya fue recibido"""
+        return self._listo.is_set()
+
+    def esperar(self, timeout: float = None) -> bool:
+        """Esperar al primer snapshot"""
+        return self._listo.wait(timeout)
+
+    def agregar_observador(self, callback: Callable[[], None]):
+        """Registrar una función a llamar (desde el hilo del listener) tras cada cambio"""
+        if callback not in self._observadores:
+            self._observadores.append(callback)
+
+    def _notificar(self):
+        for callback in self._observadores:
+            callback()
+
+    def _on_snapshot(self, docs, changes, read_time):
+        """Callback del listener de candidatos (se ejecuta en un hilo del SDK)"""
+        with self._lock:
+            for change in changes:
+                doc = change.document
+                if change.type.name == 'REMOVED':
+                    self._candidatos.pop(doc.id, None)
+                    self._actualizar_contador(doc.reference.path, doc.id, 0, None)
+                    self._reubicar(doc.id)
+                    continue
+
+                data = doc.to_dict() or {}
+                self._candidatos[doc.id] = {
+                    'nombre': data.get('nombre'),
+                    'numero': data.get('numero'),
+                    'cargo': data.get('cargo'),
+                    'semestre': data.get('semestre'),
+                    'imagen': data.get('imagen'),
+                }
+                self._actualizar_contador(
+                    doc.reference.path, doc.id, data.get('votos', 0), doc.update_time
+                )
+                # Un cambio de número también cambia los desempates (y uno de
+                # cargo o semestre, el segmento)
+                self._reubicar(doc.id)
+        self._listo.set()
+        self._notificar()
+
+    def _on_snapshot_shards(self, docs, changes, read_time):
+        """Callback del listener de shards"""
+        with self._lock:
+            for change in changes:
+                doc = change.document
+                candidato_id = doc.reference.parent.parent.id
+                if change.type.name == 'REMOVED':
+                    self._actualizar_contador(doc.reference.path, candidato_id, 0, None)
+                else:
+                    votos = (doc.to_dict() or {}).get('votos', 0)
+                    self._actualizar_contador(doc.reference.path, candidato_id, votos, doc.update_time)
+        self._notificar()
+
+    def _actualizar_contador(self, ruta: str, candidato_id: str, votos: int, update_time):
+        """Aplicar el valor confirmado de un documento contador (requiere el lock)"""
+        anterior = self._contadores.get(ruta)
+        delta = votos - (anterior['votos'] if anterior else 0)
+        descartados = 0
+        if update_time is None:
+            self._contadores.pop(ruta, None)
+            pendientes = self._pendientes.pop(ruta, None)
+            if pendientes:
+                descartados = sum(n for _, n in pendientes['tiempos'])
+        else:
+            self._contadores[ruta] = {
+                'candidato_id': candidato_id,
+                'votos': votos,
+                'update_time': update_time,
+            }
+            # Descartar los incrementos locales que ya vienen incluidos
+            pendientes = self._pendientes.get(ruta)
+            if pendientes:
+                restantes = [(t, n) for t, n in pendientes['tiempos'] if t > update_time]
+                descartados = sum(n for t, n in pendientes['tiempos'] if t <= update_time)
+                if restantes:
+                    pendientes['tiempos'] = restantes
+                else:
+                    del self._pendientes[ruta]
+        self._totales[candidato_id] = self._totales.get(candidato_id, 0) + delta
+        self._sumar(candidato_id, delta - descartados)
+
+    def _sumar(self, candidato_id: str, delta: int):
+        """Aplicar un cambio en los votos actuales de un candidato (requiere el lock)"""
+        if delta:
+            self._votos[candidato_id] = self._votos.get(candidato_id, 0) + delta
+            self._reubicar(candidato_id)
+
+    def _reubicar(self, candidato_id: str):
+        """Llevar al candidato a su puesto en el ranking general y en el de su
+        segmento (requiere el lock)"""
+        data = self._candidatos.get(candidato_id)
+        anterior = self._segmento_de.get(candidato_id)
+        if data is None:
+            self._ranking.quitar(candidato_id)
+            if anterior is not None:
+                self._quitar_de_segmento(candidato_id, anterior)
+            return
+        votos = self._votos.get(candidato_id, 0)
+        self._ranking.actualizar(candidato_id, votos, data['numero'])
+        clave = clave_segmento(data['cargo'], data['semestre'])
+        if anterior != clave:
+            if anterior is not None:
+                self._quitar_de_segmento(candidato_id, anterior)
+            self._segmento_de[candidato_id] = clave
+        segmento = self._segmentos.get(clave)
+        if segmento is None:
+            segmento = self._segmentos[clave] = Ranking()
+        segmento.actualizar(candidato_id, votos, data['numero'])
+
+    def _quitar_de_segmento(self, candidato_id: str, clave: Tuple[str, str]):
+        segmento = self._segmentos[clave]
+        segmento.quitar(candidato_id)
+        del self._segmento_de[candidato_id]
+        if not len(segmento):
+            del self._segmentos[clave]
+
+    # =========================
+    # Escrituras locales
+    # =========================
+
+    def registrar_incremento(self, candidato_id: str, ruta: str, update_time, cantidad: int = 1) -> None:
+        """Reflejar de inmediato `cantidad` votos escritos por este proceso.
+
+        `ruta` es el documento contador escrito (el candidato o uno de sus
+        shards) y `update_time` el de la escritura; cuando el listener entregue
+        una versión igual o posterior de ese documento, el incremento local se
+        descarta.
+        """
+        if update_time is None:
+            return
+        with self._lock:
+            contador = self._contadores.get(ruta)
+            if contador is not None and contador['update_time'] >= update_time:
+                return
+            pendientes = self._pendientes.setdefault(
+                ruta, {'candidato_id': candidato_id, 'tiempos': []}
+            )
+            pendientes['tiempos'].append((update_time, cantidad))
+            self._sumar(candidato_id, cantidad)
+
+    # =========================
+    # Lecturas
+    # =========================
+
+    def _votos_por_candidato(self) -> Dict[str, int]:
+        return {cid: self._votos.get(cid, 0) for cid in self._candidatos}
+
+    def existe(self, candidato_id: str) -> Optional[bool]:
+        """Si el candidato existe; None mientras no llegue el primer snapshot"""
+        if not self.listo:
+            return None
+        with self._lock:
+            return candidato_id in self._candidatos
+
+    def votos(self, candidato_id: str) -> int:
+        """Votos actuales de un candidato"""
+        with self._lock:
+            return self._votos.get(candidato_id, 0) if candidato_id in self._candidatos else 0
+
+    def _ordenados(self) -> List[tuple]:
+        return sorted(
+            self._candidatos.items(),
+            key=lambda item: (item[1]['numero'] is None, item[1]['numero'] or 0, item[0])
+        )
+
+    def get_candidatos(self) -> List[dict]:
+        """Campos en memoria de cada candidato (id, nombre, numero, cargo, imagen, votos), por número"""
+        with self._lock:
+            return [
+                {'id': candidato_id, **data, 'votos': self._votos.get(candidato_id, 0)}
+                for candidato_id, data in self._ordenados()
+            ]
+
+    def get_conteo_votos(self) -> List[dict]:
+        """Mismo formato que CandidatoService.get_conteo_votos"""
+        with self._lock:
+            votos = self._votos_por_candidato()
+            total_votos = sum(votos.values())
+            resultados = []
+            for candidato_id, data in self._ordenados():
+                porcentaje = (votos[candidato_id] / total_votos * 100) if total_votos > 0 else 0
+                resultados.append({
+                    'candidato_id': candidato_id,
+                    'nombre': data['nombre'],
+                    'numero': data['numero'],
+                    'cargo': data['cargo'],
+                    'semestre': data['semestre'],
+                    'imagen': data['imagen'],
+                    'votos': votos[candidato_id],
+                    'porcentaje': round(porcentaje, 2)
+                })
+            return resultados
+
+    def get_estadisticas(self) -> dict:
+        """Mismo formato que CandidatoService.get_estadisticas (el líder sale del ranking)"""
+        candidato_ganador: Optional[str] = None
+        votos_ganador = 0
+
+        with self._lock:
+            total_votos = self._ranking.total
+            total_candidatos = len(self._candidatos)
+            for candidato_id, votos in self._ranking.primeros(1):
+                # Igual que con la colección: sin votos no hay ganador
+                if votos > 0:
+                    candidato_ganador = self._candidatos[candidato_id]['nombre']
+                    votos_ganador = votos
+
+        return {
+            'total_votos': total_votos,
+            'total_candidatos': total_candidatos,
+            'candidato_ganador': candidato_ganador,
+            'votos_ganador': votos_ganador
+        }
+
+    def get_top(self, n: int) -> dict:
+        """Top N del ranking con márgenes (formato de ranking.top_con_margenes)"""
+        with self._lock:
+            total_votos = self._ranking.total
+            filas = []
+            for candidato_id, votos in self._ranking.primeros(n + 1):
+                data = self._candidatos[candidato_id]
+                porcentaje = (votos / total_votos * 100) if total_votos > 0 else 0
+                filas.append({
+                    'candidato_id': candidato_id,
+                    'nombre': data['nombre'],
+                    'numero': data['numero'],
+                    'cargo': data['cargo'],
+                    'semestre': data['semestre'],
+                    'imagen': data['imagen'],
+                    'votos': votos,
+                    'porcentaje': round(porcentaje, 2)
+                })
+            total_candidatos = len(self._candidatos)
+        return top_con_margenes(filas, n, total_votos, total_candidatos)
+
+    def get_segmentos(self, cargo: str = None, semestre: str = None) -> List[dict]:
+        """Resultados de cada segmento (cargo, semestre), solo los del `cargo`
+        y/o `semestre` indicados (formato de ranking.segmento_con_porcentajes).
+
+        Cada segmento sale de su ranking, ya ordenado y con su total: no se
+        recorre ni se ordena el resto de los candidatos.
+        """
+        with self._lock:
+            if cargo is not None and semestre is not None:
+                clave = clave_segmento(cargo, semestre)
+                claves = [clave] if clave in self._segmentos else []
+            else:
+                claves = [
+                    clave for clave in sorted(self._segmentos)
+                    if (cargo is None or clave[0] == cargo) and (semestre is None or clave[1] == semestre)
+                ]
+            resultados = []
+            for clave in claves:
+                segmento = self._segmentos[clave]
+                filas = []
+                for candidato_id, votos in segmento.primeros(len(segmento)):
+                    data = self._candidatos[candidato_id]
+                    filas.append({
+                        'candidato_id': candidato_id,
+                        'nombre': data['nombre'],
+                        'numero': data['numero'],
+                        'cargo': data['cargo'],
+                        'semestre': data['semestre'],
+                        'imagen': data['imagen'],
+                        'votos': votos,
+                    })
+                resultados.append(segmento_con_porcentajes(clave, filas, segmento.total))
+            return resultados
+
+
+# Instancia global del cache de conteo
+conteo_cache = ConteoCache()
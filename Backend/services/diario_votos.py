@@ -0,0 +1,343 @@
+"""Diario local (write-ahead) de los votos aceptados por la ingesta diferida.
+
+Herramienta de recuperación (desde Backend/, con el servidor detenido o con
+ranuras libres):
+    python -m services.diario_votos estado [--dir DIARIO_VOTOS_DIR]
+    python -m services.diario_votos reproducir [--dir DIARIO_VOTOS_DIR]
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Optional
+from config.settings import DIARIO_VOTOS_DIR, DIARIO_SEGMENTO_MB
+from metricas import registro
+
+try:
+    import fcntl
+except ImportError:  # Windows: una sola ranura, sin bloqueo entre procesos
+    fcntl = None
+
+PREFIJO_RANURA = 'ranura-'
+PREFIJO_SEGMENTO = 'votos-'
+EXTENSION_SEGMENTO = '.log'
+ARCHIVO_BLOQUEO = '.lock'
+
+diario_fsync_votos = registro.histograma(
+    'contivotos_diario_fsync_votos', 'Votos anotados en el diario por cada fsync',
+    buckets=(1, 2, 5, 10, 25, 50, 100, 250, 500)
+)
+diario_fsync_segundos = registro.histograma(
+    'contivotos_diario_fsync_segundos', 'Duración de cada escritura + fsync del diario de votos'
+)
+
+
+class DiarioVotos:
+    """Log segmentado, solo de agregado, con fsync agrupado.
+
+    anotar() agrega el voto al buffer y espera el próximo fsync: una sola
+    tarea escribe de una vez todo lo acumulado mientras el fsync anterior
+    estaba en curso, así que con carga cada fsync confirma muchos votos.
+    confirmar() anota (sin esperar el fsync) los recibos ya escritos en
+    Firestore o rechazados; un segmento cerrado sin votos pendientes se borra.
+
+    Cada proceso toma una ranura libre (un subdirectorio bloqueado con flock)
+    para que `uvicorn --workers N` no comparta archivos; al reiniciarse un
+    worker toma una ranura libre y reproduce lo que quedó pendiente en ella.
+    La reproducción es idempotente: los IDs de voto y de correo son
+    deterministas y el voto guarda su recibo (ver IngestaVotos._escribir_uno).
+    """
+
+    def __init__(self, directorio: str = DIARIO_VOTOS_DIR, segmento_max: int = int(DIARIO_SEGMENTO_MB * 2**20),
+                 numero_ranura: int = None):
+        self.directorio = directorio
+        self.segmento_max = max(1, segmento_max)
+        # Ranura fija (la herramienta de recuperación) o None para la primera libre
+        self.numero_ranura = numero_ranura
+        self.ranura: Optional[str] = None
+        self._bloqueo = None
+        self._archivo = None
+        self._segmento = 0
+        self._tamano = 0
+        # Votos sin confirmar por segmento y segmento de cada recibo pendiente
+        self._pendientes: Counter = Counter()
+        self._segmento_de: Dict[str, int] = {}
+        # Líneas por escribir: (bytes, futuro que espera el fsync o None, recibo del voto o None)
+        self._buffer: List[tuple] = []
+        self._despertar: Optional[asyncio.Event] = None
+        self._tarea: Optional[asyncio.Task] = None
+        self._cerrando = False
+
+    def activo(self) -> bool:
+        return bool(self.directorio)
+
+    # =========================
+    # Apertura y recuperación
+    # =========================
+
+    def abrir(self) -> List[dict]:
+        """Tomar una ranura, abrir un segmento nuevo y retornar los votos que
+        quedaron sin confirmar en ella"""
+        if self.numero_ranura is not None:
+            numeros = [self.numero_ranura]
+        else:
+            numeros = range(len(ranuras(self.directorio)) + 1)
+        for numero in numeros:
+            if self._tomar_ranura(numero):
+                break
+        else:
+            raise RuntimeError(f'La ranura {self.numero_ranura} del diario está en uso por otro proceso')
+
+        votos = leer_ranura(self.ranura)
+        self._segmento = max(segmentos(self.ranura), default=0)
+        for voto in votos:
+            segmento = voto.pop('segmento')
+            self._segmento_de[voto['recibo']] = segmento
+            self._pendientes[segmento] += 1
+        self._rotar()
+        self._cerrando = False
+        self._despertar = asyncio.Event()
+        self._tarea = asyncio.create_task(self._bucle())
+        return votos
+
+    def _tomar_ranura(self, numero: int) -> bool:
+        ruta = os.path.join(self.directorio, f'{PREFIJO_RANURA}{numero}')
+        os.makedirs(ruta, exist_ok=True)
+        bloqueo = open(os.path.join(ruta, ARCHIVO_BLOQUEO), 'a')
+        if fcntl is not None:
+            try:
+                fcntl.flock(bloqueo, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                bloqueo.close()
+                return False
+        self.ranura, self._bloqueo = ruta, bloqueo
+        return True
+
+    async def detener(self):
+        """Escribir lo que quede en el buffer, cerrar y liberar la ranura"""
+        if self._tarea is None:
+            return
+        self._cerrando = True
+        self._despertar.set()
+        await self._tarea
+        self._tarea = None
+        self._archivo.close()
+        self._archivo = None
+        if not sum(self._pendientes.values()):
+            # Todo quedó en Firestore: la ranura queda vacía
+            for numero in segmentos(self.ranura):
+                os.remove(ruta_segmento(self.ranura, numero))
+        self._pendientes.clear()
+        self._segmento_de.clear()
+        self._bloqueo.close()
+        self._bloqueo = None
+
+    # =========================
+    # Escritura
+    # =========================
+
+    async def anotar(self, voto: dict):
+        """Agregar el voto al diario; retorna cuando ya está en disco"""
+        futuro = asyncio.get_running_loop().create_future()
+        self._agregar(dict(voto, tipo='voto'), futuro, voto['recibo'])
+        await futuro
+
+    def confirmar(self, recibos: List[str]):
+        """Marcar votos como resueltos (escritos en Firestore o rechazados)"""
+        for recibo in recibos:
+            segmento = self._segmento_de.pop(recibo, None)
+            if segmento is not None:
+                self._pendientes[segmento] -= 1
+        self._agregar({'tipo': 'fin', 'recibos': list(recibos)})
+        self._purgar()
+
+    def pendientes(self) -> int:
+        return len(self._segmento_de)
+
+    def _agregar(self, registro_: dict, futuro: asyncio.Future = None, recibo: str = None):
+        linea = json.dumps(registro_, default=_serializar, separators=(',', ':')).encode('utf-8') + b'\n'
+        self._buffer.append((linea, futuro, recibo))
+        self._despertar.set()
+
+    async def _bucle(self):
+        while True:
+            await self._despertar.wait()
+            self._despertar.clear()
+            while self._buffer:
+                await self._escribir_buffer()
+            if self._cerrando:
+                return
+
+    async def _escribir_buffer(self):
+        grupo, self._buffer = self._buffer, []
+        segmento = self._segmento
+        inicio = time.perf_counter()
+        try:
+            await asyncio.to_thread(self._escribir, b''.join(linea for linea, _, _ in grupo))
+        except Exception as e:
+            for _, futuro, _ in grupo:
+                if futuro is not None and not futuro.done():
+                    futuro.set_exception(e)
+            return
+        diario_fsync_segundos.observar(time.perf_counter() - inicio)
+
+        anotados = 0
+        for _, futuro, recibo in grupo:
+            if recibo is not None:
+                self._segmento_de[recibo] = segmento
+                self._pendientes[segmento] += 1
+                anotados += 1
+            if futuro is not None and not futuro.done():
+                futuro.set_result(None)
+        if anotados:
+            diario_fsync_votos.observar(anotados)
+        if self._tamano >= self.segmento_max:
+            self._rotar()
+            self._purgar()
+
+    def _escribir(self, datos: bytes):
+        """write + fsync (en un hilo, fuera del event loop)"""
+        self._archivo.write(datos)
+        self._archivo.flush()
+        os.fsync(self._archivo.fileno())
+        self._tamano += len(datos)
+
+    def _rotar(self):
+        """Cerrar el segmento actual y empezar el siguiente"""
+        if self._archivo is not None:
+            self._archivo.close()
+        self._segmento += 1
+        self._archivo = open(ruta_segmento(self.ranura, self._segmento), 'ab')
+        self._tamano = 0
+        self._pendientes.setdefault(self._segmento, 0)
+        _fsync_directorio(self.ranura)
+
+    def _purgar(self):
+        """Borrar los segmentos cerrados cuyos votos ya se resolvieron"""
+        for segmento in [s for s, n in self._pendientes.items() if n <= 0 and s < self._segmento]:
+            del self._pendientes[segmento]
+            try:
+                os.remove(ruta_segmento(self.ranura, segmento))
+            except FileNotFoundError:
+                pass
+
+
+# =========================
+# Lectura de ranuras y segmentos
+# =========================
+
+def ranuras(directorio: str) -> List[str]:
+    if not os.path.isdir(directorio):
+        return []
+    nombres = [n for n in os.listdir(directorio) if n.startswith(PREFIJO_RANURA)]
+    return sorted((os.path.join(directorio, n) for n in nombres), key=_numero)
+
+
+def segmentos(ranura: str) -> List[int]:
+    nombres = os.listdir(ranura) if os.path.isdir(ranura) else []
+    return sorted(
+        int(n[len(PREFIJO_SEGMENTO):-len(EXTENSION_SEGMENTO)]) for n in nombres
+        if n.startswith(PREFIJO_SEGMENTO) and n.endswith(EXTENSION_SEGMENTO)
+    )
+
+
+def ruta_segmento(ranura: str, numero: int) -> str:
+    return os.path.join(ranura, f'{PREFIJO_SEGMENTO}{numero:08d}{EXTENSION_SEGMENTO}')
+
+
+def leer_ranura(ranura: str) -> List[dict]:
+    """Votos anotados y no confirmados, en orden, con el segmento de cada uno.
+
+    Una línea incompleta al final de un segmento (caída durante un write) se
+    descarta: su voto nunca se confirmó al cliente.
+    """
+    votos: Dict[str, dict] = {}
+    for numero in segmentos(ranura):
+        with open(ruta_segmento(ranura, numero), 'rb') as archivo:
+            for linea in archivo:
+                try:
+                    registro_ = json.loads(linea)
+                except ValueError:
+                    continue
+                if registro_.get('tipo') == 'voto':
+                    registro_.pop('tipo')
+                    registro_['fecha'] = datetime.fromisoformat(registro_['fecha'])
+                    registro_['segmento'] = numero
+                    votos[registro_['recibo']] = registro_
+                elif registro_.get('tipo') == 'fin':
+                    for recibo in registro_['recibos']:
+                        votos.pop(recibo, None)
+    return list(votos.values())
+
+
+def _numero(ruta: str) -> int:
+    return int(os.path.basename(ruta)[len(PREFIJO_RANURA):])
+
+
+def _serializar(valor):
+    if isinstance(valor, datetime):
+        return valor.isoformat()
+    raise TypeError(f'{type(valor).__name__} no es serializable')
+
+
+def _fsync_directorio(ruta: str):
+    """Que la creación del segmento también sobreviva a una caída"""
+    if not hasattr(os, 'O_DIRECTORY'):
+        return
+    fd = os.open(ruta, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+# Instancia global del diario (desactivado si DIARIO_VOTOS_DIR está vacío)
+diario_votos = DiarioVotos()
+
+registro.medidor(
+    'contivotos_diario_pendientes', 'Votos del diario local aún no escritos en Firestore',
+    diario_votos.pendientes
+)
+
+
+# =========================
+# Herramienta de recuperación
+# =========================
+
+async def reproducir(directorio: str):
+    """Escribir en Firestore los votos pendientes de todas las ranuras libres"""
+    from services.ingesta_votos import IngestaVotos
+
+    for ruta in ranuras(directorio):
+        ingesta = IngestaVotos(modo='diferida', diario=DiarioVotos(directorio, numero_ranura=_numero(ruta)))
+        try:
+            recuperados = ingesta.iniciar()
+        except RuntimeError as e:
+            print(f"{ruta}: {e}")
+            continue
+        while ingesta.pendientes():
+            print(f"{ruta}: {ingesta.pendientes()} votos por escribir")
+            await asyncio.sleep(1)
+        await ingesta.detener()
+        print(f"{ruta}: {recuperados} votos reproducidos")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Estado y reproducción del diario local de votos')
+    parser.add_argument('accion', choices=('estado', 'reproducir'))
+    parser.add_argument('--dir', default=DIARIO_VOTOS_DIR or 'diario_votos')
+    args = parser.parse_args()
+
+    if args.accion == 'estado':
+        for ruta in ranuras(args.dir):
+            votos = leer_ranura(ruta)
+            print(f"{ruta}: {len(segmentos(ruta))} segmentos, {len(votos)} votos sin confirmar")
+    else:
+        asyncio.run(reproducir(args.dir))
+
+
+if __name__ == '__main__':
+    main()
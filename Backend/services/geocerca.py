@@ -0,0 +1,298 @@
+import math
+from typing import Dict, List, Optional, Sequence, Tuple
+from config.settings import GEOCERCAS, GEOCERCAS_CELDA_GRADOS
+from metricas import registro
+
+# Radio medio de la Tierra en metros
+RADIO_TIERRA = 6371000.0
+# Metros por grado de latitud
+METROS_POR_GRADO = RADIO_TIERRA * math.pi / 180
+
+
+class Circulo:
+    """Campus definido por un centro y un radio en metros.
+
+    El centro se guarda en radianes junto con su coseno, y el radio como el
+    término de Haversine que le corresponde (`a_max`): un punto está dentro
+    si su término no lo supera, sin sqrt ni atan2.
+    """
+
+    def __init__(self, campus: str, lat: float, lng: float, radio_m: float):
+        if radio_m <= 0:
+            raise ValueError(f"Radio de geocerca inválido para {campus!r}: {radio_m}")
+        self.campus = campus
+        self.lat, self.lng, self.radio_m = lat, lng, radio_m
+        self.lat_rad = math.radians(lat)
+        self.lng_rad = math.radians(lng)
+        self.cos_lat = math.cos(self.lat_rad)
+        self.a_max = math.sin(min(radio_m / RADIO_TIERRA, math.pi) / 2) ** 2
+        # Caja en grados para el índice (el coseno más chico de la caja ensancha la longitud)
+        margen_lat = radio_m / METROS_POR_GRADO
+        cos_min = max(math.cos(math.radians(min(abs(lat) + margen_lat, 89.9))), 1e-6)
+        margen_lng = min(radio_m / (METROS_POR_GRADO * cos_min), 180.0)
+        self.caja = (lat - margen_lat, lng - margen_lng, lat + margen_lat, lng + margen_lng)
+
+    def termino(self, lat_rad: float, lng_rad: float, cos_lat: float) -> float:
+        """Término `a` de Haversine hasta el centro (punto ya en radianes)"""
+        return (math.sin((lat_rad - self.lat_rad) / 2) ** 2
+                + self.cos_lat * cos_lat * math.sin((lng_rad - self.lng_rad) / 2) ** 2)
+
+    def distancia(self, lat_rad: float, lng_rad: float, cos_lat: float) -> float:
+        """Metros hasta el centro"""
+        a = min(1.0, self.termino(lat_rad, lng_rad, cos_lat))
+        return 2 * RADIO_TIERRA * math.asin(math.sqrt(a))
+
+
+class Poligono:
+    """Campus definido por sus vértices (lat, lng), en orden.
+
+    Los vértices se proyectan a metros en un plano tangente al centro de su
+    caja (a escala de un campus el error es de centímetros) y la pertenencia
+    se decide con ray casting sobre las aristas ya proyectadas.
+    """
+
+    def __init__(self, campus: str, vertices: Sequence[Tuple[float, float]]):
+        if len(vertices) < 3:
+            raise ValueError(f"La geocerca {campus!r} necesita al menos 3 vértices")
+        self.campus = campus
+        lats = [v[0] for v in vertices]
+        lngs = [v[1] for v in vertices]
+        self.caja = (min(lats), min(lngs), max(lats), max(lngs))
+        self.lat0 = (self.caja[0] + self.caja[2]) / 2
+        self.lng0 = (self.caja[1] + self.caja[3]) / 2
+        self.escala_lng = METROS_POR_GRADO * math.cos(math.radians(self.lat0))
+        puntos = [self._proyectar(lat, lng) for lat, lng in vertices]
+        # (x1, y1, x2, y2) de cada arista
+        self.aristas = [(*puntos[i - 1], *puntos[i]) for i in range(len(puntos))]
+        # Círculo que lo envuelve: cota inferior barata de la distancia al polígono
+        self.envolvente = Circulo(campus, self.lat0, self.lng0, max(1.0, max(math.hypot(x, y) for x, y in puntos)))
+
+    def _proyectar(self, lat: float, lng: float) -> Tuple[float, float]:
+        return (lng - self.lng0) * self.escala_lng, (lat - self.lat0) * METROS_POR_GRADO
+
+    def contiene_grados(self, lat: float, lng: float) -> bool:
+        if not (self.caja[0] <= lat <= self.caja[2] and self.caja[1] <= lng <= self.caja[3]):
+            return False
+        x, y = self._proyectar(lat, lng)
+        dentro = False
+        for x1, y1, x2, y2 in self.aristas:
+            if (y1 > y) != (y2 > y) and x < x1 + (y - y1) * (x2 - x1) / (y2 - y1):
+                dentro = not dentro
+        return dentro
+
+    def al_borde_grados(self, lat: float, lng: float) -> float:
+        """Metros hasta el polígono (0 dentro)"""
+        if self.contiene_grados(lat, lng):
+            return 0.0
+        x, y = self._proyectar(lat, lng)
+        minima = math.inf
+        for x1, y1, x2, y2 in self.aristas:
+            dx, dy = x2 - x1, y2 - y1
+            largo = dx * dx + dy * dy
+            t = 0.0 if largo == 0 else max(0.0, min(1.0, ((x - x1) * dx + (y - y1) * dy) / largo))
+            minima = min(minima, math.hypot(x - x1 - t * dx, y - y1 - t * dy))
+        return minima
+
+
+def leer_geocercas(texto: str) -> list:
+    """Geocercas de GEOCERCAS: `campus|lat,lng|radio_m` o `campus|lat,lng lat,lng lat,lng ...`, separadas por ';'"""
+    cercas = []
+    for parte in texto.split(';'):
+        parte = parte.strip()
+        if not parte:
+            continue
+        try:
+            campos = [campo.strip() for campo in parte.split('|')]
+            campus = campos[0]
+            puntos = [tuple(float(c) for c in punto.split(',')) for punto in campos[1].split()]
+            if any(len(punto) != 2 for punto in puntos) or not campus:
+                raise ValueError()
+            if len(campos) == 3 and len(puntos) == 1:
+                cercas.append(Circulo(campus, puntos[0][0], puntos[0][1], float(campos[2])))
+            elif len(campos) == 2:
+                cercas.append(Poligono(campus, puntos))
+            else:
+                raise ValueError()
+        except (ValueError, IndexError) as e:
+            raise ValueError(f"Geocerca inválida: {parte!r} {e}".rstrip())
+    return cercas
+
+
+class Geocerca:
+    """Verificación de coordenadas contra las geocercas de todos los campus.
+
+    Las geocercas (círculos y polígonos) se reparten en una grilla de celdas
+    de `celda` grados según su caja: cada punto mira solo las geocercas de
+    su celda, así que el costo no crece con el número de campus y un punto
+    lejos de todos se descarta con una búsqueda en un dict. La distancia al
+    campus solo se calcula si se pide (la respuesta de verificar-ubicacion
+    la incluye); fuera de todos, la del más cercano recorre las geocercas y
+    descarta los polígonos por su círculo envolvente.
+
+    Sin geocercas configuradas no se restringe la ubicación.
+    """
+
+    def __init__(self, cercas: Optional[list] = None, celda: float = GEOCERCAS_CELDA_GRADOS):
+        if celda <= 0:
+            raise ValueError(f"Tamaño de celda de geocerca inválido: {celda}")
+        self.celda = celda
+        self.cercas = leer_geocercas(GEOCERCAS) if cercas is None else cercas
+        # (fila, columna) -> geocercas cuya caja toca la celda
+        self._grilla: Dict[Tuple[int, int], tuple] = {}
+        for cerca in self.cercas:
+            lat_min, lng_min, lat_max, lng_max = cerca.caja
+            for fila in range(math.floor(lat_min / celda), math.floor(lat_max / celda) + 1):
+                for columna in range(math.floor(lng_min / celda), math.floor(lng_max / celda) + 1):
+                    self._grilla[fila, columna] = self._grilla.get((fila, columna), ()) + (cerca,)
+        # Coordenadas por resultado (se exponen en /metrics sin un lock por verificación)
+        self.resultados: Dict[str, int] = {'dentro': 0, 'fuera': 0}
+
+    def celdas(self) -> int:
+        return len(self._grilla)
+
+    def verificar(self, lat: float, lng: float, con_distancia: bool = True) -> Tuple[bool, Optional[str], Optional[float]]:
+        """(dentro, campus, metros) para una coordenada.
+
+        `campus` es el que contiene el punto o, si está fuera, el más cercano;
+        los metros son hasta su centro (círculos) o hasta su borde (polígonos).
+        """
+        if not self.cercas:
+            self.resultados['dentro'] += 1
+            return True, None, None
+        if not con_distancia:
+            cerca = self._contenedora(lat, lng)
+            self.resultados['fuera' if cerca is None else 'dentro'] += 1
+            return cerca is not None, cerca.campus if cerca is not None else None, None
+        dentro, cerca, metros = self._ubicar(lat, lng)
+        self.resultados['dentro' if dentro else 'fuera'] += 1
+        return dentro, cerca.campus, metros
+
+    def verificar_lote(
+        self, lats: Sequence[float], lngs: Sequence[float], con_distancia: bool = False
+    ) -> Tuple[List[bool], List[Optional[str]], Optional[List[Optional[float]]]]:
+        """Columnas (dentro, campus, metros) para columnas de coordenadas.
+
+        Un solo recorrido por la grilla: los puntos de celdas sin geocercas
+        (la mayoría, lejos de todo campus) no pasan de la búsqueda en el
+        dict. Los metros son None si no se piden.
+        """
+        n = len(lats)
+        if len(lngs) != n:
+            raise ValueError("lat y lng deben tener el mismo largo")
+        if not self.cercas:
+            self.resultados['dentro'] += n
+            return [True] * n, [None] * n, [None] * n if con_distancia else None
+
+        if con_distancia:
+            return self._ubicar_lote(lats, lngs)
+
+        contenedoras = [None] * n
+        celda, grilla, contenedora = self.celda, self._grilla, self._contenedora
+        floor = math.floor
+        for i in range(n):
+            lat, lng = lats[i], lngs[i]
+            cercas = grilla.get((floor(lat / celda), floor(lng / celda)))
+            if cercas is not None:
+                contenedoras[i] = contenedora(lat, lng, cercas)
+
+        dentro = [cerca is not None for cerca in contenedoras]
+        adentro = sum(dentro)
+        self.resultados['dentro'] += adentro
+        self.resultados['fuera'] += n - adentro
+        return dentro, [cerca.campus if cerca is not None else None for cerca in contenedoras], None
+
+    def _ubicar_lote(self, lats: Sequence[float], lngs: Sequence[float]) -> tuple:
+        n = len(lats)
+        dentro: List[bool] = [False] * n
+        campus: List[Optional[str]] = [None] * n
+        distancias: List[Optional[float]] = [None] * n
+        ubicar = self._ubicar
+        for i in range(n):
+            adentro, cerca, distancias[i] = ubicar(lats[i], lngs[i])
+            dentro[i], campus[i] = adentro, cerca.campus
+        adentro = sum(dentro)
+        self.resultados['dentro'] += adentro
+        self.resultados['fuera'] += n - adentro
+        return dentro, campus, distancias
+
+    def _contenedora(self, lat: float, lng: float, cercas: Optional[tuple] = None):
+        """La geocerca que contiene el punto (None si ninguna); `cercas` son las de su celda"""
+        if cercas is None:
+            cercas = self._grilla.get((math.floor(lat / self.celda), math.floor(lng / self.celda)))
+            if cercas is None:
+                return None
+        lat_rad = None
+        for cerca in cercas:
+            if type(cerca) is Circulo:
+                if lat_rad is None:
+                    lat_rad, lng_rad = math.radians(lat), math.radians(lng)
+                    cos_lat = math.cos(lat_rad)
+                if (math.sin((lat_rad - cerca.lat_rad) / 2) ** 2
+                        + cerca.cos_lat * cos_lat * math.sin((lng_rad - cerca.lng_rad) / 2) ** 2) <= cerca.a_max:
+                    return cerca
+            elif cerca.contiene_grados(lat, lng):
+                return cerca
+        return None
+
+    def _ubicar(self, lat: float, lng: float) -> tuple:
+        """(dentro, geocerca, metros): la que contiene el punto o la más cercana a su borde.
+
+        Los radianes y el coseno del punto se calculan una vez, y la
+        distancia al círculo que lo contiene sale del mismo término `a` con
+        que se decidió que está dentro.
+        """
+        sin, asin, sqrt = math.sin, math.asin, math.sqrt
+        lat_rad = math.radians(lat)
+        lng_rad, cos_lat = math.radians(lng), math.cos(lat_rad)
+        cercas = self._grilla.get((math.floor(lat / self.celda), math.floor(lng / self.celda)))
+        if cercas is not None:
+            for cerca in cercas:
+                if type(cerca) is Circulo:
+                    s_lat = sin((lat_rad - cerca.lat_rad) / 2)
+                    s_lng = sin((lng_rad - cerca.lng_rad) / 2)
+                    a = s_lat * s_lat + cerca.cos_lat * cos_lat * s_lng * s_lng
+                    if a <= cerca.a_max:
+                        return True, cerca, 2 * RADIO_TIERRA * asin(sqrt(a))
+                elif cerca.contiene_grados(lat, lng):
+                    return True, cerca, 0.0
+
+        # Fuera de todas: la más cercana a su borde
+        mejor, al_borde, metros = None, math.inf, 0.0
+        poligonos = None
+        for cerca in self.cercas:
+            if type(cerca) is Circulo:
+                s_lat = sin((lat_rad - cerca.lat_rad) / 2)
+                s_lng = sin((lng_rad - cerca.lng_rad) / 2)
+                a = s_lat * s_lat + cerca.cos_lat * cos_lat * s_lng * s_lng
+                distancia = 2 * RADIO_TIERRA * asin(sqrt(min(1.0, a)))
+                if distancia - cerca.radio_m < al_borde:
+                    mejor, al_borde, metros = cerca, distancia - cerca.radio_m, distancia
+            else:
+                envolvente = cerca.envolvente
+                cota = envolvente.distancia(lat_rad, lng_rad, cos_lat) - envolvente.radio_m
+                poligonos = poligonos or []
+                poligonos.append((cota, id(cerca), cerca))
+        if poligonos:
+            # Del más prometedor al menos; se cortan cuando su cota ya no mejora
+            for cota, _, cerca in sorted(poligonos):
+                if cota >= al_borde:
+                    break
+                distancia = cerca.al_borde_grados(lat, lng)
+                if distancia < al_borde:
+                    mejor, al_borde, metros = cerca, distancia, distancia
+        return False, mejor, metros
+
+
+# Instancia global de las geocercas de los campus
+geocerca = Geocerca()
+
+registro.medidor(
+    'contivotos_geocerca_verificaciones_total',
+    'Coordenadas verificadas contra las geocercas por resultado (dentro, fuera)',
+    lambda: {(resultado,): n for resultado, n in geocerca.resultados.items()},
+    ('resultado',), tipo='counter'
+)
+registro.medidor(
+    'contivotos_geocercas', 'Geocercas de campus configuradas',
+    lambda: len(geocerca.cercas)
+)
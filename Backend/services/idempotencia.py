@@ -0,0 +1,137 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Hashable, Optional, Tuple
+from config.settings import IDEMPOTENCIA_MAX_RESPUESTAS, IDEMPOTENCIA_TTL_S
+from metricas import registro
+
+# Largo máximo de una Idempotency-Key (un UUID ocupa 36)
+MAX_LARGO_CLAVE = 255
+
+idempotencia_total = registro.contador(
+    'contivotos_idempotencia_total',
+    'Peticiones con Idempotency-Key por resultado (nueva, repetida, en_curso, conflicto)',
+    ('resultado',)
+)
+
+
+class ClaveReutilizada(Exception):
+    """La Idempotency-Key ya se usó con otra petición"""
+
+
+class RespuestasIdempotentes:
+    """Respuestas ya dadas a peticiones con `Idempotency-Key`, por cuenta y clave.
+
+    El primer pedido con una clave se ejecuta y su (código, cuerpo) se guarda
+    `ttl` segundos, hasta `max_respuestas` con desalojo LRU; los reintentos
+    con la misma clave reciben esa respuesta sin validar ni escribir nada
+    otra vez. Un reintento que llega mientras el primero sigue en curso
+    espera su resultado. Solo se guardan los resultados definitivos (2xx y
+    los rechazos 4xx); los errores 5xx, como Firestore sin responder, no
+    (el reintento vuelve a intentarlo). Las claves son por cuenta: la misma
+    clave en otra cuenta es otra petición. Cada respuesta guarda la `huella`
+    de la petición: la misma clave con otra petición es un error del cliente.
+
+    Las respuestas nuevas se pasan a `al_guardar` (el backplane) para que
+    los demás workers también las reconozcan.
+    """
+
+    def __init__(self, ttl: float = IDEMPOTENCIA_TTL_S, max_respuestas: int = IDEMPOTENCIA_MAX_RESPUESTAS):
+        self.ttl = ttl
+        self.max_respuestas = max_respuestas
+        # (cuenta, clave) -> (vence, huella, código, cuerpo), del menos al más recientemente usado
+        self._respuestas: 'OrderedDict[Tuple[str, str], Tuple[float, Hashable, int, dict]]' = OrderedDict()
+        self._en_curso: Dict[Tuple[str, str], Tuple[Hashable, asyncio.Future]] = {}
+        self.al_guardar: Optional[Callable[[dict], None]] = None
+
+    def iniciar(self, al_guardar: Callable[[dict], None] = None):
+        self.al_guardar = al_guardar
+
+    def conocida(self, cuenta: str, clave: str) -> bool:
+        """Si la clave de la cuenta tiene una respuesta guardada o una petición en curso"""
+        return (cuenta, clave) in self._en_curso or self._leer((cuenta, clave)) is not None
+
+    async def resolver(
+        self, cuenta: str, clave: str, huella: Hashable, producir: Callable[[], Awaitable[Tuple[int, dict]]]
+    ) -> Tuple[int, dict, bool]:
+        """(código, cuerpo, repetida) para la petición con `clave` de `cuenta`"""
+        clave = (cuenta, clave)
+        guardada = self._leer(clave)
+        if guardada is not None:
+            if guardada[1] != huella:
+                idempotencia_total.inc('conflicto')
+                raise ClaveReutilizada()
+            idempotencia_total.inc('repetida')
+            return guardada[2], guardada[3], True
+
+        en_curso = self._en_curso.get(clave)
+        if en_curso is not None:
+            if en_curso[0] != huella:
+                idempotencia_total.inc('conflicto')
+                raise ClaveReutilizada()
+            idempotencia_total.inc('en_curso')
+            codigo, cuerpo = await asyncio.shield(en_curso[1])
+            return codigo, cuerpo, True
+
+        idempotencia_total.inc('nueva')
+        futuro = asyncio.ensure_future(self._producir(clave, huella, producir))
+        self._en_curso[clave] = (huella, futuro)
+        # shield: si el cliente se desconecta, el voto termina y queda guardado
+        codigo, cuerpo = await asyncio.shield(futuro)
+        return codigo, cuerpo, False
+
+    async def _producir(self, clave: Tuple[str, str], huella: Hashable, producir) -> Tuple[int, dict]:
+        try:
+            codigo, cuerpo = await producir()
+        finally:
+            del self._en_curso[clave]
+        if codigo < 500:
+            self.guardar(clave, huella, codigo, cuerpo)
+            if self.al_guardar is not None:
+                self.al_guardar({
+                    'tipo': 'idempotencia', 'clave': list(clave), 'huella': list(huella),
+                    'codigo': codigo, 'cuerpo': cuerpo,
+                })
+        return codigo, cuerpo
+
+    def guardar(self, clave: Tuple[str, str], huella: Hashable, codigo: int, cuerpo: dict):
+        ahora = time.monotonic()
+        self._respuestas[clave] = (ahora + self.ttl, huella, codigo, cuerpo)
+        self._respuestas.move_to_end(clave)
+        # Las del frente son las menos usadas: se van las vencidas y lo que sobre
+        while self._respuestas:
+            primera = next(iter(self._respuestas.values()))
+            if len(self._respuestas) <= self.max_respuestas and primera[0] > ahora:
+                break
+            self._respuestas.popitem(last=False)
+
+    def _leer(self, clave: Tuple[str, str]) -> Optional[Tuple[float, Hashable, int, dict]]:
+        guardada = self._respuestas.get(clave)
+        if guardada is None:
+            return None
+        if guardada[0] <= time.monotonic():
+            del self._respuestas[clave]
+            return None
+        self._respuestas.move_to_end(clave)
+        return guardada
+
+    def on_evento(self, evento: dict, local: bool):
+        """Evento del backplane: respuestas de otros workers y reinicios"""
+        tipo = evento.get('tipo')
+        if tipo == 'idempotencia' and not local:
+            self.guardar(tuple(evento['clave']), tuple(evento['huella']), evento['codigo'], evento['cuerpo'])
+        elif tipo == 'reinicio':
+            # Los votos se borraron: las respuestas guardadas ya no valen
+            self._respuestas.clear()
+
+    def __len__(self) -> int:
+        return len(self._respuestas)
+
+
+# Instancia global de las respuestas idempotentes
+respuestas_idempotentes = RespuestasIdempotentes()
+
+registro.medidor(
+    'contivotos_idempotencia_respuestas', 'Respuestas guardadas para reintentos con Idempotency-Key',
+    lambda: len(respuestas_idempotentes)
+)
@@ -0,0 +1,208 @@
+import hashlib
+import math
+import sys
+import threading
+from typing import Dict, Optional
+from config.firebase import votos_correos_ref
+from config.settings import INDICE_VOTANTES, INDICE_VOTANTES_CAPACIDAD
+from metricas import registro
+
+# Colecciones indexadas: IDs de documento de voto (sha256 del userId) y de
+# reserva de correo (sha256 del correo), ver voto_id y correo_id
+VOTOS = 'votos'
+CORREOS = 'votos_correos'
+
+FALSOS_POSITIVOS_BLOOM = 0.01
+
+
+def _clave(doc_id: str) -> int:
+    """Hash de 128 bits del ID de documento (los primeros 64 bastan en el conjunto)"""
+    return int.from_bytes(hashlib.blake2b(doc_id.encode('utf-8'), digest_size=16).digest(), 'big')
+
+
+class FiltroBloom:
+    """Filtro de Bloom de tamaño fijo: sin falsos negativos, sin borrados"""
+
+    def __init__(self, capacidad: int, falsos_positivos: float = FALSOS_POSITIVOS_BLOOM):
+        capacidad = max(1, capacidad)
+        self.bits = max(64, math.ceil(-capacidad * math.log(falsos_positivos) / math.log(2) ** 2))
+        self.k = max(1, round(self.bits / capacidad * math.log(2)))
+        self._mapa = bytearray((self.bits + 7) // 8)
+        self.agregados = 0
+
+    def _posiciones(self, clave: int):
+        # Doble hashing (Kirsch-Mitzenmacher) sobre las dos mitades de la clave
+        h1, h2 = clave >> 64, (clave & 0xFFFFFFFFFFFFFFFF) | 1
+        return [(h1 + i * h2) % self.bits for i in range(self.k)]
+
+    def agregar(self, clave: int):
+        for posicion in self._posiciones(clave):
+            self._mapa[posicion >> 3] |= 1 << (posicion & 7)
+        self.agregados += 1
+
+    def __contains__(self, clave: int) -> bool:
+        return all(self._mapa[p >> 3] & (1 << (p & 7)) for p in self._posiciones(clave))
+
+    def __len__(self) -> int:
+        return self.agregados
+
+    def memoria(self) -> int:
+        return sys.getsizeof(self._mapa)
+
+
+class _Conjunto:
+    """Claves de 64 bits en un set; admite borrados"""
+
+    def __init__(self):
+        self._claves = set()
+
+    def agregar(self, clave: int):
+        self._claves.add(clave >> 64)
+
+    def quitar(self, clave: int):
+        self._claves.discard(clave >> 64)
+
+    def __contains__(self, clave: int) -> bool:
+        return (clave >> 64) in self._claves
+
+    def __len__(self) -> int:
+        return len(self._claves)
+
+    def memoria(self) -> int:
+        # La tabla del set más un int de 64 bits por clave
+        return sys.getsizeof(self._claves) + len(self._claves) * sys.getsizeof(1 << 63)
+
+
+class IndiceVotantes:
+    """Quién ya votó, en memoria, para responder las verificaciones sin Firestore.
+
+    Un listener on_snapshot sobre votos_correos lo carga con el snapshot
+    inicial y lo mantiene al día: cada reserva aporta su ID (el correo) y su
+    campo voto_id (el userId), los dos ya hasheados. Los votos de este
+    proceso se agregan al confirmarse su batch.
+
+    Modos (INDICE_VOTANTES):
+    - conjunto: responde "sí" y "no" sin round trips; los borrados (reinicio
+      de la elección) llegan por el listener.
+    - bloom: un filtro de Bloom por colección (~1,2 bytes por votante); un
+      "no" es seguro y un "quizás" se confirma en Firestore. Como no admite
+      borrados, se vacía cuando el listener informa que no quedan reservas.
+    - desactivado: toda verificación va a Firestore.
+    """
+
+    def __init__(self, modo: str = INDICE_VOTANTES, capacidad: int = INDICE_VOTANTES_CAPACIDAD):
+        if modo not in ('conjunto', 'bloom', 'desactivado'):
+            raise ValueError(f'Modo de índice de votantes desconocido: {modo}')
+        self.modo = modo
+        self.capacidad = capacidad
+        self._lock = threading.Lock()
+        self._listo = threading.Event()
+        self._reservas = 0
+        self._indices: Dict[str, object] = {}
+        self._watch = None
+        self._vaciar()
+
+    def _vaciar(self):
+        if self.modo == 'bloom':
+            self._indices = {VOTOS: FiltroBloom(self.capacidad), CORREOS: FiltroBloom(self.capacidad)}
+        else:
+            self._indices = {VOTOS: _Conjunto(), CORREOS: _Conjunto()}
+
+    # =========================
+    # Ciclo de vida del listener
+    # =========================
+
+    def iniciar(self):
+        """Suscribirse a votos_correos (el snapshot inicial carga el índice)"""
+        if self.modo == 'desactivado' or self._watch is not None:
+            return
+        self._watch = votos_correos_ref.on_snapshot(self._on_snapshot)
+
+    def detener(self):
+        if self._watch is not None:
+            self._watch.unsubscribe()
+            self._watch = None
+        self._listo.clear()
+        with self._lock:
+            self._reservas = 0
+            self._vaciar()
+
+    @property
+    def listo(self) -> bool:
+        """True cuando el primer snapshot ya fue recibido"""
+        return self._listo.is_set()
+
+    def esperar(self, timeout: float = None) -> bool:
+        return self._listo.wait(timeout)
+
+    def _on_snapshot(self, docs, changes, read_time):
+        """Callback del listener (se ejecuta en un hilo del SDK)"""
+        with self._lock:
+            for change in changes:
+                doc = change.document
+                voto = (doc.to_dict() or {}).get('voto_id')
+                if change.type.name == 'REMOVED':
+                    self._reservas = max(0, self._reservas - 1)
+                    if self.modo == 'conjunto':
+                        self._indices[CORREOS].quitar(_clave(doc.id))
+                        if voto:
+                            self._indices[VOTOS].quitar(_clave(voto))
+                    continue
+                if change.type.name == 'ADDED':
+                    self._reservas += 1
+                self._indices[CORREOS].agregar(_clave(doc.id))
+                if voto:
+                    self._indices[VOTOS].agregar(_clave(voto))
+            if self.modo == 'bloom' and self._reservas == 0:
+                # Elección reiniciada: el filtro no admite borrados
+                self._vaciar()
+        self._listo.set()
+
+    # =========================
+    # Consultas
+    # =========================
+
+    def consultar(self, coleccion: str, doc_id: str) -> Optional[bool]:
+        """¿Existe el documento `doc_id` de votos/votos_correos?
+
+        False y True (solo en modo conjunto) son definitivos; None significa
+        que hay que preguntarle a Firestore.
+        """
+        if not self.listo:
+            return None
+        with self._lock:
+            presente = _clave(doc_id) in self._indices[coleccion]
+        if not presente:
+            return False
+        return True if self.modo == 'conjunto' else None
+
+    def registrar(self, voto_doc_id: str, correo_doc_id: str):
+        """Reflejar de inmediato un voto escrito por este proceso"""
+        if self.modo == 'desactivado':
+            return
+        with self._lock:
+            self._indices[VOTOS].agregar(_clave(voto_doc_id))
+            self._indices[CORREOS].agregar(_clave(correo_doc_id))
+
+    def entradas(self) -> Dict[str, int]:
+        with self._lock:
+            return {coleccion: len(indice) for coleccion, indice in self._indices.items()}
+
+    def memoria(self) -> int:
+        """Bytes aproximados que ocupa el índice"""
+        with self._lock:
+            return sum(indice.memoria() for indice in self._indices.values())
+
+
+# Instancia global del índice de votantes
+indice_votantes = IndiceVotantes()
+
+registro.medidor(
+    'contivotos_indice_votantes_entradas', 'Claves en el índice de votantes por colección',
+    lambda: {(coleccion,): n for coleccion, n in indice_votantes.entradas().items()},
+    ('coleccion',)
+)
+registro.medidor(
+    'contivotos_indice_votantes_bytes', 'Memoria aproximada del índice de votantes',
+    indice_votantes.memoria
+)
@@ -0,0 +1,377 @@
+import asyncio
+import uuid
+from collections import Counter, OrderedDict
+from datetime import datetime
+from typing import Callable, List, Optional
+from config.firebase import get_async_db, votos_async_ref, votos_correos_async_ref, candidatos_async_ref
+from config.settings import INGESTA_VOTOS, INGESTA_LOTE_MAX, INGESTA_INTERVALO_MS
+from metricas import registro
+from services.almacenamiento import usa_firestore
+from services.candidato_service import CandidatoService
+from services.conteo_cache import conteo_cache
+from services.diario_votos import DiarioVotos, diario_votos
+from services.indice_votantes import indice_votantes
+from services.voto_service import VotoService, voto_id, correo_id, MAX_OPERACIONES_BATCH
+
+# Recibos cuyo estado se recuerda en memoria (los más viejos se olvidan;
+# los registrados se siguen encontrando por el campo 'recibo' del voto)
+MAX_RECIBOS = 100000
+
+# Segundos de espera antes de reintentar un batch que falló por un error transitorio
+ESPERA_REINTENTO = 1.0
+
+# Segundos que detener() intenta escribir lo que quede en la cola
+ESPERA_VACIADO = 10.0
+
+ingesta_lote = registro.histograma(
+    'contivotos_ingesta_lote_votos', 'Votos escritos por batch en la ingesta diferida',
+    buckets=(1, 5, 10, 25, 50, 100, 150, 200, 250)
+)
+ingesta_votos_total = registro.contador(
+    'contivotos_ingesta_votos_total', 'Votos de la ingesta diferida por resultado final',
+    ('resultado',)
+)
+
+
+class IngestaVotos:
+    """Ingesta diferida (write-behind) de votos.
+
+    encolar() descarta los duplicados (índice de votantes, votos aún en cola
+    y, si hace falta, Firestore) y responde con un recibo sin esperar la
+    escritura. Una única tarea vacía la cola cuando junta `lote_max` votos o
+    pasados `intervalo` segundos desde el primero: cada batch crea los votos
+    y sus reservas de correo y suma un solo Increment(k) por candidato.
+
+    Si otro worker registró el mismo usuario o correo entre tanto, el batch
+    completo falla; entonces sus votos se escriben uno por uno para rechazar
+    solo los repetidos.
+
+    Con el diario local activo (DIARIO_VOTOS_DIR) cada voto se anota en disco
+    antes de responder y los que no llegaron a Firestore (caída del proceso)
+    se vuelven a encolar al iniciar. Si Firestore no responde al validar, el
+    voto igual se acepta: el batch rechaza los repetidos al escribirse.
+    """
+
+    def __init__(self, modo: str = INGESTA_VOTOS, lote_max: int = INGESTA_LOTE_MAX,
+                 intervalo: float = INGESTA_INTERVALO_MS / 1000, diario: DiarioVotos = None):
+        if modo not in ('directa', 'diferida'):
+            raise ValueError(f'Modo de ingesta desconocido: {modo}')
+        self.modo = modo
+        self.lote_max = max(1, lote_max)
+        self.intervalo = intervalo
+        self._cola: List[dict] = []
+        # IDs de voto y de correo aceptados y aún no escritos
+        self._usuarios = set()
+        self._correos = set()
+        self._recibos: "OrderedDict[str, dict]" = OrderedDict()
+        # Se activa al llenarse un lote o al vencer el plazo del primer voto
+        self._despertar: Optional[asyncio.Event] = None
+        self._plazo: Optional[asyncio.TimerHandle] = None
+        self._tarea: Optional[asyncio.Task] = None
+        self._cerrando = False
+        self._al_confirmar: Optional[Callable[[dict], None]] = None
+        self.diario = diario if diario is not None else diario_votos
+
+    def activa(self) -> bool:
+        """True si POST /api/votos usa la ingesta diferida"""
+        return self.modo == 'diferida' and usa_firestore()
+
+    def iniciada(self) -> bool:
+        return self._tarea is not None
+
+    def iniciar(self, al_confirmar: Callable[[dict], None] = None) -> int:
+        """Arrancar la tarea escritora; `al_confirmar` recibe el evento de cada
+        candidato escrito. Retorna cuántos votos se recuperaron del diario"""
+        if self._tarea is not None:
+            return 0
+        self._al_confirmar = al_confirmar
+        self._despertar = asyncio.Event()
+        recuperados = self.diario.abrir() if self.diario.activo() else []
+        for voto in recuperados:
+            self._usuarios.add(voto['voto_doc'])
+            self._correos.add(voto['correo_doc'])
+            self._cola.append(voto)
+            self._guardar_recibo(voto['recibo'], 'pendiente', 'Voto recibido', voto['candidato_id'])
+        if recuperados:
+            print(f"Diario de votos: {len(recuperados)} votos pendientes vuelven a la cola")
+        if self._cola:
+            self._despertar.set()
+        self._tarea = asyncio.create_task(self._bucle())
+        return len(recuperados)
+
+    async def detener(self):
+        """Escribir lo que quede en la cola y detener la tarea"""
+        if self._tarea is None:
+            return
+        # Sin cancelar: el batch en curso termina y la tarea vacía la cola
+        self._cerrando = True
+        self._despertar.set()
+        try:
+            await asyncio.wait_for(self._tarea, ESPERA_VACIADO)
+        except asyncio.TimeoutError:
+            print(f"Ingesta detenida con {self.pendientes()} votos sin escribir")
+        self._tarea = None
+        self._cerrando = False
+        if self.diario.activo():
+            # Los que quedaron sin escribir se reproducen al volver a iniciar
+            await self.diario.detener()
+
+    def pendientes(self) -> int:
+        """Votos aceptados que aún no se escribieron"""
+        return len(self._usuarios)
+
+    # =========================
+    # Aceptar votos
+    # =========================
+
+    async def encolar(
+        self,
+        user_id: str,
+        candidato_id: str,
+        correo: str,
+        ip_address: str = None,
+        ubicacion_lat: float = None,
+        ubicacion_lng: float = None
+    ) -> tuple:
+        """Aceptar un voto; retorna (éxito, mensaje, recibo). Los errores de
+        Firestore (sin diario) y del diario se propagan"""
+        voto_doc, correo_doc = voto_id(user_id), correo_id(correo)
+        if voto_doc in self._usuarios:
+            return (False, 'El usuario ya ha votado', None)
+        if correo_doc in self._correos:
+            return (False, 'Este correo ya ha sido usado para votar', None)
+        rechazo = VotoService.duplicado_conocido(user_id, correo)
+        if rechazo:
+            return (False, rechazo, None)
+        if conteo_cache.existe(candidato_id) is False:
+            return (False, 'Candidato no encontrado', None)
+
+        # Reservar antes de cualquier await: otro voto igual que llegue
+        # mientras se consulta Firestore se rechaza arriba
+        self._usuarios.add(voto_doc)
+        self._correos.add(correo_doc)
+        try:
+            rechazo = await self._verificar_en_firestore(voto_doc, correo_doc, candidato_id)
+        except Exception:
+            # Firestore no responde: con el diario el voto se acepta igual; sin
+            # él no hay decisión y el error llega al cliente como 503
+            if not self.diario.activo():
+                self._liberar(voto_doc, correo_doc)
+                raise
+            rechazo = None
+        if rechazo:
+            self._liberar(voto_doc, correo_doc)
+            return (False, rechazo, None)
+
+        recibo = uuid.uuid4().hex
+        voto = {
+            'recibo': recibo,
+            'voto_doc': voto_doc,
+            'correo_doc': correo_doc,
+            'user_id': user_id,
+            'candidato_id': candidato_id,
+            'correo': correo,
+            'fecha': datetime.utcnow(),
+            'ip_address': ip_address,
+            'ubicacion_lat': ubicacion_lat,
+            'ubicacion_lng': ubicacion_lng,
+        }
+        if self.diario.activo():
+            try:
+                await self.diario.anotar(voto)
+            except Exception:
+                self._liberar(voto_doc, correo_doc)
+                raise
+        self._cola.append(voto)
+        self._guardar_recibo(recibo, 'pendiente', 'Voto recibido', candidato_id)
+        if self._despertar is None:
+            pass  # El escritor aún no arrancó: iniciar() lo despierta
+        elif len(self._cola) >= self.lote_max:
+            self._despertar.set()
+        elif len(self._cola) == 1:
+            self._plazo = asyncio.get_running_loop().call_later(self.intervalo, self._despertar.set)
+        return (True, 'Voto recibido', recibo)
+
+    @staticmethod
+    async def _verificar_en_firestore(voto_doc: str, correo_doc: str, candidato_id: str) -> Optional[str]:
+        """Lo que el índice y el cache no pudieron responder, en paralelo"""
+        consultas = []  # (motivo, referencia, se rechaza si el documento existe)
+        if indice_votantes.consultar('votos', voto_doc) is None:
+            consultas.append(('El usuario ya ha votado', votos_async_ref.document(voto_doc), True))
+        if indice_votantes.consultar('votos_correos', correo_doc) is None:
+            consultas.append((
+                'Este correo ya ha sido usado para votar', votos_correos_async_ref.document(correo_doc), True
+            ))
+        if conteo_cache.existe(candidato_id) is None:
+            consultas.append(('Candidato no encontrado', candidatos_async_ref.document(candidato_id), False))
+        docs = await asyncio.gather(*(ref.get() for _, ref, _ in consultas))
+        for (motivo, _, rechazar_si_existe), doc in zip(consultas, docs):
+            if doc.exists == rechazar_si_existe:
+                return motivo
+        return None
+
+    def _liberar(self, voto_doc: str, correo_doc: str):
+        self._usuarios.discard(voto_doc)
+        self._correos.discard(correo_doc)
+
+    # =========================
+    # Recibos
+    # =========================
+
+    def _guardar_recibo(self, recibo: str, estado: str, mensaje: str, candidato_id: str):
+        self._recibos[recibo] = {
+            'recibo': recibo,
+            'estado': estado,
+            'mensaje': mensaje,
+            'candidatoId': candidato_id,
+        }
+        self._recibos.move_to_end(recibo)
+        while len(self._recibos) > MAX_RECIBOS:
+            self._recibos.popitem(last=False)
+
+    async def estado_recibo(self, recibo: str) -> Optional[dict]:
+        """Estado de un recibo: pendiente, registrado o rechazado (None si no se conoce)"""
+        estado = self._recibos.get(recibo)
+        if estado is not None:
+            return dict(estado)
+        # Recibo de otro worker o ya olvidado: si el voto se escribió, lleva el recibo
+        async for doc in votos_async_ref.where('recibo', '==', recibo).limit(1).stream():
+            return {
+                'recibo': recibo,
+                'estado': 'registrado',
+                'mensaje': 'Voto registrado exitosamente',
+                'candidatoId': doc.get('candidato_id'),
+            }
+        return None
+
+    # =========================
+    # Escritura en batches
+    # =========================
+
+    async def _bucle(self):
+        while True:
+            await self._despertar.wait()
+            self._despertar.clear()
+            if self._plazo is not None:
+                self._plazo.cancel()
+                self._plazo = None
+            lote = self._tomar_lote()
+            if lote:
+                await self._escribir_lote(lote)
+            if self._cola:
+                # Los que quedaron ya esperaron el batch anterior: sin plazo
+                self._despertar.set()
+            elif self._cerrando:
+                return
+
+    def _tomar_lote(self) -> List[dict]:
+        """Hasta lote_max votos sin superar las 500 operaciones de un batch"""
+        candidatos = set()
+        tomados = 0
+        for voto in self._cola:
+            nuevos = candidatos | {voto['candidato_id']}
+            if tomados == self.lote_max or 2 * (tomados + 1) + len(nuevos) > MAX_OPERACIONES_BATCH:
+                break
+            candidatos = nuevos
+            tomados += 1
+        lote, self._cola = self._cola[:tomados], self._cola[tomados:]
+        return lote
+
+    async def _escribir_lote(self, lote: List[dict]):
+        from google.api_core.exceptions import AlreadyExists, NotFound
+
+        try:
+            await self._commit(lote)
+            ingesta_lote.observar(len(lote))
+        except (AlreadyExists, NotFound):
+            # Un voto repetido (de otro worker) o un candidato borrado hacen
+            # fallar todo el batch: aislarlo escribiendo uno por uno
+            for i, voto in enumerate(lote):
+                try:
+                    await self._escribir_uno(voto)
+                except Exception as e:
+                    await self._reintentar(lote[i:], e)
+                    return
+        except Exception as e:
+            await self._reintentar(lote, e)
+
+    async def _reintentar(self, lote: List[dict], error: Exception):
+        """Error transitorio: el lote vuelve al frente de la cola"""
+        print(f"Error escribiendo {len(lote)} votos en cola, se reintentará: {error}")
+        self._cola[:0] = lote
+        await asyncio.sleep(ESPERA_REINTENTO)
+
+    async def _escribir_uno(self, voto: dict):
+        from google.api_core.exceptions import AlreadyExists, NotFound
+
+        try:
+            await self._commit([voto])
+            ingesta_lote.observar(1)
+        except NotFound:
+            self._rechazar(voto, 'Candidato no encontrado')
+        except AlreadyExists:
+            existente = await votos_async_ref.document(voto['voto_doc']).get()
+            if existente.exists and existente.get('recibo') == voto['recibo']:
+                # Un intento anterior sí se escribió (se perdió la respuesta)
+                self._confirmados([voto])
+            elif existente.exists:
+                self._rechazar(voto, 'El usuario ya ha votado')
+            else:
+                self._rechazar(voto, 'Este correo ya ha sido usado para votar')
+
+    async def _commit(self, lote: List[dict]):
+        """Un batch con los votos, sus reservas y un Increment(k) por candidato"""
+        batch = get_async_db().batch()
+        for voto in lote:
+            batch.create(votos_async_ref.document(voto['voto_doc']), VotoService.datos_voto(
+                voto['user_id'], voto['candidato_id'], voto['correo'], voto['fecha'],
+                voto['ip_address'], voto['ubicacion_lat'], voto['ubicacion_lng'], voto['recibo']
+            ))
+            batch.create(votos_correos_async_ref.document(voto['correo_doc']), {
+                'voto_id': voto['voto_doc'],
+                'fecha': voto['fecha']
+            })
+        por_candidato = Counter(voto['candidato_id'] for voto in lote)
+        contadores = {}
+        for candidato_id, cantidad in por_candidato.items():
+            contadores[candidato_id] = CandidatoService.contador_ref(candidato_id, candidatos_async_ref)
+            batch.update(contadores[candidato_id], CandidatoService.datos_incremento(cantidad))
+        resultados = await batch.commit()
+
+        # Los incrementos son las últimas operaciones del batch, en ese orden
+        update_times = [r.update_time for r in resultados[-len(contadores):]]
+        fecha = datetime.utcnow()
+        eventos = []
+        for (candidato_id, ref), update_time in zip(contadores.items(), update_times):
+            cantidad = por_candidato[candidato_id]
+            conteo_cache.registrar_incremento(candidato_id, ref.path, update_time, cantidad)
+            eventos.append(VotoService.evento_voto(candidato_id, ref.path, update_time, fecha, cantidad))
+        self._confirmados(lote)
+        if self._al_confirmar:
+            for evento in eventos:
+                self._al_confirmar(evento)
+
+    def _confirmados(self, lote: List[dict]):
+        for voto in lote:
+            indice_votantes.registrar(voto['voto_doc'], voto['correo_doc'])
+            self._liberar(voto['voto_doc'], voto['correo_doc'])
+            self._guardar_recibo(voto['recibo'], 'registrado', 'Voto registrado exitosamente', voto['candidato_id'])
+        if self.diario.activo():
+            self.diario.confirmar([voto['recibo'] for voto in lote])
+        ingesta_votos_total.inc('registrado', valor=len(lote))
+
+    def _rechazar(self, voto: dict, motivo: str):
+        self._liberar(voto['voto_doc'], voto['correo_doc'])
+        self._guardar_recibo(voto['recibo'], 'rechazado', motivo, voto['candidato_id'])
+        if self.diario.activo():
+            self.diario.confirmar([voto['recibo']])
+        ingesta_votos_total.inc('rechazado')
+
+
+# Instancia global de la ingesta diferida
+ingesta_votos = IngestaVotos()
+
+registro.medidor(
+    'contivotos_ingesta_pendientes', 'Votos aceptados por la ingesta diferida aún no escritos',
+    ingesta_votos.pendientes
+)
@@ -0,0 +1,95 @@
+import asyncio
+import functools
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Hashable, Tuple
+from config.settings import LECTURAS_VIGENCIA_MS
+from metricas import registro
+
+lecturas_total = registro.contador(
+    'contivotos_lecturas_compartidas_total',
+    'Lecturas de servicio por resultado: ejecutada, compartida (en vuelo) o vigente (reutilizada)',
+    ('lectura', 'resultado')
+)
+
+
+class LecturasCompartidas:
+    """Single-flight para lecturas idénticas concurrentes.
+
+    Quien pide una clave que ya se está leyendo espera esa misma lectura en
+    vez de lanzar otra. Con `vigencia` > 0 también se reutiliza el último
+    resultado mientras tenga menos de `vigencia` segundos. El resultado es
+    compartido por todos los que lo esperan: no debe modificarse. Los
+    resultados vencidos se descartan al guardar uno nuevo (las claves
+    incluyen argumentos como el cursor de una página).
+    """
+
+    def __init__(self, vigencia: float = LECTURAS_VIGENCIA_MS / 1000):
+        self.vigencia = vigencia
+        self.activa = True
+        self._en_vuelo: Dict[Hashable, asyncio.Future] = {}
+        # clave -> (instante de la lectura, resultado), del más viejo al más nuevo
+        self._recientes: 'OrderedDict[Hashable, Tuple[float, object]]' = OrderedDict()
+
+    async def obtener(self, clave: Hashable, leer: Callable[[], Awaitable], nombre: str = '') -> object:
+        if not self.activa:
+            return await leer()
+
+        if self.vigencia > 0:
+            reciente = self._recientes.get(clave)
+            if reciente is not None and time.monotonic() - reciente[0] <= self.vigencia:
+                lecturas_total.inc(nombre, 'vigente')
+                return reciente[1]
+
+        futuro = self._en_vuelo.get(clave)
+        if futuro is not None:
+            lecturas_total.inc(nombre, 'compartida')
+        else:
+            lecturas_total.inc(nombre, 'ejecutada')
+            futuro = self._en_vuelo[clave] = asyncio.ensure_future(self._leer(clave, leer))
+        # shield: si quien lanzó la lectura se cancela, los demás la siguen esperando
+        return await asyncio.shield(futuro)
+
+    async def _leer(self, clave: Hashable, leer: Callable[[], Awaitable]) -> object:
+        inicio = time.monotonic()
+        try:
+            resultado = await leer()
+        finally:
+            del self._en_vuelo[clave]
+        if self.vigencia > 0:
+            self._guardar(clave, inicio, resultado)
+        return resultado
+
+    def _guardar(self, clave: Hashable, inicio: float, resultado: object):
+        self._recientes[clave] = (inicio, resultado)
+        self._recientes.move_to_end(clave)
+        # Los del frente son los más viejos: se van mientras estén vencidos
+        limite = time.monotonic() - self.vigencia
+        while self._recientes:
+            primero = next(iter(self._recientes.values()))
+            if primero[0] > limite:
+                break
+            self._recientes.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._recientes)
+
+
+# Instancia global compartida por los servicios
+lecturas_compartidas = LecturasCompartidas()
+
+registro.medidor(
+    'contivotos_lecturas_compartidas_recientes', 'Resultados guardados para reutilizar dentro de la vigencia',
+    lambda: len(lecturas_compartidas)
+)
+
+
+def compartida(funcion):
+    """Decorador: las llamadas concurrentes con los mismos argumentos comparten una lectura"""
+    nombre = funcion.__qualname__
+
+    @functools.wraps(funcion)
+    async def envoltura(*args, **kwargs):
+        clave = (nombre, args, tuple(sorted(kwargs.items())))
+        return await lecturas_compartidas.obtener(clave, lambda: funcion(*args, **kwargs), nombre)
+    return envoltura
@@ -0,0 +1,103 @@
+from datetime import datetime
+from typing import List
+from config.firebase import get_db, votos_ref, votos_correos_ref, sistema_ref
+from services.voto_service import MAX_OPERACIONES_BATCH, correo_id, voto_id
+
+# Documento que marca la migración como hecha: sistema/migracion_ids_votos
+DOCUMENTO_ESTADO = 'migracion_ids_votos'
+
+# Votos por batch: create del voto, create de la reserva y delete del anterior
+VOTOS_POR_BATCH = MAX_OPERACIONES_BATCH // 3
+
+
+class MigracionVotos:
+    """Migración de los votos anteriores a los IDs deterministas.
+
+    Los votos se guardan en votos/{sha256(user_id)} con una reserva en
+    votos_correos/{sha256(correo)}; los registrados antes tienen IDs
+    automáticos y no tienen reserva, así que el batch de registrar_voto y el
+    índice de votantes no los ven. La migración los mueve a su ID
+    determinista y crea su reserva. El arranque la ejecuta antes de marcar
+    el servidor como listo (y antes de los listeners); al terminar queda
+    anotada en sistema/migracion_ids_votos y los arranques siguientes solo
+    leen ese documento. También se puede correr antes de desplegar:
+
+        python -m services.migracion_votos
+    """
+
+    @staticmethod
+    def pendiente() -> bool:
+        """True si la migración no se ha completado"""
+        doc = sistema_ref.document(DOCUMENTO_ESTADO).get()
+        return not (doc.exists and doc.to_dict().get('completada'))
+
+    @staticmethod
+    def migrar() -> dict:
+        """Migrar todos los votos con ID automático; retorna los totales.
+
+        Cada página se mueve en un batch. Si el batch falla porque el
+        usuario o el correo ya tienen su documento (votos duplicados de
+        antes, u otro worker migrando a la vez), los votos de esa página se
+        mueven de a uno y los duplicados se dejan como están.
+        """
+        from google.api_core.exceptions import AlreadyExists
+        from google.cloud.firestore_v1.field_path import FieldPath
+
+        totales = {'migrados': 0, 'duplicados': 0}
+        cursor = None
+        while True:
+            consulta = votos_ref.order_by(FieldPath.document_id()).limit(VOTOS_POR_BATCH)
+            if cursor is not None:
+                consulta = consulta.start_after({FieldPath.document_id(): cursor})
+            docs = list(consulta.stream())
+            if not docs:
+                break
+            cursor = docs[-1].id
+
+            anteriores = [
+                doc for doc in docs
+                if doc.to_dict().get('user_id') and doc.id != voto_id(doc.to_dict()['user_id'])
+            ]
+            if anteriores:
+                try:
+                    MigracionVotos._mover(anteriores)
+                    totales['migrados'] += len(anteriores)
+                except AlreadyExists:
+                    for doc in anteriores:
+                        if not doc.reference.get().exists:
+                            continue
+                        try:
+                            MigracionVotos._mover([doc])
+                            totales['migrados'] += 1
+                        except AlreadyExists:
+                            totales['duplicados'] += 1
+                            print(f"Voto duplicado sin migrar: votos/{doc.id}")
+            if len(docs) < VOTOS_POR_BATCH:
+                break
+
+        sistema_ref.document(DOCUMENTO_ESTADO).set({
+            **totales, 'completada': True, 'fecha': datetime.utcnow()
+        })
+        return totales
+
+    @staticmethod
+    def _mover(docs: List):
+        batch = get_db().batch()
+        for doc in docs:
+            data = doc.to_dict()
+            nuevo_ref = votos_ref.document(voto_id(data['user_id']))
+            batch.create(nuevo_ref, data)
+            if data.get('correo'):
+                batch.create(votos_correos_ref.document(correo_id(data['correo'])), {
+                    'voto_id': nuevo_ref.id,
+                    'fecha': data.get('fecha')
+                })
+            batch.delete(doc.reference)
+        batch.commit()
+
+
+if __name__ == '__main__':
+    from config import firebase
+
+    firebase.inicializar()
+    print(MigracionVotos.migrar())
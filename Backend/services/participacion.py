@@ -0,0 +1,327 @@
+import asyncio
+import threading
+import uuid
+from array import array
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+from config.firebase import get_async_db, participacion_ref, participacion_async_ref
+from config.settings import PARTICIPACION_GUARDADO_S, PARTICIPACION_HORAS
+from metricas import registro
+from services.almacenamiento import usa_firestore
+
+# Campos de minuto de cada documento de participación: m00 ... m59
+CAMPOS_MINUTO = tuple(f'm{minuto:02d}' for minuto in range(60))
+
+
+def minuto_de(fecha: datetime) -> int:
+    """Minuto desde epoch de una fecha (las fechas sin zona son UTC, como datetime.utcnow())"""
+    if fecha.tzinfo is None:
+        fecha = fecha.replace(tzinfo=timezone.utc)
+    return int(fecha.timestamp()) // 60
+
+
+def _fecha_de(minuto: int) -> str:
+    return datetime.fromtimestamp(minuto * 60, timezone.utc).isoformat()
+
+
+class SerieParticipacion:
+    """Votos por minuto, por hora y acumulados en arrays de ancho fijo.
+
+    La ventana cubre `horas` horas alineadas a la hora en punto y sigue al
+    último minuto con votos; los votos anteriores a la ventana quedan en
+    `anteriores` y siguen contando en el acumulado. Un voto del minuto en
+    curso actualiza tres enteros; solo los que llegan fuera de orden
+    recorren el acumulado desde su minuto hasta el último.
+    """
+
+    def __init__(self, horas: int = PARTICIPACION_HORAS):
+        self.capacidad = max(1, horas) * 60
+        self.vaciar()
+
+    def vaciar(self):
+        # Minuto (desde epoch) del índice 0; None hasta el primer voto
+        self.base: Optional[int] = None
+        # Último índice con datos; el acumulado está al día hasta él
+        self.ultimo = -1
+        self.anteriores = 0
+        self.por_minuto = array('i', [0]) * self.capacidad
+        self.por_hora = array('i', [0]) * (self.capacidad // 60)
+        self.acumulado = array('i', [0]) * self.capacidad
+
+    @property
+    def total(self) -> int:
+        return self.acumulado[self.ultimo] if self.ultimo >= 0 else self.anteriores
+
+    def sumar(self, minuto: int, cantidad: int = 1):
+        """Sumar `cantidad` votos (negativa al borrarse) en el minuto desde epoch"""
+        if not cantidad:
+            return
+        if self.base is None:
+            self.base = minuto - minuto % 60
+        indice = minuto - self.base
+        if indice >= self.capacidad:
+            # La ventana avanza por horas completas hasta incluir el minuto
+            self._rebasar(minuto - minuto % 60 + 60 - self.capacidad)
+            indice = minuto - self.base
+        elif indice < 0:
+            nueva_base = minuto - minuto % 60
+            if self.ultimo < 0 or self.base + self.ultimo - nueva_base < self.capacidad:
+                self._rebasar(nueva_base)
+                indice = minuto - self.base
+            else:
+                # Más viejo que la ventana: solo cuenta en el acumulado
+                self.anteriores += cantidad
+                self._propagar(0, cantidad)
+                return
+
+        if indice > self.ultimo:
+            previo = self.total
+            for i in range(self.ultimo + 1, indice + 1):
+                self.acumulado[i] = previo
+            self.ultimo = indice
+        self.por_minuto[indice] += cantidad
+        self.por_hora[indice // 60] += cantidad
+        self._propagar(indice, cantidad)
+
+    def _propagar(self, desde: int, cantidad: int):
+        for i in range(desde, self.ultimo + 1):
+            self.acumulado[i] += cantidad
+
+    def _rebasar(self, nueva_base: int):
+        """Mover la ventana para que empiece en `nueva_base` (pasa raramente: por hora)"""
+        minutos = [(self.base + i, n) for i, n in enumerate(self.por_minuto[:self.ultimo + 1]) if n]
+        fin = self.base + self.ultimo
+        anteriores = self.anteriores
+        self.vaciar()
+        self.base = nueva_base
+        self.anteriores = anteriores
+        for minuto, n in minutos:
+            indice = minuto - nueva_base
+            if indice < 0:
+                self.anteriores += n
+            else:
+                self.por_minuto[indice] += n
+                self.por_hora[indice // 60] += n
+        self.ultimo = max(-1, min(fin - nueva_base, self.capacidad - 1)) if minutos else -1
+        total = self.anteriores
+        for i in range(self.ultimo + 1):
+            total += self.por_minuto[i]
+            self.acumulado[i] = total
+
+    def como_dict(self, desde: int = 0) -> dict:
+        """Serie desde el índice `desde` (por_hora siempre completa)"""
+        fin = self.ultimo + 1
+        return {
+            'inicio': _fecha_de(self.base) if self.base is not None else None,
+            'minutos': fin,
+            'desde': desde,
+            'por_minuto': self.por_minuto[desde:fin].tolist(),
+            'acumulado': self.acumulado[desde:fin].tolist(),
+            'por_hora': self.por_hora[:(fin + 59) // 60].tolist(),
+            'anteriores': self.anteriores,
+            'total': self.total,
+        }
+
+    def memoria(self) -> int:
+        """Bytes de los tres arrays"""
+        return sum(a.itemsize * len(a) for a in (self.por_minuto, self.por_hora, self.acumulado))
+
+
+class Participacion:
+    """Curva de participación mantenida con cada voto, sin recorrer `votos`.
+
+    Con Firestore cada worker acumula los votos que registra por minuto y
+    cada PARTICIPACION_GUARDADO_S segundos los suma (Increment) a su propio
+    documento por hora, `participacion/{hora}-{worker}`, con campos m00..m59.
+    Un listener sobre esa colección (unos pocos documentos por hora) aplica a
+    la serie la diferencia de cada documento que cambia, así que todos los
+    workers ven los votos de todos con un retraso de hasta un intervalo, y
+    un worker que arranca la recupera con el snapshot inicial. El reinicio
+    de la elección borra la colección.
+
+    Con PostgreSQL la serie se carga una vez con un GROUP BY por minuto y
+    luego suma los eventos de voto del backplane (de todos los workers).
+    """
+
+    def __init__(self, horas: int = PARTICIPACION_HORAS, intervalo_guardado: float = PARTICIPACION_GUARDADO_S):
+        self.intervalo_guardado = intervalo_guardado
+        self._lock = threading.Lock()
+        self._listo = threading.Event()
+        self._serie = SerieParticipacion(horas)
+        # Firestore: votos por minuto de cada documento según el listener
+        self._documentos: Dict[str, array] = {}
+        # Firestore: votos de este worker aún no guardados, por minuto
+        self._sin_guardar: Dict[int, int] = {}
+        self._worker = uuid.uuid4().hex[:8]
+        self._observadores: List[Callable[[], None]] = []
+        self._watch = None
+        self._tarea: Optional[asyncio.Task] = None
+
+    # =========================
+    # Ciclo de vida
+    # =========================
+
+    async def iniciar(self):
+        """Cargar la serie y empezar a mantenerla (con el almacenamiento listo)"""
+        if usa_firestore():
+            if self._watch is None:
+                self._watch = participacion_ref.on_snapshot(self._on_snapshot)
+            if self._tarea is None:
+                self._tarea = asyncio.create_task(self._bucle_guardado())
+            return
+        if self.listo:
+            return
+        from services.postgres_service import PostgresVotoService
+        minutos = await PostgresVotoService.votos_por_minuto()
+        with self._lock:
+            for minuto in sorted(minutos):
+                self._serie.sumar(minuto, minutos[minuto])
+        self._listo.set()
+        self._notificar()
+
+    async def detener(self):
+        if self._tarea is not None:
+            self._tarea.cancel()
+            try:
+                await self._tarea
+            except asyncio.CancelledError:
+                pass
+            self._tarea = None
+            # Lo que quedó sin guardar
+            await self.guardar()
+        if self._watch is not None:
+            self._watch.unsubscribe()
+            self._watch = None
+        self._listo.clear()
+        with self._lock:
+            self._serie.vaciar()
+            self._documentos.clear()
+
+    @property
+    def listo(self) -> bool:
+        return self._listo.is_set()
+
+    def agregar_observador(self, callback: Callable[[], None]):
+        """Registrar una función a llamar (posiblemente desde otro hilo) tras cada cambio"""
+        if callback not in self._observadores:
+            self._observadores.append(callback)
+
+    def _notificar(self):
+        for callback in self._observadores:
+            callback()
+
+    # =========================
+    # Votos
+    # =========================
+
+    def on_evento(self, evento: dict, local: bool):
+        """Evento del backplane (en el event loop)"""
+        tipo = evento.get('tipo')
+        if tipo == 'reinicio':
+            if usa_firestore():
+                # Los documentos borrados llegan por el listener
+                self._sin_guardar.clear()
+            elif self.listo:
+                with self._lock:
+                    self._serie.vaciar()
+                self._notificar()
+            return
+        if tipo != 'voto' or not evento.get('fecha'):
+            return
+
+        minuto = minuto_de(datetime.fromisoformat(evento['fecha']))
+        cantidad = evento.get('cantidad', 1)
+        if usa_firestore():
+            # Cada worker guarda solo los suyos; los de todos llegan por el listener
+            if local:
+                self._sin_guardar[minuto] = self._sin_guardar.get(minuto, 0) + cantidad
+        elif self.listo:
+            with self._lock:
+                self._serie.sumar(minuto, cantidad)
+            self._notificar()
+
+    async def _bucle_guardado(self):
+        while True:
+            await asyncio.sleep(self.intervalo_guardado)
+            await self.guardar()
+
+    async def guardar(self):
+        """Sumar los votos pendientes de este worker a sus documentos por hora"""
+        if not self._sin_guardar:
+            return
+        from google.cloud.firestore_v1.transforms import Increment
+
+        pendientes, self._sin_guardar = self._sin_guardar, {}
+        por_hora: Dict[int, dict] = {}
+        for minuto, cantidad in pendientes.items():
+            por_hora.setdefault(minuto // 60, {})[CAMPOS_MINUTO[minuto % 60]] = Increment(cantidad)
+        try:
+            batch = get_async_db().batch()
+            for hora, campos in por_hora.items():
+                batch.set(
+                    participacion_async_ref.document(f'{hora}-{self._worker}'),
+                    {'hora': hora, **campos}, merge=True
+                )
+            await batch.commit()
+        except Exception as e:
+            for minuto, cantidad in pendientes.items():
+                self._sin_guardar[minuto] = self._sin_guardar.get(minuto, 0) + cantidad
+            print(f"No se pudo guardar la participación, se reintentará: {e}")
+
+    def _on_snapshot(self, docs, changes, read_time):
+        """Callback del listener (se ejecuta en un hilo del SDK)"""
+        with self._lock:
+            for change in changes:
+                doc = change.document
+                anterior = self._documentos.get(doc.id)
+                if change.type.name == 'REMOVED':
+                    data, actual = {}, None
+                    self._documentos.pop(doc.id, None)
+                else:
+                    data = doc.to_dict() or {}
+                    actual = self._documentos[doc.id] = array('i', (data.get(c, 0) for c in CAMPOS_MINUTO))
+                hora = data.get('hora', _hora_de_documento(doc.id))
+                if hora is None:
+                    continue
+                for minuto in range(60):
+                    cantidad = (actual[minuto] if actual else 0) - (anterior[minuto] if anterior else 0)
+                    if cantidad:
+                        self._serie.sumar(hora * 60 + minuto, cantidad)
+        self._listo.set()
+        self._notificar()
+
+    # =========================
+    # Lecturas
+    # =========================
+
+    def serie(self, desde: int = 0) -> dict:
+        """Votos por minuto, acumulados y por hora desde `inicio` (minutos UTC)"""
+        with self._lock:
+            return self._serie.como_dict(desde)
+
+    def total(self) -> int:
+        with self._lock:
+            return self._serie.total
+
+    def sin_guardar(self) -> int:
+        return sum(self._sin_guardar.values())
+
+
+def _hora_de_documento(doc_id: str) -> Optional[int]:
+    try:
+        return int(doc_id.split('-', 1)[0])
+    except ValueError:
+        return None
+
+
+# Instancia global de la participación
+participacion = Participacion()
+
+registro.medidor(
+    'contivotos_participacion_votos', 'Votos en la serie de participación',
+    participacion.total
+)
+registro.medidor(
+    'contivotos_participacion_sin_guardar', 'Votos de este worker aún no sumados a la participación en Firestore',
+    participacion.sin_guardar
+)
@@ -0,0 +1,347 @@
+import asyncio
+from datetime import datetime
+from typing import List, Optional
+from psycopg2 import errors
+from config.postgres import cursor
+from models.candidato import Candidato
+from metricas import instrumentado
+from services.lecturas_compartidas import compartida
+from services.proyeccion import CAMPOS_CANDIDATO, campos_documento, pagina
+from services.ranking import segmentos_desde_conteo, top_desde_conteo
+
+# Campos de la API -> columnas de la tabla candidatos
+COLUMNAS_CANDIDATO = {
+    'nombre': 'nombre',
+    'numero': 'numero',
+    'cargo': 'cargo',
+    'imagen': 'foto_url',
+    'propuesta': 'descripcion',
+    'vision': 'vision',
+    'experiencia': 'experiencia',
+    'semestre': 'semestre',
+}
+
+
+def _filas(sql: str, params: tuple = ()) -> List[dict]:
+    with cursor() as cur:
+        cur.execute(sql, params)
+        return cur.fetchall()
+
+
+async def _consultar(sql: str, params: tuple = ()) -> List[dict]:
+    """Ejecutar una consulta en un hilo (psycopg2 es bloqueante)"""
+    return await asyncio.to_thread(_filas, sql, params)
+
+
+def _id(candidato_id: str) -> Optional[int]:
+    """IDs de la API (str) -> SERIAL de PostgreSQL; None si no es numérico"""
+    try:
+        return int(candidato_id)
+    except (TypeError, ValueError):
+        return None
+
+
+def _normalizar_correo(correo: str) -> str:
+    # Mismo criterio que correo_id() en Firestore
+    return correo.strip().lower()
+
+
+@instrumentado
+class PostgresCandidatoService:
+    """Misma interfaz que AsyncCandidatoService sobre PostgreSQL (database/schema.sql)"""
+
+    @staticmethod
+    def desde_fila(fila: dict) -> Candidato:
+        """Construir el modelo Candidato a partir de una fila de sp_obtener_candidatos"""
+        return Candidato(
+            id=str(fila['id']),
+            nombre=fila['nombre'],
+            numero=fila['numero'],
+            cargo=fila['cargo'],
+            imagen=fila['foto_url'],
+            propuesta=fila['descripcion'],
+            vision=fila['vision'],
+            experiencia=fila['experiencia'],
+            semestre=fila['semestre'],
+            votos=fila['votos'] or 0,
+            created_at=fila['created_at'],
+            updated_at=fila['updated_at']
+        )
+
+    @staticmethod
+    @compartida
+    async def get_all() -> List[Candidato]:
+        """Obtener todos los candidatos"""
+        filas = await _consultar("SELECT * FROM sp_obtener_candidatos()")
+        return [PostgresCandidatoService.desde_fila(fila) for fila in filas]
+
+    @staticmethod
+    @compartida
+    async def get_pagina(campos: tuple = CAMPOS_CANDIDATO, limite: int = None, despues: tuple = None) -> dict:
+        """Candidatos con solo `campos`, de a `limite`, después del cursor `despues`"""
+        columnas = {campo: COLUMNAS_CANDIDATO.get(campo, campo) for campo in campos_documento(campos)}
+        sql = f"SELECT id, {', '.join(columnas.values())} FROM sp_obtener_candidatos()"
+        params = []
+        if despues is not None:
+            if _id(despues[1]) is None:
+                raise ValueError('Cursor inválido')
+            sql += " WHERE (numero, id) > (%s, %s)"
+            params += [despues[0], _id(despues[1])]
+        sql += " ORDER BY numero, id"
+        if limite is not None:
+            # Uno más para saber si hay página siguiente
+            sql += " LIMIT %s"
+            params.append(limite + 1)
+
+        filas = [
+            {'id': str(fila['id']), **{campo: fila[columna] for campo, columna in columnas.items()}}
+            for fila in await _consultar(sql, tuple(params))
+        ]
+        for fila in filas:
+            if 'votos' in fila:
+                fila['votos'] = fila['votos'] or 0
+        return pagina(filas, campos, limite)
+
+    @staticmethod
+    async def get_by_id(candidato_id: str) -> Optional[Candidato]:
+        """Obtener un candidato por ID"""
+        pk = _id(candidato_id)
+        if pk is None:
+            return None
+        filas = await _consultar("SELECT * FROM sp_obtener_candidato_por_id(%s)", (pk,))
+        return PostgresCandidatoService.desde_fila(filas[0]) if filas else None
+
+    @staticmethod
+    def _crear(nombre, numero, imagen, propuesta, extra: dict) -> tuple:
+        with cursor() as cur:
+            cur.execute(
+                "SELECT * FROM sp_crear_candidato(%s, %s, %s, %s)",
+                (nombre, numero, imagen, propuesta)
+            )
+            fila = cur.fetchone()
+            if fila['success']:
+                # Campos que el procedimiento no recibe, en la misma transacción
+                cur.execute(
+                    "UPDATE candidatos SET cargo = %s, vision = %s, experiencia = %s, semestre = %s "
+                    "WHERE id = %s",
+                    (extra['cargo'], extra['vision'], extra['experiencia'], extra['semestre'],
+                     fila['candidato_id'])
+                )
+        candidato_id = str(fila['candidato_id']) if fila['success'] else None
+        return (fila['success'], fila['message'], candidato_id)
+
+    @staticmethod
+    async def create(
+        nombre: str,
+        numero: int,
+        cargo: str = None,
+        imagen: str = None,
+        propuesta: str = None,
+        vision: str = None,
+        experiencia: str = None,
+        semestre: str = None
+    ) -> tuple:
+        """Crear un nuevo candidato"""
+        try:
+            return await asyncio.to_thread(
+                PostgresCandidatoService._crear, nombre, numero, imagen, propuesta,
+                {'cargo': cargo, 'vision': vision, 'experiencia': experiencia, 'semestre': semestre}
+            )
+        except Exception as e:
+            return (False, str(e), None)
+
+    @staticmethod
+    def _actualizar(pk: int, campos: dict) -> int:
+        asignaciones = ", ".join(f"{COLUMNAS_CANDIDATO[campo]} = %s" for campo in campos)
+        with cursor() as cur:
+            cur.execute(
+                f"UPDATE candidatos SET {asignaciones}, updated_at = CURRENT_TIMESTAMP WHERE id = %s",
+                (*campos.values(), pk)
+            )
+            return cur.rowcount
+
+    @staticmethod
+    async def update(
+        candidato_id: str,
+        nombre: str = None,
+        numero: int = None,
+        cargo: str = None,
+        imagen: str = None,
+        propuesta: str = None,
+        vision: str = None,
+        experiencia: str = None,
+        semestre: str = None
+    ) -> tuple:
+        """Actualizar un candidato"""
+        pk = _id(candidato_id)
+        if pk is None:
+            return (False, 'Candidato no encontrado')
+
+        campos = {
+            'nombre': nombre,
+            'numero': numero,
+            'cargo': cargo,
+            'imagen': imagen,
+            'propuesta': propuesta,
+            'vision': vision,
+            'experiencia': experiencia,
+            'semestre': semestre,
+        }
+        campos = {campo: valor for campo, valor in campos.items() if valor is not None}
+        try:
+            if not await asyncio.to_thread(PostgresCandidatoService._actualizar, pk, campos):
+                return (False, 'Candidato no encontrado')
+            return (True, 'Candidato actualizado exitosamente')
+        except errors.UniqueViolation:
+            return (False, 'Ya existe un candidato con ese numero')
+        except Exception as e:
+            return (False, str(e))
+
+    @staticmethod
+    async def delete(candidato_id: str) -> tuple:
+        """Eliminar un candidato"""
+        pk = _id(candidato_id)
+        if pk is None:
+            return (False, 'Candidato no encontrado')
+        try:
+            fila = (await _consultar("SELECT * FROM sp_eliminar_candidato(%s)", (pk,)))[0]
+            return (fila['success'], fila['message'])
+        except Exception as e:
+            return (False, str(e))
+
+    @staticmethod
+    @compartida
+    async def get_conteo_votos() -> List[dict]:
+        """Obtener conteo de votos de todos los candidatos"""
+        filas = await _consultar("SELECT * FROM sp_obtener_conteo_votos()")
+        return [
+            {
+                'candidato_id': str(fila['candidato_id']),
+                'nombre': fila['nombre'],
+                'numero': fila['numero'],
+                'cargo': fila['cargo'],
+                'semestre': fila['semestre'],
+                'imagen': fila['foto_url'],
+                'votos': fila['votos'] or 0,
+                'porcentaje': float(fila['porcentaje'])
+            }
+            for fila in filas
+        ]
+
+    @staticmethod
+    @compartida
+    async def get_estadisticas() -> dict:
+        """Obtener estadísticas generales"""
+        fila = (await _consultar("SELECT * FROM sp_obtener_estadisticas()"))[0]
+        # Igual que en Firestore: sin votos no hay ganador
+        hay_ganador = fila['votos_ganador'] > 0
+        return {
+            'total_votos': fila['total_votos'],
+            'total_candidatos': fila['total_candidatos'],
+            'candidato_ganador': fila['candidato_ganador'] if hay_ganador else None,
+            'votos_ganador': fila['votos_ganador']
+        }
+
+    @staticmethod
+    async def get_top(n: int) -> dict:
+        """Los n primeros puestos con sus márgenes"""
+        return top_desde_conteo(await PostgresCandidatoService.get_conteo_votos(), n)
+
+    @staticmethod
+    async def get_segmentos(cargo: str = None, semestre: str = None) -> List[dict]:
+        """Resultados por segmento (cargo, semestre) con porcentajes y líder de cada uno"""
+        return segmentos_desde_conteo(await PostgresCandidatoService.get_conteo_votos(), cargo, semestre)
+
+
+@instrumentado
+class PostgresVotoService:
+    """Misma interfaz que AsyncVotoService sobre PostgreSQL (database/schema.sql)"""
+
+    @staticmethod
+    async def verificar_correo(correo: str) -> bool:
+        """Verificar si un correo ya votó"""
+        filas = await _consultar(
+            "SELECT sp_verificar_correo_ya_voto(%s) AS existe", (_normalizar_correo(correo),)
+        )
+        return filas[0]['existe']
+
+    @staticmethod
+    async def verificar_user_id(user_id: str) -> bool:
+        """Verificar si un usuario ya votó"""
+        filas = await _consultar("SELECT sp_verificar_ya_voto(%s) AS existe", (user_id,))
+        return filas[0]['existe']
+
+    @staticmethod
+    async def registrar_voto(
+        user_id: str,
+        candidato_id: str,
+        correo: str,
+        ip_address: str = None,
+        ubicacion_lat: float = None,
+        ubicacion_lng: float = None
+    ) -> tuple:
+        """Registrar un nuevo voto con una sola llamada a sp_registrar_voto.
+
+        Los duplicados (user_id o correo) los rechazan las restricciones UNIQUE
+        de la tabla votos dentro del procedimiento.
+        """
+        pk = _id(candidato_id)
+        if pk is None:
+            return (False, 'Candidato no encontrado', None)
+        # Los errores de conexión se propagan: no son un rechazo del voto
+        fila = (await _consultar(
+            "SELECT * FROM sp_registrar_voto(%s, %s, %s, %s, %s, %s)",
+            (user_id, pk, _normalizar_correo(correo), ip_address, ubicacion_lat, ubicacion_lng)
+        ))[0]
+
+        if not fila['success']:
+            return (False, fila['message'], None)
+        # Sin documento contador: los demás workers releen el conteo de la base
+        return (True, fila['message'], {
+            'tipo': 'voto',
+            'candidato_id': candidato_id,
+            'ruta': None,
+            'update_time': None,
+            'fecha': datetime.utcnow().isoformat(),
+        })
+
+    @staticmethod
+    async def get_votos_por_candidato(candidato_id: str) -> int:
+        """Obtener cantidad de votos de un candidato"""
+        candidato = await PostgresCandidatoService.get_by_id(candidato_id)
+        return candidato.votos if candidato else 0
+
+    @staticmethod
+    async def get_estadisticas() -> dict:
+        """Obtener estadísticas generales"""
+        return await PostgresCandidatoService.get_estadisticas()
+
+    @staticmethod
+    async def contar_votos() -> int:
+        """Total de votos"""
+        return (await _consultar("SELECT COUNT(*) AS total FROM votos"))[0]['total']
+
+    @staticmethod
+    async def votos_por_minuto() -> dict:
+        """{minuto desde epoch: votos}, agrupado en la base (carga de la participación)"""
+        filas = await _consultar(
+            "SELECT floor(extract(epoch FROM fecha::timestamptz) / 60)::bigint AS minuto, "
+            "COUNT(*) AS votos FROM votos GROUP BY 1"
+        )
+        return {fila['minuto']: fila['votos'] for fila in filas}
+
+    @staticmethod
+    async def reiniciar_eleccion(progreso=None, cursores: dict = None) -> tuple:
+        """Reiniciar la elección (borrar todos los votos).
+
+        sp_reiniciar_eleccion borra todo en una transacción: el progreso se
+        informa una sola vez al terminar y no hay cursores que retomar.
+        """
+        try:
+            fila = (await _consultar("SELECT * FROM sp_reiniciar_eleccion()"))[0]
+            total_votos = fila['votos_eliminados']
+            if progreso and fila['success']:
+                await progreso('votos', None, total_votos)
+            return (fila['success'], f'Eleccion reiniciada. Votos eliminados: {total_votos}', total_votos)
+        except Exception as e:
+            return (False, str(e), 0)
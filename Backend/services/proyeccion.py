@@ -0,0 +1,75 @@
+import base64
+import json
+from typing import List, Optional, Tuple
+
+# Campos que admite ?fields= en GET /api/candidatos/ (en el orden de la respuesta)
+CAMPOS_CANDIDATO = (
+    'id', 'nombre', 'numero', 'cargo', 'imagen', 'propuesta', 'vision',
+    'experiencia', 'semestre', 'votos', 'created_at', 'updated_at',
+)
+
+# Campos que el cache de conteo tiene en memoria (la cédula de votación)
+CAMPOS_EN_CACHE = frozenset(('id', 'nombre', 'numero', 'cargo', 'semestre', 'imagen', 'votos'))
+
+
+def leer_campos(fields: Optional[str]) -> Tuple[str, ...]:
+    """Campos pedidos en `fields` (separados por comas), en orden canónico y con `id`"""
+    if not fields:
+        return CAMPOS_CANDIDATO
+    pedidos = {campo.strip() for campo in fields.split(',') if campo.strip()}
+    desconocidos = pedidos - set(CAMPOS_CANDIDATO)
+    if desconocidos:
+        raise ValueError(f"Campos desconocidos: {', '.join(sorted(desconocidos))}")
+    pedidos.add('id')
+    return tuple(campo for campo in CAMPOS_CANDIDATO if campo in pedidos)
+
+
+def campos_documento(campos: Tuple[str, ...]) -> List[str]:
+    """Campos a leer del documento: los pedidos (salvo `id`) más `numero` para el cursor"""
+    return [campo for campo in CAMPOS_CANDIDATO if campo != 'id' and (campo in campos or campo == 'numero')]
+
+
+def cursor_de(numero, candidato_id: str) -> str:
+    """Cursor opaco que apunta después del candidato (orden por número e ID)"""
+    crudo = json.dumps([numero, candidato_id], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(crudo).decode('ascii').rstrip('=')
+
+
+def leer_cursor(cursor: Optional[str]) -> Optional[tuple]:
+    """(numero, candidato_id) de un cursor de cursor_de()"""
+    if not cursor:
+        return None
+    try:
+        crudo = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        numero, candidato_id = json.loads(crudo)
+    except (ValueError, TypeError):
+        raise ValueError('Cursor inválido')
+    if not isinstance(candidato_id, str) or not (numero is None or isinstance(numero, int)):
+        raise ValueError('Cursor inválido')
+    return numero, candidato_id
+
+
+def _clave_orden(numero, candidato_id: str) -> tuple:
+    return (numero is None, numero or 0, candidato_id)
+
+
+def pagina(
+    filas: List[dict], campos: Tuple[str, ...], limite: Optional[int] = None, despues: Optional[tuple] = None
+) -> dict:
+    """Página de filas ordenadas por número e ID, proyectadas a `campos`.
+
+    `filas` puede traer una fila más que `limite`: si está, hay página
+    siguiente. Con `despues` se descartan primero las filas hasta el cursor
+    (cuando la consulta no lo aplicó).
+    """
+    if despues is not None:
+        desde = _clave_orden(*despues)
+        filas = [fila for fila in filas if _clave_orden(fila['numero'], fila['id']) > desde]
+    siguiente = None
+    if limite is not None and len(filas) > limite:
+        filas = filas[:limite]
+        siguiente = cursor_de(filas[-1]['numero'], filas[-1]['id'])
+    return {
+        'candidatos': [{campo: fila.get(campo) for campo in campos} for fila in filas],
+        'siguiente': siguiente,
+    }
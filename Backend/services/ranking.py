@@ -0,0 +1,141 @@
+import bisect
+from typing import Dict, List, Tuple
+
+
+def clave_ranking(candidato_id: str, votos: int, numero) -> tuple:
+    """Más votos primero; con los mismos votos, el número de candidato menor
+    (los que no tienen número al final) y por último el ID"""
+    return (-votos, numero is None, numero or 0, candidato_id)
+
+
+class Ranking:
+    """Candidatos ordenados por votos, actualizado en cada cambio.
+
+    Cada `actualizar` reubica un solo candidato con búsqueda binaria, así que
+    el líder y el top N se leen sin recorrer ni ordenar todos los candidatos.
+    No es seguro entre hilos: quien lo usa lo protege con su propio lock.
+    """
+
+    def __init__(self):
+        self._orden: List[tuple] = []
+        self._claves: Dict[str, tuple] = {}
+        self.total = 0
+
+    def __len__(self) -> int:
+        return len(self._orden)
+
+    def actualizar(self, candidato_id: str, votos: int, numero) -> None:
+        nueva = clave_ranking(candidato_id, votos, numero)
+        anterior = self._claves.get(candidato_id)
+        if anterior == nueva:
+            return
+        if anterior is not None:
+            del self._orden[bisect.bisect_left(self._orden, anterior)]
+            self.total += anterior[0]
+        bisect.insort(self._orden, nueva)
+        self._claves[candidato_id] = nueva
+        self.total += votos
+
+    def quitar(self, candidato_id: str) -> None:
+        anterior = self._claves.pop(candidato_id, None)
+        if anterior is not None:
+            del self._orden[bisect.bisect_left(self._orden, anterior)]
+            self.total += anterior[0]
+
+    def limpiar(self) -> None:
+        self._orden.clear()
+        self._claves.clear()
+        self.total = 0
+
+    def primeros(self, n: int) -> List[Tuple[str, int]]:
+        """(candidato_id, votos) de los n primeros puestos"""
+        return [(clave[3], -clave[0]) for clave in self._orden[:n]]
+
+
+def ordenar_conteo(conteo: List[dict]) -> List[dict]:
+    """Filas de get_conteo_votos en orden de ranking (para lecturas sin cache)"""
+    return sorted(conteo, key=lambda fila: clave_ranking(fila['candidato_id'], fila['votos'], fila['numero']))
+
+
+def top_con_margenes(filas: List[dict], n: int, total_votos: int, total_candidatos: int) -> dict:
+    """Top N con posición y márgenes.
+
+    `filas` son las filas del conteo en orden de ranking, con al menos n + 1
+    si existen (la siguiente a la última del top define su margen).
+    `margen_siguiente` es la ventaja sobre el puesto siguiente (None si no
+    hay) y `diferencia_lider` lo que le falta para alcanzar al primero; un
+    margen 0 es un empate, resuelto por número de candidato.
+    """
+    lider = filas[0]['votos'] if filas else 0
+    ganadores = []
+    for posicion, fila in enumerate(filas[:n]):
+        siguiente = filas[posicion + 1]['votos'] if posicion + 1 < len(filas) else None
+        ganadores.append({
+            **fila,
+            'posicion': posicion + 1,
+            'margen_siguiente': fila['votos'] - siguiente if siguiente is not None else None,
+            'diferencia_lider': lider - fila['votos'],
+        })
+    return {
+        'total_votos': total_votos,
+        'total_candidatos': total_candidatos,
+        'ganadores': ganadores,
+    }
+
+
+def top_desde_conteo(conteo: List[dict], n: int) -> dict:
+    """Top N a partir del conteo completo (PostgreSQL o Firestore sin listener)"""
+    return top_con_margenes(
+        ordenar_conteo(conteo), n, sum(fila['votos'] for fila in conteo), len(conteo)
+    )
+
+
+def clave_segmento(cargo, semestre) -> Tuple[str, str]:
+    """Segmento de un candidato: (cargo, semestre), sin valor = ''"""
+    return (cargo or '', semestre or '')
+
+
+def segmento_con_porcentajes(clave: Tuple[str, str], filas: List[dict], total_votos: int) -> dict:
+    """Resultados de un segmento a partir de sus filas en orden de ranking.
+
+    Los porcentajes son dentro del segmento; `lider` es el primer puesto con
+    su `margen_siguiente` (None sin votos, como el ganador de las estadísticas).
+    """
+    candidatos = []
+    for posicion, fila in enumerate(filas):
+        porcentaje = (fila['votos'] / total_votos * 100) if total_votos > 0 else 0
+        candidatos.append({**fila, 'porcentaje': round(porcentaje, 2), 'posicion': posicion + 1})
+    lider = None
+    if candidatos and candidatos[0]['votos'] > 0:
+        segundo = candidatos[1]['votos'] if len(candidatos) > 1 else None
+        lider = {
+            'candidato_id': candidatos[0]['candidato_id'],
+            'nombre': candidatos[0]['nombre'],
+            'votos': candidatos[0]['votos'],
+            'porcentaje': candidatos[0]['porcentaje'],
+            'margen_siguiente': candidatos[0]['votos'] - segundo if segundo is not None else None,
+        }
+    return {
+        'cargo': clave[0],
+        'semestre': clave[1],
+        'total_votos': total_votos,
+        'total_candidatos': len(candidatos),
+        'lider': lider,
+        'candidatos': candidatos,
+    }
+
+
+def segmento_desde_filas(clave: Tuple[str, str], filas: List[dict]) -> dict:
+    """Resultados de un segmento a partir de sus filas del conteo, en cualquier orden"""
+    return segmento_con_porcentajes(clave, ordenar_conteo(filas), sum(fila['votos'] for fila in filas))
+
+
+def segmentos_desde_conteo(conteo: List[dict], cargo: str = None, semestre: str = None) -> List[dict]:
+    """Resultados por segmento a partir del conteo completo (PostgreSQL o Firestore
+    sin listener), solo los del `cargo` y/o `semestre` indicados"""
+    por_segmento: Dict[Tuple[str, str], List[dict]] = {}
+    for fila in conteo:
+        clave = clave_segmento(fila['cargo'], fila.get('semestre'))
+        if (cargo is None or clave[0] == cargo) and (semestre is None or clave[1] == semestre):
+            por_segmento.setdefault(clave, []).append(fila)
+    return [segmento_desde_filas(clave, filas) for clave, filas in sorted(por_segmento.items())]
@@ -0,0 +1,192 @@
+import asyncio
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+from config.firebase import get_async_db, sistema_async_ref
+from services.almacenamiento import ServicioVotos, usa_firestore
+
+# Documento con el estado del reinicio: sistema/reinicio_eleccion
+DOCUMENTO_ESTADO = 'reinicio_eleccion'
+
+# Segundos sin avance tras los cuales un reinicio 'en_curso' se da por interrumpido
+SIN_AVANCE_INTERRUMPIDO = 60
+
+# Mínimo de segundos entre escrituras del progreso en Firestore
+INTERVALO_GUARDADO = 1.0
+
+
+def _ahora() -> str:
+    return datetime.utcnow().isoformat()
+
+
+class ReinicioEleccion:
+    """Reinicio de la elección como trabajo en segundo plano.
+
+    POST /api/votos/reiniciar lanza el trabajo y responde de inmediato;
+    GET /api/votos/reiniciar/estado informa su avance. Con Firestore el
+    estado, incluidos los cursores hasta donde todo está borrado, se guarda
+    en sistema/reinicio_eleccion: cualquier worker puede consultarlo y un
+    reinicio interrumpido (el proceso murió a mitad) se retoma desde esos
+    cursores con el siguiente POST. El documento se reclama con una escritura
+    condicionada a la versión leída, así que de varios POST simultáneos (en
+    uno o varios workers) solo uno lanza el trabajo.
+    """
+
+    def __init__(self):
+        self._lock = asyncio.Lock()
+        self._tarea: Optional[asyncio.Task] = None
+        self._estado = self._nuevo_estado('inactivo')
+        self._guardado_en = 0.0
+
+    @staticmethod
+    def _nuevo_estado(estado: str) -> dict:
+        return {
+            'estado': estado,
+            'total_votos': 0,
+            'votos_eliminados': 0,
+            'correos_eliminados': 0,
+            'lotes': 0,
+            'cursores': {},
+            'mensaje': None,
+            'iniciado': None,
+            'actualizado': None,
+            'finalizado': None,
+        }
+
+    @staticmethod
+    def _publico(estado: dict) -> dict:
+        """Estado con el porcentaje de votos borrados"""
+        total = estado['total_votos']
+        porcentaje = min(100.0, estado['votos_eliminados'] * 100 / total) if total else 100.0
+        if estado['estado'] == 'inactivo':
+            porcentaje = 0.0
+        return {**estado, 'porcentaje': round(porcentaje, 2)}
+
+    def en_curso(self) -> bool:
+        """True si este proceso está ejecutando un reinicio"""
+        return self._tarea is not None and not self._tarea.done()
+
+    async def estado(self) -> dict:
+        """Estado del último reinicio (de este worker o, con Firestore, de cualquiera)"""
+        if not self.en_curso() and usa_firestore():
+            guardado = await self._leer()
+            if guardado:
+                return self._publico(guardado)
+        return self._publico(self._estado)
+
+    async def iniciar(self, al_terminar: Callable[[], None] = None) -> dict:
+        """Lanzar el reinicio (o retomar uno interrumpido) y retornar su estado.
+
+        Si ya hay uno en curso, en este o en otro worker, retorna su estado
+        sin lanzar otro. `al_terminar` se llama si el reinicio termina bien.
+        """
+        async with self._lock:
+            if self.en_curso():
+                return self._publico(self._estado)
+
+            estado = self._nuevo_estado('en_curso')
+            doc = await self._documento().get() if usa_firestore() else None
+            guardado = doc.to_dict() if doc is not None and doc.exists else None
+            if guardado and guardado['estado'] == 'en_curso':
+                if not self._interrumpido(guardado):
+                    return self._publico(guardado)
+                # Retomar: lo anterior a los cursores ya está borrado
+                estado.update({
+                    campo: guardado[campo] for campo in (
+                        'total_votos', 'votos_eliminados', 'correos_eliminados', 'lotes', 'cursores', 'iniciado'
+                    )
+                })
+            else:
+                estado['total_votos'] = await ServicioVotos.contar_votos()
+                estado['iniciado'] = _ahora()
+
+            if doc is None:
+                estado['actualizado'] = _ahora()
+            elif not await self._reclamar(doc, estado):
+                # Otro worker lo lanzó entre la lectura y la escritura
+                return self._publico(await self._leer() or estado)
+            self._estado = estado
+            self._tarea = asyncio.create_task(self._ejecutar(dict(estado['cursores']), al_terminar))
+            return self._publico(self._estado)
+
+    async def _ejecutar(self, cursores: dict, al_terminar: Optional[Callable[[], None]]):
+        try:
+            exito, mensaje, _ = await ServicioVotos.reiniciar_eleccion(
+                progreso=self._progreso, cursores=cursores
+            )
+        except Exception as e:
+            exito, mensaje = False, str(e)
+
+        self._estado.update({
+            'estado': 'completado' if exito else 'error',
+            'mensaje': (
+                f"Eleccion reiniciada. Votos eliminados: {self._estado['votos_eliminados']}"
+                if exito else mensaje
+            ),
+            'finalizado': _ahora(),
+        })
+        await self._guardar(forzar=True)
+        if exito and al_terminar:
+            al_terminar()
+
+    async def _progreso(self, coleccion: str, cursor: Optional[str], eliminados: int):
+        """Un batch más borrado: todo lo anterior a `cursor` ya no existe"""
+        campo = 'correos_eliminados' if coleccion == 'votos_correos' else 'votos_eliminados'
+        self._estado[campo] += eliminados
+        self._estado['lotes'] += 1
+        if cursor is not None:
+            self._estado['cursores'][coleccion] = cursor
+        await self._guardar()
+
+    @staticmethod
+    def _interrumpido(estado: dict) -> bool:
+        actualizado = datetime.fromisoformat(estado['actualizado'] or estado['iniciado'])
+        return datetime.utcnow() - actualizado > timedelta(seconds=SIN_AVANCE_INTERRUMPIDO)
+
+    # =========================
+    # Estado en Firestore
+    # =========================
+
+    @staticmethod
+    def _documento():
+        return sistema_async_ref.document(DOCUMENTO_ESTADO)
+
+    async def _leer(self) -> Optional[dict]:
+        doc = await self._documento().get()
+        return doc.to_dict() if doc.exists else None
+
+    async def _reclamar(self, doc, estado: dict) -> bool:
+        """Escribir `estado` solo si el documento sigue como en `doc`; False si
+        otro worker lo escribió antes"""
+        from google.api_core.exceptions import AlreadyExists, FailedPrecondition
+
+        estado['actualizado'] = _ahora()
+        try:
+            if doc.exists:
+                await self._documento().update(
+                    dict(estado), option=get_async_db().write_option(last_update_time=doc.update_time)
+                )
+            else:
+                await self._documento().create(dict(estado))
+        except (AlreadyExists, FailedPrecondition):
+            return False
+        self._guardado_en = asyncio.get_running_loop().time()
+        return True
+
+    async def _guardar(self, forzar: bool = False):
+        """Guardar el estado; el progreso, a lo sumo una vez por INTERVALO_GUARDADO"""
+        self._estado['actualizado'] = _ahora()
+        if not usa_firestore():
+            return
+        ahora = asyncio.get_running_loop().time()
+        if not forzar and ahora - self._guardado_en < INTERVALO_GUARDADO:
+            return
+        self._guardado_en = ahora
+        try:
+            await self._documento().set(dict(self._estado))
+        except Exception as e:
+            # Sin el estado guardado el reinicio sigue; solo no se podrá retomar
+            print(f"No se pudo guardar el estado del reinicio: {e}")
+
+
+# Instancia global (un trabajo por worker)
+reinicio_eleccion = ReinicioEleccion()
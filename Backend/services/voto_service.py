@@ -1,28 +1,65 @@
 from typing import Optional
-from config.firebase import get_db, votos_ref, candidatos_ref
+from config.firebase import get_db, votos_ref, votos_correos_ref, candidatos_ref, participacion_ref
+from config.settings import VOTOS_NUM_SHARDS
 from models.voto import Voto
+from services.candidato_service import CandidatoService
+from services.contador_distribuido import ContadorDistribuido
+from services.conteo_cache import conteo_cache
+from services.geocerca import geocerca
+from services.indice_votantes import indice_votantes
 from datetime import datetime
-import math
+import hashlib
+from metricas import instrumentado
 
+# Máximo de operaciones que Firestore acepta en un batch
+MAX_OPERACIONES_BATCH = 500
 
+
+def voto_id(user_id: str) -> str:
+    """ID determinista del documento de voto de un usuario"""
+    return hashlib.sha256(user_id.encode('utf-8')).hexdigest()
+
+
+def correo_id(correo: str) -> str:
+    """ID determinista del documento que reserva un correo"""
+    return hashlib.sha256(correo.strip().lower().encode('utf-8')).hexdigest()
+
+
+def pagina_por_id(coleccion, cursor: str = None):
+    """Consulta de la página siguiente a `cursor` (solo IDs, ordenada por ID)"""
+    from google.cloud.firestore_v1.field_path import FieldPath
+
+    consulta = (
+        coleccion.order_by(FieldPath.document_id())
+        .select([FieldPath.document_id()])
+        .limit(MAX_OPERACIONES_BATCH)
+    )
+    if cursor is not None:
+        consulta = consulta.start_after({FieldPath.document_id(): cursor})
+    return consulta
+
+
+@instrumentado
 class VotoService:
     """Servicio para operaciones de votos usando Firestore"""
 
     @staticmethod
     def verificar_correo(correo: str) -> bool:
-        """Verificar si un correo ya votó"""
-        docs = votos_ref.where('correo', '==', correo).stream()
-        for _ in docs:
-            return True
-        return False
+        """Verificar si un correo ya votó (sin round trip si el índice lo sabe)"""
+        doc_id = correo_id(correo)
+        ya_voto = indice_votantes.consultar('votos_correos', doc_id)
+        if ya_voto is not None:
+            return ya_voto
+        return votos_correos_ref.document(doc_id).get().exists
 
     @staticmethod
     def verificar_user_id(user_id: str) -> bool:
-        """Verificar si un usuario ya votó"""
-        docs = votos_ref.where('user_id', '==', user_id).stream()
-        for _ in docs:
-            return True
-        return False
+        """Verificar si un usuario ya votó (sin round trip si el índice lo sabe)"""
+        doc_id = voto_id(user_id)
+        ya_voto = indice_votantes.consultar('votos', doc_id)
+        if ya_voto is not None:
+            return ya_voto
+        return votos_ref.document(doc_id).get().exists
 
     @staticmethod
     def registrar_voto(
@@ -33,115 +70,188 @@ class VotoService:
         ubicacion_lat: float = None,
         ubicacion_lng: float = None
     ) -> tuple:
-        """Registrar un nuevo voto"""
+        """Registrar un nuevo voto; retorna (éxito, mensaje, evento del voto).
+
+        El voto, la reserva del correo y el incremento del contador van en un
+        único batch: los `create` fallan si el usuario o el correo ya votaron y
+        el `update` falla si el candidato no existe, así que los duplicados se
+        rechazan de forma atómica en un solo viaje a Firestore. Los que el
+        índice de votantes ya conoce se rechazan sin ese viaje. Los errores de
+        Firestore (sin conexión, timeouts) se propagan: el voto no quedó
+        decidido y no es un rechazo.
+        """
+        from google.api_core.exceptions import AlreadyExists, NotFound
+
+        rechazo = VotoService.duplicado_conocido(user_id, correo)
+        if rechazo:
+            return (False, rechazo, None)
         try:
-            # Verificar si el usuario ya votó
-            if VotoService.verificar_user_id(user_id):
-                return (False, 'El usuario ya ha votado')
-            
-            # Verificar si el correo ya fue usado
-            if VotoService.verificar_correo(correo):
-                return (False, 'Este correo ya ha sido usado para votar')
-            
-            # Verificar que el candidato existe
-            candidato_doc = candidatos_ref.document(candidato_id).get()
-            if not candidato_doc.exists:
-                return (False, 'Candidato no encontrado')
-            
-            # Crear el voto
             now = datetime.utcnow()
-            voto_data = {
-                'user_id': user_id,
-                'candidato_id': candidato_id,
-                'correo': correo,
-                'fecha': now,
-                'ip_address': ip_address or '',
-                'ubicacion_lat': ubicacion_lat,
-                'ubicacion_lng': ubicacion_lng
-            }
-            
-            votos_ref.document().set(voto_data)
-            
-            # Incrementar el contador de votos del candidato
-            from config.firebase import get_db
-            db = get_db()
-            candidato_ref = candidatos_ref.document(candidato_id)
-            candidato_ref.update({
-                'votos': db.FieldValue.increment(1),
-                'updated_at': now
+            voto_ref = votos_ref.document(voto_id(user_id))
+            correo_ref = votos_correos_ref.document(correo_id(correo))
+            contador_ref = CandidatoService.contador_ref(candidato_id)
+
+            batch = get_db().batch()
+            batch.create(voto_ref, VotoService.datos_voto(
+                user_id, candidato_id, correo, now, ip_address, ubicacion_lat, ubicacion_lng
+            ))
+            batch.create(correo_ref, {
+                'voto_id': voto_ref.id,
+                'fecha': now
             })
-            
-            return (True, 'Voto registrado exitosamente')
-        except Exception as e:
-            return (False, str(e))
+            batch.update(contador_ref, CandidatoService.datos_incremento())
+            results = batch.commit()
+
+            update_time = results[-1].update_time
+            conteo_cache.registrar_incremento(candidato_id, contador_ref.path, update_time)
+            indice_votantes.registrar(voto_ref.id, correo_ref.id)
+            return (True, 'Voto registrado exitosamente', VotoService.evento_voto(
+                candidato_id, contador_ref.path, update_time, now
+            ))
+        except AlreadyExists:
+            # Solo en el caso de rechazo se lee para saber qué se repitió
+            if voto_ref.get().exists:
+                return (False, 'El usuario ya ha votado', None)
+            return (False, 'Este correo ya ha sido usado para votar', None)
+        except NotFound:
+            return (False, 'Candidato no encontrado', None)
+
+    @staticmethod
+    def duplicado_conocido(user_id: str, correo: str) -> Optional[str]:
+        """Motivo de rechazo si el índice de votantes ya sabe que votó"""
+        if indice_votantes.consultar('votos', voto_id(user_id)):
+            return 'El usuario ya ha votado'
+        if indice_votantes.consultar('votos_correos', correo_id(correo)):
+            return 'Este correo ya ha sido usado para votar'
+        return None
+
+    @staticmethod
+    def datos_voto(
+        user_id: str,
+        candidato_id: str,
+        correo: str,
+        fecha: datetime,
+        ip_address: str = None,
+        ubicacion_lat: float = None,
+        ubicacion_lng: float = None,
+        recibo: str = None
+    ) -> dict:
+        """Documento de un voto (`recibo`: el de la ingesta diferida, si la hubo)"""
+        data = {
+            'user_id': user_id,
+            'candidato_id': candidato_id,
+            'correo': correo,
+            'fecha': fecha,
+            'ip_address': ip_address or '',
+            'ubicacion_lat': ubicacion_lat,
+            'ubicacion_lng': ubicacion_lng
+        }
+        if recibo:
+            data['recibo'] = recibo
+        return data
+
+    @staticmethod
+    def evento_voto(candidato_id: str, ruta: str, update_time, fecha: datetime, cantidad: int = 1) -> dict:
+        """Evento de `cantidad` votos registrados, serializable para otros workers"""
+        return {
+            'tipo': 'voto',
+            'candidato_id': candidato_id,
+            'ruta': ruta,
+            'update_time': update_time.isoformat() if update_time else None,
+            'fecha': fecha.isoformat(),
+            'cantidad': cantidad,
+        }
 
     @staticmethod
     def get_votos_por_candidato(candidato_id: str) -> int:
         """Obtener cantidad de votos de un candidato"""
         doc = candidatos_ref.document(candidato_id).get()
         if doc.exists:
-            return doc.to_dict().get('votos', 0)
+            votos = doc.to_dict().get('votos', 0)
+            if ContadorDistribuido.activo():
+                votos += ContadorDistribuido.total(candidato_id)
+            return votos
         return 0
 
     @staticmethod
     def get_estadisticas() -> dict:
         """Obtener estadísticas generales"""
-        from services.candidato_service import CandidatoService
         return CandidatoService.get_estadisticas()
 
     @staticmethod
     def verificar_puede_votar(
         correo: str,
         lat: float,
-        lng: float,
-        lat_campus: float = -12.0753,
-        lng_campus: float = -77.0821,
-        radio_campus: float = 0.5
+        lng: float
     ) -> tuple:
         """Verificar si el usuario puede votar (verificado y dentro del campus)"""
         # Verificar si ya votó
         if VotoService.verificar_correo(correo):
             return (False, 'Ya has votado anteriormente')
         
-        # Calcular distancia al campus (fórmula de Haversine)
+        # Verificar que esté dentro de algún campus
         if lat and lng:
-            R = 6371  # Radio de la Tierra en km
-            dlat = math.radians(lat - lat_campus)
-            dlng = math.radians(lng - lng_campus)
-            a = math.sin(dlat/2)**2 + math.cos(math.radians(lat_campus)) * \
-                math.cos(math.radians(lat)) * math.sin(dlng/2)**2
-            c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-            distancia = R * c
-            
-            if distancia > radio_campus:
-                return (False, f'Estas fuera del campus (distancia: {distancia:.2f} km)')
+            dentro, _, distancia = geocerca.verificar(lat, lng)
+            if not dentro:
+                return (False, f'Estas fuera del campus (distancia: {distancia / 1000:.2f} km)')
         
         return (True, 'Puedes votar')
 
+    @staticmethod
+    def contar_votos() -> int:
+        """Total de votos con una agregación count() (no lee los documentos)"""
+        return int(votos_ref.count().get()[0][0].value)
+
+    @staticmethod
+    def lotes_reinicio_contadores(candidato_ids, nuevo_batch, candidatos=None) -> list:
+        """Batches que dejan en cero los contadores (y shards) de los candidatos,
+        de a lo sumo MAX_OPERACIONES_BATCH operaciones cada uno"""
+        candidatos = candidatos or candidatos_ref
+        por_candidato = 1 + (VOTOS_NUM_SHARDS if ContadorDistribuido.activo() else 0)
+        lotes = []
+        operaciones = MAX_OPERACIONES_BATCH
+        for candidato_id in candidato_ids:
+            if operaciones + por_candidato > MAX_OPERACIONES_BATCH:
+                lotes.append(nuevo_batch())
+                operaciones = 0
+            lotes[-1].update(candidatos.document(candidato_id), {'votos': 0, 'updated_at': datetime.utcnow()})
+            if ContadorDistribuido.activo():
+                ContadorDistribuido.inicializar(candidato_id, lotes[-1], candidatos)
+            operaciones += por_candidato
+        return lotes
+
     @staticmethod
     def reiniciar_eleccion() -> tuple:
-        """Reiniciar la elección (borrar todos los votos)"""
+        """Reiniciar la elección (borrar todos los votos).
+
+        Firestore rechaza batches de más de 500 operaciones, así que cada
+        colección se recorre por páginas con cursor y cada página se borra en
+        su propio batch. AsyncVotoService.reiniciar_eleccion hace lo mismo con
+        varios commits en paralelo.
+        """
         try:
-            # Contar votos antes de eliminar
-            total_votos = 0
-            docs = votos_ref.stream()
-            for doc in docs:
-                total_votos += 1
-            
-            # Eliminar todos los votos
-            batch = get_db().batch()
-            docs = votos_ref.stream()
-            for doc in docs:
-                batch.delete(doc.reference)
-            batch.commit()
-            
-            # Resetear contadores de candidatos
-            batch = get_db().batch()
-            docs = candidatos_ref.stream()
-            for doc in docs:
-                batch.update(doc.reference, {'votos': 0, 'updated_at': datetime.utcnow()})
-            batch.commit()
-            
+            total_votos = VotoService.contar_votos()
+
+            # Eliminar todos los votos, las reservas de correo y la participación
+            for coleccion in (votos_ref, votos_correos_ref, participacion_ref):
+                cursor = None
+                while True:
+                    refs = [doc.reference for doc in pagina_por_id(coleccion, cursor).stream()]
+                    if not refs:
+                        break
+                    batch = get_db().batch()
+                    for ref in refs:
+                        batch.delete(ref)
+                    batch.commit()
+                    if len(refs) < MAX_OPERACIONES_BATCH:
+                        break
+                    cursor = refs[-1].id
+
+            # Resetear contadores de candidatos (los shards se recrean en cero)
+            candidato_ids = [doc.id for doc in candidatos_ref.stream()]
+            for batch in VotoService.lotes_reinicio_contadores(candidato_ids, get_db().batch):
+                batch.commit()
+
             return (True, f'Eleccion reiniciada. Votos eliminados: {total_votos}', total_votos)
         except Exception as e:
             return (False, str(e), 0)
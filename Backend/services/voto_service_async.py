@@ -0,0 +1,203 @@
+import asyncio
+from typing import Awaitable, Callable, Optional
+from config.firebase import (
+    get_async_db, votos_async_ref, votos_correos_async_ref, candidatos_async_ref, participacion_async_ref
+)
+from services.candidato_service import CandidatoService
+from services.candidato_service_async import AsyncCandidatoService
+from services.conteo_cache import conteo_cache
+from services.geocerca import geocerca
+from services.indice_votantes import indice_votantes
+from services.voto_service import VotoService, voto_id, correo_id, pagina_por_id, MAX_OPERACIONES_BATCH
+from config.settings import REINICIO_COMMITS_PARALELOS
+from datetime import datetime
+from metricas import instrumentado
+
+
+@instrumentado
+class AsyncVotoService:
+    """Versión asíncrona de VotoService sobre firestore.AsyncClient"""
+
+    @staticmethod
+    async def verificar_correo(correo: str) -> bool:
+        """Verificar si un correo ya votó (sin round trip si el índice lo sabe)"""
+        doc_id = correo_id(correo)
+        ya_voto = indice_votantes.consultar('votos_correos', doc_id)
+        if ya_voto is not None:
+            return ya_voto
+        return (await votos_correos_async_ref.document(doc_id).get()).exists
+
+    @staticmethod
+    async def verificar_user_id(user_id: str) -> bool:
+        """Verificar si un usuario ya votó (sin round trip si el índice lo sabe)"""
+        doc_id = voto_id(user_id)
+        ya_voto = indice_votantes.consultar('votos', doc_id)
+        if ya_voto is not None:
+            return ya_voto
+        return (await votos_async_ref.document(doc_id).get()).exists
+
+    @staticmethod
+    async def registrar_voto(
+        user_id: str,
+        candidato_id: str,
+        correo: str,
+        ip_address: str = None,
+        ubicacion_lat: float = None,
+        ubicacion_lng: float = None
+    ) -> tuple:
+        """Registrar un nuevo voto en un único batch (ver VotoService.registrar_voto)"""
+        from google.api_core.exceptions import AlreadyExists, NotFound
+
+        rechazo = VotoService.duplicado_conocido(user_id, correo)
+        if rechazo:
+            return (False, rechazo, None)
+        try:
+            now = datetime.utcnow()
+            voto_ref = votos_async_ref.document(voto_id(user_id))
+            correo_ref = votos_correos_async_ref.document(correo_id(correo))
+            contador_ref = CandidatoService.contador_ref(candidato_id, candidatos_async_ref)
+
+            batch = get_async_db().batch()
+            batch.create(voto_ref, VotoService.datos_voto(
+                user_id, candidato_id, correo, now, ip_address, ubicacion_lat, ubicacion_lng
+            ))
+            batch.create(correo_ref, {
+                'voto_id': voto_ref.id,
+                'fecha': now
+            })
+            batch.update(contador_ref, CandidatoService.datos_incremento())
+            results = await batch.commit()
+
+            update_time = results[-1].update_time
+            conteo_cache.registrar_incremento(candidato_id, contador_ref.path, update_time)
+            indice_votantes.registrar(voto_ref.id, correo_ref.id)
+            return (True, 'Voto registrado exitosamente', VotoService.evento_voto(
+                candidato_id, contador_ref.path, update_time, now
+            ))
+        except AlreadyExists:
+            # Solo en el caso de rechazo se lee para saber qué se repitió
+            if (await voto_ref.get()).exists:
+                return (False, 'El usuario ya ha votado', None)
+            return (False, 'Este correo ya ha sido usado para votar', None)
+        except NotFound:
+            return (False, 'Candidato no encontrado', None)
+
+    @staticmethod
+    async def get_votos_por_candidato(candidato_id: str) -> int:
+        """Obtener cantidad de votos de un candidato"""
+        candidato = await AsyncCandidatoService.get_by_id(candidato_id)
+        return candidato.votos if candidato else 0
+
+    @staticmethod
+    async def get_estadisticas() -> dict:
+        """Obtener estadísticas generales"""
+        return await AsyncCandidatoService.get_estadisticas()
+
+    @staticmethod
+    async def verificar_puede_votar(
+        correo: str,
+        lat: float,
+        lng: float
+    ) -> tuple:
+        """Verificar si el usuario puede votar (verificado y dentro del campus)"""
+        # Verificar si ya votó
+        if await AsyncVotoService.verificar_correo(correo):
+            return (False, 'Ya has votado anteriormente')
+        
+        # Verificar que esté dentro de algún campus
+        if lat and lng:
+            dentro, _, distancia = geocerca.verificar(lat, lng)
+            if not dentro:
+                return (False, f'Estas fuera del campus (distancia: {distancia / 1000:.2f} km)')
+        
+        return (True, 'Puedes votar')
+
+    @staticmethod
+    async def contar_votos() -> int:
+        """Total de votos con una agregación count() (no lee los documentos)"""
+        resultado = await votos_async_ref.count().get()
+        return int(resultado[0][0].value)
+
+    @staticmethod
+    async def reiniciar_eleccion(
+        progreso: Optional[Callable[[str, str, int], Awaitable]] = None,
+        cursores: Optional[dict] = None
+    ) -> tuple:
+        """Reiniciar la elección (borrar todos los votos).
+
+        Recorre votos y votos_correos por páginas con cursor y borra cada
+        página en su propio batch de a lo sumo 500 operaciones; hasta
+        REINICIO_COMMITS_PARALELOS commits quedan en vuelo mientras se lee la
+        página siguiente. `progreso(coleccion, cursor, eliminados)` se espera
+        cada vez que todo lo anterior a `cursor` ya está borrado, y
+        `cursores` ({coleccion: cursor}) retoma un reinicio interrumpido.
+        """
+        try:
+            cursores = cursores or {}
+            eliminados = {}
+            for coleccion in (votos_async_ref, votos_correos_async_ref):
+                eliminados[coleccion.id] = await AsyncVotoService._eliminar_coleccion(
+                    coleccion, cursores.get(coleccion.id), progreso
+                )
+
+            # La participación (unos pocos documentos por hora) no cuenta en el progreso
+            await AsyncVotoService._eliminar_coleccion(participacion_async_ref, None, None)
+
+            # Resetear contadores de candidatos (los shards se recrean en cero)
+            candidato_ids = [doc.id async for doc in candidatos_async_ref.stream()]
+            lotes = VotoService.lotes_reinicio_contadores(
+                candidato_ids, get_async_db().batch, candidatos_async_ref
+            )
+            await asyncio.gather(*(batch.commit() for batch in lotes))
+
+            total_votos = eliminados[votos_async_ref.id]
+            return (True, f'Eleccion reiniciada. Votos eliminados: {total_votos}', total_votos)
+        except Exception as e:
+            return (False, str(e), 0)
+
+    @staticmethod
+    async def _eliminar_coleccion(coleccion, cursor: Optional[str], progreso) -> int:
+        """Borrar una colección página a página con commits en paralelo"""
+        en_vuelo = asyncio.Semaphore(REINICIO_COMMITS_PARALELOS)
+        pendientes = []  # (cursor de la página, tarea del commit), en orden
+        eliminados = 0
+
+        async def borrar(refs: list) -> int:
+            try:
+                batch = get_async_db().batch()
+                for ref in refs:
+                    batch.delete(ref)
+                await batch.commit()
+                return len(refs)
+            finally:
+                en_vuelo.release()
+
+        async def confirmar(hasta_completar: bool):
+            # El cursor solo avanza sobre páginas cuyo commit, y el de todas
+            # las anteriores, ya terminó
+            nonlocal eliminados
+            while pendientes and (hasta_completar or pendientes[0][1].done()):
+                cursor_pagina, tarea = pendientes.pop(0)
+                borrados = await tarea
+                eliminados += borrados
+                if progreso:
+                    await progreso(coleccion.id, cursor_pagina, borrados)
+
+        try:
+            while True:
+                refs = [doc.reference async for doc in pagina_por_id(coleccion, cursor).stream()]
+                if not refs:
+                    break
+                cursor = refs[-1].id
+                await en_vuelo.acquire()
+                pendientes.append((cursor, asyncio.create_task(borrar(refs))))
+                await confirmar(hasta_completar=False)
+                if len(refs) < MAX_OPERACIONES_BATCH:
+                    break
+            await confirmar(hasta_completar=True)
+        finally:
+            # Ante un error no dejar commits huérfanos
+            for _, tarea in pendientes:
+                tarea.cancel()
+            await asyncio.gather(*(tarea for _, tarea in pendientes), return_exceptions=True)
+        return eliminados
@@ -0,0 +1,53 @@
+"""Pruebas sobre el Firestore en memoria de los benchmarks.
+
+Uso (desde Backend/):
+    python -m pytest tests
+
+El cliente simulado se instala antes de importar cualquier servicio, así
+que nada sale a la red. Cada prueba usa sus propios candidatos y votantes.
+"""
+import asyncio
+import os
+import uuid
+
+import pytest
+
+# Los reintentos de una misma cuenta excederían la regla de admisión por cuenta
+os.environ.setdefault('ADMISION_REGLAS', '')
+
+from benchmarks.firestore_simulado import ClienteSimulado, instalar  # noqa: E402
+
+cliente = ClienteSimulado()
+instalar(cliente)
+
+
+def nuevo_candidato() -> str:
+    """Crear un candidato con un número libre y retornar su ID"""
+    from services.candidato_service_async import AsyncCandidatoService
+
+    numero = uuid.uuid4().int % 10**9
+    exito, mensaje, candidato_id = asyncio.run(AsyncCandidatoService.create(
+        nombre=f'Candidato {numero}', numero=numero, cargo='Delegado'
+    ))
+    assert exito, mensaje
+    return candidato_id
+
+
+def votos_de(candidato_id: str) -> int:
+    from services.candidato_service_async import AsyncCandidatoService
+
+    return asyncio.run(AsyncCandidatoService.get_by_id(candidato_id)).votos
+
+
+@pytest.fixture
+def candidato() -> str:
+    return nuevo_candidato()
+
+
+@pytest.fixture
+def votante():
+    """Fábrica de (userId, correo) que no votaron"""
+    def crear():
+        sufijo = uuid.uuid4().hex[:12]
+        return f'u{sufijo}', f'{sufijo}@continental.edu.pe'
+    return crear
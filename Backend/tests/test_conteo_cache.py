@@ -0,0 +1,30 @@
+import asyncio
+import uuid
+
+from services.candidato_service_async import AsyncCandidatoService
+from services.conteo_cache import ConteoCache
+from services.ranking import segmentos_desde_conteo
+
+
+def test_segmento_sin_semestre_igual_que_desde_el_conteo():
+    cargo = f'Cargo {uuid.uuid4().hex[:8]}'
+
+    async def crear():
+        for semestre in (None, 'V'):
+            numero = uuid.uuid4().int % 10**9
+            assert (await AsyncCandidatoService.create(
+                nombre=f'Candidato {numero}', numero=numero, cargo=cargo, semestre=semestre
+            ))[0]
+    asyncio.run(crear())
+
+    cache = ConteoCache()
+    cache.iniciar()
+    try:
+        assert cache.esperar(timeout=5)
+        conteo = cache.get_conteo_votos()
+        for semestre in ('', 'V', None):
+            esperado = segmentos_desde_conteo(conteo, cargo, semestre)
+            assert esperado
+            assert cache.get_segmentos(cargo, semestre) == esperado
+    finally:
+        cache.detener()
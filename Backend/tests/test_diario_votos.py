@@ -0,0 +1,85 @@
+import asyncio
+import time
+
+from services.diario_votos import DiarioVotos
+from services.ingesta_votos import IngestaVotos
+from services.voto_service import voto_id
+from tests.conftest import cliente, votos_de
+
+
+async def _esperar(condicion, limite: float = 5.0):
+    fin = time.monotonic() + limite
+    while not condicion():
+        assert time.monotonic() < fin, 'la ingesta no vació la cola a tiempo'
+        await asyncio.sleep(0.01)
+
+
+async def _caer(ingesta: IngestaVotos):
+    """El proceso muere con votos anotados en el diario y sin escribir"""
+    ingesta._tarea.cancel()
+    await asyncio.gather(ingesta._tarea, return_exceptions=True)
+    await ingesta.diario.detener()
+
+
+def test_votos_del_diario_se_escriben_al_reiniciar(tmp_path, candidato, votante):
+    votantes = [votante() for _ in range(3)]
+
+    async def aceptar():
+        # Un plazo largo: nada llega a Firestore antes de la caída
+        ingesta = IngestaVotos(modo='diferida', intervalo=60, diario=DiarioVotos(str(tmp_path)))
+        ingesta.iniciar()
+        recibos = []
+        for user_id, correo in votantes:
+            exito, _, recibo = await ingesta.encolar(user_id, candidato, correo)
+            assert exito
+            recibos.append(recibo)
+        await _caer(ingesta)
+        return recibos
+    recibos = asyncio.run(aceptar())
+    assert votos_de(candidato) == 0
+
+    async def reiniciar():
+        ingesta = IngestaVotos(modo='diferida', intervalo=0.01, diario=DiarioVotos(str(tmp_path)))
+        recuperados = ingesta.iniciar()
+        await _esperar(lambda: ingesta.pendientes() == 0)
+        estados = [(await ingesta.estado_recibo(recibo))['estado'] for recibo in recibos]
+        await ingesta.detener()
+        return recuperados, estados, ingesta.diario.pendientes()
+    recuperados, estados, pendientes = asyncio.run(reiniciar())
+
+    assert recuperados == 3
+    assert estados == ['registrado'] * 3
+    assert pendientes == 0
+    assert votos_de(candidato) == 3
+    for (user_id, _), recibo in zip(votantes, recibos):
+        assert cliente.collection('votos').document(voto_id(user_id)).get().get('recibo') == recibo
+
+
+def test_reproducir_un_voto_ya_escrito_no_lo_cuenta_dos_veces(tmp_path, candidato, votante):
+    user_id, correo = votante()
+
+    async def escribir_y_caer():
+        # El batch llega a Firestore pero el proceso muere antes de anotarlo
+        # como confirmado en el diario
+        ingesta = IngestaVotos(modo='diferida', intervalo=60, diario=DiarioVotos(str(tmp_path)))
+        ingesta.iniciar()
+        _, _, recibo = await ingesta.encolar(user_id, candidato, correo)
+        await IngestaVotos(modo='diferida', diario=DiarioVotos(''))._commit(list(ingesta._cola))
+        await _caer(ingesta)
+        return recibo
+
+    recibo = asyncio.run(escribir_y_caer())
+    assert votos_de(candidato) == 1
+
+    async def reiniciar():
+        ingesta = IngestaVotos(modo='diferida', intervalo=0.01, diario=DiarioVotos(str(tmp_path)))
+        recuperados = ingesta.iniciar()
+        await _esperar(lambda: ingesta.pendientes() == 0)
+        estado = await ingesta.estado_recibo(recibo)
+        await ingesta.detener()
+        return recuperados, estado
+    recuperados, estado = asyncio.run(reiniciar())
+
+    assert recuperados == 1
+    assert estado['estado'] == 'registrado'
+    assert votos_de(candidato) == 1
@@ -0,0 +1,100 @@
+import asyncio
+import uuid
+
+import httpx
+import pytest
+
+from services.idempotencia import ClaveReutilizada, RespuestasIdempotentes
+from tests.conftest import votos_de
+
+
+def _productor(codigo: int = 200):
+    """Productor que cuenta sus llamadas"""
+    llamadas = []
+
+    async def producir():
+        llamadas.append(1)
+        await asyncio.sleep(0)
+        return codigo, {'n': len(llamadas)}
+    return producir, llamadas
+
+
+def test_reintento_recibe_la_misma_respuesta():
+    respuestas = RespuestasIdempotentes()
+    producir, llamadas = _productor()
+
+    async def probar():
+        primera = await respuestas.resolver('u1', 'k', ('u1', 'c1'), producir)
+        segunda = await respuestas.resolver('u1', 'k', ('u1', 'c1'), producir)
+        return primera, segunda
+    primera, segunda = asyncio.run(probar())
+
+    assert primera == (200, {'n': 1}, False)
+    assert segunda == (200, {'n': 1}, True)
+    assert len(llamadas) == 1
+
+
+def test_reintento_concurrente_espera_al_original():
+    respuestas = RespuestasIdempotentes()
+    producir, llamadas = _productor()
+
+    async def probar():
+        return await asyncio.gather(*(
+            respuestas.resolver('u1', 'k', ('u1', 'c1'), producir) for _ in range(3)
+        ))
+    resultados = asyncio.run(probar())
+
+    assert len(llamadas) == 1
+    assert sorted(repetida for _, _, repetida in resultados) == [False, True, True]
+
+
+def test_clave_con_otra_peticion_es_conflicto():
+    respuestas = RespuestasIdempotentes()
+    producir, _ = _productor()
+    asyncio.run(respuestas.resolver('u1', 'k', ('u1', 'c1'), producir))
+    with pytest.raises(ClaveReutilizada):
+        asyncio.run(respuestas.resolver('u1', 'k', ('u1', 'c2'), producir))
+
+
+def test_claves_por_cuenta():
+    respuestas = RespuestasIdempotentes()
+    producir, llamadas = _productor()
+    asyncio.run(respuestas.resolver('u1', 'k', ('u1', 'c1'), producir))
+    codigo, _, repetida = asyncio.run(respuestas.resolver('u2', 'k', ('u2', 'c1'), producir))
+    assert (codigo, repetida, len(llamadas)) == (200, False, 2)
+
+
+def test_errores_5xx_no_se_guardan():
+    respuestas = RespuestasIdempotentes()
+    producir, llamadas = _productor(503)
+    asyncio.run(respuestas.resolver('u1', 'k', ('u1', 'c1'), producir))
+    assert not respuestas.conocida('u1', 'k')
+    codigo, _, repetida = asyncio.run(respuestas.resolver('u1', 'k', ('u1', 'c1'), producir))
+    assert (codigo, repetida, len(llamadas)) == (503, False, 2)
+
+
+def test_post_votos_repetido_con_idempotency_key(candidato, votante):
+    from app.main import app
+
+    user_id, correo = votante()
+    voto = {'userId': user_id, 'candidatoId': candidato, 'correo': correo}
+    headers = {'Idempotency-Key': str(uuid.uuid4())}
+
+    async def probar():
+        async with app.router.lifespan_context(app):
+            transporte = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transporte, base_url='http://test') as http:
+                primera = await http.post('/api/votos/', json=voto, headers=headers)
+                segunda = await http.post('/api/votos/', json=voto, headers=headers)
+                sin_clave = await http.post('/api/votos/', json=voto)
+                otro_voto = await http.post('/api/votos/', json=dict(voto, candidatoId='otro'), headers=headers)
+        return primera, segunda, sin_clave, otro_voto
+    primera, segunda, sin_clave, otro_voto = asyncio.run(probar())
+
+    assert primera.status_code == 200 and 'Idempotency-Replayed' not in primera.headers
+    assert segunda.status_code == 200 and segunda.headers['Idempotency-Replayed'] == 'true'
+    assert segunda.json() == primera.json()
+    # Sin la clave el reintento es un voto nuevo, y se rechaza por repetido
+    assert sin_clave.status_code == 400
+    assert otro_voto.status_code == 422
+    assert votos_de(candidato) == 1
@@ -0,0 +1,85 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from services.reinicio_eleccion import DOCUMENTO_ESTADO, SIN_AVANCE_INTERRUMPIDO, ReinicioEleccion
+from services.voto_service_async import AsyncVotoService
+from tests.conftest import cliente, votos_de
+
+
+def _vaciar_votos():
+    for coleccion in ('votos', 'votos_correos'):
+        for doc in cliente.collection(coleccion).stream():
+            doc.reference.delete()
+
+
+def _ids(coleccion: str) -> list:
+    return sorted(doc.id for doc in cliente.collection(coleccion).stream())
+
+
+def _estado_guardado(hace: timedelta, **campos) -> dict:
+    momento = (datetime.utcnow() - hace).isoformat()
+    estado = {
+        'estado': 'en_curso', 'total_votos': 0, 'votos_eliminados': 0, 'correos_eliminados': 0,
+        'lotes': 0, 'cursores': {}, 'mensaje': None, 'iniciado': momento, 'actualizado': momento,
+        'finalizado': None,
+    }
+    estado.update(campos)
+    return estado
+
+
+def _votar(candidato: str, votante, cantidad: int):
+    async def votar():
+        for _ in range(cantidad):
+            user_id, correo = votante()
+            assert (await AsyncVotoService.registrar_voto(user_id, candidato, correo))[0]
+    asyncio.run(votar())
+
+
+def test_reinicio_interrumpido_se_retoma_desde_los_cursores(candidato, votante):
+    _vaciar_votos()
+    _votar(candidato, votante, 5)
+    votos = _ids('votos')
+
+    # Un reinicio anterior borró los dos primeros votos y su proceso murió
+    for doc_id in votos[:2]:
+        cliente.collection('votos').document(doc_id).delete()
+    sistema = cliente.collection('sistema').document(DOCUMENTO_ESTADO)
+    sistema.set(_estado_guardado(
+        timedelta(seconds=SIN_AVANCE_INTERRUMPIDO * 2),
+        total_votos=5, votos_eliminados=2, lotes=1, cursores={'votos': votos[1]},
+    ))
+
+    reinicio = ReinicioEleccion()
+
+    async def retomar():
+        estado = await reinicio.iniciar()
+        await reinicio._tarea
+        return estado, await reinicio.estado()
+    try:
+        al_iniciar, final = asyncio.run(retomar())
+    finally:
+        sistema.delete()
+
+    assert al_iniciar['estado'] == 'en_curso' and al_iniciar['votos_eliminados'] == 2
+    assert final['estado'] == 'completado'
+    assert (final['total_votos'], final['votos_eliminados'], final['correos_eliminados']) == (5, 5, 5)
+    assert final['porcentaje'] == 100.0
+    assert _ids('votos') == [] and _ids('votos_correos') == []
+    assert votos_de(candidato) == 0
+
+
+def test_reinicio_en_curso_en_otro_worker_no_se_relanza(candidato, votante):
+    _vaciar_votos()
+    _votar(candidato, votante, 2)
+    sistema = cliente.collection('sistema').document(DOCUMENTO_ESTADO)
+    sistema.set(_estado_guardado(timedelta(seconds=1), total_votos=2))
+
+    reinicio = ReinicioEleccion()
+    try:
+        estado = asyncio.run(reinicio.iniciar())
+    finally:
+        sistema.delete()
+
+    assert estado['estado'] == 'en_curso'
+    assert not reinicio.en_curso()
+    assert len(_ids('votos')) == 2
@@ -0,0 +1,38 @@
+import asyncio
+
+from services.voto_service import VotoService, voto_id
+from services.voto_service_async import AsyncVotoService
+from tests.conftest import cliente, votos_de
+
+
+def test_voto_repetido_del_mismo_usuario(candidato, votante):
+    user_id, correo = votante()
+    exito, _, evento = asyncio.run(AsyncVotoService.registrar_voto(user_id, candidato, correo))
+    assert exito and evento['candidato_id'] == candidato
+
+    exito, mensaje, evento = asyncio.run(AsyncVotoService.registrar_voto(user_id, candidato, f'otro.{correo}'))
+    assert (exito, mensaje, evento) == (False, 'El usuario ya ha votado', None)
+    assert votos_de(candidato) == 1
+
+
+def test_correo_repetido_con_otro_usuario(candidato, votante):
+    user_id, correo = votante()
+    otro_usuario, _ = votante()
+    assert asyncio.run(AsyncVotoService.registrar_voto(user_id, candidato, correo))[0]
+
+    # El correo se normaliza: mayúsculas y espacios no lo hacen otro
+    exito, mensaje, _ = asyncio.run(
+        AsyncVotoService.registrar_voto(otro_usuario, candidato, f' {correo.upper()} ')
+    )
+    assert (exito, mensaje) == (False, 'Este correo ya ha sido usado para votar')
+    assert votos_de(candidato) == 1
+    # El rechazo no dejó ni el voto ni la reserva a medias
+    assert not cliente.collection('votos').document(voto_id(otro_usuario)).get().exists
+
+
+def test_voto_repetido_en_el_cliente_sincrono(candidato, votante):
+    user_id, correo = votante()
+    assert VotoService.registrar_voto(user_id, candidato, correo)[0]
+    exito, mensaje, _ = VotoService.registrar_voto(user_id, candidato, correo)
+    assert (exito, mensaje) == (False, 'El usuario ya ha votado')
+    assert votos_de(candidato) == 1